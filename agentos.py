@@ -5,25 +5,46 @@ This file sets up the AgentOS with all agents and serves the API
 import asyncio
 import json
 import os
+import uuid
+from contextlib import asynccontextmanager
 from pathlib import Path
 from typing import Optional
 from agno.db.sqlite import SqliteDb
 from agno.os import AgentOS
 from agno.tools.mcp import MultiMCPTools
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, File, Form, HTTPException, Request, UploadFile
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import StreamingResponse
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from sse_starlette.sse import EventSourceResponse
 
 from agents import create_newsletter_agent, create_digest_agent, create_research_agent, create_social_agent
 from workflows import create_newsletter_workflow, create_simple_newsletter_workflow
 from workflows.notification_manager import get_notification_manager
 from services.email_service import send_newsletter_email
+from services.knowledge_refresher import get_knowledge_refresher
+from services.knowledge_service import get_knowledge_service
+from services.lance_maintenance import get_lance_maintenance
+from services.memory_queue import get_memory_queue
+from services.memory_index import get_memory_index
+from services.history_budget import get_history_budget
+from services.session_summary import get_session_summary_queue
+from services.memory_consolidation import get_memory_consolidator
+from services.chat_history_import import get_chat_history_importer
+from services.interest_profile import get_interest_profiles
+from services.llm_cache import get_llm_cache
+from services.http_pool import get_http_pool
+from services.run_accounting import get_run_accounting
+from services.metrics import get_metrics_registry
+from readers import get_reader_registry
 from config.settings import (
     DATABASE_FILE,
     AGENTOS_PORT,
     AGENTOS_HOST,
     STATIC_DIR,
+    KNOWLEDGE_REFRESH_ENABLED,
+    LANCE_MAINTENANCE_ENABLED,
+    MEMORY_CONSOLIDATION_ENABLED,
+    CHAT_IMPORT_DIR,
     validate_settings,
 )
 
@@ -31,11 +52,36 @@ from config.settings import (
 # Validate settings on startup
 validate_settings()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open the shared knowledge base before serving, release it on shutdown"""
+    knowledge_service = get_knowledge_service()
+    await asyncio.to_thread(knowledge_service.warm_up)
+    # Start loading the history tokenizer so first runs do not fall back to estimates for long
+    get_history_budget().counter.load()
+    if LANCE_MAINTENANCE_ENABLED:
+        get_lance_maintenance().start()
+    if KNOWLEDGE_REFRESH_ENABLED:
+        await asyncio.to_thread(start_knowledge_refresher)
+    yield
+    if KNOWLEDGE_REFRESH_ENABLED:
+        get_knowledge_refresher(knowledge_service.knowledge).stop()
+    memory_consolidator.stop()
+    # Extract memories from turns still waiting in the deferred queue
+    await asyncio.to_thread(get_memory_queue().close)
+    await asyncio.to_thread(get_session_summary_queue().close)
+    await asyncio.to_thread(get_run_accounting().close)
+    get_lance_maintenance().stop()
+    knowledge_service.close()
+    await get_http_pool().aclose()
+
+
 # Create custom FastAPI app FIRST (before AgentOS)
 custom_app = FastAPI(
     title="Open Pulse API",
     description="Personalized AI Newsletter Service with Notifications",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # Create shared database instance
@@ -56,6 +102,26 @@ newsletter_workflow = create_newsletter_workflow(db=db)
 simple_workflow = create_simple_newsletter_workflow(db=db)
 print("✅ Workflows created successfully")
 
+# Incremental re-crawl of URL-sourced knowledge, started in lifespan after the knowledge warm-up
+def start_knowledge_refresher():
+    knowledge_refresher = get_knowledge_refresher(get_knowledge_service().knowledge)
+    discovered = knowledge_refresher.discover_sources()
+    if discovered:
+        print(f"📌 Tracking {discovered} new URL source(s) for refresh")
+    knowledge_refresher.start()
+
+
+def require_knowledge_refresher():
+    """The knowledge refresher, or 404 when KNOWLEDGE_REFRESH_ENABLED is off"""
+    if not KNOWLEDGE_REFRESH_ENABLED:
+        raise HTTPException(status_code=404, detail="Knowledge refresh is disabled")
+    return get_knowledge_refresher(get_knowledge_service().knowledge)
+
+# Periodic merging of near-duplicate user memories
+memory_consolidator = get_memory_consolidator(db)
+if MEMORY_CONSOLIDATION_ENABLED:
+    memory_consolidator.start()
+
 
 # ========================
 # Custom API Endpoints (Define BEFORE AgentOS)
@@ -324,6 +390,285 @@ def create_custom_endpoints(app: FastAPI, agent_os_instance: AgentOS):
         return notification_manager.get_stats()
 
 
+    @app.get("/api/knowledge/stats")
+    async def knowledge_stats():
+        """Get shared knowledge base statistics (paths, init time, document count)"""
+        return await asyncio.to_thread(get_knowledge_service().get_stats)
+
+
+    @app.get("/api/knowledge/indexes")
+    async def knowledge_indexes():
+        """Get vector/full-text index coverage and the latency before and after each index change"""
+        index_manager = get_knowledge_service().vector_db.index_manager
+        if index_manager is None:
+            return {"enabled": False}
+        return await asyncio.to_thread(index_manager.get_stats)
+
+
+    @app.post("/api/knowledge/indexes/check")
+    async def check_knowledge_indexes():
+        """Build or update indexes now if a threshold has been crossed"""
+        index_manager = get_knowledge_service().vector_db.index_manager
+        if index_manager is None:
+            return {"enabled": False}
+        record = await asyncio.to_thread(index_manager.check)
+        return {"enabled": True, "changed": record is not None, "record": record}
+
+
+    @app.get("/api/knowledge/maintenance")
+    async def knowledge_maintenance_stats():
+        """Get fragment/version counts, on-disk size and recent compaction passes"""
+        return await asyncio.to_thread(get_lance_maintenance().get_stats)
+
+
+    @app.post("/api/knowledge/maintenance/run")
+    async def run_knowledge_maintenance():
+        """Compact fragments and prune old versions now, returning before/after layout"""
+        report = await asyncio.to_thread(get_lance_maintenance().run)
+        return report.to_dict()
+
+
+    @app.get("/api/memory/queue")
+    async def memory_queue_stats():
+        """Get deferred memory extraction stats (pending turns, LLM calls and latency saved)"""
+        return get_memory_queue().get_stats()
+
+
+    @app.post("/api/memory/queue/flush")
+    async def flush_memory_queue():
+        """Extract memories from every queued turn now"""
+        await asyncio.to_thread(get_memory_queue().flush)
+        return get_memory_queue().get_stats()
+
+
+    @app.get("/api/sessions/summaries")
+    async def session_summary_stats():
+        """Get incremental session summary stats (updates, skips and prompt size per update)"""
+        return get_session_summary_queue().get_stats()
+
+
+    @app.get("/api/sessions/history")
+    async def history_budget_stats():
+        """Get conversation history stats per agent (history tokens and runs per prompt)"""
+        return get_history_budget().get_stats()
+
+
+    @app.get("/api/memory/index")
+    async def memory_index_stats():
+        """Get memory retrieval stats (memories indexed, context tokens saved per run)"""
+        return get_memory_index().get_stats()
+
+
+    @app.get("/api/memory/consolidation")
+    async def memory_consolidation_stats():
+        """Get memory consolidation stats (memory count and tokens before/after recent passes)"""
+        return memory_consolidator.get_stats()
+
+
+    @app.post("/api/memory/consolidation/run")
+    async def run_memory_consolidation(user_id: Optional[str] = None, dry_run: bool = False):
+        """Merge near-duplicate memories now (dry_run only reports the clusters)"""
+        report = await asyncio.to_thread(memory_consolidator.run, user_id, dry_run)
+        return report.to_dict()
+
+
+    @app.get("/api/memory/archive/{user_id}")
+    async def archived_memories(user_id: str, limit: int = 100):
+        """List a user's memories that were merged away by consolidation"""
+        return {"memories": await asyncio.to_thread(memory_consolidator.list_archived, user_id, limit)}
+
+
+    @app.get("/api/http-pool")
+    async def http_pool_stats():
+        """Get shared HTTP pool stats (limits, HTTP/2, provider clients created and reused)"""
+        return get_http_pool().get_stats()
+
+
+    @app.get("/api/llm-cache")
+    async def llm_cache_stats():
+        """Get LLM response cache stats (hits, latency and tokens saved)"""
+        return await asyncio.to_thread(get_llm_cache().get_stats)
+
+
+    @app.delete("/api/llm-cache")
+    async def clear_llm_cache():
+        """Drop every cached model response"""
+        await asyncio.to_thread(get_llm_cache().clear)
+        return {"status": "cleared"}
+
+
+    @app.get("/api/accounting")
+    async def run_accounting_stats():
+        """Get run accounting stats (rows stored, total estimated cost)"""
+        return await asyncio.to_thread(get_run_accounting().get_stats)
+
+
+    @app.get("/api/accounting/summary")
+    async def run_accounting_summary(
+        group_by: str = "day",
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        user_id: Optional[str] = None,
+        agent: Optional[str] = None,
+    ):
+        """Tokens, latency and estimated cost by user, agent, day, step, model or workflow (days as YYYY-MM-DD)"""
+        try:
+            rows = await asyncio.to_thread(get_run_accounting().summary, group_by, since, until, user_id, agent)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return {"group_by": group_by, "rows": rows}
+
+
+    @app.get("/api/accounting/runs")
+    async def run_accounting_runs(limit: int = 50, user_id: Optional[str] = None, agent: Optional[str] = None):
+        """Latest accounted agent runs and workflow steps"""
+        return {"runs": await asyncio.to_thread(get_run_accounting().recent, limit, user_id, agent)}
+
+
+    @app.get("/api/profile/{user_id}")
+    async def interest_profile(user_id: str):
+        """Get a user's interest profile (weighted topics, formats, exclusions), rebuilt if memories changed"""
+        profile = await asyncio.to_thread(get_interest_profiles(db).get, user_id)
+        return profile.to_dict()
+
+
+    @app.get("/api/profile")
+    async def interest_profile_stats():
+        """Get interest profile cache stats (hits, builds, invalidations)"""
+        return get_interest_profiles(db).get_stats()
+
+
+    @app.post("/api/memory/import")
+    async def import_chat_history(
+        file: UploadFile = File(...),
+        user_id: str = Form(...),
+        format: Optional[str] = Form(None),
+    ):
+        """Upload a chat export (JSON/JSONL/TXT) and extract memories from it in the background"""
+        import_dir = Path(CHAT_IMPORT_DIR)
+        import_dir.mkdir(parents=True, exist_ok=True)
+        # Unique per upload; the job deletes the file when it ends
+        path = import_dir / f"{uuid.uuid4().hex}-{Path(file.filename or 'export.txt').name}"
+        # Stream the upload to disk; exports can be hundreds of MB, so file I/O stays off the event loop
+        out = await asyncio.to_thread(open, path, "wb")
+        try:
+            while chunk := await file.read(1 << 20):
+                await asyncio.to_thread(out.write, chunk)
+        except BaseException:
+            await asyncio.to_thread(out.close)
+            path.unlink(missing_ok=True)
+            raise
+        await asyncio.to_thread(out.close)
+        job = get_chat_history_importer(db).start(str(path), user_id, format, delete_file=True)
+        return job.to_dict()
+
+
+    @app.get("/api/memory/import")
+    async def list_chat_imports():
+        """List recent chat history imports with their progress"""
+        return {"jobs": get_chat_history_importer(db).list_jobs()}
+
+
+    @app.get("/api/memory/import/{job_id}")
+    async def chat_import_status(job_id: str):
+        """Get the progress of one chat history import"""
+        job = get_chat_history_importer(db).get_job(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Import job not found")
+        return job.to_dict()
+
+
+    @app.post("/api/memory/import/{job_id}/cancel")
+    async def cancel_chat_import(job_id: str):
+        """Stop a running chat history import after the windows in flight"""
+        job = get_chat_history_importer(db).cancel(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Import job not found")
+        return job.to_dict()
+
+
+    @app.get("/api/knowledge/refresh/stats")
+    async def knowledge_refresh_stats():
+        """Get knowledge refresh statistics (bytes fetched, chunks re-embedded per cycle)"""
+        return require_knowledge_refresher().get_stats()
+
+
+    @app.get("/api/knowledge/refresh/sources")
+    async def knowledge_refresh_sources():
+        """List URL sources tracked for refresh"""
+        return {"sources": require_knowledge_refresher().list_sources()}
+
+
+    @app.post("/api/knowledge/refresh/sources")
+    async def add_knowledge_refresh_source(request: Request):
+        """
+        Track a URL for periodic refresh
+        Form fields: url, interval_seconds (optional), name (optional),
+        metadata (optional JSON object; its user_id keeps the chunks in that user's namespace)
+        """
+        knowledge_refresher = require_knowledge_refresher()
+        form_data = await request.form()
+        url = form_data.get("url", "")
+        if not url:
+            raise HTTPException(status_code=400, detail="url is required")
+
+        metadata = None
+        if form_data.get("metadata"):
+            try:
+                metadata = json.loads(form_data.get("metadata"))
+            except ValueError:
+                metadata = None
+            if not isinstance(metadata, dict):
+                raise HTTPException(status_code=400, detail="metadata must be a JSON object")
+
+        interval = form_data.get("interval_seconds") or None
+        if interval is not None:
+            try:
+                interval = int(interval)
+            except ValueError:
+                raise HTTPException(status_code=400, detail="interval_seconds must be a whole number of seconds")
+            if interval <= 0:
+                raise HTTPException(status_code=400, detail="interval_seconds must be positive")
+
+        await asyncio.to_thread(
+            knowledge_refresher.add_source,
+            url,
+            interval,
+            form_data.get("name") or None,
+            None,
+            metadata,
+        )
+        return {"url": url, "status": "tracked"}
+
+
+    @app.post("/api/knowledge/refresh/run")
+    async def run_knowledge_refresh(force: bool = False):
+        """Run a refresh cycle now and return its report"""
+        report = await asyncio.to_thread(require_knowledge_refresher().run_cycle, force)
+        return report.to_dict()
+
+
+    @app.get("/api/readers/stats")
+    async def reader_stats():
+        """Known readers, their registration status and whether they have been loaded"""
+        return get_reader_registry().get_stats()
+
+
+    @app.get("/api/metrics")
+    async def metrics_snapshot(prefix: Optional[str] = None):
+        """
+        Get structured metrics as JSON (reader latency, retries, chunk counts, ...)
+        Use ?prefix=reader_ to filter by metric name
+        """
+        return get_metrics_registry().snapshot(prefix=prefix)
+
+
+    @app.get("/metrics", response_class=PlainTextResponse)
+    async def metrics_prometheus():
+        """Metrics in the Prometheus text exposition format"""
+        return get_metrics_registry().render_prometheus()
+
+
 # Create AgentOS with custom FastAPI app
 agent_os = AgentOS(
     id="open-pulse-os",
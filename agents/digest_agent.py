@@ -2,54 +2,23 @@
 Digest Agent - Background agent for processing user interests and generating newsletters
 This agent runs autonomously to create personalized content
 """
+import os
 from textwrap import dedent
 from agno.agent import Agent
 from agno.db.sqlite import SqliteDb
-from agno.models.openai import OpenAIChat
-from agno.models.openrouter import OpenRouter
 from agno.tools.arxiv import ArxivTools
-from config.settings import DATABASE_FILE
+from config.settings import DATABASE_FILE, INTEREST_PROFILE_ENABLED
+from config.model_factory import create_chat_model
 from config.memory_config import create_digest_memory_manager
-from agno.knowledge import Knowledge
-from agno.vectordb.lancedb import LanceDb
-from agno.db.sqlite import SqliteDb
-from agno.vectordb.search import SearchType
-from agno.knowledge.embedder.google import GeminiEmbedder
-from agno.knowledge.embedder.openai import OpenAIEmbedder
-import os
-
-# Import custom reader registry
-from readers import register_all_readers
+from services.knowledge_namespace import scope_knowledge_to_user
+from services.memory_index import focus_memories_on_input
+from services.llm_cache import with_response_cache
+from services.interest_profile import get_interest_profiles, load_interest_profile, with_interest_profile
+from services.knowledge_service import get_knowledge
+from services.run_accounting import account_runs
 
 MODEL_ID = os.getenv("MODEL_ID")
 
-contents_db = SqliteDb(db_file="my_knowledge.db")
-
-
-vector_db = LanceDb(
-    table_name="agno_docs",
-    uri="tmp/lancedb",
-    search_type=SearchType.hybrid,
-    embedder=OpenAIEmbedder(),
-)
-
-# Create knowledge base
-knowledge = Knowledge(
-    name="My Knowledge Base",
-    vector_db=vector_db,
-    contents_db=contents_db,
-)
-
-# Register all custom readers
-reader_status = register_all_readers(knowledge)
-for reader_name, status in reader_status.items():
-    if status == "registered":
-        print(f"✅ Registered {reader_name}")
-    elif status.startswith("skipped"):
-        print(f"⚠️  {reader_name}: {status}")
-    else:
-        print(f"❌ {reader_name}: {status}")
-
 
 def create_digest_agent(db: SqliteDb = None) -> Agent:
     """
@@ -70,12 +39,16 @@ def create_digest_agent(db: SqliteDb = None) -> Agent:
     if db is None:
         # Use Agno's default table names
         db = SqliteDb(db_file=DATABASE_FILE)
+    if INTEREST_PROFILE_ENABLED:
+        get_interest_profiles(db)  # Memory writes through db refresh the profile
     
     agent = Agent(
         name="Digest Agent",
-        model=OpenAIChat(id=MODEL_ID) if os.getenv("OPENAI_API_KEY") else OpenRouter(id=MODEL_ID),
+        # Identical calls on the same day are served from the response cache (LLM_CACHE_ENABLED)
+        model=with_response_cache(create_chat_model(MODEL_ID)),
         description="An AI agent that analyzes user interests and generates personalized newsletter content.",
-        instructions=dedent("""
+        # Instructions end with the user's cached interest profile
+        instructions=with_interest_profile(dedent("""
             You are the Digest Agent for Open Pulse, responsible for generating personalized newsletters.
             
             Your role is to:
@@ -105,10 +78,12 @@ def create_digest_agent(db: SqliteDb = None) -> Agent:
             - Insightful and thought-provoking
             - Respectful of the reader's time
             - Enthusiastic about interesting developments
-        """),
+        """)),
         # Database for storing digest sessions
         db=db,
-        knowledge=knowledge,
+        knowledge=get_knowledge(),  # Shared knowledge base
+        # Search only this user's and shared documents; rank memories by the run input
+        pre_hooks=[scope_knowledge_to_user, focus_memories_on_input, load_interest_profile, account_runs],
         memory_manager=create_digest_memory_manager(db),  # Use custom memory configuration
         # Don't need to create new memories, just read existing ones
         enable_user_memories=True,
@@ -146,12 +121,16 @@ def create_research_agent(db: SqliteDb = None) -> Agent:
     if db is None:
         # Use Agno's default table names
         db = SqliteDb(db_file=DATABASE_FILE)
+    if INTEREST_PROFILE_ENABLED:
+        get_interest_profiles(db)  # Memory writes through db refresh the profile
     
     agent = Agent(
         name="Research Agent",
-        model=OpenAIChat(id=MODEL_ID) if os.getenv("OPENAI_API_KEY") else OpenRouter(id=MODEL_ID),
+        # Identical calls on the same day are served from the response cache (LLM_CACHE_ENABLED)
+        model=with_response_cache(create_chat_model(MODEL_ID)),
         description="An AI agent specialized in finding and extracting relevant information.",
-        instructions=dedent("""
+        # Instructions end with the user's cached interest profile
+        instructions=with_interest_profile(dedent("""
             You are a Research Agent specialized in finding high-quality information.
             
             Your role is to:
@@ -174,9 +153,11 @@ def create_research_agent(db: SqliteDb = None) -> Agent:
             - Notable sources
             - Relevance score (1-10)
             - Recency (date of information)
-        """),
+        """)),
         db=db,
-        knowledge=knowledge,
+        knowledge=get_knowledge(),  # Shared knowledge base
+        # Search only this user's and shared documents; load the user's interest profile
+        pre_hooks=[scope_knowledge_to_user, load_interest_profile, account_runs],
         add_datetime_to_context=True,
         enable_user_memories=True,
         tools=[
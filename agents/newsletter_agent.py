@@ -6,49 +6,17 @@ import os
 from textwrap import dedent
 from agno.agent import Agent
 from agno.db.sqlite import SqliteDb
-from agno.models.openai import OpenAIChat
-from agno.models.openrouter import OpenRouter
 from agno.tools.arxiv import ArxivTools
 from config.settings import DATABASE_FILE
-from config.memory_config import create_newsletter_memory_manager
-from agno.knowledge import Knowledge
-from agno.vectordb.lancedb import LanceDb,SearchType
-from agno.db.sqlite import SqliteDb
-from agno.knowledge.embedder.google import GeminiEmbedder
-from agno.knowledge.embedder.openai import OpenAIEmbedder
-import os
-
-# Import custom reader registry
-from readers import register_all_readers
+from config.model_factory import create_chat_model
+from config.memory_config import create_newsletter_memory_manager, create_session_summary_manager, use_agentic_memory
+from services.history_budget import budget_history
+from services.knowledge_namespace import scope_knowledge_to_user
+from services.knowledge_service import get_knowledge
+from services.run_accounting import account_runs
 
 MODEL_ID = os.getenv("MODEL_ID")
 
-contents_db = SqliteDb(db_file="my_knowledge.db")
-
-vector_db = LanceDb(
-    table_name="agno_docs",
-    uri="tmp/lancedb",
-    search_type=SearchType.hybrid,
-    embedder=OpenAIEmbedder(),
-)
-
-# Create knowledge base
-knowledge = Knowledge(
-    name="My Knowledge Base",
-    vector_db=vector_db,
-    contents_db=contents_db
-)
-
-# Register all custom readers
-reader_status = register_all_readers(knowledge)
-for reader_name, status in reader_status.items():
-    if status == "registered":
-        print(f"✅ Registered {reader_name}")
-    elif status.startswith("skipped"):
-        print(f"⚠️  {reader_name}: {status}")
-    else:
-        print(f"❌ {reader_name}: {status}")
-
 
 def create_newsletter_agent(db: SqliteDb = None) -> Agent:
     """
@@ -72,7 +40,7 @@ def create_newsletter_agent(db: SqliteDb = None) -> Agent:
     
     agent = Agent(
         name="Newsletter Agent",
-        model=OpenAIChat(id=MODEL_ID) if os.getenv("OPENAI_API_KEY") else OpenRouter(id=MODEL_ID),
+        model=create_chat_model(MODEL_ID),
         description="A friendly AI assistant that helps users discover and learn about topics they're interested in.",
         instructions=dedent("""
             You are the Newsletter Agent for Open Pulse, a personalized newsletter service.
@@ -100,17 +68,19 @@ def create_newsletter_agent(db: SqliteDb = None) -> Agent:
         """),
         # Enable memory to remember user preferences
         db=db,
-        knowledge=knowledge,
+        knowledge=get_knowledge(),  # Shared knowledge base
+        pre_hooks=[scope_knowledge_to_user, budget_history, account_runs],  # Search only this user's and shared documents; history by token budget
         memory_manager=create_newsletter_memory_manager(db),  # Use custom memory configuration
         enable_user_memories=True,
-        enable_agentic_memory=True,  # Let the agent manage its own memories
+        enable_agentic_memory=use_agentic_memory(),  # Let the agent manage its own memories (off when MEMORY_MODE=deferred)
         
         # Add conversation history to context
         add_history_to_context=True,
-        num_history_runs=10,  # Keep last 10 conversation turns
+        num_history_runs=10,  # At most the last 10 turns, within HISTORY_MAX_TOKENS
         
         # Enable session summaries for long conversations
         enable_session_summaries=True,
+        session_summary_manager=create_session_summary_manager(db),  # Fold new runs in the background (SESSION_SUMMARY_MODE)
         
         # Add current date/time to context
         add_datetime_to_context=True,
@@ -6,8 +6,9 @@ It allows customization of how memories are created, stored, and retrieved.
 """
 import os
 from agno.memory import MemoryManager
-from agno.models.openai import OpenAIChat
 from agno.db.sqlite import SqliteDb
+from config.model_factory import create_openai_model
+from config.settings import MEMORY_MODE, MEMORY_RETRIEVAL_ENABLED, SESSION_SUMMARY_MODE
 
 
 # Memory extraction rules and instructions
@@ -71,11 +72,25 @@ When processing uploaded chat histories:
 """
 
 
+def _memory_manager_class(deferred: bool, relevant_memories: bool) -> type:
+    if relevant_memories:
+        from services.memory_index import DeferredRelevantMemoryManager, RelevantMemoryManager
+
+        return DeferredRelevantMemoryManager if deferred else RelevantMemoryManager
+    if deferred:
+        from services.memory_queue import DeferredMemoryManager
+
+        return DeferredMemoryManager
+    return MemoryManager
+
+
 def create_memory_manager(
     db: SqliteDb,
     model_id: str = None,
     additional_instructions: str = None,
-    enable_wechat_history_processing: bool = False
+    enable_wechat_history_processing: bool = False,
+    deferred: bool = None,
+    relevant_memories: bool = False
 ) -> MemoryManager:
     """
     Create a customized MemoryManager for Open Pulse agents.
@@ -85,6 +100,10 @@ def create_memory_manager(
         model_id: Model to use for memory creation (default: gpt-4o-mini)
         additional_instructions: Extra instructions to append to base rules
         enable_wechat_history_processing: Whether to include chat history processing rules
+        deferred: Queue end-of-turn extraction and run it in background batches
+            (default: MEMORY_MODE == "deferred")
+        relevant_memories: Give runs only the memories most relevant to their input
+            (needs the focus_memories_on_input pre-hook on the agent)
 
     Returns:
         MemoryManager: Configured memory manager instance
@@ -115,10 +134,13 @@ def create_memory_manager(
     if additional_instructions:
         instructions += "\n\n## Additional Instructions\n\n" + additional_instructions
 
+    if deferred is None:
+        deferred = MEMORY_MODE == "deferred"
+
     # Create memory manager
-    memory_manager = MemoryManager(
+    memory_manager = _memory_manager_class(deferred, relevant_memories)(
         db=db,
-        model=OpenAIChat(id=model_id),
+        model=create_openai_model(model_id),
         additional_instructions=instructions
     )
 
@@ -165,6 +187,8 @@ def create_digest_memory_manager(db: SqliteDb) -> MemoryManager:
     - Reading existing memories (not creating new ones)
     - Understanding user context for content generation
     - Tracking content performance over time
+    - Only the memories relevant to the run's input in its context
+      (MEMORY_RETRIEVAL_ENABLED)
 
     Args:
         db: Database connection
@@ -185,7 +209,8 @@ def create_digest_memory_manager(db: SqliteDb) -> MemoryManager:
     return create_memory_manager(
         db=db,
         additional_instructions=additional_instructions,
-        enable_wechat_history_processing=False
+        enable_wechat_history_processing=False,
+        relevant_memories=MEMORY_RETRIEVAL_ENABLED
     )
 
 
@@ -224,12 +249,46 @@ def create_wechat_history_memory_manager(db: SqliteDb) -> MemoryManager:
     )
 
 
+def create_session_summary_manager(db: SqliteDb):
+    """
+    Create the session summary manager for agents with enable_session_summaries.
+
+    With SESSION_SUMMARY_MODE=incremental (default) new runs are folded into the
+    previous summary in the background; with "inline" this returns None and agno
+    re-summarizes the whole session at the end of every run.
+
+    Args:
+        db: Database connection the agent stores its sessions in
+
+    Returns:
+        IncrementalSessionSummaryManager, or None for agno's default manager
+    """
+    if SESSION_SUMMARY_MODE != "incremental":
+        return None
+    from services.session_summary import IncrementalSessionSummaryManager
+
+    # model=None: the agent fills in its own model, as for the default manager
+    return IncrementalSessionSummaryManager(db=db)
+
+
+def use_agentic_memory() -> bool:
+    """
+    Whether agents should update memories through the memory tool during the turn.
+
+    agno skips end-of-turn extraction when agentic memory is on, so deferred
+    mode turns it off and lets the queued extraction do the work.
+    """
+    return MEMORY_MODE != "deferred"
+
+
 # Export configuration
 __all__ = [
+    'use_agentic_memory',
     'create_memory_manager',
     'create_newsletter_memory_manager',
     'create_digest_memory_manager',
     'create_wechat_history_memory_manager',
+    'create_session_summary_manager',
     'MEMORY_EXTRACTION_RULES',
     'WECHAT_HISTORY_EXTRACTION_RULES',
 ]
@@ -0,0 +1,104 @@
+"""
+Model Factory for Open Pulse
+
+Every agent, memory manager and workflow gets its models from here. With
+HTTP_POOL_ENABLED the models are pooled variants of OpenAIChat and OpenRouter:
+instead of building a new OpenAI client (and connection pool) per call, they
+reuse provider clients from the shared HTTP pool in services/http_pool.py, so
+keep-alive connections are shared across all agents and background jobs.
+"""
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+from agno.models.base import Model
+from agno.models.openai import OpenAIChat
+from agno.models.openrouter import OpenRouter
+
+from config.settings import GOOGLE_API_KEY, HTTP_POOL_ENABLED
+
+
+class SharedClientMixin:
+    """Take the OpenAI clients from the shared HTTP pool (unless an http_client was given)"""
+
+    def get_client(self):
+        if self.http_client is not None:
+            return super().get_client()
+        from services.http_pool import get_http_pool
+
+        return get_http_pool().openai_client(self._get_client_params())
+
+    def get_async_client(self):
+        if self.http_client is not None:
+            return super().get_async_client()
+        from services.http_pool import get_http_pool
+
+        return get_http_pool().async_openai_client(self._get_client_params())
+
+
+@dataclass
+class PooledOpenAIChat(SharedClientMixin, OpenAIChat):
+    """OpenAIChat on the shared HTTP pool"""
+
+
+@dataclass
+class PooledOpenRouter(SharedClientMixin, OpenRouter):
+    """OpenRouter on the shared HTTP pool"""
+
+
+def create_openai_model(model_id: str, **kwargs) -> OpenAIChat:
+    """
+    Create an OpenAI chat model.
+
+    Args:
+        model_id: OpenAI model id (e.g. gpt-4o-mini)
+        **kwargs: Further OpenAIChat parameters
+
+    Returns:
+        OpenAIChat: Pooled when HTTP_POOL_ENABLED
+    """
+    model_class = PooledOpenAIChat if HTTP_POOL_ENABLED else OpenAIChat
+    return model_class(id=model_id, **kwargs)
+
+
+def create_chat_model(model_id: Optional[str] = None, **kwargs) -> Model:
+    """
+    Create the agents' chat model: OpenAI when OPENAI_API_KEY is set, OpenRouter otherwise.
+
+    Args:
+        model_id: Model id (default: MODEL_ID)
+        **kwargs: Further model parameters
+
+    Returns:
+        Model: Pooled when HTTP_POOL_ENABLED
+
+    Example:
+        >>> agent = Agent(model=create_chat_model(), ...)
+    """
+    if model_id is None:
+        model_id = os.getenv("MODEL_ID")
+    if os.getenv("OPENAI_API_KEY"):
+        return create_openai_model(model_id, **kwargs)
+    model_class = PooledOpenRouter if HTTP_POOL_ENABLED else OpenRouter
+    return model_class(id=model_id, **kwargs)
+
+
+def create_gemini_client(api_key: Optional[str] = None):
+    """google-genai client for workflow steps, reused across calls when HTTP_POOL_ENABLED"""
+    api_key = api_key or GOOGLE_API_KEY
+    if not HTTP_POOL_ENABLED:
+        from google import genai
+
+        return genai.Client(api_key=api_key)
+    from services.http_pool import get_http_pool
+
+    return get_http_pool().gemini_client(api_key)
+
+
+__all__ = [
+    'PooledOpenAIChat',
+    'PooledOpenRouter',
+    'create_openai_model',
+    'create_chat_model',
+    'create_gemini_client',
+]
@@ -19,6 +19,112 @@ if DATABASE_FILE.startswith("sqlite:///"):
 else:
     DATABASE_FILE = DATABASE_FILE
 
+# User memories: "agentic" (the agent calls the memory tool during the turn) or
+# "deferred" (turns are queued and extracted in batches in the background)
+MEMORY_MODE = os.getenv("MEMORY_MODE", "agentic").lower()
+MEMORY_BATCH_TURNS = int(os.getenv("MEMORY_BATCH_TURNS", "5"))
+MEMORY_IDLE_SECONDS = float(os.getenv("MEMORY_IDLE_SECONDS", "120"))
+# A failed extraction is retried with exponential backoff before its turns are dropped
+MEMORY_EXTRACTION_MAX_RETRIES = int(os.getenv("MEMORY_EXTRACTION_MAX_RETRIES", "3"))
+MEMORY_RETRY_BACKOFF_SECONDS = float(os.getenv("MEMORY_RETRY_BACKOFF_SECONDS", "30"))
+# Digest runs get the memories most relevant to their input, capped by count and estimated tokens
+MEMORY_RETRIEVAL_ENABLED = os.getenv("MEMORY_RETRIEVAL_ENABLED", "true").lower() == "true"
+MEMORY_TOP_K = int(os.getenv("MEMORY_TOP_K", "20"))
+MEMORY_CONTEXT_MAX_TOKENS = int(os.getenv("MEMORY_CONTEXT_MAX_TOKENS", "1500"))
+# Periodic merging of near-duplicate memories (originals are kept in the archive file)
+MEMORY_CONSOLIDATION_ENABLED = os.getenv("MEMORY_CONSOLIDATION_ENABLED", "false").lower() == "true"
+MEMORY_CONSOLIDATION_INTERVAL_SECONDS = int(os.getenv("MEMORY_CONSOLIDATION_INTERVAL_SECONDS", str(24 * 3600)))
+MEMORY_CONSOLIDATION_THRESHOLD = float(os.getenv("MEMORY_CONSOLIDATION_THRESHOLD", "0.9"))
+MEMORY_CONSOLIDATION_MODEL_ID = os.getenv("MEMORY_CONSOLIDATION_MODEL_ID", "gpt-4o-mini")
+MEMORY_ARCHIVE_DB_FILE = os.getenv("MEMORY_ARCHIVE_DB_FILE", str(PROJECT_ROOT / "tmp" / "memory_archive.db"))
+# Per-user interest profiles, rebuilt only when the user's memories change
+INTEREST_PROFILE_ENABLED = os.getenv("INTEREST_PROFILE_ENABLED", "true").lower() == "true"
+INTEREST_PROFILE_DB_FILE = os.getenv("INTEREST_PROFILE_DB_FILE", str(PROJECT_ROOT / "tmp" / "interest_profiles.db"))
+INTEREST_PROFILE_MODEL_ID = os.getenv("INTEREST_PROFILE_MODEL_ID", "gpt-4o-mini")
+# Opt-in cache of model responses for the digest and research agents (same inputs, same day)
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "false").lower() == "true"
+LLM_CACHE_FILE = os.getenv("LLM_CACHE_FILE", str(PROJECT_ROOT / "tmp" / "llm_cache.db"))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+LLM_CACHE_BUCKET_SECONDS = int(os.getenv("LLM_CACHE_BUCKET_SECONDS", str(24 * 3600)))
+# Session summaries: "incremental" folds new runs into the previous summary in the background,
+# "inline" re-summarizes the whole session at the end of every run (agno's default)
+SESSION_SUMMARY_MODE = os.getenv("SESSION_SUMMARY_MODE", "incremental").lower()
+SESSION_SUMMARY_MIN_NEW_RUNS = int(os.getenv("SESSION_SUMMARY_MIN_NEW_RUNS", "2"))
+SESSION_SUMMARY_MIN_NEW_TOKENS = int(os.getenv("SESSION_SUMMARY_MIN_NEW_TOKENS", "800"))
+# Conversation history added to a run: newest runs first up to a token budget (0 = no budget)
+HISTORY_MAX_TOKENS = int(os.getenv("HISTORY_MAX_TOKENS", "4000"))
+HISTORY_MAX_MESSAGE_TOKENS = int(os.getenv("HISTORY_MAX_MESSAGE_TOKENS", "1500"))
+HISTORY_TOKENIZER = os.getenv("HISTORY_TOKENIZER", "Xenova/gpt-4o")
+# Per-run accounting of tokens, latency and estimated cost (prices file: {"model": [usd_per_mtok_in, usd_per_mtok_out]})
+ACCOUNTING_ENABLED = os.getenv("ACCOUNTING_ENABLED", "true").lower() == "true"
+ACCOUNTING_DB_FILE = os.getenv("ACCOUNTING_DB_FILE", str(PROJECT_ROOT / "tmp" / "run_accounting.db"))
+ACCOUNTING_PRICES_FILE = os.getenv("ACCOUNTING_PRICES_FILE", "")
+# Bulk chat-history import: windows end after a quiet gap or at the token budget
+CHAT_IMPORT_DIR = os.getenv("CHAT_IMPORT_DIR", str(PROJECT_ROOT / "tmp" / "chat_imports"))
+CHAT_IMPORT_WORKERS = int(os.getenv("CHAT_IMPORT_WORKERS", "4"))
+CHAT_IMPORT_WINDOW_GAP_SECONDS = int(os.getenv("CHAT_IMPORT_WINDOW_GAP_SECONDS", str(6 * 3600)))
+CHAT_IMPORT_WINDOW_MAX_TOKENS = int(os.getenv("CHAT_IMPORT_WINDOW_MAX_TOKENS", "3000"))
+
+# Shared HTTP connection pool of all model provider clients (HTTP/2 needs the h2 package)
+HTTP_POOL_ENABLED = os.getenv("HTTP_POOL_ENABLED", "true").lower() == "true"
+HTTP_POOL_MAX_CONNECTIONS = int(os.getenv("HTTP_POOL_MAX_CONNECTIONS", "100"))
+HTTP_POOL_MAX_KEEPALIVE = int(os.getenv("HTTP_POOL_MAX_KEEPALIVE", "20"))
+HTTP_POOL_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_POOL_KEEPALIVE_EXPIRY", "60"))
+HTTP_POOL_HTTP2 = os.getenv("HTTP_POOL_HTTP2", "true").lower() == "true"
+
+# Knowledge base (shared by all agents)
+KNOWLEDGE_NAME = os.getenv("KNOWLEDGE_NAME", "My Knowledge Base")
+KNOWLEDGE_CONTENTS_DB_FILE = os.getenv("KNOWLEDGE_CONTENTS_DB_FILE", str(PROJECT_ROOT / "my_knowledge.db"))
+LANCEDB_URI = os.getenv("LANCEDB_URI", str(PROJECT_ROOT / "tmp" / "lancedb"))
+LANCEDB_TABLE_NAME = os.getenv("LANCEDB_TABLE_NAME", "agno_docs")
+
+# Per-user knowledge: rows are partitioned by this metadata key, searches only see
+# the current user's rows plus the shared namespace
+KNOWLEDGE_NAMESPACE_KEY = os.getenv("KNOWLEDGE_NAMESPACE_KEY", "user_id")
+KNOWLEDGE_SHARED_NAMESPACE = os.getenv("KNOWLEDGE_SHARED_NAMESPACE", "shared")
+
+# Embedder backend: "openai" (API) or "local" (sentence-transformers on CPU threads)
+EMBEDDER_BACKEND = os.getenv("EMBEDDER_BACKEND", "openai").lower()
+# Reduced-dimension vectors: OpenAI text-embedding-3 "dimensions", or Matryoshka truncation locally
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", "0")) or None
+LOCAL_EMBEDDER_MODEL = os.getenv("LOCAL_EMBEDDER_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+LOCAL_EMBEDDER_BATCH_SIZE = int(os.getenv("LOCAL_EMBEDDER_BATCH_SIZE", "64"))
+LOCAL_EMBEDDER_THREADS = int(os.getenv("LOCAL_EMBEDDER_THREADS", str(os.cpu_count() or 2)))
+# Stored vector precision: float32, float16, or int8 (float16 column + int8 scalar-quantized index)
+VECTOR_PRECISION = os.getenv("VECTOR_PRECISION", "float32").lower()
+
+# Persistent embedding cache (float32 rows on disk, LRU eviction)
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", str(PROJECT_ROOT / "tmp" / "embedding_cache"))
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+
+# Ingestion embedding batches (estimated tokens / chunks per request, requests in flight)
+EMBEDDING_BATCH_MAX_TOKENS = int(os.getenv("EMBEDDING_BATCH_MAX_TOKENS", "32000"))
+EMBEDDING_BATCH_MAX_ITEMS = int(os.getenv("EMBEDDING_BATCH_MAX_ITEMS", "100"))
+EMBEDDING_MAX_CONCURRENCY = int(os.getenv("EMBEDDING_MAX_CONCURRENCY", "4"))
+
+# Knowledge search result cache (LRU + TTL, cleared whenever the table changes)
+SEARCH_CACHE_ENABLED = os.getenv("SEARCH_CACHE_ENABLED", "true").lower() == "true"
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "1024"))
+SEARCH_CACHE_TTL_SECONDS = int(os.getenv("SEARCH_CACHE_TTL_SECONDS", "600"))
+
+# LanceDB index lifecycle (ANN index above a row threshold, incremental updates after new rows)
+KNOWLEDGE_INDEX_ENABLED = os.getenv("KNOWLEDGE_INDEX_ENABLED", "true").lower() == "true"
+VECTOR_INDEX_TYPE = os.getenv("VECTOR_INDEX_TYPE", "IVF_PQ")
+VECTOR_INDEX_MIN_ROWS = int(os.getenv("VECTOR_INDEX_MIN_ROWS", "5000"))
+INDEX_UPDATE_MIN_NEW_ROWS = int(os.getenv("INDEX_UPDATE_MIN_NEW_ROWS", "500"))
+VECTOR_INDEX_RETRAIN_GROWTH = float(os.getenv("VECTOR_INDEX_RETRAIN_GROWTH", "2.0"))
+
+# LanceDB writes go through one writer thread that coalesces concurrent inserts
+LANCE_WRITE_QUEUE_ENABLED = os.getenv("LANCE_WRITE_QUEUE_ENABLED", "true").lower() == "true"
+LANCE_WRITE_BATCH_ROWS = int(os.getenv("LANCE_WRITE_BATCH_ROWS", "5000"))
+LANCE_WRITE_LINGER_MS = int(os.getenv("LANCE_WRITE_LINGER_MS", "50"))
+
+# LanceDB maintenance (fragment compaction and pruning of old table versions)
+LANCE_MAINTENANCE_ENABLED = os.getenv("LANCE_MAINTENANCE_ENABLED", "true").lower() == "true"
+LANCE_MAINTENANCE_INTERVAL_SECONDS = int(os.getenv("LANCE_MAINTENANCE_INTERVAL_SECONDS", str(6 * 3600)))
+LANCE_VERSION_RETENTION_HOURS = float(os.getenv("LANCE_VERSION_RETENTION_HOURS", "24"))
+
 # LLM API Keys
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
@@ -27,6 +133,21 @@ OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 # Google Gemini API Key (for image generation)
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 
+# Jina Reader streaming (read large pages incrementally, split by markdown section)
+JINA_STREAM_READS = os.getenv("JINA_STREAM_READS", "false").lower() == "true"
+JINA_MAX_BYTES = int(os.getenv("JINA_MAX_BYTES", str(20 * 1024 * 1024)))
+
+# Local file readers (PDF/HTML/Markdown parsed in a process pool)
+READER_PROCESS_WORKERS = int(os.getenv("READER_PROCESS_WORKERS", str(os.cpu_count() or 2)))
+READER_INLINE_MAX_BYTES = int(os.getenv("READER_INLINE_MAX_BYTES", str(256 * 1024)))
+READER_PDF_PAGES_PER_TASK = int(os.getenv("READER_PDF_PAGES_PER_TASK", "16"))
+
+# Chunk cache (keyed by content hash + strategy + parameters) and threads for API-backed chunkers
+CHUNK_CACHE_ENABLED = os.getenv("CHUNK_CACHE_ENABLED", "true").lower() == "true"
+CHUNK_CACHE_FILE = os.getenv("CHUNK_CACHE_FILE", str(PROJECT_ROOT / "tmp" / "chunk_cache.db"))
+CHUNK_CACHE_MAX_ENTRIES = int(os.getenv("CHUNK_CACHE_MAX_ENTRIES", "20000"))
+CHUNK_THREAD_WORKERS = int(os.getenv("CHUNK_THREAD_WORKERS", "4"))
+
 # MCP Tools API Keys
 BRAVE_API_KEY = os.getenv("BRAVE_API_KEY")
 
@@ -46,6 +167,12 @@ IMAGES_DIR.mkdir(exist_ok=True)
 NEWSLETTER_GENERATION_HOUR = int(os.getenv("NEWSLETTER_GENERATION_HOUR", "8"))
 NEWSLETTER_GENERATION_MINUTE = int(os.getenv("NEWSLETTER_GENERATION_MINUTE", "0"))
 
+# Knowledge refresh (incremental re-crawl of URL sources)
+KNOWLEDGE_REFRESH_ENABLED = os.getenv("KNOWLEDGE_REFRESH_ENABLED", "false").lower() == "true"
+KNOWLEDGE_REFRESH_DB_FILE = os.getenv("KNOWLEDGE_REFRESH_DB_FILE", str(PROJECT_ROOT / "tmp" / "knowledge_refresh.db"))
+KNOWLEDGE_REFRESH_INTERVAL_SECONDS = int(os.getenv("KNOWLEDGE_REFRESH_INTERVAL_SECONDS", str(24 * 3600)))
+KNOWLEDGE_REFRESH_TICK_SECONDS = int(os.getenv("KNOWLEDGE_REFRESH_TICK_SECONDS", "300"))
+
 # Telemetry
 AGNO_TELEMETRY = os.getenv("AGNO_TELEMETRY", "false").lower() == "true"
 
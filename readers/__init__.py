@@ -12,8 +12,28 @@ Usage:
     status = register_all_readers(knowledge)
     print(f"Reader registration status: {status}")
 """
-from .jina_reader import JinaWebReader
-from .registry import register_all_readers
+from .registry import ReaderRegistry, ReaderSpec, RegistryKnowledge, get_reader_registry, register_all_readers
 
-__all__ = ['JinaWebReader', 'register_all_readers']
+__all__ = [
+    'JinaWebReader',
+    'LocalPDFReader',
+    'LocalHTMLReader',
+    'LocalMarkdownReader',
+    'ReaderRegistry',
+    'ReaderSpec',
+    'RegistryKnowledge',
+    'get_reader_registry',
+    'register_all_readers',
+]
+
+
+def __getattr__(name):
+    # Reader classes are imported on first access, not when the package loads
+    if name == 'JinaWebReader':
+        from .jina_reader import JinaWebReader
+        return JinaWebReader
+    if name in ('LocalPDFReader', 'LocalHTMLReader', 'LocalMarkdownReader'):
+        from . import local_readers
+        return getattr(local_readers, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
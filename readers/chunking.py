@@ -0,0 +1,376 @@
+"""
+Chunking - Parallel chunking with a persistent per-document chunk cache
+
+Chunk output is cached in SQLite under (content hash, strategy, parameters),
+so re-processing a document with the same strategy is a lookup, and switching
+strategies only recomputes the documents whose key changed. Documents that
+miss the cache are chunked in parallel:
+- CPU-bound strategies (fixed size, recursive, document, markdown, row) run
+  in the shared reader process pool, one task per document (PDF readers
+  produce one document per page, so large files fan out per page)
+- strategies that call an API (semantic, agentic) run in a thread pool
+- small inputs are chunked inline, where a round-trip would cost more
+
+Cached chunks are stored relative to their source document (extra metadata,
+id suffix), so a renamed upload with the same content is still a hit.
+
+Usage:
+    from readers.chunking import chunk_documents
+
+    chunks = chunk_documents(reader, documents)
+"""
+import hashlib
+import json
+import pickle
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from agno.knowledge.chunking.fixed import FixedSizeChunking
+from agno.knowledge.chunking.strategy import ChunkingStrategy
+from agno.knowledge.document.base import Document
+from agno.utils.log import logger
+
+from config.settings import (
+    CHUNK_CACHE_ENABLED,
+    CHUNK_CACHE_FILE,
+    CHUNK_CACHE_MAX_ENTRIES,
+    CHUNK_THREAD_WORKERS,
+    READER_INLINE_MAX_BYTES,
+)
+from services.metrics import get_metrics_registry
+
+# Strategies that only use the CPU and pickle cleanly
+PROCESS_STRATEGIES = {"FixedSizeChunking", "RecursiveChunking", "DocumentChunking", "MarkdownChunking", "RowChunking"}
+
+# Attributes rebuilt lazily by strategies, not part of their parameters
+_IGNORED_ATTRIBUTES = {"chunker"}
+
+_MISSING = object()
+
+
+def _describe(value: Any) -> Any:
+    """JSON-friendly description of a strategy parameter"""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [_describe(item) for item in value]
+    if isinstance(value, dict):
+        return {str(key): _describe(item) for key, item in sorted(value.items())}
+    # Embedders and models: the class plus whatever selects the output
+    return {
+        "type": type(value).__name__,
+        "id": getattr(value, "id", None),
+        "dimensions": getattr(value, "dimensions", None),
+    }
+
+
+def strategy_fingerprint(strategy: ChunkingStrategy) -> str:
+    """Strategy class and parameters as a stable string"""
+    params = {
+        name: _describe(value)
+        for name, value in sorted(vars(strategy).items())
+        if not name.startswith("_") and name not in _IGNORED_ATTRIBUTES
+    }
+    return json.dumps({"strategy": type(strategy).__name__, "params": params}, sort_keys=True)
+
+
+def chunk_cache_key(document: Document, fingerprint: str) -> str:
+    content = document.content or ""
+    digest = hashlib.sha256()
+    digest.update(content.encode("utf-8", errors="surrogatepass"))
+    digest.update(b"\0")
+    digest.update(fingerprint.encode())
+    return digest.hexdigest()
+
+
+# ============================================================================
+# Chunks relative to their source document
+# ============================================================================
+
+def _relative(document: Document, chunks: List[Document]) -> List[Dict[str, Any]]:
+    source_meta = document.meta_data or {}
+    entries = []
+    for chunk in chunks:
+        if chunk is document:
+            # Strategies return the document itself when it is already small enough
+            entries.append({"source": True})
+            continue
+        entry: Dict[str, Any] = {
+            "content": chunk.content,
+            "meta": {
+                key: value for key, value in (chunk.meta_data or {}).items()
+                if source_meta.get(key, _MISSING) != value
+            },
+        }
+        if chunk.name != document.name:
+            entry["name"] = chunk.name
+        if chunk.id is not None:
+            for prefix, base in (("id", document.id), ("name", document.name)):
+                if base and chunk.id.startswith(base):
+                    entry["id"] = [prefix, chunk.id[len(base):]]
+                    break
+            else:
+                entry["id"] = ["literal", chunk.id]
+        entries.append(entry)
+    return entries
+
+
+def _restore(document: Document, entries: List[Dict[str, Any]]) -> List[Document]:
+    chunks = []
+    for entry in entries:
+        if entry.get("source"):
+            chunks.append(document)
+            continue
+        meta_data = dict(document.meta_data or {})
+        meta_data.update(entry["meta"])
+        chunk_id = None
+        if "id" in entry:
+            prefix, rest = entry["id"]
+            chunk_id = rest if prefix == "literal" else f"{document.id if prefix == 'id' else document.name}{rest}"
+        chunks.append(Document(
+            id=chunk_id,
+            name=entry.get("name", document.name),
+            meta_data=meta_data,
+            content=entry["content"],
+        ))
+    return chunks
+
+
+# ============================================================================
+# Cache store
+# ============================================================================
+
+class ChunkCache:
+    """
+    SQLite-backed cache of chunk lists, evicting the least recently used
+    entries beyond max_entries.
+    """
+
+    def __init__(self, db_file: str = CHUNK_CACHE_FILE, max_entries: int = CHUNK_CACHE_MAX_ENTRIES):
+        self.db_file = db_file
+        self.max_entries = max_entries
+        Path(db_file).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_file, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            "key TEXT PRIMARY KEY, strategy TEXT NOT NULL, chunks TEXT NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_last_used ON chunks(last_used)")
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            row = self._conn.execute("SELECT chunks FROM chunks WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE chunks SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, strategy: str, entries: List[Dict[str, Any]]):
+        try:
+            data = json.dumps(entries)
+        except (TypeError, ValueError) as e:
+            logger.debug(f"Chunks not cached, metadata is not JSON-serializable: {e}")
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO chunks (key, strategy, chunks, last_used) VALUES (?, ?, ?, ?)",
+                (key, strategy, data, time.time()),
+            )
+            self._conn.execute(
+                "DELETE FROM chunks WHERE key IN ("
+                "SELECT key FROM chunks ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM chunks")
+            self._conn.commit()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# Global singleton instance
+_chunk_cache: Optional[ChunkCache] = None
+_chunk_cache_lock = threading.Lock()
+
+
+def get_chunk_cache() -> Optional[ChunkCache]:
+    """Get or create the global chunk cache (None when CHUNK_CACHE_ENABLED is false)"""
+    global _chunk_cache
+    if not CHUNK_CACHE_ENABLED:
+        return None
+    with _chunk_cache_lock:
+        if _chunk_cache is None:
+            _chunk_cache = ChunkCache()
+        return _chunk_cache
+
+
+def _record_lookup(strategy: str, hit: bool):
+    get_metrics_registry().counter("chunk_cache_lookups_total", "Chunk cache lookups").inc(
+        strategy=strategy, result="hit" if hit else "miss"
+    )
+
+
+def cached_chunk(
+    strategy: ChunkingStrategy, document: Document, chunk_fn: Callable[[Document], List[Document]]
+) -> List[Document]:
+    """Chunk one document through the cache, calling chunk_fn on a miss"""
+    cache = get_chunk_cache()
+    if cache is None or not document.content:
+        return chunk_fn(document)
+
+    fingerprint = strategy_fingerprint(strategy)
+    key = chunk_cache_key(document, fingerprint)
+    strategy_name = type(strategy).__name__
+    entries = cache.get(key)
+    _record_lookup(strategy_name, entries is not None)
+    if entries is not None:
+        return _restore(document, entries)
+
+    chunks = chunk_fn(document)
+    cache.put(key, strategy_name, _relative(document, chunks))
+    return chunks
+
+
+# ============================================================================
+# Parallel chunking
+# ============================================================================
+
+def _chunk_worker(strategy: ChunkingStrategy, document: Document) -> List[Document]:
+    """Chunk one document (runs in a child process, must stay picklable)"""
+    return strategy.chunk(document)
+
+
+_thread_pool: Optional[ThreadPoolExecutor] = None
+_thread_pool_lock = threading.Lock()
+
+
+def _get_thread_pool() -> ThreadPoolExecutor:
+    global _thread_pool
+    with _thread_pool_lock:
+        if _thread_pool is None:
+            _thread_pool = ThreadPoolExecutor(max_workers=max(1, CHUNK_THREAD_WORKERS), thread_name_prefix="chunking")
+        return _thread_pool
+
+
+def _use_processes(strategy: ChunkingStrategy) -> bool:
+    if type(strategy).__name__ not in PROCESS_STRATEGIES:
+        return False
+    try:
+        pickle.dumps(strategy)
+        return True
+    except Exception:
+        return False
+
+
+def _run_parallel(strategy: ChunkingStrategy, documents: List[Document]) -> List[List[Document]]:
+    """Chunk documents concurrently, in processes or threads depending on the strategy"""
+    size = sum(len(doc.content or "") for doc in documents)
+    if len(documents) < 2 and size <= READER_INLINE_MAX_BYTES:
+        return [strategy.chunk(doc) for doc in documents]
+
+    if _use_processes(strategy):
+        if size <= READER_INLINE_MAX_BYTES:
+            return [strategy.chunk(doc) for doc in documents]
+        from readers.local_readers import _reset_broken_pool, get_parse_pool
+
+        try:
+            pool = get_parse_pool()
+            futures = [pool.submit(_chunk_worker, strategy, doc) for doc in documents]
+            return [future.result() for future in futures]
+        except BrokenProcessPool:
+            logger.warning("Chunking process pool broke, chunking inline")
+            _reset_broken_pool()
+            return [strategy.chunk(doc) for doc in documents]
+
+    return list(_get_thread_pool().map(strategy.chunk, documents))
+
+
+def get_strategy(reader) -> ChunkingStrategy:
+    """The reader's chunking strategy, defaulting like agno's Reader.chunk_document"""
+    if reader.chunking_strategy is None:
+        reader.chunking_strategy = FixedSizeChunking(chunk_size=reader.chunk_size)
+    return reader.chunking_strategy
+
+
+def chunk_documents(
+    reader, documents: List[Document], on_chunked: Optional[Callable[[int], None]] = None
+) -> List[Document]:
+    """
+    Chunk documents with the reader's strategy: cached documents are restored,
+    the rest are chunked in parallel and cached.
+
+    Args:
+        reader: Reader whose chunking_strategy (and chunk_size) is used
+        documents: Source documents
+        on_chunked: Called with the chunk count of every document
+
+    Returns:
+        List[Document]: Chunks in document order
+    """
+    strategy = get_strategy(reader)
+    strategy_name = type(strategy).__name__
+    cache = get_chunk_cache()
+    fingerprint = strategy_fingerprint(strategy) if cache is not None else ""
+
+    results: List[Optional[List[Document]]] = [None] * len(documents)
+    pending: List[Tuple[int, str]] = []
+    for i, document in enumerate(documents):
+        if cache is None or not document.content:
+            pending.append((i, ""))
+            continue
+        key = chunk_cache_key(document, fingerprint)
+        entries = cache.get(key)
+        _record_lookup(strategy_name, entries is not None)
+        if entries is not None:
+            results[i] = _restore(document, entries)
+        else:
+            pending.append((i, key))
+
+    if pending:
+        started = time.perf_counter()
+        chunked = _run_parallel(strategy, [documents[i] for i, _ in pending])
+        for (i, key), chunks in zip(pending, chunked):
+            results[i] = chunks
+            if key:
+                cache.put(key, strategy_name, _relative(documents[i], chunks))
+        get_metrics_registry().histogram(
+            "chunking_seconds", "Time to chunk the uncached documents of one read",
+            (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 15.0, 60.0),
+        ).observe(time.perf_counter() - started, strategy=strategy_name)
+
+    flattened: List[Document] = []
+    for chunks in results:
+        if on_chunked is not None:
+            on_chunked(len(chunks))
+        flattened.extend(chunks)
+    return flattened
@@ -0,0 +1,141 @@
+"""
+Reader Instrumentation - Structured metrics for every registered reader
+
+Wraps a reader instance so that each read and chunk call records metrics in
+the global metrics registry (services.metrics). Readers that talk to a remote
+API (e.g. JinaWebReader) additionally record HTTP-level metrics themselves.
+
+Metrics:
+    reader_read_seconds          histogram  time spent in read/async_read
+    reader_documents_total       counter    documents returned by read
+    reader_content_chars         histogram  characters per returned document
+    reader_reads_total           counter    read calls by outcome (ok/empty/error)
+    reader_chunks_per_document   histogram  chunks produced per source document
+
+chunk_document is also routed through the chunk cache (readers.chunking)
+for readers that use agno's default chunk_document.
+"""
+import contextvars
+import functools
+import time
+from typing import Any, List, Optional
+
+from agno.knowledge.reader.base import Reader
+from services.metrics import get_metrics_registry
+from .chunking import cached_chunk, get_strategy
+
+
+# Histogram buckets
+FETCH_SECONDS_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+CONTENT_SIZE_BUCKETS = (1_000, 10_000, 50_000, 100_000, 500_000, 1_000_000, 5_000_000, 20_000_000)
+CHUNK_COUNT_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+# Set while an instrumented read is running, so a reader whose async_read
+# delegates to read (via asyncio.to_thread, which copies the context) is only
+# counted once
+_in_read = contextvars.ContextVar("reader_in_read", default=False)
+
+
+def _record_read(reader_key: str, started: float, documents: Optional[List[Any]], error: bool = False):
+    metrics = get_metrics_registry()
+    metrics.histogram(
+        "reader_read_seconds", "Time spent reading a source", FETCH_SECONDS_BUCKETS
+    ).observe(time.perf_counter() - started, reader=reader_key)
+
+    if error:
+        outcome = "error"
+    elif not documents:
+        outcome = "empty"
+    else:
+        outcome = "ok"
+    metrics.counter("reader_reads_total", "Read calls by outcome").inc(reader=reader_key, outcome=outcome)
+
+    if documents:
+        metrics.counter("reader_documents_total", "Documents returned by readers").inc(
+            len(documents), reader=reader_key
+        )
+        sizes = metrics.histogram(
+            "reader_content_chars", "Characters per document returned by readers", CONTENT_SIZE_BUCKETS
+        )
+        for doc in documents:
+            sizes.observe(len(getattr(doc, "content", "") or ""), reader=reader_key)
+
+
+def record_chunk_count(reader_key: str, count: int):
+    get_metrics_registry().histogram(
+        "reader_chunks_per_document", "Chunks produced per source document", CHUNK_COUNT_BUCKETS
+    ).observe(count, reader=reader_key)
+
+
+def instrument_reader(reader: Reader, reader_key: Optional[str] = None) -> Reader:
+    """
+    Attach metrics to a reader instance.
+
+    The instance's read, async_read and chunk_document methods are wrapped in
+    place; the class itself is untouched. Wrapping is idempotent.
+
+    Args:
+        reader: The reader instance to instrument
+        reader_key: Label used in metrics (defaults to the class name)
+
+    Returns:
+        Reader: The same reader instance
+    """
+    if getattr(reader, "_metrics_instrumented", False):
+        return reader
+
+    reader_key = reader_key or type(reader).__name__
+    read = reader.read
+    async_read = reader.async_read
+    chunk_document = reader.chunk_document
+
+    @functools.wraps(read)
+    def instrumented_read(*args, **kwargs):
+        if _in_read.get():
+            return read(*args, **kwargs)
+        token = _in_read.set(True)
+        started = time.perf_counter()
+        try:
+            documents = read(*args, **kwargs)
+        except Exception:
+            _record_read(reader_key, started, None, error=True)
+            raise
+        finally:
+            _in_read.reset(token)
+        _record_read(reader_key, started, documents)
+        return documents
+
+    @functools.wraps(async_read)
+    async def instrumented_async_read(*args, **kwargs):
+        if _in_read.get():
+            return await async_read(*args, **kwargs)
+        token = _in_read.set(True)
+        started = time.perf_counter()
+        try:
+            documents = await async_read(*args, **kwargs)
+        except Exception:
+            _record_read(reader_key, started, None, error=True)
+            raise
+        finally:
+            _in_read.reset(token)
+        _record_read(reader_key, started, documents)
+        return documents
+
+    # Only agno's default chunk_document is known to depend on nothing but the strategy
+    cacheable = type(reader).chunk_document is Reader.chunk_document
+
+    @functools.wraps(chunk_document)
+    def instrumented_chunk_document(document, *args, **kwargs):
+        if cacheable and not args and not kwargs:
+            chunks = cached_chunk(get_strategy(reader), document, chunk_document)
+        else:
+            chunks = chunk_document(document, *args, **kwargs)
+        record_chunk_count(reader_key, len(chunks or []))
+        return chunks
+
+    reader.read = instrumented_read
+    reader.async_read = instrumented_async_read
+    reader.chunk_document = instrumented_chunk_document
+    reader._metrics_instrumented = True
+    reader._metrics_key = reader_key
+    return reader
@@ -2,139 +2,294 @@
 Jina Web Reader - Custom reader for web content using Jina AI API
 Solves the issue with Agno's built-in web readers (WebsiteReader, FirecrawlReader, etc.)
 """
+import codecs
 import os
+import re
+import time
 import requests
-from typing import List
+from typing import Iterable, Iterator, List, Optional
 from agno.knowledge.document.base import Document
 from agno.knowledge.reader.base import Reader
 from agno.utils.log import logger
+from services.metrics import get_metrics_registry
+from .instrumentation import CONTENT_SIZE_BUCKETS, FETCH_SECONDS_BUCKETS
+
+
+# Markdown ATX heading ("# Title" ... "###### Title")
+HEADING_PATTERN = re.compile(r"^\s{0,3}(#{1,6})\s+(.*?)\s*#*\s*$")
+# Fenced code block delimiter (``` or ~~~)
+FENCE_PATTERN = re.compile(r"^\s{0,3}(```|~~~)")
 
 
 class JinaWebReader(Reader):
-    
+
     def __init__(
         self,
         api_key: str = None,
         timeout: int = 30,
         max_retries: int = 3,
+        stream: bool = False,
+        max_bytes: Optional[int] = None,
+        max_section_chars: int = 20000,
+        stream_chunk_size: int = 64 * 1024,
         **kwargs
     ):
 
         super().__init__(**kwargs)
-        
+
         # Get API key from parameter or environment variable
         self.api_key = api_key or os.getenv("JINA_API_KEY")
         if not self.api_key:
             logger.warning(
                 "No Jina API key provided. "
             )
-        
+
         self.timeout = timeout
         self.max_retries = max_retries
         self.base_url = "https://r.jina.ai"
-    
+
+        # Streaming mode: read the body incrementally and emit one Document
+        # per markdown section instead of one Document for the whole page
+        self.stream = stream
+        self.max_bytes = max_bytes
+        self.max_section_chars = max_section_chars
+        self.stream_chunk_size = stream_chunk_size
+
     def read(self, url: str, name: str = None) -> List[Document]:
+        if self.stream:
+            # Knowledge ingestion (RegistryKnowledge) consumes iter_read directly
+            return list(self.iter_read(url, name))
+
+        response = self._fetch(url)
+        if response is None:
+            return []
+
+        content = response.text
+        self._observe_bytes(len(response.content))
+
+        if not content or len(content.strip()) == 0:
+            logger.warning(f"Empty content returned from {url}")
+            return []
+
+        # Create document
+        doc_name = name or url
+        doc = Document(
+            name=doc_name,
+            content=content,
+            meta_data={
+                "source": url,
+                "reader": "JinaWebReader",
+                "content_length": len(content)
+            }
+        )
+
+        logger.info(
+            f"Successfully read {len(content)} characters from {url}"
+        )
+        return [doc]
+
+    def iter_read(self, url: str, name: str = None) -> Iterator[Document]:
+        """
+        Stream a page and yield one Document per markdown section.
+
+        The body is decoded incrementally and split on headings as they
+        arrive, so downstream chunking can start before the download
+        finishes. Reading stops once ``max_bytes`` have been received.
+
+        Args:
+            url: The URL to read
+            name: Optional document name (defaults to the URL)
+
+        Yields:
+            Document: One document per section of the page
+        """
+        response = self._fetch(url, stream=True)
+        if response is None:
+            return
+
+        doc_name = name or url
+        state = {"bytes_read": 0, "truncated": False}
+        sections = 0
+        total_chars = 0
+
+        try:
+            lines = self._iter_lines(response, state)
+            for title, content in split_markdown_sections(lines, self.max_section_chars):
+                if not content.strip():
+                    continue
+                meta_data = {
+                    "source": url,
+                    "reader": "JinaWebReader",
+                    "content_length": len(content),
+                    "section_index": sections,
+                    "streamed": True,
+                }
+                if title:
+                    meta_data["section_title"] = title
+                if state["truncated"]:
+                    meta_data["truncated"] = True
+                sections += 1
+                total_chars += len(content)
+                yield Document(
+                    name=doc_name,
+                    content=content,
+                    meta_data=meta_data,
+                )
+        except requests.RequestException as e:
+            logger.error(f"Stream interrupted reading {url}: {str(e)}")
+        finally:
+            response.close()
+            self._observe_bytes(state["bytes_read"])
+
+        if sections == 0:
+            logger.warning(f"Empty content returned from {url}")
+            return
+
+        logger.info(
+            f"Successfully streamed {total_chars} characters in {sections} sections "
+            f"from {url} ({state['bytes_read']} bytes)"
+        )
+
+    def _iter_lines(self, response, state: dict) -> Iterator[str]:
+        """Decode the response body incrementally, enforcing the byte cap."""
+        decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(errors="replace")
+        buffer = ""
+
+        for raw in response.iter_content(chunk_size=self.stream_chunk_size):
+            if not raw:
+                continue
+            if self.max_bytes is not None and state["bytes_read"] + len(raw) > self.max_bytes:
+                raw = raw[: self.max_bytes - state["bytes_read"]]
+                state["truncated"] = True
+            state["bytes_read"] += len(raw)
+
+            buffer += decoder.decode(raw)
+            *complete, buffer = buffer.split("\n")
+            for line in complete:
+                yield line + "\n"
+
+            if state["truncated"]:
+                logger.warning(
+                    f"Stopped reading {response.url} after {self.max_bytes} bytes (max_bytes reached)"
+                )
+                break
+
+        buffer += decoder.decode(b"", final=True)
+        if buffer:
+            yield buffer
+
+    def _fetch(self, url: str, stream: bool = False) -> Optional[requests.Response]:
+        """
+        Request a URL through Jina Reader, retrying on timeouts and rate limits.
+
+        Returns:
+            The successful response, or None if the URL could not be read
+        """
         if not url:
             logger.error("No URL provided to JinaWebReader")
-            return []
-        
+            return None
+
         if not url.startswith(("http://", "https://")):
             logger.error(f"Invalid URL format: {url}")
-            return []
-        
+            return None
+
         logger.info(f"Reading URL with Jina Reader: {url}")
-        
+
         try:
             # Construct Jina Reader URL
             jina_url = f"{self.base_url}/{url}"
-            
+
             # Prepare headers
             headers = {}
             if self.api_key:
                 headers["Authorization"] = f"Bearer {self.api_key}"
-            
+
+            metrics = get_metrics_registry()
+            fetch_seconds = metrics.histogram(
+                "reader_fetch_seconds", "HTTP fetch latency per request", FETCH_SECONDS_BUCKETS
+            )
+            responses = metrics.counter("reader_http_responses_total", "HTTP responses by status code")
+            retries = metrics.counter("reader_retries_total", "Retried HTTP requests by reason")
+
             # Make request with retries
             for attempt in range(self.max_retries):
                 try:
+                    started = time.perf_counter()
                     response = requests.get(
                         jina_url,
                         headers=headers,
-                        timeout=self.timeout
+                        timeout=self.timeout,
+                        stream=stream
                     )
-                    
+                    # For streamed responses this measures time to headers
+                    fetch_seconds.observe(time.perf_counter() - started, reader="JinaWebReader")
+                    responses.inc(reader="JinaWebReader", status=response.status_code)
+
                     if response.status_code == 200:
-                        content = response.text
-                        
-                        if not content or len(content.strip()) == 0:
-                            logger.warning(f"Empty content returned from {url}")
-                            return []
-                        
-                        # Create document
-                        doc_name = name or url
-                        doc = Document(
-                            name=doc_name,
-                            content=content,
-                            meta_data={
-                                "source": url,
-                                "reader": "JinaWebReader",
-                                "content_length": len(content)
-                            }
-                        )
-                        
-                        logger.info(
-                            f"Successfully read {len(content)} characters from {url}"
-                        )
-                        return [doc]
-                    
-                    elif response.status_code == 401:
+                        return response
+
+                    # Error bodies are small: read it, then release the pooled connection
+                    error_text = response.text[:200]
+                    response.close()
+
+                    if response.status_code == 401:
                         logger.error(
                             "Jina API authentication failed. Check your API key."
                         )
-                        return []
-                    
+                        return None
+
                     elif response.status_code == 429:
                         logger.warning(
                             f"Rate limit exceeded (attempt {attempt + 1}/{self.max_retries})"
                         )
                         if attempt < self.max_retries - 1:
-                            import time
+                            retries.inc(reader="JinaWebReader", reason="rate_limit")
                             time.sleep(2 ** attempt)  # Exponential backoff
                             continue
-                        return []
-                    
+                        return None
+
                     else:
                         logger.error(
-                            f"Jina Reader returned status {response.status_code}: {response.text[:200]}"
+                            f"Jina Reader returned status {response.status_code}: {error_text}"
                         )
-                        return []
-                
+                        return None
+
                 except requests.Timeout:
+                    responses.inc(reader="JinaWebReader", status="timeout")
                     logger.warning(
                         f"Request timeout (attempt {attempt + 1}/{self.max_retries})"
                     )
                     if attempt < self.max_retries - 1:
+                        retries.inc(reader="JinaWebReader", reason="timeout")
                         continue
                     logger.error(f"Failed to read {url} after {self.max_retries} attempts")
-                    return []
-                
+                    return None
+
                 except requests.RequestException as e:
+                    responses.inc(reader="JinaWebReader", status="error")
                     logger.error(f"Request error reading {url}: {str(e)}")
-                    return []
-        
+                    return None
+
         except Exception as e:
             logger.error(f"Unexpected error reading {url}: {str(e)}")
-            return []
-    
+            return None
+
+    def _observe_bytes(self, size: int):
+        """Record the response size of one fetched page."""
+        get_metrics_registry().histogram(
+            "reader_response_bytes", "Response bytes per fetched page", CONTENT_SIZE_BUCKETS
+        ).observe(size, reader="JinaWebReader")
+
     async def async_read(self, url: str, name: str = None) -> List[Document]:
         # For now, use sync version in async context
         # TODO: Implement true async with aiohttp if needed
         import asyncio
         return await asyncio.to_thread(self.read, url, name)
-    
+
     def get_supported_chunking_strategies(self) -> List[str]:
         """
         Get list of supported chunking strategies for this reader.
-        
+
         Returns:
             List[str]: List of supported chunking strategy names
         """
@@ -146,3 +301,47 @@ class JinaWebReader(Reader):
             "AgenticChunking"
         ]
 
+
+def split_markdown_sections(
+    lines: Iterable[str],
+    max_section_chars: Optional[int] = None,
+) -> Iterator[tuple]:
+    """
+    Group markdown lines into sections, starting a new one at each heading.
+
+    Headings inside fenced code blocks are ignored. A section that grows past
+    ``max_section_chars`` without a heading is flushed early so memory stays
+    bounded on pages with little structure.
+
+    Args:
+        lines: Markdown lines, including their trailing newlines
+        max_section_chars: Optional soft limit on the size of a section
+
+    Yields:
+        tuple: (section_title, section_content)
+    """
+    title = None
+    parts: List[str] = []
+    size = 0
+    in_fence = False
+
+    for line in lines:
+        if FENCE_PATTERN.match(line):
+            in_fence = not in_fence
+
+        heading = None if in_fence else HEADING_PATTERN.match(line)
+        if heading and parts:
+            yield title, "".join(parts)
+            parts, size = [], 0
+        if heading:
+            title = heading.group(2)
+
+        parts.append(line)
+        size += len(line)
+
+        if max_section_chars and size >= max_section_chars and not in_fence:
+            yield title, "".join(parts)
+            parts, size = [], 0
+
+    if parts:
+        yield title, "".join(parts)
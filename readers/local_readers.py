@@ -0,0 +1,372 @@
+"""
+Local Readers - Offline PDF, HTML and Markdown readers for file uploads
+
+Parsing is CPU-bound, so large files are parsed in a shared ProcessPoolExecutor
+instead of in the request process. PDFs are split into page ranges that are
+extracted in parallel from a file path (uploads are spooled to a temporary file
+once, never pickled per task); HTML and Markdown files are parsed as one task
+each. Small files are parsed inline, where a process round-trip would cost more
+than it saves. No network access is needed.
+"""
+import asyncio
+import io
+import multiprocessing
+import os
+import re
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import IO, Any, Callable, List, Optional, Tuple, Union
+
+from agno.knowledge.chunking.strategy import ChunkingStrategyType
+from agno.knowledge.document.base import Document
+from agno.knowledge.reader.base import Reader
+from agno.knowledge.types import ContentType
+from agno.utils.log import logger
+from config.settings import READER_INLINE_MAX_BYTES, READER_PDF_PAGES_PER_TASK, READER_PROCESS_WORKERS
+
+
+# HTML elements that never carry article text
+HTML_NOISE_TAGS = ["script", "style", "noscript", "template", "svg", "nav", "footer", "header", "form", "iframe"]
+HTML_HEADING_TAGS = {"h1": "#", "h2": "##", "h3": "###", "h4": "####", "h5": "#####", "h6": "######"}
+
+# YAML front matter at the top of a markdown file
+FRONT_MATTER_PATTERN = re.compile(r"\A---\s*\n.*?\n---\s*\n", re.DOTALL)
+MARKDOWN_TITLE_PATTERN = re.compile(r"^\s{0,3}#\s+(.+?)\s*#*\s*$", re.MULTILINE)
+
+
+# ============================================================================
+# Worker functions (run in child processes, must stay picklable)
+# ============================================================================
+
+def _open_pdf(source: Union[bytes, str], password: Optional[str] = None):
+    """Open a PDF given as bytes or a file path. Returns None if it cannot be decrypted."""
+    from pypdf import PdfReader
+
+    pdf = PdfReader(io.BytesIO(source) if isinstance(source, bytes) else source)
+    if pdf.is_encrypted and not pdf.decrypt(password or ""):
+        return None
+    return pdf
+
+
+def _count_pdf_pages(source: Union[bytes, str], password: Optional[str] = None) -> Optional[int]:
+    """Number of pages of a PDF, or None if it cannot be decrypted."""
+    pdf = _open_pdf(source, password)
+    return None if pdf is None else len(pdf.pages)
+
+
+def _extract_pdf_pages(source: Union[bytes, str], start: int, end: int, password: Optional[str] = None) -> List[str]:
+    """Extract the text of pages [start, end) from a PDF given as bytes or a file path."""
+    pdf = _open_pdf(source, password)
+    return [(pdf.pages[i].extract_text() or "") for i in range(start, end)]
+
+
+def _parse_html(data: bytes, encoding: Optional[str] = None) -> Tuple[Optional[str], str]:
+    """Convert an HTML document to markdown-ish text. Returns (title, text)."""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(data, "html.parser", from_encoding=encoding)
+    title = soup.title.get_text(strip=True) if soup.title else None
+
+    for tag in soup(HTML_NOISE_TAGS):
+        tag.decompose()
+
+    body = soup.find("main") or soup.find("article") or soup.body or soup
+    for tag_name, prefix in HTML_HEADING_TAGS.items():
+        for heading in body.find_all(tag_name):
+            heading.replace_with(f"\n\n{prefix} {heading.get_text(' ', strip=True)}\n\n")
+    for item in body.find_all("li"):
+        item.replace_with(f"\n- {item.get_text(' ', strip=True)}\n")
+
+    text = body.get_text("\n")
+    lines = [line.strip() for line in text.splitlines()]
+    text = re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+    return title, text
+
+
+def _parse_markdown(data: bytes, encoding: Optional[str] = None) -> Tuple[Optional[str], str]:
+    """Decode a markdown file and strip YAML front matter. Returns (title, text)."""
+    text = data.decode(encoding or "utf-8", errors="replace")
+    text = FRONT_MATTER_PATTERN.sub("", text, count=1)
+    match = MARKDOWN_TITLE_PATTERN.search(text)
+    return (match.group(1) if match else None), text.strip()
+
+
+# ============================================================================
+# Shared process pool
+# ============================================================================
+
+_parse_pool: Optional[ProcessPoolExecutor] = None
+_parse_pool_lock = threading.Lock()
+
+
+def get_parse_pool() -> ProcessPoolExecutor:
+    """Get or create the shared parsing process pool"""
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is None:
+            # spawn: the API process runs threads, which fork does not copy safely
+            _parse_pool = ProcessPoolExecutor(
+                max_workers=max(1, READER_PROCESS_WORKERS),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            logger.info(f"Started reader process pool with {READER_PROCESS_WORKERS} workers")
+        return _parse_pool
+
+
+def shutdown_parse_pool(wait: bool = True):
+    """Shut down the shared parsing process pool (it is recreated on next use)"""
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is not None:
+            _parse_pool.shutdown(wait=wait, cancel_futures=True)
+            _parse_pool = None
+
+
+def _reset_broken_pool():
+    global _parse_pool
+    with _parse_pool_lock:
+        _parse_pool = None
+
+
+# ============================================================================
+# Readers
+# ============================================================================
+
+class LocalFileReader(Reader):
+    """
+    Base class for local file readers that parse in the process pool.
+
+    Subclasses implement _parse(source, size, doc_name) and return Documents.
+    """
+
+    reader_name = "LocalFileReader"
+
+    def __init__(self, inline_max_bytes: Optional[int] = None, use_process_pool: bool = True, **kwargs):
+        super().__init__(**kwargs)
+        self.inline_max_bytes = READER_INLINE_MAX_BYTES if inline_max_bytes is None else inline_max_bytes
+        self.use_process_pool = use_process_pool
+
+    def _load(self, file: Union[Path, str, IO[Any]], name: Optional[str]) -> Tuple[Union[bytes, str], int, str]:
+        """
+        Resolve the input to (source, size, doc_name).
+
+        Paths are passed to workers as strings so large files are not pickled.
+        """
+        if isinstance(file, (str, Path)):
+            path = Path(file)
+            if not path.exists():
+                raise FileNotFoundError(f"Could not find file: {path}")
+            return str(path), path.stat().st_size, name or path.stem
+
+        file.seek(0)
+        data = file.read()
+        if isinstance(data, str):
+            data = data.encode(self.encoding or "utf-8")
+        file_name = getattr(file, "name", None)
+        doc_name = name or (Path(file_name).stem if isinstance(file_name, str) else "document")
+        return data, len(data), doc_name
+
+    def _should_offload(self, size: int) -> bool:
+        return self.use_process_pool and size > self.inline_max_bytes
+
+    def _run_many(self, fn: Callable, arg_list: List[tuple], offload: bool = True) -> List[Any]:
+        """Run a worker function once per argument tuple, in the pool or inline for small inputs."""
+        if offload:
+            try:
+                pool = get_parse_pool()
+                futures = [pool.submit(fn, *args) for args in arg_list]
+                return [future.result() for future in futures]
+            except BrokenProcessPool:
+                logger.warning(f"{self.reader_name}: process pool broke, parsing inline")
+                _reset_broken_pool()
+        return [fn(*args) for args in arg_list]
+
+    def _run(self, fn: Callable, *args, offload: bool = True) -> Any:
+        return self._run_many(fn, [args], offload=offload)[0]
+
+    def _finalize(self, documents: List[Document]) -> List[Document]:
+        documents = [doc for doc in documents if doc.content and doc.content.strip()]
+        if self.chunk:
+            from .chunking import chunk_documents
+            from .instrumentation import record_chunk_count
+
+            reader_key = getattr(self, "_metrics_key", None)
+            return chunk_documents(
+                self, documents, on_chunked=(lambda count: record_chunk_count(reader_key, count)) if reader_key else None
+            )
+        return documents
+
+    def _parse(self, source: Union[bytes, str], size: int, doc_name: str, **kwargs) -> List[Document]:
+        raise NotImplementedError
+
+    def read(self, file: Union[Path, str, IO[Any]], name: Optional[str] = None, **kwargs) -> List[Document]:
+        try:
+            source, size, doc_name = self._load(file, name)
+            logger.info(f"{self.reader_name} reading {doc_name} ({size} bytes)")
+            return self._finalize(self._parse(source, size, doc_name, **kwargs))
+        except Exception as e:
+            logger.error(f"{self.reader_name} failed to read {name or file}: {str(e)}")
+            return []
+
+    async def async_read(self, file: Union[Path, str, IO[Any]], name: Optional[str] = None, **kwargs) -> List[Document]:
+        # The calling thread only waits on the pool, so the event loop stays free
+        return await asyncio.to_thread(self.read, file, name, **kwargs)
+
+    @staticmethod
+    def _read_source(source: Union[bytes, str]) -> bytes:
+        return source if isinstance(source, bytes) else Path(source).read_bytes()
+
+
+class LocalPDFReader(LocalFileReader):
+    """PDF reader using pypdf, extracting page ranges in parallel"""
+
+    reader_name = "LocalPDFReader"
+
+    def __init__(self, pages_per_task: Optional[int] = None, password: Optional[str] = None, **kwargs):
+        if kwargs.get("chunking_strategy") is None:
+            from agno.knowledge.chunking.document import DocumentChunking
+
+            kwargs["chunking_strategy"] = DocumentChunking(chunk_size=5000)
+        super().__init__(**kwargs)
+        self.pages_per_task = pages_per_task or READER_PDF_PAGES_PER_TASK
+        self.password = password
+
+    @classmethod
+    def get_supported_chunking_strategies(cls) -> List[ChunkingStrategyType]:
+        return [
+            ChunkingStrategyType.DOCUMENT_CHUNKER,
+            ChunkingStrategyType.FIXED_SIZE_CHUNKER,
+            ChunkingStrategyType.AGENTIC_CHUNKER,
+            ChunkingStrategyType.SEMANTIC_CHUNKER,
+            ChunkingStrategyType.RECURSIVE_CHUNKER,
+        ]
+
+    @classmethod
+    def get_supported_content_types(cls) -> List[ContentType]:
+        return [ContentType.PDF]
+
+    def read(self, file: Union[Path, str, IO[Any]], name: Optional[str] = None, password: Optional[str] = None) -> List[Document]:
+        return super().read(file, name, password=password)
+
+    def _parse(self, source: Union[bytes, str], size: int, doc_name: str, password: Optional[str] = None) -> List[Document]:
+        password = password or self.password
+        offload = self._should_offload(size)
+        if not (offload and isinstance(source, bytes)):
+            return self._parse_pages(source, doc_name, password, offload)
+
+        # Workers open the spooled file by path instead of each receiving the whole PDF
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as spooled:
+            spooled.write(source)
+        try:
+            return self._parse_pages(spooled.name, doc_name, password, offload)
+        finally:
+            os.unlink(spooled.name)
+
+    def _parse_pages(self, source: Union[bytes, str], doc_name: str, password: Optional[str], offload: bool) -> List[Document]:
+        # Counting pages parses the document structure, so it runs in the pool as well
+        page_count = self._run(_count_pdf_pages, source, password, offload=offload)
+        if page_count is None:
+            logger.error(f'PDF file "{doc_name}" is password protected and could not be decrypted')
+            return []
+
+        ranges = [
+            (start, min(start + self.pages_per_task, page_count))
+            for start in range(0, page_count, self.pages_per_task)
+        ]
+        results = self._run_many(
+            _extract_pdf_pages,
+            [(source, start, end, password) for start, end in ranges],
+            offload=offload,
+        )
+        pages = [text for chunk in results for text in chunk]
+
+        logger.info(f"{self.reader_name} extracted {page_count} pages from {doc_name} in {len(ranges)} tasks")
+        return [
+            Document(
+                name=doc_name,
+                id=f"{doc_name}_{page_number}",
+                meta_data={"page": page_number, "reader": self.reader_name},
+                content=text,
+            )
+            for page_number, text in enumerate(pages, start=1)
+        ]
+
+
+def _markdown_chunking_default(kwargs: dict) -> dict:
+    """Use MarkdownChunking unless the caller chose a strategy (as agno's MarkdownReader does)."""
+    if kwargs.get("chunking_strategy") is None:
+        try:
+            from agno.knowledge.chunking.markdown import MarkdownChunking
+
+            kwargs["chunking_strategy"] = MarkdownChunking()
+        except ImportError:
+            pass
+    return kwargs
+
+
+class LocalHTMLReader(LocalFileReader):
+    """HTML reader using BeautifulSoup, keeping headings as markdown"""
+
+    reader_name = "LocalHTMLReader"
+
+    def __init__(self, **kwargs):
+        super().__init__(**_markdown_chunking_default(kwargs))
+
+    @classmethod
+    def get_supported_chunking_strategies(cls) -> List[ChunkingStrategyType]:
+        return [
+            ChunkingStrategyType.MARKDOWN_CHUNKER,
+            ChunkingStrategyType.DOCUMENT_CHUNKER,
+            ChunkingStrategyType.FIXED_SIZE_CHUNKER,
+            ChunkingStrategyType.RECURSIVE_CHUNKER,
+            ChunkingStrategyType.SEMANTIC_CHUNKER,
+            ChunkingStrategyType.AGENTIC_CHUNKER,
+        ]
+
+    @classmethod
+    def get_supported_content_types(cls) -> List[ContentType]:
+        return [ContentType.TXT]
+
+    def _parse(self, source: Union[bytes, str], size: int, doc_name: str) -> List[Document]:
+        data = self._read_source(source)
+        title, text = self._run(_parse_html, data, None, offload=self._should_offload(size))
+        meta_data = {"reader": self.reader_name}
+        if title:
+            meta_data["title"] = title
+        return [Document(name=doc_name, id=str(uuid.uuid4()), meta_data=meta_data, content=text)]
+
+
+class LocalMarkdownReader(LocalFileReader):
+    """Markdown reader that strips front matter and records the document title"""
+
+    reader_name = "LocalMarkdownReader"
+
+    def __init__(self, **kwargs):
+        super().__init__(**_markdown_chunking_default(kwargs))
+
+    @classmethod
+    def get_supported_chunking_strategies(cls) -> List[ChunkingStrategyType]:
+        return [
+            ChunkingStrategyType.MARKDOWN_CHUNKER,
+            ChunkingStrategyType.DOCUMENT_CHUNKER,
+            ChunkingStrategyType.AGENTIC_CHUNKER,
+            ChunkingStrategyType.RECURSIVE_CHUNKER,
+            ChunkingStrategyType.SEMANTIC_CHUNKER,
+            ChunkingStrategyType.FIXED_SIZE_CHUNKER,
+        ]
+
+    @classmethod
+    def get_supported_content_types(cls) -> List[ContentType]:
+        return [ContentType.MARKDOWN]
+
+    def _parse(self, source: Union[bytes, str], size: int, doc_name: str) -> List[Document]:
+        data = self._read_source(source)
+        title, text = self._run(_parse_markdown, data, self.encoding, offload=self._should_offload(size))
+        meta_data = {"reader": self.reader_name}
+        if title:
+            meta_data["title"] = title
+        return [Document(name=doc_name, id=str(uuid.uuid4()), meta_data=meta_data, content=text)]
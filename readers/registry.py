@@ -3,141 +3,511 @@ Reader Registry - Centralized registration system for custom readers
 
 This module provides a unified way to register all custom readers with both
 the Knowledge instance and ReaderFactory.
+
+Readers are described declaratively (READER_SPECS below) or discovered from
+the ``open_pulse.readers`` entry point group, so third-party packages can add
+readers without code changes here:
+
+    # pyproject.toml of a plugin package
+    [project.entry-points."open_pulse.readers"]
+    MyReader = "my_package.readers:MyReader"
+
+Factories are registered with ReaderFactory once per process, and reader
+instances are only built the first time they are used.
 """
+import asyncio
+import importlib
+import io
 import os
-from typing import Optional
+import threading
+from dataclasses import dataclass
+from importlib.metadata import entry_points
+from itertools import islice
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import lazy_object_proxy
 from agno.knowledge import Knowledge
+from agno.knowledge.content import Content, ContentStatus, FileData
+from agno.knowledge.document.base import Document
+from agno.knowledge.reader.base import Reader
 from agno.knowledge.reader.reader_factory import ReaderFactory
-from .jina_reader import JinaWebReader
+from agno.utils.log import logger
+from config.settings import JINA_STREAM_READS, JINA_MAX_BYTES
+from .instrumentation import instrument_reader
+
+
+# Entry point group scanned for third-party readers
+ENTRY_POINT_GROUP = "open_pulse.readers"
+
+# Sections of a streamed page that are chunked and inserted together
+STREAM_BATCH_SECTIONS = 8
+
+
+@dataclass
+class ReaderSpec:
+    """
+    Declarative description of a reader.
+
+    Attributes:
+        key: Reader ID used in knowledge.readers and ReaderFactory
+        target: Import path of the reader class or factory ("module:attr")
+        name: Display name
+        description: Display description
+        required_env: Environment variables that must be set for the reader to be usable
+        options: Callable returning constructor kwargs, evaluated on first use
+        extensions: File extensions and MIME types dispatched to this reader
+        source: Where the spec came from ("builtin" or "entry_point")
+        attach: Whether to expose the reader in knowledge.readers (False for
+            readers that are only reached through ReaderFactory)
+    """
+    key: str
+    target: str
+    name: str
+    description: str = ""
+    required_env: Tuple[str, ...] = ()
+    options: Optional[Callable[[], Dict[str, Any]]] = None
+    extensions: Optional[List[str]] = None
+    source: str = "builtin"
+    attach: bool = True
+
+    def missing_env(self) -> List[str]:
+        return [var for var in self.required_env if not os.getenv(var)]
+
+
+# Built-in readers. Add a row here to register a new reader.
+READER_SPECS: List[ReaderSpec] = [
+    ReaderSpec(
+        key="JinaWebReader",
+        target="readers.jina_reader:JinaWebReader",
+        name="Jina Web Reader",
+        description="A reader for web content using Jina API",
+        required_env=("JINA_API_KEY",),
+        options=lambda: {
+            "api_key": os.getenv("JINA_API_KEY"),
+            "stream": JINA_STREAM_READS,
+            "max_bytes": JINA_MAX_BYTES,
+        },
+    ),
+    # Local file readers. "pdf" and "markdown" replace agno's built-in
+    # ReaderFactory entries, so uploads dispatched by agno use them too.
+    ReaderSpec(
+        key="pdf",
+        target="readers.local_readers:LocalPDFReader",
+        name="PDF Reader",
+        description="Offline PDF reader (pypdf), pages parsed in a process pool",
+        extensions=[".pdf", "application/pdf"],
+        attach=False,
+    ),
+    ReaderSpec(
+        key="html",
+        target="readers.local_readers:LocalHTMLReader",
+        name="HTML Reader",
+        description="Offline HTML reader (BeautifulSoup), parsed in a process pool",
+        extensions=[".html", ".htm", "text/html", "application/xhtml+xml"],
+        attach=False,
+    ),
+    ReaderSpec(
+        key="markdown",
+        target="readers.local_readers:LocalMarkdownReader",
+        name="Markdown Reader",
+        description="Offline Markdown reader, large files parsed in a process pool",
+        extensions=[".md", ".markdown", "text/markdown", "text/x-markdown"],
+        attach=False,
+    ),
+]
+
+
+def evict_cached_reader(key: str):
+    """
+    Drop the reader instance ReaderFactory cached under a key.
+
+    ReaderFactory only offers clear_cache(), so this reaches into its private
+    _reader_cache. Written against agno==2.1.0 (pinned in pyproject.toml);
+    check it again when upgrading agno.
+    """
+    cache = getattr(ReaderFactory, "_reader_cache", None)
+    if cache is not None:
+        cache.pop(key, None)
+
+
+def _import_target(target: str) -> Callable[..., Reader]:
+    module_name, _, attr = target.partition(":")
+    obj = importlib.import_module(module_name)
+    for part in attr.split("."):
+        obj = getattr(obj, part)
+    return obj
+
+
+class ReaderRegistry:
+    """
+    Process-wide registry of reader specs and lazily created reader instances.
+    """
+
+    def __init__(self, specs: Optional[List[ReaderSpec]] = None):
+        self._specs: Dict[str, ReaderSpec] = {}
+        self._instances: Dict[str, Reader] = {}
+        self._errors: Dict[str, str] = {}
+        self._factories_registered = False
+        self._lock = threading.RLock()
+
+        for spec in specs if specs is not None else READER_SPECS:
+            self.add_spec(spec)
+
+    def add_spec(self, spec: ReaderSpec):
+        """Add or replace a reader spec"""
+        with self._lock:
+            self._specs[spec.key] = spec
+
+    def discover(self) -> List[str]:
+        """
+        Add readers published under the ``open_pulse.readers`` entry point group.
+
+        The entry point is not loaded here; its target is imported on first use.
+
+        Returns:
+            List[str]: Keys of newly discovered readers
+        """
+        discovered = []
+        try:
+            eps = entry_points(group=ENTRY_POINT_GROUP)
+        except Exception as e:
+            logger.warning(f"Could not scan reader entry points: {str(e)}")
+            return discovered
+
+        for ep in eps:
+            if ep.name in self._specs:
+                continue
+            self.add_spec(ReaderSpec(
+                key=ep.name,
+                target=ep.value,
+                name=ep.name,
+                description=f"Reader provided by {ep.value.split(':')[0]}",
+                source="entry_point",
+            ))
+            discovered.append(ep.name)
+        return discovered
+
+    def register_factories(self) -> Dict[str, str]:
+        """
+        Register a ReaderFactory method for every usable spec (once per process).
+
+        Returns:
+            dict: Reader key -> registration status
+        """
+        with self._lock:
+            if not self._factories_registered:
+                self.discover()
+                for spec in self._specs.values():
+                    if spec.missing_env():
+                        continue
+                    # Drop any instance agno cached before we took over the key
+                    evict_cached_reader(spec.key)
+                    ReaderFactory.register_reader(
+                        key=spec.key,
+                        reader_method=self._make_factory(spec.key),
+                        name=spec.name,
+                        description=spec.description,
+                        extensions=spec.extensions,
+                    )
+                self._factories_registered = True
+            return self.get_registration_status()
+
+    def _make_factory(self, key: str) -> Callable[..., Reader]:
+        def factory(cls=None, **kwargs) -> Reader:
+            """ReaderFactory hook: shared instance, or a new one when kwargs are given."""
+            if kwargs:
+                return self.create_reader(key, **kwargs)
+            return self.get_reader(key)
+        return factory
+
+    def get_reader_for_extension(self, extension: str) -> Reader:
+        """
+        Select a reader for a file extension or MIME type.
+
+        Readers whose spec lists the extension win; anything else falls back
+        to agno's ReaderFactory mapping.
+        """
+        extension = (extension or "").lower()
+        for spec in self._specs.values():
+            if spec.extensions and extension in spec.extensions and not spec.missing_env():
+                return self.get_reader(spec.key)
+        return ReaderFactory.get_reader_for_extension(extension)
+
+    def create_reader(self, key: str, **kwargs) -> Reader:
+        """
+        Build a new, instrumented reader instance.
+
+        Args:
+            key: Reader key
+            **kwargs: Overrides for the spec's constructor options
+        """
+        spec = self._specs.get(key)
+        if spec is None:
+            raise KeyError(f"Unknown reader: {key}")
+
+        options = dict(spec.options() if spec.options else {})
+        options.setdefault("name", spec.name)
+        options.setdefault("description", spec.description)
+        options.update(kwargs)
+
+        reader = _import_target(spec.target)(**options)
+        return instrument_reader(reader, reader_key=key)
+
+    def get_reader(self, key: str) -> Reader:
+        """Get the shared reader instance, creating it on first use"""
+        reader = self._instances.get(key)
+        if reader is not None:
+            return reader
+
+        with self._lock:
+            if key not in self._instances:
+                try:
+                    self._instances[key] = self.create_reader(key)
+                    self._errors.pop(key, None)
+                    logger.info(f"Loaded reader {key}")
+                except Exception as e:
+                    self._errors[key] = str(e)
+                    raise
+            return self._instances[key]
+
+    def lazy_reader(self, key: str) -> Reader:
+        """A proxy that builds the shared reader the first time it is touched"""
+        return lazy_object_proxy.Proxy(lambda: self.get_reader(key))
+
+    def attach(self, knowledge: Knowledge) -> Dict[str, str]:
+        """
+        Expose usable readers on a Knowledge instance as lazy proxies.
+
+        Args:
+            knowledge: The Knowledge instance to attach readers to
+
+        Returns:
+            dict: Reader key -> registration status
+        """
+        status = self.register_factories()
+
+        if not knowledge.readers:
+            knowledge.readers = {}
+
+        for key, spec in self._specs.items():
+            if spec.attach and status.get(key) == "registered" and key not in knowledge.readers:
+                knowledge.readers[key] = self.lazy_reader(key)
+
+        # Built-in agno readers already on the knowledge base get metrics too
+        for key, reader in knowledge.readers.items():
+            if key not in self._specs:
+                instrument_reader(reader, reader_key=key)
+
+        return status
+
+    def get_registration_status(self) -> Dict[str, str]:
+        """Registration status per reader, in the format of register_all_readers"""
+        status = {}
+        for key, spec in self._specs.items():
+            missing = spec.missing_env()
+            if missing:
+                status[key] = f"skipped: {', '.join(missing)} not found"
+            elif key in self._errors:
+                status[key] = f"failed: {self._errors[key]}"
+            else:
+                status[key] = "registered"
+        return status
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Report which readers are known, registered and actually loaded"""
+        status = self.get_registration_status()
+        return {
+            "factories_registered": self._factories_registered,
+            "readers": {
+                key: {
+                    "name": spec.name,
+                    "target": spec.target,
+                    "source": spec.source,
+                    "status": status[key],
+                    "loaded": key in self._instances,
+                }
+                for key, spec in self._specs.items()
+            },
+        }
+
+
+def _take(iterator: Iterator[Document], count: int) -> List[Document]:
+    return list(islice(iterator, count))
+
+
+class RegistryKnowledge(Knowledge):
+    """
+    Knowledge that dispatches file uploads through the reader registry.
+
+    Uploads are read in a worker thread: agno calls the synchronous
+    reader.read() from its async load, which would block the event loop for
+    the whole parse (the reader only waits on the process pool there).
+
+    URLs read by a streaming reader (one with ``stream`` set and an
+    ``iter_read`` method, e.g. JinaWebReader) are chunked and inserted batch
+    by batch while the page is still downloading, instead of being read whole.
+    """
+
+    def _select_reader(self, extension: str) -> Reader:
+        return get_reader_registry().get_reader_for_extension(extension)
+
+    async def _load_from_content(self, content: Content, upsert: bool = True, skip_if_exists: bool = False):
+        file_data = content.file_data
+        if (
+            not isinstance(file_data, FileData)
+            or not file_data.type
+            or file_data.content is None
+            or self.vector_db.__class__.__name__ == "LightRag"
+        ):
+            return await super()._load_from_content(content, upsert, skip_if_exists)
+
+        # Same steps as agno's file upload branch, with the read moved off the loop
+        content.name = content.name or f"content_{file_data.type}"
+        logger.info(f"Adding content from {content.name}")
+        self._add_to_contents_db(content)
+        if self._should_skip(content.content_hash, skip_if_exists):
+            content.status = ContentStatus.COMPLETED
+            self._update_content(content)
+            return
+
+        if isinstance(file_data.content, bytes):
+            content_io = io.BytesIO(file_data.content)
+        elif isinstance(file_data.content, str):
+            content_io = io.BytesIO(file_data.content.encode("utf-8", errors="replace"))
+        else:
+            content_io = file_data.content
+        reader = content.reader or self._select_reader(file_data.type)
+        read_documents = await asyncio.to_thread(reader.read, content_io, name=content.name)
+
+        if not read_documents:
+            content.status = ContentStatus.FAILED
+            content.status_message = "Content could not be read"
+            self._update_content(content)
+            return
+        for document in read_documents:
+            if content.metadata:
+                document.meta_data.update(content.metadata)
+            document.content_id = content.id
+        await self._handle_vector_db_insert(content, read_documents, upsert)
+
+    async def _load_from_url(self, content: Content, upsert: bool, skip_if_exists: bool):
+        reader = content.reader
+        streaming = reader is not None and getattr(reader, "stream", False) and hasattr(reader, "iter_read")
+        if not streaming or not content.url or self.vector_db.__class__.__name__ == "LightRag":
+            return await super()._load_from_url(content, upsert, skip_if_exists)
+        await self._stream_from_url(content, reader, upsert, skip_if_exists)
+
+    async def _stream_from_url(self, content: Content, reader: Reader, upsert: bool, skip_if_exists: bool):
+        """Insert a streamed page section batch by section batch"""
+        logger.info(f"Streaming content from URL {content.url}")
+        content.file_type = "url"
+        self._add_to_contents_db(content)
+        if self._should_skip(content.content_hash, skip_if_exists):
+            content.status = ContentStatus.COMPLETED
+            self._update_content(content)
+            return
+
+        from .chunking import chunk_documents
+        from .instrumentation import record_chunk_count
+
+        reader_key = getattr(reader, "_metrics_key", None)
+        on_chunked = (lambda count: record_chunk_count(reader_key, count)) if reader_key else None
+        # The first batch replaces what is stored for this URL, later batches add to it
+        replace = upsert and self.vector_db.upsert_available()
+        sections = reader.iter_read(content.url, name=content.name or content.url)
+        # The next batch downloads in a thread while the current one is embedded
+        next_batch = asyncio.ensure_future(asyncio.to_thread(_take, sections, STREAM_BATCH_SECTIONS))
+        inserted = 0
+        try:
+            while True:
+                batch = await next_batch
+                if not batch:
+                    break
+                next_batch = asyncio.ensure_future(asyncio.to_thread(_take, sections, STREAM_BATCH_SECTIONS))
+
+                if reader.chunk:
+                    batch = await asyncio.to_thread(chunk_documents, reader, batch, on_chunked)
+                for document in batch:
+                    document.content_id = content.id
+                if replace and inserted == 0:
+                    await self.vector_db.async_upsert(content.content_hash, batch, content.metadata)
+                else:
+                    await self.vector_db.async_insert(content.content_hash, documents=batch, filters=content.metadata)
+                inserted += len(batch)
+        except Exception as e:
+            logger.error(f"Error streaming URL {content.url}: {str(e)}")
+            content.status = ContentStatus.FAILED
+            content.status_message = f"Error streaming URL: {content.url} - {str(e)}"
+            self._update_content(content)
+            return
+        finally:
+            if not next_batch.done():
+                await asyncio.gather(next_batch, return_exceptions=True)
+            # Closing the generator closes the HTTP response
+            await asyncio.to_thread(sections.close)
+
+        if inserted == 0:
+            content.status = ContentStatus.FAILED
+            content.status_message = "Content could not be read"
+        else:
+            content.status = ContentStatus.COMPLETED
+        self._update_content(content)
+        logger.info(f"Inserted {inserted} documents streamed from {content.url}")
+
+
+# Global singleton instance
+_reader_registry: Optional[ReaderRegistry] = None
+
+
+def get_reader_registry() -> ReaderRegistry:
+    """Get or create the global reader registry"""
+    global _reader_registry
+    if _reader_registry is None:
+        _reader_registry = ReaderRegistry()
+    return _reader_registry
 
 
 def register_all_readers(knowledge: Knowledge) -> dict:
     """
     Register all custom readers with the Knowledge instance.
-    
+
     This function:
-    1. Creates instances of all custom readers
-    2. Adds them to knowledge.readers dictionary (for AgentOS priority lookup)
-    3. Registers them with ReaderFactory (for fallback lookup)
-    
+    1. Registers ReaderFactory methods for all known readers (once per process)
+    2. Adds lazy reader proxies to knowledge.readers (for AgentOS priority lookup)
+    3. Instruments every reader so reads and chunking report metrics
+
+    Reader instances are only created the first time they are used, and are
+    shared between all Knowledge instances in the process.
+
     Args:
         knowledge: The Knowledge instance to register readers with
-        
+
     Returns:
         dict: A dictionary of registered reader names and their status
-        
+
     Example:
         >>> knowledge = Knowledge(name="My KB", vector_db=vector_db, contents_db=contents_db)
         >>> status = register_all_readers(knowledge)
         >>> print(status)
-        {'JinaWebReader': 'registered', 'CustomReader': 'skipped: missing API key'}
-    """
-    status = {}
-    
-    # Initialize knowledge.readers if it doesn't exist
-    if not knowledge.readers:
-        knowledge.readers = {}
-    
-    # Register JinaWebReader
-    jina_status = _register_jina_reader(knowledge)
-    status['JinaWebReader'] = jina_status
-    
-    # Add more custom readers here in the future
-    # Example:
-    # custom_status = _register_custom_reader(knowledge)
-    # status['CustomReader'] = custom_status
-    
-    return status
-
-
-def _register_jina_reader(knowledge: Knowledge) -> str:
-    """
-    Register JinaWebReader with the Knowledge instance.
-    
-    Args:
-        knowledge: The Knowledge instance to register with
-        
-    Returns:
-        str: Registration status message
+        {'JinaWebReader': 'registered', 'CustomReader': 'skipped: CUSTOM_API_KEY not found'}
     """
-    jina_api_key = os.getenv("JINA_API_KEY")
-    
-    if not jina_api_key:
-        return "skipped: JINA_API_KEY not found"
-    
-    try:
-        # Create JinaWebReader instance
-        jina_reader = JinaWebReader(
-            api_key=jina_api_key,
-            name="Jina Web Reader",
-            description="A reader for web content using Jina API"
-        )
-        
-        # Add to knowledge.readers dictionary (AgentOS checks this first!)
-        knowledge.readers["JinaWebReader"] = jina_reader
-        
-        # Also register with ReaderFactory (for fallback lookup)
-        def create_jina_reader(**kwargs):
-            """Factory method to create JinaWebReader instance."""
-            return JinaWebReader(api_key=jina_api_key, **kwargs)
-        
-        ReaderFactory.register_reader(
-            key="JinaWebReader",
-            reader_method=create_jina_reader,
-            name="Jina Web Reader",
-            description="A reader for web content using Jina API",
-            extensions=None
-        )
-        
-        return "registered"
-        
-    except Exception as e:
-        return f"failed: {str(e)}"
+    return get_reader_registry().attach(knowledge)
 
 
 # Template for adding new custom readers:
 """
-def _register_custom_reader(knowledge: Knowledge) -> str:
-    '''
-    Register CustomReader with the Knowledge instance.
-    
-    Args:
-        knowledge: The Knowledge instance to register with
-        
-    Returns:
-        str: Registration status message
-    '''
-    # Check for required API keys or configuration
-    api_key = os.getenv("CUSTOM_API_KEY")
-    if not api_key:
-        return "skipped: CUSTOM_API_KEY not found"
-    
-    try:
-        # Create reader instance
-        custom_reader = CustomReader(
-            api_key=api_key,
-            name="Custom Reader",
-            description="Description of what this reader does"
-        )
-        
-        # Add to knowledge.readers
-        knowledge.readers["CustomReader"] = custom_reader
-        
-        # Register with ReaderFactory
-        def create_custom_reader(**kwargs):
-            return CustomReader(api_key=api_key, **kwargs)
-        
-        ReaderFactory.register_reader(
-            key="CustomReader",
-            reader_method=create_custom_reader,
-            name="Custom Reader",
-            description="Description of what this reader does",
-            extensions=None  # or [".ext1", ".ext2"] for file-based readers
-        )
-        
-        return "registered"
-        
-    except Exception as e:
-        return f"failed: {str(e)}"
-"""
+Add a row to READER_SPECS. Nothing is imported until the reader is first used.
 
+    ReaderSpec(
+        key="CustomReader",
+        target="readers.custom_reader:CustomReader",
+        name="Custom Reader",
+        description="Description of what this reader does",
+        required_env=("CUSTOM_API_KEY",),
+        options=lambda: {"api_key": os.getenv("CUSTOM_API_KEY")},
+        extensions=None,  # or [".ext1", ".ext2"] for file-based readers
+    ),
+
+Readers living in another package can instead be published under the
+"open_pulse.readers" entry point group (see the module docstring).
+"""
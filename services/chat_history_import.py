@@ -0,0 +1,553 @@
+"""
+Chat History Import - Streaming bulk memory extraction from chat exports
+
+Pasting a chat history into a turn only works for small histories. The
+importer reads a chat export (JSON array, {"messages": [...]} object, JSON
+Lines or a timestamped TXT export) as a stream, groups the messages into
+windows per conversation (a new window starts after a quiet gap or once the
+window reaches its token budget) and extracts memories from the windows:
+
+- map: one memory-extraction call per window, with bounded parallelism
+- reduce: one consolidation pass over the user's memories, merging what
+  several windows extracted about the same thing
+
+Only the open windows and the in-flight extractions are held in memory, so a
+200 MB export is processed in constant memory. Progress (bytes read, windows
+done) is reported on the job while it runs.
+
+Usage:
+    from services.chat_history_import import get_chat_history_importer
+
+    importer = get_chat_history_importer(db)
+    job = importer.start("export.json", user_id="alice@example.com")
+    importer.get_job(job.job_id).to_dict()
+
+    python -m services.chat_history_import export.txt --user-id alice@example.com
+"""
+import argparse
+import codecs
+import json
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from agno.models.message import Message
+from agno.utils.string import generate_id
+
+from config.settings import (
+    CHAT_IMPORT_WINDOW_GAP_SECONDS,
+    CHAT_IMPORT_WINDOW_MAX_TOKENS,
+    CHAT_IMPORT_WORKERS,
+)
+from services.embedding_pipeline import estimate_tokens
+from services.memory_queue import DeferredMemoryManager
+from services.metrics import get_metrics_registry
+
+READ_CHUNK_BYTES = 1 << 20
+
+SENDER_FIELDS = ("sender", "from", "talker", "nickname", "author", "user", "name")
+CONTENT_FIELDS = ("content", "text", "message", "msg", "body")
+TIME_FIELDS = ("timestamp", "time", "create_time", "createTime", "date", "datetime")
+CONVERSATION_FIELDS = ("conversation", "chat", "chat_name", "room", "group", "session")
+
+# "2024-01-05 10:23:11 Alice: hello", "[2024/01/05 10:23] Alice" (content on the following lines)
+_TXT_LINE = re.compile(
+    r"^\s*\[?(\d{4}[-/.]\d{1,2}[-/.]\d{1,2}[ T]\d{1,2}:\d{2}(?::\d{2})?)\]?\s*(?:-\s*)?(.*)$"
+)
+_DATE_PREFIX = re.compile(r"^(\d{4})[-/.](\d{1,2})[-/.](\d{1,2})([ T])(\d{1,2}):")
+_SENDER_SEPARATOR = re.compile(r":\s|：")
+_MESSAGES_KEY = re.compile(r'"(?:messages|msgs|chat_history|data)"\s*:\s*\[')
+_MESSAGES_KEY_OVERLAP = 256
+
+
+@dataclass
+class ChatMessage:
+    """One parsed message of a chat export"""
+    sender: str
+    content: str
+    conversation: str
+    timestamp: Optional[float] = None
+
+
+@dataclass
+class ChatWindow:
+    """Consecutive messages of one conversation, extracted together"""
+    conversation: str
+    messages: List[ChatMessage] = field(default_factory=list)
+    tokens: int = 0
+
+    @property
+    def start(self) -> Optional[float]:
+        return self.messages[0].timestamp if self.messages else None
+
+    @property
+    def end(self) -> Optional[float]:
+        return self.messages[-1].timestamp if self.messages else None
+
+    def to_text(self) -> str:
+        lines = []
+        for message in self.messages:
+            stamp = f"{_format_time(message.timestamp)} " if message.timestamp is not None else ""
+            lines.append(f"{stamp}{message.sender}: {message.content}")
+        return "\n".join(lines)
+
+
+def _format_time(timestamp: Optional[float]) -> str:
+    return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M") if timestamp is not None else "?"
+
+
+def parse_timestamp(value: Any) -> Optional[float]:
+    """Unix seconds from epoch seconds/milliseconds or a date string"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)) or (isinstance(value, str) and value.strip().isdigit()):
+        number = float(value)
+        return number / 1000 if number > 1e11 else number
+    # 2024/1/5 9:03 -> 2024-01-05 09:03
+    text = _DATE_PREFIX.sub(
+        lambda m: f"{m[1]}-{int(m[2]):02d}-{int(m[3]):02d}{m[4]}{int(m[5]):02d}:", str(value).strip()
+    )
+    try:
+        return datetime.fromisoformat(text.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+def _first(record: Dict[str, Any], names) -> Any:
+    for name in names:
+        value = record.get(name)
+        if value not in (None, ""):
+            return value
+    return None
+
+
+def _text(value: Any) -> str:
+    # Telegram-style exports split formatted text into fragments
+    if isinstance(value, list):
+        return "".join(part if isinstance(part, str) else str(part.get("text", "")) for part in value)
+    if isinstance(value, dict):
+        return str(value.get("text") or value.get("content") or "")
+    return str(value or "")
+
+
+def message_from_record(record: Dict[str, Any], conversation: str = "default") -> Optional[ChatMessage]:
+    """Map one exported message object to a ChatMessage (None if it has no text)"""
+    if not isinstance(record, dict):
+        return None
+    content = _text(_first(record, CONTENT_FIELDS)).strip()
+    if not content:
+        return None
+    return ChatMessage(
+        sender=str(_first(record, SENDER_FIELDS) or "unknown"),
+        content=content,
+        conversation=str(_first(record, CONVERSATION_FIELDS) or conversation),
+        timestamp=parse_timestamp(_first(record, TIME_FIELDS)),
+    )
+
+
+# ------------------------------------------------------------------
+# Streaming parsers
+# ------------------------------------------------------------------
+
+def _read_text(handle, on_bytes: Callable[[int], None], chunk_bytes: int) -> Iterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    while True:
+        chunk = handle.read(chunk_bytes)
+        on_bytes(len(chunk))
+        if not chunk:
+            tail = decoder.decode(b"", final=True)
+            if tail:
+                yield tail
+            return
+        yield decoder.decode(chunk)
+
+
+def iter_json_records(path: str, on_bytes: Callable[[int], None] = lambda n: None,
+                      chunk_bytes: int = READ_CHUNK_BYTES, lines: bool = False) -> Iterator[Dict[str, Any]]:
+    """
+    Message objects of a JSON export, decoded one at a time.
+
+    Reads a top-level array, the first messages array of a top-level object,
+    or JSON Lines; the buffer never holds more than one object plus one chunk.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, "rb") as handle:
+        chunks = _read_text(handle, on_bytes, chunk_bytes)
+        buffer, position, eof = "", 0, False
+
+        def fill() -> bool:
+            nonlocal buffer, position, eof
+            chunk = next(chunks, None)
+            if chunk is None:
+                eof = True
+                return False
+            buffer = buffer[position:] + chunk
+            position = 0
+            return True
+
+        while not buffer.strip() and fill():
+            pass
+        start = buffer.lstrip("\ufeff \t\r\n")
+        in_array = start.startswith("[")
+        if in_array:
+            position = buffer.index("[") + 1
+        elif not lines:
+            # An object wrapping the messages: skip to its messages array, keeping
+            # only enough of what was scanned to match a key split across chunks
+            while True:
+                match = _MESSAGES_KEY.search(buffer, position)
+                if match:
+                    break
+                position = max(position, len(buffer) - _MESSAGES_KEY_OVERLAP)
+                if not fill():
+                    raise ValueError("No messages array found in the JSON export")
+            in_array, position = True, match.end()
+
+        while True:
+            while position < len(buffer) and buffer[position] in "\ufeff \t\r\n,":
+                position += 1
+            if position >= len(buffer):
+                if not fill():
+                    return
+                continue
+            if in_array and buffer[position] == "]":
+                return
+            try:
+                record, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if not fill():
+                    raise
+                continue
+            position = end
+            if in_array or isinstance(record, dict):
+                yield record
+
+
+def iter_txt_messages(path: str, conversation: str, on_bytes: Callable[[int], None] = lambda n: None) -> Iterator[ChatMessage]:
+    """Messages of a text export: a timestamped header line, content on the same or following lines"""
+    current: Optional[ChatMessage] = None
+    with open(path, "rb") as handle:
+        for raw in handle:
+            on_bytes(len(raw))
+            line = raw.decode("utf-8", errors="replace").rstrip("\r\n")
+            match = _TXT_LINE.match(line)
+            if match:
+                if current is not None and current.content.strip():
+                    yield current
+                header = match.group(2)
+                separator = _SENDER_SEPARATOR.search(header)
+                sender, content = (header[:separator.start()], header[separator.end():]) if separator else (header, "")
+                current = ChatMessage(
+                    sender=sender.strip() or "unknown",
+                    content=content.strip(),
+                    conversation=conversation,
+                    timestamp=parse_timestamp(match.group(1)),
+                )
+            elif current is not None and line.strip():
+                current.content = f"{current.content}\n{line.strip()}".strip()
+    if current is not None and current.content.strip():
+        yield current
+
+
+def iter_messages(path: str, format: Optional[str] = None,
+                  on_bytes: Callable[[int], None] = lambda n: None) -> Iterator[ChatMessage]:
+    """Parsed messages of an export; format is json, jsonl or txt (default: from the file suffix)"""
+    conversation = Path(path).stem
+    format = (format or Path(path).suffix.lstrip(".")).lower()
+    if format in ("json", "jsonl", "ndjson"):
+        for record in iter_json_records(path, on_bytes, lines=format != "json"):
+            message = message_from_record(record, conversation)
+            if message is not None:
+                yield message
+    else:
+        yield from iter_txt_messages(path, conversation, on_bytes)
+
+
+def iter_windows(messages: Iterator[ChatMessage], gap_seconds: float = CHAT_IMPORT_WINDOW_GAP_SECONDS,
+                 max_tokens: int = CHAT_IMPORT_WINDOW_MAX_TOKENS, max_open: int = 64) -> Iterator[ChatWindow]:
+    """
+    Windows of consecutive messages per conversation.
+
+    A window closes after a quiet gap, when it would exceed max_tokens, or when
+    more than max_open conversations are open (the least recent one closes).
+    """
+    open_windows: Dict[str, ChatWindow] = {}
+    for message in messages:
+        window = open_windows.get(message.conversation)
+        cost = estimate_tokens(message.content) + 8
+        if window is not None:
+            quiet = (
+                message.timestamp is not None and window.end is not None
+                and message.timestamp - window.end > gap_seconds
+            )
+            if quiet or window.tokens + cost > max_tokens:
+                yield open_windows.pop(message.conversation)
+                window = None
+        if window is None:
+            if len(open_windows) >= max_open:
+                yield open_windows.pop(next(iter(open_windows)))
+            window = ChatWindow(message.conversation)
+        # Re-insert so dict order stays least-recently-used first
+        open_windows.pop(message.conversation, None)
+        open_windows[message.conversation] = window
+        window.messages.append(message)
+        window.tokens += cost
+    yield from open_windows.values()
+
+
+# ------------------------------------------------------------------
+# Import jobs
+# ------------------------------------------------------------------
+
+@dataclass
+class ImportJob:
+    """Progress and outcome of one chat history import"""
+    job_id: str
+    user_id: str
+    path: str
+    format: Optional[str] = None
+    status: str = "queued"  # queued, running, consolidating, done, failed, cancelled
+    bytes_total: int = 0
+    bytes_read: int = 0
+    messages: int = 0
+    windows: int = 0
+    windows_done: int = 0
+    windows_failed: int = 0
+    memories_before: Optional[int] = None
+    memories_after: Optional[int] = None
+    consolidation: Optional[Dict[str, Any]] = None
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    seconds: float = 0.0
+    error: Optional[str] = None
+    cancel_requested: bool = False
+    # The file is an upload owned by the job and is deleted once the job ends
+    delete_file: bool = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data.pop("cancel_requested")
+        data.pop("delete_file")
+        data["seconds"] = round(self.seconds, 3)
+        data["progress"] = round(self.bytes_read / self.bytes_total, 4) if self.bytes_total else None
+        return data
+
+
+class ChatHistoryImporter:
+    """
+    Map-reduce memory extraction over chat exports.
+
+    Args:
+        manager: Memory manager that extracts memories from a window
+        consolidator: Memory consolidator for the reduce step (None skips it)
+        workers: Windows extracted in parallel
+        gap_seconds: Quiet time that ends a window
+        max_tokens: Estimated token budget of a window
+    """
+
+    def __init__(
+        self,
+        manager,
+        consolidator=None,
+        workers: int = CHAT_IMPORT_WORKERS,
+        gap_seconds: float = CHAT_IMPORT_WINDOW_GAP_SECONDS,
+        max_tokens: int = CHAT_IMPORT_WINDOW_MAX_TOKENS,
+    ):
+        self.manager = manager
+        self.consolidator = consolidator
+        self.workers = max(1, workers)
+        self.gap_seconds = gap_seconds
+        self.max_tokens = max_tokens
+        self.jobs: Dict[str, ImportJob] = {}
+        self.max_jobs = 50
+        self._lock = threading.Lock()
+
+    def _count_memories(self, user_id: str) -> Optional[int]:
+        try:
+            return len(self.manager.get_user_memories(user_id=user_id) or [])
+        except Exception:
+            return None
+
+    def extract_window(self, window: ChatWindow, user_id: str):
+        """Map step: extract memories from one window"""
+        content = (
+            f"Chat history from '{window.conversation}' "
+            f"({_format_time(window.start)} to {_format_time(window.end)}):\n\n{window.to_text()}"
+        )
+        messages = [Message(role="user", content=content)]
+        if isinstance(self.manager, DeferredMemoryManager):
+            # Imports run in the background already; don't queue them a second time
+            self.manager.extract_now(messages=messages, user_id=user_id)
+        else:
+            self.manager.create_user_memories(messages=messages, user_id=user_id)
+
+    def _extract(self, job: ImportJob, window: ChatWindow):
+        metrics = get_metrics_registry()
+        try:
+            self.extract_window(window, job.user_id)
+        except Exception as e:
+            with self._lock:
+                job.windows_failed += 1
+                job.error = str(e)
+            metrics.counter("chat_import_windows_total", "Chat history windows extracted").inc(outcome="error")
+            print(f"❌ Memory extraction failed for a window of {window.conversation}: {str(e)}")
+            return
+        with self._lock:
+            job.windows_done += 1
+        metrics.counter("chat_import_windows_total", "Chat history windows extracted").inc(outcome="ok")
+
+    def _on_bytes(self, job: ImportJob) -> Callable[[int], None]:
+        def add(count: int):
+            job.bytes_read += count
+        return add
+
+    def run(self, job: ImportJob) -> ImportJob:
+        """Run an import job to the end (blocking)"""
+        try:
+            return self._run(job)
+        finally:
+            if job.delete_file:
+                Path(job.path).unlink(missing_ok=True)
+
+    def _run(self, job: ImportJob) -> ImportJob:
+        started = time.perf_counter()
+        job.status = "running"
+        job.started_at = datetime.now().isoformat()
+        job.bytes_total = Path(job.path).stat().st_size
+        job.memories_before = self._count_memories(job.user_id)
+        print(f"📚 Importing chat history {Path(job.path).name} ({job.bytes_total} bytes) for {job.user_id}")
+
+        try:
+            messages = iter_messages(job.path, job.format, self._on_bytes(job))
+
+            def counted():
+                for message in messages:
+                    job.messages += 1
+                    yield message
+
+            in_flight = set()
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="chat-import") as executor:
+                for window in iter_windows(counted(), self.gap_seconds, self.max_tokens):
+                    if job.cancel_requested:
+                        break
+                    # Bounded queue: parsing waits while every worker is busy
+                    while len(in_flight) >= self.workers * 2:
+                        _, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    job.windows += 1
+                    in_flight.add(executor.submit(self._extract, job, window))
+                wait(in_flight)
+
+            if job.cancel_requested:
+                job.status = "cancelled"
+            else:
+                if self.consolidator is not None and job.windows_done:
+                    job.status = "consolidating"
+                    job.consolidation = self.consolidator.run(user_id=job.user_id).to_dict()
+                job.status = "failed" if job.windows_failed and not job.windows_done else "done"
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            print(f"❌ Chat history import failed for {job.user_id}: {str(e)}")
+
+        job.memories_after = self._count_memories(job.user_id)
+        job.seconds = time.perf_counter() - started
+        job.finished_at = datetime.now().isoformat()
+        get_metrics_registry().counter("chat_imports_total", "Chat history imports").inc(outcome=job.status)
+        print(
+            f"✅ Imported {job.messages} messages in {job.windows} windows for {job.user_id} "
+            f"({job.windows_failed} failed), memories {job.memories_before} → {job.memories_after} ({job.seconds:.1f}s)"
+        )
+        return job
+
+    def create_job(
+        self, path: str, user_id: str, format: Optional[str] = None, delete_file: bool = False
+    ) -> ImportJob:
+        if not Path(path).is_file():
+            raise FileNotFoundError(path)
+        job = ImportJob(
+            job_id=generate_id(f"{path}:{user_id}:{time.time()}"),
+            user_id=user_id,
+            path=str(path),
+            format=format,
+            delete_file=delete_file,
+        )
+        with self._lock:
+            self.jobs[job.job_id] = job
+            for old in list(self.jobs)[:-self.max_jobs]:
+                self.jobs.pop(old)
+        return job
+
+    def start(
+        self, path: str, user_id: str, format: Optional[str] = None, delete_file: bool = False
+    ) -> ImportJob:
+        """
+        Start an import in a background thread and return its job
+
+        Args:
+            path: Chat export to import
+            user_id: User the memories belong to
+            format: json, jsonl or txt (default: from the file suffix)
+            delete_file: Delete the export when the job ends (for uploads)
+        """
+        job = self.create_job(path, user_id, format, delete_file)
+        threading.Thread(target=self.run, args=(job,), name=f"chat-import-{job.job_id[:8]}", daemon=True).start()
+        return job
+
+    def cancel(self, job_id: str) -> Optional[ImportJob]:
+        """Stop reading new windows; windows already extracting still finish"""
+        job = self.jobs.get(job_id)
+        if job is not None and job.status in ("queued", "running"):
+            job.cancel_requested = True
+        return job
+
+    def get_job(self, job_id: str) -> Optional[ImportJob]:
+        return self.jobs.get(job_id)
+
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        return [job.to_dict() for job in reversed(list(self.jobs.values()))]
+
+
+# Global singleton instance
+_chat_history_importer: Optional[ChatHistoryImporter] = None
+
+
+def get_chat_history_importer(db=None) -> ChatHistoryImporter:
+    """Get or create the global chat history importer (chat-history memory manager + consolidation)"""
+    global _chat_history_importer
+    if _chat_history_importer is None:
+        if db is None:
+            raise ValueError("A database is required to create the chat history importer")
+        from config.memory_config import create_wechat_history_memory_manager
+        from services.memory_consolidation import get_memory_consolidator
+
+        _chat_history_importer = ChatHistoryImporter(
+            create_wechat_history_memory_manager(db), consolidator=get_memory_consolidator(db)
+        )
+    return _chat_history_importer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract memories from a chat history export")
+    parser.add_argument("path", help="Chat export (.json, .jsonl or .txt)")
+    parser.add_argument("--user-id", required=True)
+    parser.add_argument("--format", choices=["json", "jsonl", "txt"], default=None)
+    parser.add_argument("--no-consolidate", action="store_true", help="Skip the consolidation pass at the end")
+    args = parser.parse_args()
+
+    from agno.db.sqlite import SqliteDb
+    from config.settings import DATABASE_FILE
+
+    importer = get_chat_history_importer(SqliteDb(db_file=DATABASE_FILE))
+    if args.no_consolidate:
+        importer.consolidator = None
+    job = importer.create_job(args.path, args.user_id, args.format)
+    print(json.dumps(importer.run(job).to_dict(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
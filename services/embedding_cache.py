@@ -0,0 +1,344 @@
+"""
+Embedding Cache - Persistent, disk-backed cache in front of an embedder
+
+Embeddings are stored as float32 rows in a memory-mapped file, one file per
+(model, dimensions). A small SQLite index maps the SHA-256 of the text to a
+row and tracks last use, so the least recently used rows are recycled once
+the cache is full. Re-uploaded documents and repeated queries are then served
+from disk instead of the embedding API.
+
+Usage:
+    from services.embedding_cache import CachedEmbedder
+
+    embedder = CachedEmbedder(embedder=OpenAIEmbedder())
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from agno.knowledge.embedder.base import Embedder
+
+from config.settings import EMBEDDING_CACHE_DIR, EMBEDDING_CACHE_MAX_ENTRIES
+from services.metrics import get_metrics_registry
+
+
+def text_key(text: str) -> str:
+    """Cache key of a text (the model and dimensions select the store)"""
+    return hashlib.sha256(text.encode("utf-8", errors="surrogatepass")).hexdigest()
+
+
+class EmbeddingCacheStore:
+    """
+    Fixed-capacity vector store for one (model, dimensions) pair.
+
+    Layout in ``<cache_dir>/<model>_<dimensions>/``:
+        vectors.f32  float32 matrix of shape (capacity, dimensions), memory-mapped
+        index.db     SQLite table: key -> slot, last_used
+    """
+
+    def __init__(self, cache_dir: str, model: str, dimensions: int, capacity: int):
+        self.model = model
+        self.dimensions = dimensions
+        self.capacity = capacity
+
+        safe_model = re.sub(r"[^A-Za-z0-9_.-]+", "_", model)
+        self.path = Path(cache_dir) / f"{safe_model}_{dimensions}"
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path / "index.db"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, slot INTEGER NOT NULL UNIQUE, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_last_used ON entries(last_used)")
+        self._conn.commit()
+
+        vectors_file = self.path / "vectors.f32"
+        if vectors_file.exists():
+            self._fit_capacity(vectors_file)
+        mode = "r+" if vectors_file.exists() else "w+"
+        # The file is sparse until rows are written, so a large capacity is cheap
+        self._vectors = np.memmap(vectors_file, dtype=np.float32, mode=mode, shape=(capacity, dimensions))
+
+        size, next_slot = self._conn.execute("SELECT COUNT(*), COALESCE(MAX(slot) + 1, 0) FROM entries").fetchone()
+        self._size, self._next_slot = size, min(next_slot, capacity)
+        self.evictions = 0
+
+    def _fit_capacity(self, vectors_file: Path):
+        """
+        Shrink a store written with a larger capacity.
+
+        The most recently used entries are kept; those stored past the new
+        capacity are moved into the slots freed by the dropped ones, and the
+        file is truncated.
+        """
+        row_bytes = self.dimensions * np.dtype(np.float32).itemsize
+        rows_in_file = vectors_file.stat().st_size // row_bytes
+        overflow = self._conn.execute(
+            "SELECT COUNT(*) FROM entries WHERE slot >= ?", (self.capacity,)
+        ).fetchone()[0]
+
+        if overflow:
+            keep = self._conn.execute(
+                "SELECT key, slot FROM entries ORDER BY last_used DESC LIMIT ?", (self.capacity,)
+            ).fetchall()
+            kept_keys = {key for key, _ in keep}
+            dropped = [
+                (key,) for (key,) in self._conn.execute("SELECT key FROM entries") if key not in kept_keys
+            ]
+            self._conn.executemany("DELETE FROM entries WHERE key = ?", dropped)
+
+            kept_slots = {slot for _, slot in keep}
+            free_slots = (slot for slot in range(self.capacity) if slot not in kept_slots)
+            moves = [(key, slot, next(free_slots)) for key, slot in keep if slot >= self.capacity]
+            old_vectors = np.memmap(vectors_file, dtype=np.float32, mode="r+", shape=(rows_in_file, self.dimensions))
+            for key, slot, new_slot in moves:
+                old_vectors[new_slot] = old_vectors[slot]
+            old_vectors.flush()
+            del old_vectors
+            self._conn.executemany(
+                "UPDATE entries SET slot = ? WHERE key = ?", [(new_slot, key) for key, _, new_slot in moves]
+            )
+            self._conn.commit()
+
+        if rows_in_file > self.capacity:
+            os.truncate(vectors_file, self.capacity * row_bytes)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, List[float]]:
+        """Look up vectors by key; missing keys are absent from the result"""
+        if not keys:
+            return {}
+        found: Dict[str, List[float]] = {}
+        unique = list(dict.fromkeys(keys))
+        with self._lock:
+            for i in range(0, len(unique), 500):
+                batch = unique[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, slot FROM entries WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, slot in rows:
+                    found[key] = self._vectors[slot].tolist()
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE entries SET last_used = ? WHERE key = ?", [(now, key) for key in found]
+                )
+                self._conn.commit()
+        return found
+
+    def put_many(self, items: Sequence[Tuple[str, Sequence[float]]]):
+        """Store vectors, evicting the least recently used rows when full"""
+        with self._lock:
+            existing = set()
+            keys = [key for key, _ in items]
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                existing.update(
+                    row[0] for row in self._conn.execute(
+                        f"SELECT key FROM entries WHERE key IN ({placeholders})", batch
+                    )
+                )
+
+            new_items = []
+            for key, vector in items:
+                if key in existing or len(vector) != self.dimensions:
+                    continue
+                existing.add(key)
+                new_items.append((key, vector))
+            if not new_items:
+                return
+
+            slots = self._allocate_slots(len(new_items))
+            now = time.time()
+            for (key, vector), slot in zip(new_items, slots):
+                self._vectors[slot] = np.asarray(vector, dtype=np.float32)
+            self._vectors.flush()
+            self._conn.executemany(
+                "INSERT INTO entries (key, slot, last_used) VALUES (?, ?, ?)",
+                [(key, slot, now) for (key, _), slot in zip(new_items, slots)],
+            )
+            self._conn.commit()
+            self._size += len(new_items)
+
+    def _allocate_slots(self, count: int) -> List[int]:
+        """Return `count` free slots, evicting LRU entries if needed (lock held)"""
+        count = min(count, self.capacity)
+        slots = []
+        while len(slots) < count and self._next_slot < self.capacity:
+            slots.append(self._next_slot)
+            self._next_slot += 1
+
+        missing = count - len(slots)
+        if missing:
+            victims = self._conn.execute(
+                "SELECT key, slot FROM entries ORDER BY last_used ASC LIMIT ?", (missing,)
+            ).fetchall()
+            self._conn.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key, _ in victims])
+            slots.extend(slot for _, slot in victims)
+            self._size -= len(victims)
+            self.evictions += len(victims)
+            get_metrics_registry().counter(
+                "embedding_cache_evictions_total", "Embedding cache rows evicted (LRU)"
+            ).inc(len(victims), model=self.model)
+        return slots
+
+    def close(self):
+        with self._lock:
+            self._vectors.flush()
+            self._conn.close()
+
+
+@dataclass
+class CachedEmbedder(Embedder):
+    """
+    Embedder wrapper that serves repeated texts from an EmbeddingCacheStore.
+
+    Cache hits return no usage, since no tokens were spent. Failed embeddings
+    (empty vectors) are never cached.
+    """
+
+    embedder: Optional[Embedder] = None
+    cache_dir: str = EMBEDDING_CACHE_DIR
+    max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES
+
+    def __post_init__(self):
+        if self.embedder is None:
+            raise ValueError("CachedEmbedder needs an embedder to wrap")
+        self.dimensions = self.embedder.dimensions
+        self.enable_batch = self.embedder.enable_batch
+        self.batch_size = self.embedder.batch_size
+        self.model = getattr(self.embedder, "id", None) or type(self.embedder).__name__
+        self.store = EmbeddingCacheStore(self.cache_dir, self.model, self.dimensions, self.max_entries)
+        self.hits = 0
+        self.misses = 0
+
+    def __getattr__(self, name: str) -> Any:
+        # Expose the wrapped embedder's settings (id, request_params, ...)
+        if name == "embedder":
+            raise AttributeError(name)
+        return getattr(self.embedder, name)
+
+    def _record(self, hits: int, misses: int):
+        self.hits += hits
+        self.misses += misses
+        lookups = get_metrics_registry().counter("embedding_cache_lookups_total", "Embedding cache lookups")
+        if hits:
+            lookups.inc(hits, model=self.model, result="hit")
+        if misses:
+            lookups.inc(misses, model=self.model, result="miss")
+        get_metrics_registry().gauge("embedding_cache_entries", "Rows in the embedding cache").set(
+            len(self.store), model=self.model
+        )
+
+    def _lookup(self, text: str) -> Tuple[str, Optional[List[float]]]:
+        key = text_key(text)
+        return key, self.store.get_many([key]).get(key)
+
+    def get_embedding(self, text: str) -> List[float]:
+        return self.get_embedding_and_usage(text)[0]
+
+    def get_embedding_and_usage(self, text: str) -> Tuple[List[float], Optional[Dict]]:
+        key, cached = self._lookup(text)
+        if cached is not None:
+            self._record(1, 0)
+            return cached, None
+        embedding, usage = self.embedder.get_embedding_and_usage(text)
+        if embedding:
+            self.store.put_many([(key, embedding)])
+        self._record(0, 1)
+        return embedding, usage
+
+    async def async_get_embedding(self, text: str) -> List[float]:
+        return (await self.async_get_embedding_and_usage(text))[0]
+
+    async def async_get_embedding_and_usage(self, text: str) -> Tuple[List[float], Optional[Dict]]:
+        key, cached = self._lookup(text)
+        if cached is not None:
+            self._record(1, 0)
+            return cached, None
+        embedding, usage = await self.embedder.async_get_embedding_and_usage(text)
+        if embedding:
+            self.store.put_many([(key, embedding)])
+        self._record(0, 1)
+        return embedding, usage
+
+    def _split_cached(self, texts: List[str]):
+        keys = [text_key(text) for text in texts]
+        cached = self.store.get_many(keys)
+        pending: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in cached:
+                pending.setdefault(key, text)
+        return keys, cached, pending
+
+    def _merge(self, keys, cached, fresh) -> Tuple[List[List[float]], List[Optional[Dict]]]:
+        self.store.put_many([(key, emb) for key, (emb, _) in fresh.items() if emb])
+        all_embeddings, all_usage = [], []
+        for key in keys:
+            if key in cached:
+                all_embeddings.append(cached[key])
+                all_usage.append(None)
+            else:
+                embedding, usage = fresh.get(key, ([], None))
+                all_embeddings.append(embedding)
+                all_usage.append(usage)
+
+        hits = sum(1 for key in keys if key in cached)
+        self._record(hits, len(keys) - hits)
+        return all_embeddings, all_usage
+
+    def get_embeddings_batch_and_usage(self, texts: List[str]) -> Tuple[List[List[float]], List[Optional[Dict]]]:
+        """Embed many texts synchronously, sending only uncached (and de-duplicated) texts to the wrapped embedder"""
+        keys, cached, pending = self._split_cached(texts)
+        fresh: Dict[str, Tuple[List[float], Optional[Dict]]] = {}
+        if pending:
+            if hasattr(self.embedder, "get_embeddings_batch_and_usage"):
+                embeddings, usages = self.embedder.get_embeddings_batch_and_usage(list(pending.values()))
+                fresh = {key: (emb, usage) for key, emb, usage in zip(pending, embeddings, usages)}
+            else:
+                fresh = {key: self.embedder.get_embedding_and_usage(text) for key, text in pending.items()}
+        return self._merge(keys, cached, fresh)
+
+    async def async_get_embeddings_batch_and_usage(
+        self, texts: List[str]
+    ) -> Tuple[List[List[float]], List[Optional[Dict]]]:
+        """Embed many texts, sending only uncached (and de-duplicated) texts to the wrapped embedder"""
+        keys, cached, pending = self._split_cached(texts)
+        fresh: Dict[str, Tuple[List[float], Optional[Dict]]] = {}
+        if pending:
+            if hasattr(self.embedder, "async_get_embeddings_batch_and_usage"):
+                embeddings, usages = await self.embedder.async_get_embeddings_batch_and_usage(list(pending.values()))
+                fresh = {key: (emb, usage) for key, emb, usage in zip(pending, embeddings, usages)}
+            else:
+                for key, text in pending.items():
+                    fresh[key] = await self.embedder.async_get_embedding_and_usage(text)
+        return self._merge(keys, cached, fresh)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        lookups = self.hits + self.misses
+        return {
+            "model": self.model,
+            "dimensions": self.dimensions,
+            "entries": len(self.store),
+            "capacity": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.store.evictions,
+            "path": str(self.store.path),
+        }
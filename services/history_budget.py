@@ -0,0 +1,306 @@
+"""
+History Budget - Token-budgeted conversation history for agent runs
+
+With add_history_to_context, agno adds the last num_history_runs runs to every
+prompt whatever their size, so one pasted article makes every later turn slow
+and expensive. The budget_history pre-hook makes the run's session select
+history by tokens instead: runs are taken newest first until HISTORY_MAX_TOKENS
+is reached (num_history_runs stays the upper bound), older runs are dropped -
+the session summary covers them - and single messages longer than
+HISTORY_MAX_MESSAGE_TOKENS are cut down in the history copy.
+
+Tokens are counted with the tokenizers library (HISTORY_TOKENIZER, a Hugging
+Face hub name or a tokenizer.json path). The tokenizer loads in the background;
+until it is ready the character estimate is used. Counts are cached per run,
+since runs do not change once they are stored.
+
+Usage:
+    from services.history_budget import budget_history, get_history_budget
+
+    agent = Agent(..., add_history_to_context=True, pre_hooks=[budget_history])
+    get_history_budget().get_stats()  # history tokens per agent
+"""
+import functools
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from agno.run.base import RunStatus
+from agno.utils.log import log_debug, log_warning
+
+from config.settings import HISTORY_MAX_MESSAGE_TOKENS, HISTORY_MAX_TOKENS, HISTORY_TOKENIZER
+from services.embedding_pipeline import estimate_tokens
+from services.metrics import get_metrics_registry
+
+# Runs whose token counts are kept in memory
+RUN_CACHE_SIZE = 10_000
+
+
+class TokenCounter:
+    """
+    Token counts from a tokenizers tokenizer, loaded in the background.
+
+    Args:
+        name: Hugging Face hub name or path of a tokenizer.json
+        tokenizer: Ready tokenizers.Tokenizer (skips loading)
+    """
+
+    def __init__(self, name: str = HISTORY_TOKENIZER, tokenizer=None):
+        self.name = name
+        self.tokenizer = tokenizer
+        self._loading = False
+        self._lock = threading.Lock()
+
+    @property
+    def exact(self) -> bool:
+        return self.tokenizer is not None
+
+    def load(self):
+        """Load the tokenizer without blocking the caller (downloads may take a while)"""
+        with self._lock:
+            if self.tokenizer is not None or self._loading:
+                return
+            self._loading = True
+        threading.Thread(target=self._load, name="history-tokenizer", daemon=True).start()
+
+    def _load(self):
+        try:
+            from tokenizers import Tokenizer
+
+            tokenizer = Tokenizer.from_file(self.name) if os.path.isfile(self.name) else Tokenizer.from_pretrained(self.name)
+            self.tokenizer = tokenizer
+            log_debug(f"History tokenizer {self.name} loaded")
+        except Exception as e:
+            log_warning(f"History tokenizer {self.name} unavailable, estimating tokens: {e}")
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self.tokenizer is None:
+            self.load()
+            return estimate_tokens(text)
+        return len(self.tokenizer.encode(text, add_special_tokens=False).ids)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """The first max_tokens tokens of text"""
+        if self.tokenizer is None:
+            return text[: max_tokens * 4]
+        offsets = self.tokenizer.encode(text, add_special_tokens=False).offsets
+        if len(offsets) <= max_tokens:
+            return text
+        return text[: offsets[max_tokens - 1][1]]
+
+
+def _message_text(message) -> str:
+    text = message.get_content_string()
+    if message.tool_calls:
+        text += str(message.tool_calls)
+    return text
+
+
+class HistoryBudget:
+    """
+    Picks the history of a run by tokens, newest runs first.
+
+    Args:
+        max_tokens: Token budget of the history added to a run
+        max_message_tokens: Longest single message kept whole in the history
+        counter: Token counter (defaults to HISTORY_TOKENIZER)
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = HISTORY_MAX_TOKENS,
+        max_message_tokens: int = HISTORY_MAX_MESSAGE_TOKENS,
+        counter: Optional[TokenCounter] = None,
+    ):
+        self.max_tokens = max_tokens
+        self.max_message_tokens = max_message_tokens
+        self.counter = counter or TokenCounter()
+        self._run_tokens: "OrderedDict[Tuple[str, int, bool], List[int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._agents: Dict[str, Dict[str, int]] = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def message_tokens(self, run) -> List[int]:
+        """Token count of each message of a stored run (cached)"""
+        key = (run.run_id, len(run.messages or []), self.counter.exact)
+        with self._lock:
+            counts = self._run_tokens.get(key)
+            if counts is not None:
+                self._run_tokens.move_to_end(key)
+                self.cache_hits += 1
+                return counts
+        counts = [self.counter.count(_message_text(message)) for message in run.messages or []]
+        with self._lock:
+            self.cache_misses += 1
+            self._run_tokens[key] = counts
+            while len(self._run_tokens) > RUN_CACHE_SIZE:
+                self._run_tokens.popitem(last=False)
+        return counts
+
+    def _capped(self, tokens: int) -> int:
+        return min(tokens, self.max_message_tokens) if self.max_message_tokens > 0 else tokens
+
+    def _shorten(self, message, tokens: int):
+        """Copy of an over-long message cut to max_message_tokens"""
+        if self.max_message_tokens <= 0 or tokens <= self.max_message_tokens or not isinstance(message.content, str):
+            return message, False
+        content = self.counter.truncate(message.content, self.max_message_tokens)
+        content += f"\n[... {tokens - self.max_message_tokens} more tokens left out of the history]"
+        return message.model_copy(update={"content": content}), True
+
+    def select(
+        self,
+        session,
+        agent_name: str = "agent",
+        agent_id: Optional[str] = None,
+        team_id: Optional[str] = None,
+        last_n: Optional[int] = None,
+        skip_role: Optional[str] = None,
+        skip_status: Optional[List[RunStatus]] = None,
+        skip_history_messages: bool = True,
+    ) -> List[Any]:
+        """History messages of the session within the token budget (same filters as agno)"""
+        if not session.runs:
+            return []
+        if skip_status is None:
+            skip_status = [RunStatus.paused, RunStatus.cancelled, RunStatus.error]
+
+        runs = session.runs
+        if agent_id:
+            runs = [run for run in runs if getattr(run, "agent_id", None) == agent_id]
+        if team_id:
+            runs = [run for run in runs if getattr(run, "team_id", None) == team_id]
+        runs = [run for run in runs if getattr(run, "status", None) not in skip_status and run.messages]
+        if last_n is not None:
+            runs = runs[-last_n:] if last_n > 0 else []
+
+        def keep(message) -> bool:
+            if skip_history_messages and getattr(message, "from_history", False):
+                return False
+            return not (skip_role and message.role == skip_role)
+
+        # Newest runs first until the budget is spent; older runs are left to the session summary
+        selected, used, available = [], 0, 0
+        budget_left = True
+        for run in reversed(runs):
+            run_tokens = sum(
+                self._capped(tokens) for message, tokens in zip(run.messages, self.message_tokens(run)) if keep(message)
+            )
+            available += run_tokens
+            if budget_left and (self.max_tokens <= 0 or used + run_tokens <= self.max_tokens):
+                selected.append(run)
+                used += run_tokens
+            else:
+                budget_left = False
+        selected.reverse()
+
+        messages, system_message, truncated = [], None, 0
+        for run in selected:
+            for message, tokens in zip(run.messages, self.message_tokens(run)):
+                if not keep(message):
+                    continue
+                if message.role == "system":
+                    # Only add the system message once, like agno
+                    if system_message is None:
+                        system_message = message
+                        messages.append(message)
+                    continue
+                message, shortened = self._shorten(message, tokens)
+                truncated += shortened
+                messages.append(message)
+
+        self._record(agent_name, len(runs), len(selected), available, used, truncated)
+        log_debug(f"History for {agent_name}: {len(selected)}/{len(runs)} runs, {used}/{available} tokens")
+        return messages
+
+    def _record(self, agent_name: str, runs: int, selected: int, available: int, used: int, truncated: int):
+        with self._lock:
+            stats = self._agents.setdefault(agent_name, {
+                "runs": 0, "history_runs_available": 0, "history_runs_used": 0,
+                "history_tokens_available": 0, "history_tokens_used": 0, "messages_truncated": 0,
+            })
+            stats["runs"] += 1
+            stats["history_runs_available"] += runs
+            stats["history_runs_used"] += selected
+            stats["history_tokens_available"] += available
+            stats["history_tokens_used"] += used
+            stats["messages_truncated"] += truncated
+        metrics = get_metrics_registry()
+        metrics.histogram(
+            "history_prompt_tokens", "Tokens of conversation history added to a run",
+            (250, 500, 1000, 2000, 4000, 8000, 16000, 32000),
+        ).observe(used, agent=agent_name)
+        metrics.counter("history_tokens_dropped_total", "History tokens kept out of prompts by the budget").inc(
+            available - used, agent=agent_name
+        )
+        metrics.counter("history_runs_dropped_total", "History runs left out by the budget").inc(
+            runs - selected, agent=agent_name
+        )
+        if truncated:
+            metrics.counter("history_messages_truncated_total", "Over-long history messages cut down").inc(
+                truncated, agent=agent_name
+            )
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            agents = {}
+            for name, stats in self._agents.items():
+                runs = stats["runs"]
+                agents[name] = {
+                    **stats,
+                    "avg_history_tokens": round(stats["history_tokens_used"] / runs, 1) if runs else None,
+                    "avg_history_runs": round(stats["history_runs_used"] / runs, 2) if runs else None,
+                }
+            return {
+                "max_tokens": self.max_tokens,
+                "max_message_tokens": self.max_message_tokens,
+                "tokenizer": self.counter.name,
+                "tokenizer_loaded": self.counter.exact,
+                "runs_cached": len(self._run_tokens),
+                "cache_hits": self.cache_hits,
+                "cache_misses": self.cache_misses,
+                "agents": agents,
+            }
+
+
+def budget_session_history(session, agent_name: str = "agent", budget: Optional[HistoryBudget] = None):
+    """
+    Make the session pick its history by tokens.
+
+    The session's get_messages_from_last_n_runs is wrapped in place; wrapping is idempotent.
+    """
+    if getattr(session, "_history_budget", False):
+        return session
+    original = session.get_messages_from_last_n_runs
+
+    @functools.wraps(original)
+    def budgeted(*args, **kwargs):
+        history_budget = budget if budget is not None else get_history_budget()
+        return history_budget.select(session, agent_name, *args, **kwargs)
+
+    session.get_messages_from_last_n_runs = budgeted
+    session._history_budget = True
+    return session
+
+
+def budget_history(agent=None, session=None) -> None:
+    """Agent pre-hook: fill this run's history up to HISTORY_MAX_TOKENS"""
+    if session is None or HISTORY_MAX_TOKENS <= 0:
+        return
+    budget_session_history(session, getattr(agent, "name", None) or "agent")
+
+
+# Global singleton instance
+_history_budget: Optional[HistoryBudget] = None
+
+
+def get_history_budget() -> HistoryBudget:
+    """Get or create the global history budget"""
+    global _history_budget
+    if _history_budget is None:
+        _history_budget = HistoryBudget()
+    return _history_budget
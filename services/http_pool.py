@@ -0,0 +1,234 @@
+"""
+HTTP Pool - One shared, tuned connection pool for all model provider clients
+
+agno's OpenAIChat (and OpenRouter, which extends it) builds a new OpenAI
+client - and with it a new httpx connection pool - for every model call unless
+it is given an http_client, and each agent, memory manager and workflow holds
+its own model instance. Under concurrency that means a TCP + TLS handshake per
+call and sockets that are never reused.
+
+HTTPClientPool owns one httpx.Client and one httpx.AsyncClient per event loop
+(keep-alive, pool limits, HTTP/2 when the h2 package is installed) and hands
+out provider clients built on them: OpenAI-compatible clients are cached per
+client parameters (api key, base url, ...), Gemini clients per api key. The
+model factory in config/model_factory.py uses it for every model.
+
+An async client lives only as long as its event loop: it is closed while
+asyncio.run shuts the loop down (through the loop's async generator shutdown),
+and aclose() closes the clients of every loop that is still open.
+
+Usage:
+    from services.http_pool import get_http_pool
+
+    client = get_http_pool().openai_client({"api_key": key})
+    await get_http_pool().aclose()  # at shutdown
+"""
+import asyncio
+import importlib.util
+import threading
+import weakref
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+import httpx
+from agno.utils.log import log_debug, log_warning
+
+from config.settings import (
+    HTTP_POOL_HTTP2,
+    HTTP_POOL_KEEPALIVE_EXPIRY,
+    HTTP_POOL_MAX_CONNECTIONS,
+    HTTP_POOL_MAX_KEEPALIVE,
+)
+
+# Same as the OpenAI SDK default; per-request timeouts still override it
+DEFAULT_TIMEOUT = httpx.Timeout(timeout=600.0, connect=5.0)
+
+
+def _params_key(params: Dict[str, Any]) -> Tuple:
+    return tuple(sorted((key, repr(value)) for key, value in params.items()))
+
+
+class HTTPClientPool:
+    """
+    Shared httpx clients and the provider clients built on them.
+
+    Args:
+        max_connections: Open connections per client (all hosts)
+        max_keepalive: Idle connections kept open for reuse
+        keepalive_expiry: Seconds an idle connection is kept
+        http2: Use HTTP/2 where the server supports it (needs the h2 package)
+    """
+
+    def __init__(
+        self,
+        max_connections: int = HTTP_POOL_MAX_CONNECTIONS,
+        max_keepalive: int = HTTP_POOL_MAX_KEEPALIVE,
+        keepalive_expiry: float = HTTP_POOL_KEEPALIVE_EXPIRY,
+        http2: bool = HTTP_POOL_HTTP2,
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.http2 = http2 and importlib.util.find_spec("h2") is not None
+        if http2 and not self.http2:
+            log_warning("HTTP/2 needs the h2 package (pip install 'httpx[http2]'); using HTTP/1.1 keep-alive")
+        self._lock = threading.Lock()
+        self._sync_client: Optional[httpx.Client] = None
+        # Per event loop: its async client, the provider clients built on it and
+        # the generator that closes the client when the loop shuts down
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Tuple[httpx.AsyncClient, Dict, AsyncIterator]]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._provider_clients: Dict[Tuple, Any] = {}
+
+        self.clients_created = 0
+        self.clients_reused = 0
+
+    # ------------------------------------------------------------------
+    # httpx clients
+    # ------------------------------------------------------------------
+
+    @property
+    def sync_client(self) -> httpx.Client:
+        with self._lock:
+            if self._sync_client is None or self._sync_client.is_closed:
+                self._sync_client = httpx.Client(limits=self.limits, http2=self.http2, timeout=DEFAULT_TIMEOUT)
+            return self._sync_client
+
+    def _loop_clients(self) -> Tuple[httpx.AsyncClient, Dict[Tuple, Any]]:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            for other in [other for other in self._async_clients if other.is_closed()]:
+                # Closed without shutting down its async generators; nothing left to await on
+                log_debug("Dropping the HTTP client of a closed event loop")
+                del self._async_clients[other]
+            entry = self._async_clients.get(loop)
+            if entry is None or entry[0].is_closed:
+                client = httpx.AsyncClient(limits=self.limits, http2=self.http2, timeout=DEFAULT_TIMEOUT)
+                entry = (client, {}, self._close_at_loop_shutdown(client))
+                self._async_clients[loop] = entry
+                # Start the closer on this loop so the loop's shutdown_asyncgens finalizes it
+                try:
+                    entry[2].__anext__().send(None)
+                except StopIteration:
+                    pass
+            return entry[0], entry[1]
+
+    @staticmethod
+    async def _close_at_loop_shutdown(client: httpx.AsyncClient) -> AsyncIterator[None]:
+        """Parked until the loop shuts down (or aclose), then closes the loop's client"""
+        try:
+            yield
+        finally:
+            await client.aclose()
+
+    def async_client(self) -> httpx.AsyncClient:
+        """Async client of the running event loop (connections cannot move between loops)"""
+        return self._loop_clients()[0]
+
+    # ------------------------------------------------------------------
+    # Provider clients
+    # ------------------------------------------------------------------
+
+    def _provider_client(self, key: Tuple, build, clients: Optional[Dict[Tuple, Any]] = None):
+        clients = self._provider_clients if clients is None else clients
+        with self._lock:
+            client = clients.get(key)
+            if client is not None:
+                self.clients_reused += 1
+                return client
+        client = build()
+        with self._lock:
+            # Another thread may have built the same client meanwhile; keep the first
+            client = clients.setdefault(key, client)
+            self.clients_created += 1
+        log_debug(f"Created shared {key[0]} client")
+        return client
+
+    def openai_client(self, params: Dict[str, Any]):
+        """OpenAI (or OpenAI-compatible) client for these client params, on the shared pool"""
+        from openai import OpenAI
+
+        return self._provider_client(
+            ("openai",) + _params_key(params), lambda: OpenAI(**params, http_client=self.sync_client)
+        )
+
+    def async_openai_client(self, params: Dict[str, Any]):
+        """Async OpenAI client for these client params, on the running loop's shared pool"""
+        from openai import AsyncOpenAI
+
+        http_client, loop_clients = self._loop_clients()
+        return self._provider_client(
+            ("async_openai",) + _params_key(params),
+            lambda: AsyncOpenAI(**params, http_client=http_client),
+            loop_clients,
+        )
+
+    def gemini_client(self, api_key: Optional[str]):
+        """google-genai client for an api key (it keeps its own connections alive while reused)"""
+        from google import genai
+
+        return self._provider_client(("gemini", api_key), lambda: genai.Client(api_key=api_key))
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def close(self):
+        """Close the sync client and forget every provider client"""
+        with self._lock:
+            sync_client, self._sync_client = self._sync_client, None
+            self._provider_clients.clear()
+        if sync_client is not None:
+            sync_client.close()
+
+    async def aclose(self):
+        """Close the async clients of every open event loop and the sync client"""
+        current = asyncio.get_running_loop()
+        with self._lock:
+            # A loop that is merely stopped keeps its client; its own shutdown closes it
+            entries = [
+                (loop, self._async_clients.pop(loop)) for loop in list(self._async_clients)
+                if loop is current or loop.is_running() or loop.is_closed()
+            ]
+        for loop, (_, _, closer) in entries:
+            try:
+                if loop is current:
+                    await closer.aclose()
+                elif loop.is_running():
+                    # The client's connections belong to the other loop, so close it there
+                    await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(closer.aclose(), loop))
+            except Exception as e:
+                log_warning(f"Could not close an async HTTP client: {e}")
+        self.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            kinds: Dict[str, int] = {}
+            keys = list(self._provider_clients) + [key for _, clients, _ in self._async_clients.values() for key in clients]
+            for key in keys:
+                kinds[key[0]] = kinds.get(key[0], 0) + 1
+            return {
+                "http2": self.http2,
+                "max_connections": self.limits.max_connections,
+                "max_keepalive_connections": self.limits.max_keepalive_connections,
+                "keepalive_expiry": self.limits.keepalive_expiry,
+                "sync_client_open": self._sync_client is not None and not self._sync_client.is_closed,
+                "async_clients": len(self._async_clients),
+                "provider_clients": kinds,
+                "clients_created": self.clients_created,
+                "clients_reused": self.clients_reused,
+            }
+
+
+# Global singleton instance
+_http_pool: Optional[HTTPClientPool] = None
+
+
+def get_http_pool() -> HTTPClientPool:
+    """Get or create the global HTTP client pool"""
+    global _http_pool
+    if _http_pool is None:
+        _http_pool = HTTPClientPool()
+    return _http_pool
@@ -0,0 +1,315 @@
+"""
+Index Manager - ANN and full-text index lifecycle for the knowledge table
+
+agno's LanceDb never builds a vector index, so every search is a brute-force
+scan, and its full-text index is rebuilt from scratch once per process. The
+index manager:
+- builds the full-text index on `payload` once the table has rows (native
+  Lance FTS, which can be updated incrementally)
+- builds the ANN index (IVF_PQ by default) once VECTOR_INDEX_MIN_ROWS is crossed
+- builds a bitmap index on the `namespace` column so per-user prefilters are cheap
+- folds new rows into the indexes after INDEX_UPDATE_MIN_NEW_ROWS arrive,
+  and retrains the ANN index when the table has grown by VECTOR_INDEX_RETRAIN_GROWTH
+- measures probe query latency before and after every index change
+
+Checks run in a background thread after each ingest, so uploads never wait
+for index builds.
+
+Usage:
+    from services.index_manager import LanceIndexManager
+
+    manager = LanceIndexManager(vector_db)
+    manager.schedule_check()
+    print(manager.get_stats())
+"""
+import math
+import statistics
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from agno.utils.log import log_debug
+from agno.vectordb.search import SearchType
+
+from config.settings import (
+    INDEX_UPDATE_MIN_NEW_ROWS,
+    VECTOR_INDEX_MIN_ROWS,
+    VECTOR_INDEX_RETRAIN_GROWTH,
+    VECTOR_INDEX_TYPE,
+)
+from services.metrics import get_metrics_registry
+
+FTS_COLUMN = "payload"
+NAMESPACE_COLUMN = "namespace"
+
+
+def _num_sub_vectors(dimensions: int) -> int:
+    """PQ sub-vectors: aim for 16 dimensions per sub-vector, must divide the dimension"""
+    for per_sub_vector in (16, 8, 4, 2, 1):
+        if dimensions % per_sub_vector == 0:
+            return dimensions // per_sub_vector
+    return 1
+
+
+class LanceIndexManager:
+    """
+    Builds and maintains the indexes of one LanceDb table.
+
+    Args:
+        vector_db: The agno LanceDb (or PulseLanceDb) whose table is managed
+        index_type: LanceDB vector index type (IVF_PQ, IVF_HNSW_SQ, ...)
+        min_rows: Rows required before an ANN index is built
+        update_min_new_rows: Unindexed rows that trigger an incremental index update
+        retrain_growth: Table growth factor (vs. rows at training time) that triggers a retrain
+    """
+
+    def __init__(
+        self,
+        vector_db,
+        index_type: str = VECTOR_INDEX_TYPE,
+        min_rows: int = VECTOR_INDEX_MIN_ROWS,
+        update_min_new_rows: int = INDEX_UPDATE_MIN_NEW_ROWS,
+        retrain_growth: float = VECTOR_INDEX_RETRAIN_GROWTH,
+    ):
+        self.vector_db = vector_db
+        self.index_type = index_type
+        self.min_rows = min_rows
+        self.update_min_new_rows = update_min_new_rows
+        self.retrain_growth = retrain_growth
+
+        self.trained_rows: Optional[int] = None
+        self.history: List[Dict[str, Any]] = []
+        self.last_error: Optional[str] = None
+        self._check_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    # ------------------------------------------------------------------
+    # Table inspection
+    # ------------------------------------------------------------------
+
+    def _open_table(self):
+        """Open the latest version of the table (None if it does not exist yet)"""
+        connection = self.vector_db.connection
+        if connection is None or self.vector_db.table_name not in connection.table_names():
+            return None
+        return connection.open_table(self.vector_db.table_name)
+
+    @property
+    def _vector_column(self) -> str:
+        return getattr(self.vector_db, "_vector_col", "vector")
+
+    @property
+    def _needs_fts(self) -> bool:
+        return self.vector_db.search_type in (SearchType.keyword, SearchType.hybrid)
+
+    def _indexes(self, table) -> Dict[str, Dict[str, Any]]:
+        """Index statistics, keyed by "vector" / "fts" / "namespace" """
+        found: Dict[str, Dict[str, Any]] = {}
+        for index in table.list_indices():
+            if self._vector_column in index.columns and index.index_type != "FTS":
+                kind = "vector"
+            elif FTS_COLUMN in index.columns and index.index_type == "FTS":
+                kind = "fts"
+            elif NAMESPACE_COLUMN in index.columns:
+                kind = "namespace"
+            else:
+                continue
+            stats = table.index_stats(index.name)
+            found[kind] = {
+                "name": index.name,
+                "type": stats.index_type if stats else index.index_type,
+                "indexed_rows": stats.num_indexed_rows if stats else None,
+                "unindexed_rows": stats.num_unindexed_rows if stats else None,
+            }
+        return found
+
+    def sync_state(self):
+        """Pick up indexes built by an earlier process"""
+        try:
+            table = self._open_table()
+            if table is None:
+                return
+            indexes = self._indexes(table)
+        except Exception as e:
+            log_debug(f"Index state lookup failed: {e}")
+            return
+        if "fts" in indexes:
+            # Stop agno from rebuilding the full-text index on the first search
+            self.vector_db.fts_index_exists = True
+        if "vector" in indexes and self.trained_rows is None:
+            self.trained_rows = indexes["vector"]["indexed_rows"]
+
+    def get_coverage(self) -> Dict[str, Any]:
+        """Row count and the share of rows covered by each index"""
+        table = self._open_table()
+        if table is None:
+            return {"rows": 0, "indexes": {}}
+        rows = table.count_rows()
+        indexes = self._indexes(table)
+        for info in indexes.values():
+            indexed = info["indexed_rows"] or 0
+            info["coverage"] = round(indexed / rows, 4) if rows else None
+        return {"rows": rows, "indexes": indexes}
+
+    # ------------------------------------------------------------------
+    # Latency probe
+    # ------------------------------------------------------------------
+
+    def _probe_latency_ms(self, table, samples: int = 5) -> Optional[float]:
+        """Median latency of a top-10 vector search using a stored vector as the query"""
+        try:
+            sample = table.search().select([self._vector_column]).limit(1).to_arrow()
+            if sample.num_rows == 0:
+                return None
+            query = sample.column(self._vector_column)[0].as_py()
+            timings = []
+            for _ in range(samples):
+                started = time.perf_counter()
+                search = table.search(query, vector_column_name=self._vector_column).limit(10)
+                if self.vector_db.nprobes:
+                    search = search.nprobes(self.vector_db.nprobes)
+                search.to_arrow()
+                timings.append((time.perf_counter() - started) * 1000)
+            return round(statistics.median(timings), 2)
+        except Exception as e:
+            log_debug(f"Latency probe failed: {e}")
+            return None
+
+    # ------------------------------------------------------------------
+    # Index builds
+    # ------------------------------------------------------------------
+
+    def _build_vector_index(self, table, rows: int):
+        params: Dict[str, Any] = {
+            "metric": self.vector_db.distance.value,
+            "vector_column_name": self._vector_column,
+            "index_type": self.index_type,
+            "num_partitions": max(1, int(math.sqrt(rows))),
+            "replace": True,
+        }
+        if "PQ" in self.index_type:
+            dimensions = self.vector_db.dimensions or len(
+                table.search().select([self._vector_column]).limit(1).to_arrow().column(self._vector_column)[0]
+            )
+            params["num_sub_vectors"] = _num_sub_vectors(dimensions)
+        table.create_index(**params)
+        self.trained_rows = rows
+
+    def _plan(self, table, rows: int, indexes: Dict[str, Dict[str, Any]]) -> List[str]:
+        actions = []
+        if self._needs_fts and rows > 0 and "fts" not in indexes:
+            actions.append("build_fts")
+        if rows > 0 and "namespace" not in indexes and NAMESPACE_COLUMN in table.schema.names:
+            actions.append("build_namespace")
+
+        vector = indexes.get("vector")
+        if vector is None:
+            if rows >= self.min_rows:
+                actions.append("build_vector")
+        elif self.trained_rows and rows >= self.trained_rows * self.retrain_growth:
+            actions.append("retrain_vector")
+
+        unindexed = max((info["unindexed_rows"] or 0 for info in indexes.values()), default=0)
+        if indexes and unindexed >= self.update_min_new_rows and "retrain_vector" not in actions:
+            actions.append("update")
+        return actions
+
+    def check(self) -> Optional[Dict[str, Any]]:
+        """
+        Build, retrain or update indexes if a threshold has been crossed.
+
+        Returns:
+            dict: Record of what was done (with latency before/after), or None if nothing was needed
+        """
+        if not self._check_lock.acquire(blocking=False):
+            return None
+        try:
+            table = self._open_table()
+            if table is None:
+                return None
+            rows = table.count_rows()
+            indexes = self._indexes(table)
+            actions = self._plan(table, rows, indexes)
+            if not actions:
+                return None
+            return self._apply(table, rows, actions)
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"❌ Index maintenance failed for {self.vector_db.table_name}: {str(e)}")
+            return None
+        finally:
+            self._check_lock.release()
+
+    def _apply(self, table, rows: int, actions: List[str]) -> Dict[str, Any]:
+        metrics = get_metrics_registry()
+        before_ms = self._probe_latency_ms(table)
+        started = time.perf_counter()
+
+        for action in actions:
+            action_started = time.perf_counter()
+            if action == "build_fts":
+                table.create_fts_index(FTS_COLUMN, use_tantivy=False, replace=True)
+                self.vector_db.fts_index_exists = True
+            elif action == "build_namespace":
+                table.create_scalar_index(NAMESPACE_COLUMN, index_type="BITMAP", replace=True)
+            elif action in ("build_vector", "retrain_vector"):
+                self._build_vector_index(table, rows)
+            elif action == "update":
+                # Adds new rows to the existing indexes without retraining
+                table.to_lance().optimize.optimize_indices()
+            metrics.counter("knowledge_index_builds_total", "Index builds and updates").inc(action=action)
+            metrics.histogram(
+                "knowledge_index_build_seconds", "Time to build or update an index",
+                (0.1, 0.5, 1.0, 5.0, 15.0, 60.0, 300.0),
+            ).observe(time.perf_counter() - action_started, action=action)
+
+        table = self._open_table()
+        after_ms = self._probe_latency_ms(table)
+        record = {
+            "at": datetime.now().isoformat(),
+            "rows": rows,
+            "actions": actions,
+            "seconds": round(time.perf_counter() - started, 3),
+            "probe_latency_ms_before": before_ms,
+            "probe_latency_ms_after": after_ms,
+        }
+        self.history = (self.history + [record])[-20:]
+        self.last_error = None
+        if after_ms is not None:
+            metrics.gauge("knowledge_search_probe_ms", "Probe vector search latency after the last index change").set(
+                after_ms, table=self.vector_db.table_name
+            )
+        print(
+            f"🗂️  Indexed {self.vector_db.table_name}: {', '.join(actions)} on {rows} rows "
+            f"in {record['seconds']}s (probe {before_ms} ms → {after_ms} ms)"
+        )
+        return record
+
+    def schedule_check(self):
+        """Run check() in a background thread unless one is already running"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self.check, name="lance-index-manager", daemon=True)
+        self._thread.start()
+
+    def wait(self, timeout: Optional[float] = None):
+        """Wait for a scheduled check to finish"""
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get index statistics"""
+        try:
+            coverage = self.get_coverage()
+        except Exception as e:
+            coverage = {"error": str(e)}
+        return {
+            "index_type": self.index_type,
+            "min_rows": self.min_rows,
+            "update_min_new_rows": self.update_min_new_rows,
+            "trained_rows": self.trained_rows,
+            "coverage": coverage,
+            "history": self.history,
+            "last_error": self.last_error,
+        }
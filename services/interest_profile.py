@@ -0,0 +1,493 @@
+"""
+Interest Profile - Cached, structured summary of what each user cares about
+
+Without a profile every digest run re-reads the user's raw memories and asks
+the model to work out their interests again. The profile store materializes
+that interpretation once per user in SQLite: weighted topics, preferred
+formats, exclusions and a one-line summary. It is rebuilt (one cheap model
+call, or from the memories' topic tags if the model is unavailable) only
+after that user's memories changed, which a fingerprint of the memories
+confirms before any model call.
+
+Changes are noticed on write: watch_memory_writes wraps the memory methods
+of an agno database instance, so every upsert or delete marks the owner's
+profile stale. Reads of a fresh profile are dictionary lookups.
+
+Agent runs never wait for a rebuild: with_interest_profile reads through
+peek, which serves the last stored profile and rebuilds a stale one on a
+background thread, so the next run picks the new profile up.
+
+Agents get the profile in their instructions through the load_interest_profile
+pre-hook and with_interest_profile.
+
+Usage:
+    from services.interest_profile import get_interest_profiles, load_interest_profile, with_interest_profile
+
+    profiles = get_interest_profiles(db)
+    profiles.get("alice@example.com").topics
+
+    agent = Agent(..., instructions=with_interest_profile(INSTRUCTIONS), pre_hooks=[load_interest_profile])
+"""
+import functools
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from agno.db.schemas import UserMemory
+from agno.models.message import Message
+from pydantic import BaseModel, Field
+
+from config.model_factory import create_openai_model
+from config.settings import INTEREST_PROFILE_DB_FILE, INTEREST_PROFILE_ENABLED, INTEREST_PROFILE_MODEL_ID
+from services.memory_index import memory_updated_at
+from services.metrics import get_metrics_registry
+
+PROFILE_INSTRUCTIONS = """You turn a user's stored memories into a compact interest profile for a personalized newsletter.
+- topics: the subjects the user follows, with a weight from 0 to 1 (1 = core interest); recent memories count more
+- formats: how they like content delivered (e.g. short summaries, deep dives, code examples, papers)
+- exclusions: topics or sources they explicitly do not want
+- summary: one sentence describing the reader
+Only use what the memories support."""
+
+_current_user: ContextVar[Optional[str]] = ContextVar("interest_profile_user", default=None)
+
+
+class _TopicWeight(BaseModel):
+    topic: str
+    weight: float = Field(ge=0, le=1)
+
+
+class _ProfileSchema(BaseModel):
+    topics: List[_TopicWeight] = Field(default_factory=list)
+    formats: List[str] = Field(default_factory=list)
+    exclusions: List[str] = Field(default_factory=list)
+    summary: str = ""
+
+
+@dataclass
+class InterestProfile:
+    """What one user cares about, derived from their memories"""
+    user_id: str
+    topics: Dict[str, float] = field(default_factory=dict)
+    formats: List[str] = field(default_factory=list)
+    exclusions: List[str] = field(default_factory=list)
+    summary: str = ""
+    memory_count: int = 0
+    fingerprint: str = ""
+    source: str = "empty"  # model, topics or empty
+    built_at: str = field(default_factory=lambda: datetime.now().isoformat())
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    def to_prompt(self) -> str:
+        """Compact block for an agent's instructions"""
+        lines = ["Reader interest profile (from the user's memories, strongest first):"]
+        if self.summary:
+            lines.append(f"- Summary: {self.summary}")
+        if self.topics:
+            lines.append("- Topics: " + ", ".join(f"{topic} ({weight:.1f})" for topic, weight in self.topics.items()))
+        if self.formats:
+            lines.append("- Preferred formats: " + ", ".join(self.formats))
+        if self.exclusions:
+            lines.append("- Avoid: " + ", ".join(self.exclusions))
+        return "\n".join(lines)
+
+
+def memories_fingerprint(memories: List[UserMemory]) -> str:
+    """Changes whenever a memory is added, reworded or removed"""
+    digest = hashlib.sha1()
+    for memory in sorted(memories, key=lambda m: m.memory_id or ""):
+        digest.update(f"{memory.memory_id}:{memory.memory}\n".encode("utf-8", "replace"))
+    return digest.hexdigest()
+
+
+class InterestProfileStore:
+    """
+    Per-user interest profiles, cached in process and persisted in SQLite.
+
+    Args:
+        db: agno database holding the memories table
+        model: Model that writes profiles (default: INTEREST_PROFILE_MODEL_ID)
+        db_file: SQLite file for the profiles
+        max_memories: Most recent memories given to the model
+        max_topics: Topics kept per profile
+    """
+
+    def __init__(
+        self,
+        db,
+        model=None,
+        db_file: str = INTEREST_PROFILE_DB_FILE,
+        max_memories: int = 200,
+        max_topics: int = 15,
+    ):
+        self.db = db
+        self.model = model
+        self.db_file = db_file
+        self.max_memories = max_memories
+        self.max_topics = max_topics
+
+        self._profiles: Dict[str, InterestProfile] = {}
+        self._stale: set = set()
+        self._lock = threading.Lock()
+        self._build_locks: Dict[str, threading.Lock] = {}
+        self._rebuilds: Dict[str, threading.Thread] = {}
+        self._generation = 0
+
+        self.hits = 0
+        self.builds = 0
+        self.invalidations = 0
+        self.lookup_seconds = 0.0
+
+        self._init_db()
+
+    # ------------------------------------------------------------------
+    # Storage
+    # ------------------------------------------------------------------
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_file)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _init_db(self):
+        Path(self.db_file).parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS interest_profiles (
+                    user_id TEXT PRIMARY KEY,
+                    profile TEXT NOT NULL,
+                    fingerprint TEXT NOT NULL,
+                    built_at REAL NOT NULL
+                )
+            """)
+
+    def _load(self, user_id: str) -> Optional[InterestProfile]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT profile FROM interest_profiles WHERE user_id = ?", (user_id,)).fetchone()
+        if row is None:
+            return None
+        return InterestProfile(**json.loads(row["profile"]))
+
+    def _save(self, profile: InterestProfile):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO interest_profiles VALUES (?, ?, ?, ?)",
+                (profile.user_id, json.dumps(profile.to_dict(), ensure_ascii=False), profile.fingerprint, time.time()),
+            )
+
+    # ------------------------------------------------------------------
+    # Reads & invalidation
+    # ------------------------------------------------------------------
+
+    def get(self, user_id: str) -> InterestProfile:
+        """The user's profile, rebuilt first if their memories changed"""
+        started = time.perf_counter()
+        with self._lock:
+            profile = self._profiles.get(user_id)
+            fresh = profile is not None and user_id not in self._stale
+        if fresh:
+            with self._lock:
+                self.hits += 1
+                self.lookup_seconds += time.perf_counter() - started
+            return profile
+
+        with self._build_lock(user_id):
+            with self._lock:
+                profile = self._profiles.get(user_id)
+                if profile is not None and user_id not in self._stale:
+                    return profile
+            return self._refresh(user_id)
+
+    def peek(self, user_id: str) -> Optional[InterestProfile]:
+        """
+        The user's last stored profile, without waiting for a rebuild.
+
+        A stale or missing profile is rebuilt on a background thread; until it
+        is ready the previous profile (or None) is returned.
+        """
+        started = time.perf_counter()
+        with self._lock:
+            profile = self._profiles.get(user_id)
+            fresh = profile is not None and user_id not in self._stale
+            if fresh:
+                self.hits += 1
+                self.lookup_seconds += time.perf_counter() - started
+                return profile
+
+        if profile is None:
+            profile = self._load(user_id)
+            if profile is not None:
+                with self._lock:
+                    self._profiles.setdefault(user_id, profile)
+                    self._stale.add(user_id)
+        self.refresh_in_background(user_id)
+        return profile
+
+    def refresh_in_background(self, user_id: str):
+        """Rebuild the user's profile on a daemon thread (once at a time per user)"""
+        with self._lock:
+            running = self._rebuilds.get(user_id)
+            if running is not None and running.is_alive():
+                return
+            thread = threading.Thread(
+                target=self._background_refresh, args=(user_id,), name=f"interest-profile-{user_id}", daemon=True
+            )
+            self._rebuilds[user_id] = thread
+        thread.start()
+
+    def _background_refresh(self, user_id: str):
+        try:
+            self.get(user_id)
+        except Exception as e:
+            print(f"⚠️  Interest profile rebuild failed for {user_id}: {str(e)}")
+        finally:
+            with self._lock:
+                if self._rebuilds.get(user_id) is threading.current_thread():
+                    del self._rebuilds[user_id]
+
+    def _build_lock(self, user_id: str) -> threading.Lock:
+        with self._lock:
+            return self._build_locks.setdefault(user_id, threading.Lock())
+
+    def _refresh(self, user_id: str) -> InterestProfile:
+        with self._lock:
+            generation = self._generation
+        memories = self.db.get_user_memories(user_id=user_id) or []
+        fingerprint = memories_fingerprint(memories)
+        with self._lock:
+            stored = self._profiles.get(user_id)
+        if stored is None:
+            stored = self._load(user_id)
+        # Only rebuild if the memories really changed; this also catches writes
+        # made while this process was not running
+        if stored is not None and stored.fingerprint == fingerprint:
+            profile = stored
+        else:
+            profile = self.build(user_id, memories, fingerprint)
+            self._save(profile)
+        with self._lock:
+            self._profiles[user_id] = profile
+            # A write that landed during the build keeps the profile stale
+            if self._generation == generation:
+                self._stale.discard(user_id)
+        return profile
+
+    def invalidate(self, user_id: Optional[str] = None):
+        """Mark a user's profile (or every profile) for rebuild on next read"""
+        with self._lock:
+            self.invalidations += 1
+            self._generation += 1
+            if user_id is None:
+                self._stale.update(self._profiles)
+            else:
+                self._stale.add(user_id)
+        get_metrics_registry().counter("interest_profile_invalidations_total", "Interest profiles marked stale").inc()
+
+    # ------------------------------------------------------------------
+    # Building
+    # ------------------------------------------------------------------
+
+    def _model(self):
+        if self.model is None:
+            self.model = create_openai_model(INTEREST_PROFILE_MODEL_ID)
+        return self.model
+
+    def build_with_model(self, memories: List[UserMemory]) -> _ProfileSchema:
+        """One model call: the structured profile of the given memories (oldest first)"""
+        listing = "\n".join(
+            f"- {memory.memory}" + (f" [topics: {', '.join(memory.topics)}]" if memory.topics else "")
+            for memory in memories
+        )
+        response = self._model().response(
+            messages=[
+                Message(role="system", content=PROFILE_INSTRUCTIONS),
+                Message(role="user", content=f"Memories (oldest first):\n{listing}"),
+            ],
+            response_format=_ProfileSchema,
+        )
+        if isinstance(response.parsed, _ProfileSchema):
+            return response.parsed
+        return _ProfileSchema.model_validate_json(response.content or "{}")
+
+    def build_from_topics(self, memories: List[UserMemory]) -> _ProfileSchema:
+        """Profile from the memories' topic tags, weighted by frequency and recency"""
+        scores: Counter = Counter()
+        for rank, memory in enumerate(memories):
+            recency = 0.5 + 0.5 * (rank + 1) / len(memories)
+            for topic in memory.topics or []:
+                scores[topic.strip().lower()] += recency
+        top = max(scores.values(), default=0)
+        return _ProfileSchema(
+            topics=[_TopicWeight(topic=topic, weight=round(score / top, 2)) for topic, score in scores.most_common()]
+        )
+
+    def build(self, user_id: str, memories: List[UserMemory], fingerprint: str) -> InterestProfile:
+        """Build a profile from memories (no caching)"""
+        started = time.perf_counter()
+        recent = sorted(memories, key=memory_updated_at)[-self.max_memories:]
+        source = "empty"
+        schema = _ProfileSchema()
+        if recent:
+            try:
+                schema, source = self.build_with_model(recent), "model"
+            except Exception as e:
+                print(f"⚠️  Interest profile model call failed for {user_id}, using memory topics: {str(e)}")
+                schema, source = self.build_from_topics(recent), "topics"
+
+        topics = sorted(schema.topics, key=lambda t: -t.weight)[:self.max_topics]
+        profile = InterestProfile(
+            user_id=user_id,
+            topics={t.topic: round(t.weight, 2) for t in topics},
+            formats=schema.formats,
+            exclusions=schema.exclusions,
+            summary=schema.summary,
+            memory_count=len(memories),
+            fingerprint=fingerprint,
+            source=source,
+        )
+        seconds = time.perf_counter() - started
+        with self._lock:
+            self.builds += 1
+        metrics = get_metrics_registry()
+        metrics.counter("interest_profile_builds_total", "Interest profiles built").inc(source=source)
+        metrics.histogram(
+            "interest_profile_build_seconds", "Time to build one interest profile",
+            (0.01, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+        ).observe(seconds)
+        print(f"🎯 Built interest profile for {user_id} from {len(memories)} memories ({source}, {seconds:.2f}s)")
+        return profile
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "profiles_cached": len(self._profiles),
+                "stale": len(self._stale),
+                "rebuilding": len(self._rebuilds),
+                "hits": self.hits,
+                "builds": self.builds,
+                "invalidations": self.invalidations,
+                "avg_hit_microseconds": round(self.lookup_seconds / self.hits * 1e6, 2) if self.hits else None,
+            }
+
+
+# ------------------------------------------------------------------
+# Write-triggered invalidation
+# ------------------------------------------------------------------
+
+def watch_memory_writes(db, store: InterestProfileStore):
+    """
+    Invalidate profiles whenever memories are written through this database instance.
+
+    The instance's memory write methods are wrapped in place; wrapping is idempotent.
+    """
+    if getattr(db, "_interest_profile_watch", False):
+        return db
+
+    def owner_of(memory_id: str) -> Optional[str]:
+        try:
+            memory = db.get_user_memory(memory_id)
+        except Exception:
+            return None
+        return getattr(memory, "user_id", None) if memory is not None else None
+
+    def wrap(name: str, users_of: Callable[..., Optional[List[Optional[str]]]], before: bool = False):
+        method = getattr(db, name, None)
+        if method is None:
+            return
+
+        @functools.wraps(method)
+        def watched(*args, **kwargs):
+            # Deletes have to look the owner up before the row is gone
+            users = users_of(*args, **kwargs) if before else None
+            result = method(*args, **kwargs)
+            if not before:
+                users = users_of(*args, **kwargs)
+            if users is None:
+                store.invalidate()
+            else:
+                for user_id in set(users):
+                    store.invalidate(user_id or "default")
+            return result
+
+        setattr(db, name, watched)
+
+    def memory_arg(memory=None, *args, **kwargs):
+        return [memory.user_id] if memory is not None else []
+
+    def memories_arg(memories=None, *args, **kwargs):
+        return [memory.user_id for memory in memories or []]
+
+    def memory_id_arg(memory_id=None, *args, **kwargs):
+        user_id = owner_of(memory_id)
+        return [user_id] if user_id else None
+
+    def memory_ids_arg(memory_ids=None, *args, **kwargs):
+        users = [owner_of(memory_id) for memory_id in memory_ids or []]
+        return None if None in users else users
+
+    wrap("upsert_user_memory", memory_arg)
+    wrap("upsert_memories", memories_arg)
+    wrap("delete_user_memory", memory_id_arg, before=True)
+    wrap("delete_user_memories", memory_ids_arg, before=True)
+    wrap("clear_memories", lambda *args, **kwargs: None)
+    db._interest_profile_watch = True
+    return db
+
+
+# ------------------------------------------------------------------
+# Agent integration
+# ------------------------------------------------------------------
+
+def load_interest_profile(user_id: Optional[str] = None) -> None:
+    """Agent pre-hook: use this run's user for with_interest_profile"""
+    _current_user.set(user_id)
+
+
+def with_interest_profile(instructions: str) -> Callable[[], str]:
+    """
+    Agent instructions followed by the run user's interest profile (when one is loaded)
+
+    agno calls instructions synchronously, also on the event loop under arun, so
+    this only peeks: a stale profile is rebuilt in the background for later runs.
+    """
+
+    def instructions_with_profile() -> str:
+        user_id = _current_user.get()
+        if not INTEREST_PROFILE_ENABLED or _interest_profiles is None or not user_id:
+            return instructions
+        try:
+            profile = _interest_profiles.peek(user_id)
+        except Exception as e:
+            print(f"⚠️  Interest profile unavailable for {user_id}: {str(e)}")
+            return instructions
+        if profile is None or not (profile.topics or profile.summary):
+            return instructions
+        return f"{instructions}\n\n{profile.to_prompt()}"
+
+    return instructions_with_profile
+
+
+# Global singleton instance
+_interest_profiles: Optional[InterestProfileStore] = None
+
+
+def get_interest_profiles(db=None) -> InterestProfileStore:
+    """Get or create the global profile store; writes through db invalidate its profiles"""
+    global _interest_profiles
+    if _interest_profiles is None:
+        if db is None:
+            raise ValueError("A database is required to create the interest profile store")
+        _interest_profiles = InterestProfileStore(db)
+    if db is not None:
+        watch_memory_writes(db, _interest_profiles)
+    return _interest_profiles
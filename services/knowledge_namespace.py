@@ -0,0 +1,56 @@
+"""
+Knowledge Namespace - Which user's knowledge the current run may search
+
+Rows in the knowledge table belong to a namespace: the owner's id (taken from
+the KNOWLEDGE_NAMESPACE_KEY metadata field at upload) or the shared namespace.
+Searches are limited to the namespace of the current run plus the shared one.
+
+agno does not pass the user id down to knowledge search, so the namespace is
+kept in a context variable that the scope_knowledge_to_user pre-hook sets at
+the start of every agent run.
+
+Usage:
+    from services.knowledge_namespace import knowledge_namespace, scope_knowledge_to_user
+
+    agent = Agent(..., knowledge=get_knowledge(), pre_hooks=[scope_knowledge_to_user])
+
+    with knowledge_namespace("alice@example.com"):
+        knowledge.search("my notes")
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+from config.settings import KNOWLEDGE_NAMESPACE_KEY, KNOWLEDGE_SHARED_NAMESPACE
+
+_current_namespace: ContextVar[Optional[str]] = ContextVar("knowledge_namespace", default=None)
+
+
+def namespace_of(meta_data: Optional[Dict[str, Any]]) -> str:
+    """Namespace of a document, from its metadata"""
+    owner = (meta_data or {}).get(KNOWLEDGE_NAMESPACE_KEY)
+    return str(owner) if owner not in (None, "") else KNOWLEDGE_SHARED_NAMESPACE
+
+
+def get_knowledge_namespace() -> Optional[str]:
+    """Namespace of the current run (None outside of a user's run)"""
+    return _current_namespace.get()
+
+
+def set_knowledge_namespace(namespace: Optional[str]):
+    _current_namespace.set(str(namespace) if namespace not in (None, "") else None)
+
+
+@contextmanager
+def knowledge_namespace(namespace: Optional[str]):
+    """Search as the given user inside the block"""
+    token = _current_namespace.set(str(namespace) if namespace not in (None, "") else None)
+    try:
+        yield
+    finally:
+        _current_namespace.reset(token)
+
+
+def scope_knowledge_to_user(user_id: Optional[str] = None) -> None:
+    """Agent pre-hook: limit knowledge searches of this run to the run's user"""
+    set_knowledge_namespace(user_id)
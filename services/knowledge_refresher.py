@@ -0,0 +1,471 @@
+"""
+Knowledge Refresher - Incremental re-crawl of URL-sourced knowledge
+
+URL content is a snapshot taken at import time. The refresher revisits each
+stored URL on its own schedule, re-chunks the page and diffs the chunks
+against what is already in LanceDB. Only new or changed chunks are embedded
+and inserted; chunks that disappeared from the page are deleted.
+
+Chunk identity follows the knowledge table's row ids (chunk_row_id of the
+content in the source's namespace), so an unchanged chunk is recognised
+without embedding it again. Each source keeps the metadata it was added with,
+so a user's URL is refreshed into that user's namespace.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field, asdict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from apscheduler.schedulers.background import BackgroundScheduler
+from agno.knowledge import Knowledge
+from agno.knowledge.document.base import Document
+from agno.utils.string import generate_id
+
+from config.settings import (
+    KNOWLEDGE_REFRESH_DB_FILE,
+    KNOWLEDGE_REFRESH_INTERVAL_SECONDS,
+    KNOWLEDGE_REFRESH_TICK_SECONDS,
+)
+from readers import JinaWebReader
+from services.knowledge_namespace import namespace_of
+from services.lance_store import chunk_row_id
+
+
+@dataclass
+class SourceRefreshReport:
+    """Result of refreshing a single URL source"""
+    url: str
+    bytes_fetched: int = 0
+    chunks_total: int = 0
+    chunks_reembedded: int = 0
+    chunks_removed: int = 0
+    chunks_unchanged: int = 0
+    error: Optional[str] = None
+
+
+@dataclass
+class RefreshCycleReport:
+    """Aggregated result of one refresh cycle"""
+    started_at: str
+    duration_seconds: float = 0.0
+    sources_checked: int = 0
+    bytes_fetched: int = 0
+    chunks_reembedded: int = 0
+    chunks_removed: int = 0
+    chunks_unchanged: int = 0
+    sources: List[SourceRefreshReport] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to dictionary for JSON serialization"""
+        return asdict(self)
+
+
+class KnowledgeRefresher:
+    """
+    Periodically re-crawls URL sources and upserts only the changed chunks
+
+    Features:
+    - Per-source refresh interval, persisted in SQLite
+    - Chunk-level diff against the ids already stored in LanceDB
+    - Reports bytes fetched and chunks re-embedded per cycle
+    """
+
+    def __init__(
+        self,
+        knowledge: Knowledge,
+        db_file: str = KNOWLEDGE_REFRESH_DB_FILE,
+        default_interval_seconds: int = KNOWLEDGE_REFRESH_INTERVAL_SECONDS,
+        tick_seconds: int = KNOWLEDGE_REFRESH_TICK_SECONDS,
+        max_reports: int = 20,
+    ):
+        """
+        Initialize the refresher
+
+        Args:
+            knowledge: Knowledge instance whose vector db holds the URL chunks
+            db_file: SQLite file used to persist sources and chunk ids
+            default_interval_seconds: Refresh interval for sources without their own
+            tick_seconds: How often the scheduler checks for due sources
+            max_reports: Number of cycle reports kept in memory
+        """
+        self.knowledge = knowledge
+        self.db_file = db_file
+        self.default_interval_seconds = default_interval_seconds
+        self.tick_seconds = tick_seconds
+        self.max_reports = max_reports
+
+        self.reports: List[RefreshCycleReport] = []
+        self._lock = threading.Lock()
+        self._scheduler: Optional[BackgroundScheduler] = None
+
+        self._init_db()
+
+    # ------------------------------------------------------------------
+    # Storage
+    # ------------------------------------------------------------------
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_file)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _init_db(self):
+        Path(self.db_file).parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS refresh_sources (
+                    url TEXT PRIMARY KEY,
+                    name TEXT,
+                    content_id TEXT,
+                    interval_seconds INTEGER NOT NULL,
+                    last_refreshed_at REAL,
+                    next_due_at REAL NOT NULL,
+                    metadata TEXT,
+                    namespace TEXT
+                )
+            """)
+            # Sources tracked before metadata was stored
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(refresh_sources)")}
+            for column in ("metadata", "namespace"):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE refresh_sources ADD COLUMN {column} TEXT")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS refresh_chunks (
+                    url TEXT NOT NULL,
+                    chunk_id TEXT NOT NULL,
+                    PRIMARY KEY (url, chunk_id)
+                )
+            """)
+
+    # ------------------------------------------------------------------
+    # Sources
+    # ------------------------------------------------------------------
+
+    def add_source(
+        self,
+        url: str,
+        interval_seconds: Optional[int] = None,
+        name: Optional[str] = None,
+        content_id: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+    ):
+        """
+        Register a URL for periodic refresh
+
+        The chunk ids already stored for this URL are read from LanceDB once,
+        so the first refresh only re-embeds what actually changed.
+
+        Args:
+            url: URL to re-crawl
+            interval_seconds: Refresh interval (defaults to the refresher default)
+            name: Document name to use (defaults to the URL)
+            content_id: Knowledge content id the chunks belong to
+            metadata: Metadata the URL was added with; its owner sets the namespace
+        """
+        interval = interval_seconds or self.default_interval_seconds
+        content_id = content_id or generate_id(self._content_hash(url))
+
+        with self._connect() as conn:
+            exists = conn.execute("SELECT 1 FROM refresh_sources WHERE url = ?", (url,)).fetchone()
+            conn.execute(
+                """
+                INSERT INTO refresh_sources (url, name, content_id, interval_seconds, next_due_at, metadata, namespace)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(url) DO UPDATE SET
+                    name = excluded.name,
+                    content_id = excluded.content_id,
+                    interval_seconds = excluded.interval_seconds,
+                    metadata = excluded.metadata,
+                    namespace = excluded.namespace
+                """,
+                (
+                    url, name or url, content_id, interval, time.time() + interval,
+                    json.dumps(metadata) if metadata else None, namespace_of(metadata),
+                ),
+            )
+            if not exists:
+                known_ids = self._stored_chunk_ids(url)
+                conn.executemany(
+                    "INSERT OR IGNORE INTO refresh_chunks (url, chunk_id) VALUES (?, ?)",
+                    [(url, cid) for cid in known_ids],
+                )
+
+        print(f"📌 Tracking {url} for refresh every {interval}s")
+
+    def remove_source(self, url: str):
+        """Stop refreshing a URL (its chunks stay in the knowledge base)"""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM refresh_sources WHERE url = ?", (url,))
+            conn.execute("DELETE FROM refresh_chunks WHERE url = ?", (url,))
+
+    def list_sources(self) -> List[Dict[str, Any]]:
+        """List all tracked sources"""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT * FROM refresh_sources ORDER BY next_due_at").fetchall()
+        return [dict(row) for row in rows]
+
+    def discover_sources(self) -> int:
+        """
+        Track every URL that was added through the Knowledge API
+
+        Returns:
+            int: Number of newly tracked sources
+        """
+        if self.knowledge.contents_db is None:
+            return 0
+
+        tracked = {source["url"]: source for source in self.list_sources()}
+        contents, _ = self.knowledge.get_content()
+        added = 0
+        for content in contents:
+            url = content.name
+            if content.file_type != "url" or not url or not url.startswith(("http://", "https://")):
+                continue
+            if url in tracked:
+                if content.metadata and tracked[url]["metadata"] is None:
+                    self._set_metadata(url, content.metadata)
+                continue
+            self.add_source(url, content_id=content.id, metadata=content.metadata)
+            added += 1
+        return added
+
+    def _set_metadata(self, url: str, metadata: Dict[str, Any]):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE refresh_sources SET metadata = ?, namespace = ? WHERE url = ?",
+                (json.dumps(metadata), namespace_of(metadata), url),
+            )
+
+    # ------------------------------------------------------------------
+    # Refresh
+    # ------------------------------------------------------------------
+
+    def run_cycle(self, force: bool = False) -> RefreshCycleReport:
+        """
+        Refresh every source that is due
+
+        Args:
+            force: Refresh all sources regardless of their schedule
+
+        Returns:
+            RefreshCycleReport: What was fetched and re-embedded
+        """
+        # Only one cycle at a time; a slow cycle must not overlap the next tick
+        if not self._lock.acquire(blocking=False):
+            print("⏳ Knowledge refresh already running, skipping this tick")
+            return RefreshCycleReport(started_at=datetime.now().isoformat())
+
+        try:
+            report = RefreshCycleReport(started_at=datetime.now().isoformat())
+            start = time.perf_counter()
+
+            now = time.time()
+            with self._connect() as conn:
+                if force:
+                    due = conn.execute("SELECT * FROM refresh_sources").fetchall()
+                else:
+                    due = conn.execute(
+                        "SELECT * FROM refresh_sources WHERE next_due_at <= ?", (now,)
+                    ).fetchall()
+
+            for source in due:
+                source_report = self.refresh_source(dict(source))
+                report.sources.append(source_report)
+                report.sources_checked += 1
+                report.bytes_fetched += source_report.bytes_fetched
+                report.chunks_reembedded += source_report.chunks_reembedded
+                report.chunks_removed += source_report.chunks_removed
+                report.chunks_unchanged += source_report.chunks_unchanged
+
+            report.duration_seconds = round(time.perf_counter() - start, 3)
+            self._store_report(report)
+
+            if report.sources_checked:
+                print(
+                    f"🔄 Knowledge refresh: {report.sources_checked} source(s), "
+                    f"{report.bytes_fetched} bytes fetched, "
+                    f"{report.chunks_reembedded} chunk(s) re-embedded, "
+                    f"{report.chunks_removed} removed, {report.chunks_unchanged} unchanged"
+                )
+            return report
+        finally:
+            self._lock.release()
+
+    def refresh_source(self, source: Dict[str, Any]) -> SourceRefreshReport:
+        """
+        Re-crawl one source and apply the chunk-level diff
+
+        Args:
+            source: Row from refresh_sources
+
+        Returns:
+            SourceRefreshReport: Per-source counters
+        """
+        url = source["url"]
+        report = SourceRefreshReport(url=url)
+        metadata = json.loads(source["metadata"]) if source.get("metadata") else None
+        namespace = namespace_of(metadata)
+
+        try:
+            reader = self._get_reader()
+            documents = reader.read(url, name=source["name"])
+            if not documents:
+                report.error = "no content returned"
+                return report
+
+            chunks: Dict[str, Document] = {}
+            for document in documents:
+                report.bytes_fetched += len(document.content.encode("utf-8"))
+                for chunk in self._chunk(reader, document):
+                    chunk.content_id = source["content_id"]
+                    chunks.setdefault(chunk_row_id(chunk.content, namespace), chunk)
+
+            with self._connect() as conn:
+                rows = conn.execute("SELECT chunk_id FROM refresh_chunks WHERE url = ?", (url,)).fetchall()
+            old_ids = {row["chunk_id"] for row in rows}
+            new_ids = set(chunks)
+
+            added_ids = new_ids - old_ids
+            removed_ids = old_ids - new_ids
+
+            vector_db = self.knowledge.vector_db
+            if added_ids:
+                vector_db.insert(
+                    content_hash=self._content_hash(url),
+                    documents=[chunks[cid] for cid in added_ids],
+                    filters=metadata,
+                )
+            for cid in removed_ids:
+                vector_db.delete_by_id(cid)
+
+            with self._connect() as conn:
+                conn.executemany(
+                    "DELETE FROM refresh_chunks WHERE url = ? AND chunk_id = ?",
+                    [(url, cid) for cid in removed_ids],
+                )
+                conn.executemany(
+                    "INSERT OR IGNORE INTO refresh_chunks (url, chunk_id) VALUES (?, ?)",
+                    [(url, cid) for cid in added_ids],
+                )
+
+            report.chunks_total = len(new_ids)
+            report.chunks_reembedded = len(added_ids)
+            report.chunks_removed = len(removed_ids)
+            report.chunks_unchanged = len(new_ids & old_ids)
+
+        except Exception as e:
+            print(f"❌ Failed to refresh {url}: {e}")
+            report.error = str(e)
+
+        finally:
+            now = time.time()
+            with self._connect() as conn:
+                conn.execute(
+                    "UPDATE refresh_sources SET last_refreshed_at = ?, next_due_at = ? WHERE url = ?",
+                    (now, now + source["interval_seconds"], url),
+                )
+
+        return report
+
+    def _get_reader(self):
+        readers = self.knowledge.readers or {}
+        return readers.get("JinaWebReader") or JinaWebReader()
+
+    @staticmethod
+    def _chunk(reader, document: Document) -> List[Document]:
+        if not reader.chunk:
+            return [document]
+        return reader.chunk_document(document)
+
+    @staticmethod
+    def _content_hash(url: str) -> str:
+        # Same hash Knowledge uses for URL content, so UI deletes still apply
+        return hashlib.sha256(url.encode()).hexdigest()
+
+    def _stored_chunk_ids(self, url: str) -> List[str]:
+        """Ids of the rows LanceDB already holds for a URL"""
+        vector_db = self.knowledge.vector_db
+        table = getattr(vector_db, "table", None)
+        if table is None:
+            return []
+
+        # The hash is hex, so it can go into the filter as is. Filtering in
+        # LanceDB avoids pulling (and JSON-parsing) every row for each URL;
+        # the few matches are checked exactly.
+        content_hash = self._content_hash(url)
+        result = (
+            table.search()
+            .where(f"payload LIKE '%{content_hash}%'")
+            .select(["id", "payload"])
+            .limit(None)
+            .to_arrow()
+        )
+        return [
+            row_id
+            for row_id, payload in zip(result.column("id").to_pylist(), result.column("payload").to_pylist())
+            if json.loads(payload).get("content_hash") == content_hash
+        ]
+
+    # ------------------------------------------------------------------
+    # Scheduling & stats
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """Start checking for due sources in a background thread"""
+        if self._scheduler is not None:
+            return
+        self._scheduler = BackgroundScheduler(daemon=True)
+        self._scheduler.add_job(
+            self.run_cycle,
+            "interval",
+            seconds=self.tick_seconds,
+            id="knowledge-refresh",
+            max_instances=1,
+            coalesce=True,
+        )
+        self._scheduler.start()
+        print(f"✅ Knowledge refresher started (tick every {self.tick_seconds}s)")
+
+    def stop(self):
+        """Stop the background scheduler"""
+        if self._scheduler is not None:
+            self._scheduler.shutdown(wait=False)
+            self._scheduler = None
+
+    def _store_report(self, report: RefreshCycleReport):
+        self.reports.append(report)
+        if len(self.reports) > self.max_reports:
+            self.reports = self.reports[-self.max_reports:]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get refresher statistics"""
+        return {
+            "running": self._scheduler is not None,
+            "tracked_sources": len(self.list_sources()),
+            "tick_seconds": self.tick_seconds,
+            "recent_cycles": [report.to_dict() for report in self.reports[-5:]],
+            "totals": {
+                "bytes_fetched": sum(r.bytes_fetched for r in self.reports),
+                "chunks_reembedded": sum(r.chunks_reembedded for r in self.reports),
+                "chunks_removed": sum(r.chunks_removed for r in self.reports),
+            },
+        }
+
+
+# Global singleton instance
+_knowledge_refresher: Optional[KnowledgeRefresher] = None
+
+
+def get_knowledge_refresher(knowledge: Optional[Knowledge] = None) -> KnowledgeRefresher:
+    """Get or create the global knowledge refresher instance"""
+    global _knowledge_refresher
+    if _knowledge_refresher is None:
+        if knowledge is None:
+            raise ValueError("A Knowledge instance is required to create the refresher")
+        _knowledge_refresher = KnowledgeRefresher(knowledge)
+    return _knowledge_refresher
@@ -0,0 +1,221 @@
+"""
+Knowledge Service - One shared knowledge base for all agents
+
+Builds the contents database, the LanceDB vector store, the embedder and the
+Knowledge instance once per process, on first use, and hands the same objects
+to every agent. Paths come from config/settings.py.
+
+Usage:
+    from services.knowledge_service import get_knowledge
+
+    agent = Agent(..., knowledge=get_knowledge())
+"""
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from agno.db.sqlite import SqliteDb
+from agno.knowledge import Knowledge
+from agno.knowledge.embedder.base import Embedder
+from agno.knowledge.embedder.openai import OpenAIEmbedder
+from agno.vectordb.lancedb import SearchType
+
+from config.settings import (
+    EMBEDDER_BACKEND,
+    EMBEDDING_CACHE_ENABLED,
+    EMBEDDING_DIMENSIONS,
+    KNOWLEDGE_CONTENTS_DB_FILE,
+    KNOWLEDGE_NAME,
+    LANCEDB_TABLE_NAME,
+    LANCEDB_URI,
+)
+from readers import RegistryKnowledge, register_all_readers
+from services.embedding_cache import CachedEmbedder
+from services.lance_store import PulseLanceDb
+
+
+def create_embedder(backend: str = EMBEDDER_BACKEND, dimensions: Optional[int] = EMBEDDING_DIMENSIONS) -> Embedder:
+    """
+    Create the embedder for a backend ("openai" or "local").
+
+    dimensions requests reduced-dimension vectors (text-embedding-3 models
+    for OpenAI, truncation for local models); None keeps the model default.
+    """
+    if backend == "local":
+        from services.local_embedder import LocalEmbedder
+
+        return LocalEmbedder(dimensions=dimensions)
+    if backend == "openai":
+        return OpenAIEmbedder(dimensions=dimensions) if dimensions else OpenAIEmbedder()
+    raise ValueError(f"Unknown embedder backend '{backend}' (use openai or local)")
+
+
+class KnowledgeService:
+    """
+    Owns the shared knowledge base and its storage handles.
+
+    Nothing is opened until the knowledge base is first requested. warm_up()
+    can be called at startup to pay that cost before the first request, and
+    close() releases the handles at shutdown.
+    """
+
+    def __init__(
+        self,
+        name: str = KNOWLEDGE_NAME,
+        contents_db_file: str = KNOWLEDGE_CONTENTS_DB_FILE,
+        lancedb_uri: str = LANCEDB_URI,
+        table_name: str = LANCEDB_TABLE_NAME,
+        embedder: Optional[Embedder] = None,
+    ):
+        self.name = name
+        self.contents_db_file = contents_db_file
+        self.lancedb_uri = lancedb_uri
+        self.table_name = table_name
+        self._embedder = embedder
+
+        self._knowledge: Optional[Knowledge] = None
+        self._reader_status: Dict[str, str] = {}
+        self._init_seconds: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def knowledge(self) -> Knowledge:
+        """The shared Knowledge instance (built on first access)"""
+        if self._knowledge is None:
+            with self._lock:
+                if self._knowledge is None:
+                    self._knowledge = self._build()
+        return self._knowledge
+
+    @property
+    def vector_db(self) -> PulseLanceDb:
+        return self.knowledge.vector_db
+
+    @property
+    def contents_db(self) -> SqliteDb:
+        return self.knowledge.contents_db
+
+    @property
+    def is_initialized(self) -> bool:
+        return self._knowledge is not None
+
+    def _create_embedder(self) -> Embedder:
+        embedder = self._embedder or create_embedder()
+        if EMBEDDING_CACHE_ENABLED and not isinstance(embedder, CachedEmbedder):
+            embedder = CachedEmbedder(embedder=embedder)
+        return embedder
+
+    def _build(self) -> Knowledge:
+        started = time.perf_counter()
+
+        contents_db = SqliteDb(db_file=self.contents_db_file)
+        vector_db = PulseLanceDb(
+            table_name=self.table_name,
+            uri=self.lancedb_uri,
+            search_type=SearchType.hybrid,
+            embedder=self._create_embedder(),
+        )
+        knowledge = RegistryKnowledge(
+            name=self.name,
+            vector_db=vector_db,
+            contents_db=contents_db,
+        )
+
+        # Register all custom readers
+        self._reader_status = register_all_readers(knowledge)
+        for reader_name, status in self._reader_status.items():
+            if status == "registered":
+                print(f"✅ Registered {reader_name}")
+            elif status.startswith("skipped"):
+                print(f"⚠️  {reader_name}: {status}")
+            else:
+                print(f"❌ {reader_name}: {status}")
+
+        self._init_seconds = time.perf_counter() - started
+        print(f"📚 Knowledge base ready: {self.table_name} @ {self.lancedb_uri} ({self._init_seconds:.2f}s)")
+        return knowledge
+
+    def warm_up(self) -> Dict[str, Any]:
+        """
+        Open all handles ahead of the first request.
+
+        Returns:
+            dict: Service statistics after warm-up
+        """
+        knowledge = self.knowledge
+        try:
+            knowledge.vector_db.exists()
+            knowledge.vector_db.get_count()
+            if knowledge.vector_db.index_manager is not None:
+                # Catch up on indexes (e.g. after an upgrade) without delaying startup
+                knowledge.vector_db.index_manager.schedule_check()
+        except Exception as e:
+            print(f"⚠️  Knowledge warm-up failed: {str(e)}")
+        return self.get_stats()
+
+    def close(self):
+        """Release storage handles and worker processes. The service can be rebuilt afterwards."""
+        from readers.local_readers import shutdown_parse_pool
+
+        shutdown_parse_pool(wait=False)
+
+        with self._lock:
+            knowledge = self._knowledge
+            self._knowledge = None
+        if knowledge is None:
+            return
+
+        contents_db = knowledge.contents_db
+        if contents_db is not None and getattr(contents_db, "db_engine", None) is not None:
+            contents_db.Session.remove()
+            contents_db.db_engine.dispose()
+
+        vector_db = knowledge.vector_db
+        if vector_db is not None:
+            if vector_db.write_queue is not None:
+                vector_db.write_queue.close()
+            if isinstance(vector_db.embedder, CachedEmbedder):
+                vector_db.embedder.store.close()
+            vector_db.table = None
+            vector_db.async_table = None
+            vector_db.async_connection = None
+        print("🔒 Knowledge base closed")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get service statistics"""
+        stats: Dict[str, Any] = {
+            "initialized": self.is_initialized,
+            "name": self.name,
+            "contents_db_file": self.contents_db_file,
+            "lancedb_uri": self.lancedb_uri,
+            "table_name": self.table_name,
+            "init_seconds": round(self._init_seconds, 3) if self._init_seconds is not None else None,
+            "readers": self._reader_status,
+        }
+        if self.is_initialized:
+            try:
+                stats["documents"] = self._knowledge.vector_db.get_count()
+            except Exception:
+                stats["documents"] = None
+            stats["store"] = self._knowledge.vector_db.get_stats()
+            embedder = self._knowledge.vector_db.embedder
+            if isinstance(embedder, CachedEmbedder):
+                stats["embedding_cache"] = embedder.get_stats()
+        return stats
+
+
+# Global singleton instance
+_knowledge_service: Optional[KnowledgeService] = None
+
+
+def get_knowledge_service() -> KnowledgeService:
+    """Get or create the global knowledge service"""
+    global _knowledge_service
+    if _knowledge_service is None:
+        _knowledge_service = KnowledgeService()
+    return _knowledge_service
+
+
+def get_knowledge() -> Knowledge:
+    """Shortcut for get_knowledge_service().knowledge"""
+    return get_knowledge_service().knowledge
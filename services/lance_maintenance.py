@@ -0,0 +1,213 @@
+"""
+Lance Maintenance - Scheduled compaction and version pruning for the knowledge table
+
+Every append leaves a fragment and a table version behind under the LanceDB
+directory. A maintenance pass merges small fragments, removes versions older
+than the retention window and folds new rows into the indexes. It runs on the
+table's writer thread, so it never overlaps with an ingest.
+
+Usage:
+    from services.lance_maintenance import get_lance_maintenance
+
+    maintenance = get_lance_maintenance()
+    maintenance.start()
+    report = maintenance.run()
+"""
+import os
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from apscheduler.schedulers.background import BackgroundScheduler
+
+from config.settings import LANCE_MAINTENANCE_INTERVAL_SECONDS, LANCE_VERSION_RETENTION_HOURS
+from services.metrics import get_metrics_registry
+
+
+def _dir_size(path: Path) -> Optional[int]:
+    if not path.exists():
+        return None
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+@dataclass
+class MaintenanceReport:
+    """Table layout before and after one maintenance pass"""
+    table_name: str
+    started_at: str = field(default_factory=lambda: datetime.now().isoformat())
+    seconds: float = 0.0
+    before: Dict[str, Any] = field(default_factory=dict)
+    after: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["seconds"] = round(self.seconds, 3)
+        return data
+
+
+class LanceMaintenance:
+    """
+    Compacts fragments and prunes old versions of one PulseLanceDb table.
+
+    Args:
+        vector_db: The PulseLanceDb to maintain
+        retention_hours: Versions older than this are removed
+        interval_seconds: Time between scheduled passes
+    """
+
+    def __init__(
+        self,
+        vector_db,
+        retention_hours: float = LANCE_VERSION_RETENTION_HOURS,
+        interval_seconds: int = LANCE_MAINTENANCE_INTERVAL_SECONDS,
+    ):
+        self.vector_db = vector_db
+        self.retention_hours = retention_hours
+        self.interval_seconds = interval_seconds
+        self.reports: List[MaintenanceReport] = []
+        self.max_reports = 20
+        self._scheduler: Optional[BackgroundScheduler] = None
+
+    def _open_table(self):
+        connection = self.vector_db.connection
+        if connection is None or self.vector_db.table_name not in connection.table_names():
+            return None
+        return connection.open_table(self.vector_db.table_name)
+
+    def _table_path(self) -> Optional[Path]:
+        uri = str(self.vector_db.uri)
+        if "://" in uri:
+            return None  # Object storage: size is not measured
+        return Path(uri) / f"{self.vector_db.table_name}.lance"
+
+    def get_layout(self) -> Dict[str, Any]:
+        """Fragment count, version count, row count and on-disk size of the table"""
+        table = self._open_table()
+        if table is None:
+            return {"exists": False}
+        stats = table.stats()
+        fragment_stats = stats.get("fragment_stats", {})
+        table_path = self._table_path()
+        return {
+            "exists": True,
+            "rows": stats.get("num_rows"),
+            "fragments": fragment_stats.get("num_fragments"),
+            "small_fragments": fragment_stats.get("num_small_fragments"),
+            "versions": len(table.list_versions()),
+            "disk_bytes": _dir_size(table_path) if table_path is not None else None,
+        }
+
+    def _optimize(self):
+        table = self._open_table()
+        if table is None:
+            return
+        table.optimize(cleanup_older_than=timedelta(hours=self.retention_hours))
+        # The store's handle may point at a version that was just pruned
+        self.vector_db.table = self._open_table()
+
+    def run(self) -> MaintenanceReport:
+        """Run one maintenance pass and return its report"""
+        report = MaintenanceReport(table_name=self.vector_db.table_name)
+        started = time.perf_counter()
+        try:
+            report.before = self.get_layout()
+            if report.before.get("exists"):
+                write_queue = getattr(self.vector_db, "write_queue", None)
+                if write_queue is not None:
+                    write_queue.run_exclusive(self._optimize).result()
+                else:
+                    self._optimize()
+            report.after = self.get_layout()
+        except Exception as e:
+            report.error = str(e)
+            print(f"❌ LanceDB maintenance failed for {report.table_name}: {str(e)}")
+        report.seconds = time.perf_counter() - started
+
+        self._record(report)
+        return report
+
+    def _record(self, report: MaintenanceReport):
+        self.reports = (self.reports + [report])[-self.max_reports:]
+        metrics = get_metrics_registry()
+        metrics.counter("lance_maintenance_runs_total", "LanceDB maintenance passes").inc(
+            outcome="error" if report.error else "ok"
+        )
+        after = report.after or {}
+        if after.get("fragments") is not None:
+            metrics.gauge("lance_table_fragments", "Fragments in the LanceDB table").set(
+                after["fragments"], table=report.table_name
+            )
+        if after.get("disk_bytes") is not None:
+            metrics.gauge("lance_table_disk_bytes", "On-disk size of the LanceDB table").set(
+                after["disk_bytes"], table=report.table_name
+            )
+        if not report.error and report.before.get("exists"):
+            print(
+                f"🧹 Compacted {report.table_name}: fragments {report.before.get('fragments')} → {after.get('fragments')}, "
+                f"versions {report.before.get('versions')} → {after.get('versions')}, "
+                f"{report.before.get('disk_bytes')} → {after.get('disk_bytes')} bytes ({report.seconds:.1f}s)"
+            )
+
+    # ------------------------------------------------------------------
+    # Scheduling & stats
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """Run maintenance passes in a background thread"""
+        if self._scheduler is not None:
+            return
+        self._scheduler = BackgroundScheduler(daemon=True)
+        self._scheduler.add_job(
+            self.run,
+            "interval",
+            seconds=self.interval_seconds,
+            id="lance-maintenance",
+            max_instances=1,
+            coalesce=True,
+        )
+        self._scheduler.start()
+        print(f"✅ LanceDB maintenance started (every {self.interval_seconds}s, keep {self.retention_hours}h of versions)")
+
+    def stop(self):
+        """Stop the background scheduler"""
+        if self._scheduler is not None:
+            self._scheduler.shutdown(wait=False)
+            self._scheduler = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get maintenance statistics"""
+        try:
+            layout = self.get_layout()
+        except Exception as e:
+            layout = {"error": str(e)}
+        return {
+            "running": self._scheduler is not None,
+            "interval_seconds": self.interval_seconds,
+            "retention_hours": self.retention_hours,
+            "layout": layout,
+            "recent_runs": [report.to_dict() for report in self.reports[-5:]],
+        }
+
+
+# Global singleton instance
+_lance_maintenance: Optional[LanceMaintenance] = None
+
+
+def get_lance_maintenance() -> LanceMaintenance:
+    """Get or create maintenance for the shared knowledge table"""
+    global _lance_maintenance
+    if _lance_maintenance is None:
+        from services.knowledge_service import get_knowledge_service
+
+        _lance_maintenance = LanceMaintenance(get_knowledge_service().vector_db)
+    return _lance_maintenance
@@ -0,0 +1,468 @@
+"""
+Lance Store - LanceDb vector store tuned for Open Pulse ingestion
+
+Extends agno's LanceDb:
+- Existing chunks are detected with one bulk id lookup, before any embedding
+  is paid for (agno embeds first and then checks each chunk separately)
+- New chunks are embedded through the EmbeddingPipeline in token-budgeted,
+  concurrency-limited batches
+- All rows of an insert are written in a single add(), through a write queue
+  that coalesces concurrent inserts into larger appends
+- Search results are cached in memory; every write bumps the table version
+  and clears the cache
+- Vector and full-text indexes are maintained by a LanceIndexManager
+- Rows carry a `namespace` column (the owning user, or the shared namespace);
+  searches prefilter on it so they only touch the current user's rows
+"""
+import asyncio
+import json
+import time
+from hashlib import md5
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import pyarrow as pa
+from agno.knowledge.document.base import Document
+from agno.utils.log import log_debug, log_info, logger
+from agno.vectordb.lancedb import LanceDb, SearchType
+
+from config.settings import (
+    KNOWLEDGE_INDEX_ENABLED,
+    KNOWLEDGE_NAMESPACE_KEY,
+    KNOWLEDGE_SHARED_NAMESPACE,
+    LANCE_WRITE_QUEUE_ENABLED,
+    SEARCH_CACHE_ENABLED,
+    VECTOR_INDEX_TYPE,
+    VECTOR_PRECISION,
+)
+from services.embedding_pipeline import EmbeddingPipeline, EmbeddingReport
+from services.index_manager import LanceIndexManager
+from services.knowledge_namespace import get_knowledge_namespace, namespace_of
+from services.metrics import get_metrics_registry
+from services.search_cache import SearchResultCache, search_key
+from services.write_queue import LanceWriteQueue
+
+
+NAMESPACE_COLUMN = "namespace"
+
+
+def chunk_row_id(content: str, namespace: Optional[str] = None) -> str:
+    """
+    Row id of a chunk. Shared chunks match agno's LanceDb (md5 of the cleaned
+    content); a user's chunks are keyed by user too, so two users can store
+    the same text.
+    """
+    cleaned = content.replace("\x00", "\ufffd")
+    if namespace and namespace != KNOWLEDGE_SHARED_NAMESPACE:
+        cleaned = f"{namespace}:{cleaned}"
+    return md5(cleaned.encode()).hexdigest()
+
+
+def _sql_str(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+class PulseLanceDb(LanceDb):
+    """
+    LanceDb with bulk existence checks, batched embedding, bulk writes and a
+    search result cache.
+
+    Pass search_cache=None to disable caching, or a SearchResultCache to
+    tune its size and TTL. Likewise index_manager=None disables automatic
+    index builds, and write_queue=None makes every insert append directly.
+    Full-text search uses Lance's native index by default
+    (use_tantivy=False), which can be updated incrementally.
+
+    vector_precision selects how vectors are stored in new tables: "float32",
+    "float16" (half the size), or "int8" (float16 column plus an
+    IVF_HNSW_SQ index, whose scalar quantizer keeps int8 codes).
+    """
+
+    def __init__(
+        self,
+        *args,
+        search_cache: Any = "default",
+        index_manager: Any = "default",
+        write_queue: Any = "default",
+        vector_precision: str = VECTOR_PRECISION,
+        **kwargs,
+    ):
+        if vector_precision not in ("float32", "float16", "int8"):
+            raise ValueError(f"Unknown vector precision '{vector_precision}' (use float32, float16 or int8)")
+        self.vector_precision = vector_precision
+        kwargs.setdefault("use_tantivy", False)
+        super().__init__(*args, **kwargs)
+        self._ensure_namespace_column()
+        self.pipeline = EmbeddingPipeline(self.embedder)
+        self.last_ingest: Optional[Dict[str, Any]] = None
+
+        if search_cache == "default":
+            search_cache = SearchResultCache(name=self.table_name) if SEARCH_CACHE_ENABLED else None
+        self.search_cache: Optional[SearchResultCache] = search_cache
+        self.version = 0
+
+        if index_manager == "default":
+            index_type = "IVF_HNSW_SQ" if vector_precision == "int8" else VECTOR_INDEX_TYPE
+            index_manager = LanceIndexManager(self, index_type=index_type) if KNOWLEDGE_INDEX_ENABLED else None
+        self.index_manager: Optional[LanceIndexManager] = index_manager
+        if self.index_manager is not None:
+            self.index_manager.sync_state()
+
+        if write_queue == "default":
+            write_queue = LanceWriteQueue(self._add_rows, name=self.table_name) if LANCE_WRITE_QUEUE_ENABLED else None
+        self.write_queue: Optional[LanceWriteQueue] = write_queue
+
+    # ------------------------------------------------------------------
+    # Schema & namespaces
+    # ------------------------------------------------------------------
+
+    def _base_schema(self) -> pa.Schema:
+        schema = super()._base_schema()
+        if self.vector_precision != "float32":
+            position = schema.get_field_index(self._vector_col)
+            schema = schema.set(position, pa.field(self._vector_col, pa.list_(pa.float16(), self.dimensions)))
+        return schema.append(pa.field(NAMESPACE_COLUMN, pa.string()))
+
+    def _ensure_namespace_column(self):
+        """Add the namespace column to a table created before namespaces, backfilling it from metadata"""
+        if self.table is None or NAMESPACE_COLUMN in self.table.schema.names:
+            return
+        self.table.add_columns({NAMESPACE_COLUMN: _sql_str(KNOWLEDGE_SHARED_NAMESPACE)})
+
+        owned: Dict[str, List[str]] = {}
+        rows = self.table.search().select([self._id, "payload"]).limit(None).to_arrow()
+        for row_id, payload in zip(rows.column(self._id).to_pylist(), rows.column("payload").to_pylist()):
+            try:
+                namespace = namespace_of(json.loads(payload).get("meta_data"))
+            except (TypeError, ValueError):
+                continue
+            if namespace != KNOWLEDGE_SHARED_NAMESPACE:
+                owned.setdefault(namespace, []).append(row_id)
+
+        for namespace, ids in owned.items():
+            for i in range(0, len(ids), 500):
+                quoted = ", ".join(_sql_str(row_id) for row_id in ids[i:i + 500])
+                self.table.update(where=f"{self._id} IN ({quoted})", values={NAMESPACE_COLUMN: namespace})
+        print(f"🔀 Added namespaces to {self.table_name}: {sum(len(ids) for ids in owned.values())} rows in {len(owned)} user namespace(s)")
+
+    @staticmethod
+    def _namespace_where(namespace: Optional[str]) -> str:
+        """Rows visible to a namespace: its own and the shared ones"""
+        if namespace is None or namespace == KNOWLEDGE_SHARED_NAMESPACE:
+            return f"{NAMESPACE_COLUMN} = {_sql_str(KNOWLEDGE_SHARED_NAMESPACE)}"
+        return f"{NAMESPACE_COLUMN} IN ({_sql_str(namespace)}, {_sql_str(KNOWLEDGE_SHARED_NAMESPACE)})"
+
+    @staticmethod
+    def _split_namespace(filters: Optional[Dict[str, Any]]) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        """Take the namespace out of the filters, falling back to the current run's user"""
+        remaining = dict(filters) if filters else {}
+        namespace = remaining.pop(KNOWLEDGE_NAMESPACE_KEY, None)
+        if namespace in (None, ""):
+            namespace = get_knowledge_namespace()
+        return (str(namespace) if namespace is not None else None), (remaining or None)
+
+    def _bump_version(self):
+        """Mark the table as changed, dropping cached search results"""
+        self.version += 1
+        if self.search_cache is not None:
+            self.search_cache.invalidate()
+
+    # ------------------------------------------------------------------
+    # Ingestion
+    # ------------------------------------------------------------------
+
+    def _existing_ids(self, ids: List[str]) -> Set[str]:
+        """Return the subset of ids already stored in the table"""
+        if self.table is None or not ids:
+            return set()
+        existing: Set[str] = set()
+        try:
+            for i in range(0, len(ids), 500):
+                batch = ids[i:i + 500]
+                quoted = ", ".join(f"'{row_id}'" for row_id in batch)
+                result = self.table.search().where(f"{self._id} IN ({quoted})").select([self._id]).limit(len(batch)).to_arrow()
+                existing.update(result.column(self._id).to_pylist())
+        except Exception as e:
+            log_debug(f"Bulk id lookup failed, treating all chunks as new: {e}")
+        return existing
+
+    def _select_new(
+        self, documents: List[Document], filters: Optional[Dict[str, Any]]
+    ) -> Tuple[List[Document], List[str]]:
+        """Apply filters, then drop chunks that are already stored (or repeated in this call)"""
+        if filters:
+            for doc in documents:
+                meta_data = doc.meta_data.copy() if doc.meta_data else {}
+                meta_data.update(filters)
+                doc.meta_data = meta_data
+        ids = [chunk_row_id(doc.content, namespace_of(doc.meta_data)) for doc in documents]
+        existing = self._existing_ids(list(dict.fromkeys(ids)))
+
+        new_docs, new_ids = [], []
+        for doc, row_id in zip(documents, ids):
+            if row_id in existing:
+                continue
+            existing.add(row_id)
+            new_docs.append(doc)
+            new_ids.append(row_id)
+        return new_docs, new_ids
+
+    def _build_rows(self, content_hash: str, documents: List[Document], ids: List[str]) -> List[Dict[str, Any]]:
+        rows = []
+        for doc, row_id in zip(documents, ids):
+            if not doc.embedding:
+                logger.warning(f"Skipping chunk of {doc.name} without embedding")
+                continue
+            payload = {
+                "name": doc.name,
+                "meta_data": doc.meta_data,
+                "content": doc.content.replace("\x00", "\ufffd"),
+                "usage": doc.usage,
+                "content_id": doc.content_id,
+                "content_hash": content_hash,
+            }
+            rows.append({
+                "id": row_id,
+                "vector": self._prepare_vector(doc.embedding),
+                "payload": json.dumps(payload),
+                NAMESPACE_COLUMN: namespace_of(doc.meta_data),
+            })
+        return rows
+
+    def _add_rows(self, rows: List[Dict[str, Any]]):
+        """Append rows to the table in a single add()"""
+        if self.table is None:
+            self.create()
+        if self.on_bad_vectors is not None:
+            self.table.add(rows, on_bad_vectors=self.on_bad_vectors, fill_value=self.fill_value)
+        else:
+            self.table.add(rows)
+
+    def _write_rows(self, rows: List[Dict[str, Any]]):
+        """Write all rows of one insert, through the write queue when enabled"""
+        if self.write_queue is not None:
+            self.write_queue.write(rows)
+        else:
+            self._add_rows(rows)
+
+    def _record_ingest(self, total: int, written: int, report: EmbeddingReport):
+        if written and self.index_manager is not None:
+            self.index_manager.schedule_check()
+        self.last_ingest = {
+            "documents": total,
+            "skipped_existing": total - report.chunks,
+            "written": written,
+            "embedding": report.to_dict(),
+        }
+        log_debug(f"Inserted {written} of {total} documents")
+
+    def insert(self, content_hash: str, documents: List[Document], filters: Optional[Dict[str, Any]] = None) -> None:
+        """Insert documents, embedding only chunks that are not stored yet"""
+        if not documents:
+            return
+        new_docs, new_ids = self._select_new(documents, filters)
+        report = self.pipeline.embed_documents_sync(new_docs)
+        rows = self._build_rows(content_hash, new_docs, new_ids)
+        if rows:
+            self._write_rows(rows)
+        self._record_ingest(len(documents), len(rows), report)
+        self._bump_version()
+
+    async def async_insert(
+        self, content_hash: str, documents: List[Document], filters: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """Insert documents, embedding only chunks that are not stored yet"""
+        if not documents:
+            return
+        new_docs, new_ids = await asyncio.to_thread(self._select_new, documents, filters)
+        report = await self.pipeline.embed_documents(new_docs)
+        rows = self._build_rows(content_hash, new_docs, new_ids)
+        if rows and self.write_queue is not None:
+            await asyncio.wrap_future(self.write_queue.submit(rows))
+        elif rows:
+            await asyncio.to_thread(self._add_rows, rows)
+        self._record_ingest(len(documents), len(rows), report)
+        self._bump_version()
+
+    # ------------------------------------------------------------------
+    # Writes that change search results
+    # ------------------------------------------------------------------
+
+    def drop(self) -> None:
+        super().drop()
+        self._bump_version()
+
+    async def async_drop(self) -> None:
+        await super().async_drop()
+        self._bump_version()
+
+    def delete(self) -> bool:
+        try:
+            return super().delete()
+        finally:
+            self._bump_version()
+
+    def delete_by_id(self, id: str) -> bool:
+        try:
+            return super().delete_by_id(id)
+        finally:
+            self._bump_version()
+
+    def delete_by_name(self, name: str) -> bool:
+        try:
+            return super().delete_by_name(name)
+        finally:
+            self._bump_version()
+
+    def delete_by_metadata(self, metadata: Dict[str, Any]) -> bool:
+        try:
+            return super().delete_by_metadata(metadata)
+        finally:
+            self._bump_version()
+
+    def delete_by_content_id(self, content_id: str) -> bool:
+        try:
+            return super().delete_by_content_id(content_id)
+        finally:
+            self._bump_version()
+
+    def _delete_by_content_hash(self, content_hash: str) -> bool:
+        try:
+            return super()._delete_by_content_hash(content_hash)
+        finally:
+            self._bump_version()
+
+    def update_metadata(self, content_id: str, metadata: Dict[str, Any]) -> None:
+        try:
+            super().update_metadata(content_id, metadata)
+        finally:
+            self._bump_version()
+
+    # ------------------------------------------------------------------
+    # Search
+    # ------------------------------------------------------------------
+
+    def _observe_search(self, started: float):
+        get_metrics_registry().histogram(
+            "knowledge_search_seconds", "Time to run an uncached knowledge search",
+            (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+        ).observe(time.perf_counter() - started)
+
+    def _ensure_fts_index(self):
+        if not self.fts_index_exists:
+            self.table.create_fts_index("payload", use_tantivy=self.use_tantivy, replace=True)
+            self.fts_index_exists = True
+
+    def _query(self, query: str, limit: int, where: str):
+        """Run the configured search type, prefiltered by `where`"""
+        if self.search_type == SearchType.keyword:
+            self._ensure_fts_index()
+            return self.table.search(query=query, query_type="fts").where(where, prefilter=True).limit(limit).to_pandas()
+
+        query_embedding = self.embedder.get_embedding(query)
+        if not query_embedding:
+            logger.error(f"Error getting embedding for Query: {query}")
+            return None
+
+        if self.search_type == SearchType.hybrid:
+            self._ensure_fts_index()
+            # lancedb 0.25 passes the hybrid builder's *postfilter* flag on as the sub-queries'
+            # prefilter flag, so prefilter=False here is what makes both sub-queries prefilter
+            results = (
+                self.table.search(vector_column_name=self._vector_col, query_type="hybrid")
+                .vector(query_embedding)
+                .text(query)
+                .where(where, prefilter=False)
+                .limit(limit)
+            )
+        elif self.search_type == SearchType.vector:
+            results = (
+                self.table.search(query=query_embedding, vector_column_name=self._vector_col)
+                .where(where, prefilter=True)
+                .limit(limit)
+            )
+        else:
+            logger.error(f"Invalid search type '{self.search_type}'.")
+            return None
+
+        if self.nprobes:
+            results.nprobes(self.nprobes)
+        return results.to_pandas()
+
+    def _search(
+        self, query: str, limit: int, filters: Optional[Dict[str, Any]], namespace: Optional[str]
+    ) -> List[Document]:
+        """agno's LanceDb.search, restricted to the namespace before ranking"""
+        if self.connection:
+            self.table = self.connection.open_table(name=self.table_name)
+        if self.table is None:
+            logger.error("Table not initialized. Please create the table first")
+            return []
+
+        started = time.perf_counter()
+        results = self._query(query, limit, self._namespace_where(namespace))
+        if results is None:
+            return []
+        search_results = self._build_search_results(results)
+
+        # Remaining metadata filters are applied after the search, as in agno
+        if filters and search_results:
+            search_results = [
+                doc for doc in search_results
+                if doc.meta_data is not None
+                and all(key in doc.meta_data and doc.meta_data[key] == value for key, value in filters.items())
+            ]
+
+        if self.reranker and search_results:
+            search_results = self.reranker.rerank(query=query, documents=search_results)
+
+        self._observe_search(started)
+        log_info(f"Found {len(search_results)} documents")
+        return search_results
+
+    def search(self, query: str, limit: int = 5, filters: Optional[Dict[str, Any]] = None) -> List[Document]:
+        """Search the current user's and shared documents, serving repeated searches from the cache"""
+        namespace, filters = self._split_namespace(filters)
+        if self.search_cache is None:
+            return self._search(query, limit, filters, namespace)
+
+        key = search_key(query, filters, self.search_type, limit, self.version, namespace)
+        cached = self.search_cache.get(key)
+        if cached is not None:
+            return cached
+
+        results = self._search(query, limit, filters, namespace)
+        # Skip caching if an ingest finished while the search was running
+        if key[-1] == self.version:
+            self.search_cache.put(key, results)
+        return results
+
+    async def async_search(
+        self, query: str, limit: int = 5, filters: Optional[Dict[str, Any]] = None
+    ) -> List[Document]:
+        """Search the current user's and shared documents, serving repeated searches from the cache"""
+        namespace, filters = self._split_namespace(filters)
+        if self.search_cache is None:
+            return await asyncio.to_thread(self._search, query, limit, filters, namespace)
+
+        key = search_key(query, filters, self.search_type, limit, self.version, namespace)
+        cached = self.search_cache.get(key)
+        if cached is not None:
+            return cached
+
+        results = await asyncio.to_thread(self._search, query, limit, filters, namespace)
+        if key[-1] == self.version:
+            self.search_cache.put(key, results)
+        return results
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get store statistics"""
+        return {
+            "table_name": self.table_name,
+            "dimensions": self.dimensions,
+            "vector_precision": self.vector_precision,
+            "version": self.version,
+            "last_ingest": self.last_ingest,
+            "search_cache": self.search_cache.get_stats() if self.search_cache is not None else None,
+            "indexes": self.index_manager.get_stats() if self.index_manager is not None else None,
+            "write_queue": self.write_queue.get_stats() if self.write_queue is not None else None,
+        }
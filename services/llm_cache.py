@@ -0,0 +1,346 @@
+"""
+LLM Response Cache - Deterministic, disk-backed cache of model calls
+
+Cron retries and test runs of a workflow repeat the same model calls with the
+same inputs. With LLM_CACHE_ENABLED, models wrapped by with_response_cache
+look each call up first, keyed on the SHA-256 of:
+
+- model class and id
+- the formatted messages (timestamps in system messages are dropped, the
+  agent adds the current time to every run)
+- tools, tool choice, response format and request parameters (temperature, ...)
+- the date bucket (LLM_CACHE_BUCKET_SECONDS, one UTC day by default), so
+  content is never reused across days
+
+Responses live in a SQLite file capped at LLM_CACHE_MAX_BYTES; the least
+recently used entries are evicted first. Each entry remembers the latency
+and tokens of the original call, so hits report the time and tokens saved.
+
+Usage:
+    from services.llm_cache import with_response_cache
+
+    model = with_response_cache(OpenAIChat(id="gpt-4o"))
+"""
+import functools
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from agno.models.message import Message
+from agno.models.response import ModelResponse
+from pydantic import BaseModel
+
+from config.settings import LLM_CACHE_BUCKET_SECONDS, LLM_CACHE_ENABLED, LLM_CACHE_FILE, LLM_CACHE_MAX_BYTES
+from services.metrics import get_metrics_registry
+
+_TIMESTAMP = re.compile(r"\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:[+-]\d{2}:?\d{2}|Z)?")
+
+# ModelResponse fields stored in the cache; media and citations are not cacheable
+_RESPONSE_FIELDS = ("role", "content", "tool_calls", "event", "provider_data", "reasoning_content",
+                    "redacted_reasoning_content", "extra")
+
+
+def _schema_of(response_format: Any) -> Any:
+    if isinstance(response_format, type) and issubclass(response_format, BaseModel):
+        return response_format.model_json_schema()
+    return response_format
+
+
+def _format_messages(model, messages: List[Message]) -> List[Any]:
+    formatted = []
+    for message in messages:
+        try:
+            data = model._format_message(message)
+        except Exception:
+            data = message.to_dict()
+        if message.role == "system" and isinstance(data.get("content"), str):
+            data = {**data, "content": _TIMESTAMP.sub("<now>", data["content"])}
+        formatted.append(data)
+    return formatted
+
+
+def request_key(
+    model,
+    messages: List[Message],
+    response_format: Any = None,
+    tools: Optional[List[Dict[str, Any]]] = None,
+    tool_choice: Any = None,
+    bucket_seconds: int = LLM_CACHE_BUCKET_SECONDS,
+    now: Optional[float] = None,
+) -> str:
+    """Cache key of one model call"""
+    try:
+        params = model.get_request_params(response_format=response_format, tools=tools, tool_choice=tool_choice)
+    except Exception:
+        params = {"temperature": getattr(model, "temperature", None)}
+    request = {
+        "model": f"{type(model).__name__}:{model.id}",
+        "messages": _format_messages(model, messages),
+        "tools": tools,
+        "tool_choice": tool_choice,
+        "response_format": _schema_of(response_format),
+        "params": {k: v for k, v in params.items() if v is not None and k not in ("tools", "tool_choice", "response_format")},
+        "bucket": int((now if now is not None else time.time()) // bucket_seconds),
+    }
+    encoded = json.dumps(request, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(encoded.encode("utf-8", errors="surrogatepass")).hexdigest()
+
+
+def _cacheable(response: ModelResponse) -> bool:
+    return (
+        (response.content is None or isinstance(response.content, str))
+        and not (response.audio or response.images or response.videos or response.audios or response.files)
+        and response.citations is None
+    )
+
+
+def _usage(responses: List[ModelResponse]) -> Dict[str, int]:
+    input_tokens = output_tokens = 0
+    for response in responses:
+        usage = response.response_usage
+        if usage is not None:
+            input_tokens += getattr(usage, "input_tokens", 0) or 0
+            output_tokens += getattr(usage, "output_tokens", 0) or 0
+    return {"input_tokens": input_tokens, "output_tokens": output_tokens}
+
+
+def _dump(responses: List[ModelResponse]) -> str:
+    return json.dumps([{name: getattr(r, name) for name in _RESPONSE_FIELDS} for r in responses], ensure_ascii=False)
+
+
+def _load(payload: str, response_format: Any = None) -> List[ModelResponse]:
+    responses = []
+    for data in json.loads(payload):
+        response = ModelResponse(**data)
+        # Hits spend no tokens
+        response.response_usage = None
+        if isinstance(response_format, type) and issubclass(response_format, BaseModel) and response.content:
+            try:
+                response.parsed = response_format.model_validate_json(response.content)
+            except Exception:
+                pass
+        responses.append(response)
+    return responses
+
+
+class LLMResponseCache:
+    """
+    Size-capped SQLite store of model responses.
+
+    Args:
+        path: SQLite file
+        max_bytes: Total payload size kept; least recently used entries go first
+    """
+
+    def __init__(self, path: str = LLM_CACHE_FILE, max_bytes: int = LLM_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, model TEXT NOT NULL, payload TEXT NOT NULL, size INTEGER NOT NULL, "
+            "seconds REAL NOT NULL, input_tokens INTEGER NOT NULL, output_tokens INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses(last_used)")
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.seconds_saved = 0.0
+        self.input_tokens_saved = 0
+        self.output_tokens_saved = 0
+
+    def get(self, key: str, model: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, seconds, input_tokens, output_tokens FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+            else:
+                self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+                self._conn.commit()
+                self.hits += 1
+                self.seconds_saved += row[1]
+                self.input_tokens_saved += row[2]
+                self.output_tokens_saved += row[3]
+        metrics = get_metrics_registry()
+        metrics.counter("llm_cache_lookups_total", "LLM response cache lookups").inc(
+            model=model, result="miss" if row is None else "hit"
+        )
+        if row is None:
+            return None
+        metrics.counter("llm_cache_seconds_saved_total", "Model latency saved by cache hits").inc(row[1], model=model)
+        metrics.counter("llm_cache_tokens_saved_total", "Tokens not spent thanks to cache hits").inc(
+            row[2] + row[3], model=model
+        )
+        return row[0]
+
+    def put(self, key: str, model: str, payload: str, seconds: float, usage: Dict[str, int]):
+        size = len(payload.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            previous = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, model, payload, size, seconds, usage["input_tokens"], usage["output_tokens"], now, now),
+            )
+            self._size += size - (previous[0] if previous else 0)
+            self._evict()
+            self._conn.commit()
+        get_metrics_registry().gauge("llm_cache_bytes", "Size of cached LLM responses").set(self._size)
+
+    def _evict(self):
+        """Drop least recently used entries until the cache fits (lock held)"""
+        while self._size > self.max_bytes:
+            victims = self._conn.execute(
+                "SELECT key, size FROM responses ORDER BY last_used ASC LIMIT 100"
+            ).fetchall()
+            if not victims:
+                self._size = 0
+                return
+            for key, size in victims:
+                if self._size <= self.max_bytes:
+                    break
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._size -= size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+            self._size = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "enabled": LLM_CACHE_ENABLED,
+                "entries": entries,
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "seconds_saved": round(self.seconds_saved, 3),
+                "input_tokens_saved": self.input_tokens_saved,
+                "output_tokens_saved": self.output_tokens_saved,
+            }
+
+
+def cache_model_responses(model, cache: Optional["LLMResponseCache"] = None):
+    """
+    Serve a model's calls from the response cache.
+
+    The instance's invoke, ainvoke, invoke_stream and ainvoke_stream methods
+    are wrapped in place; the class itself is untouched. Wrapping is idempotent.
+    """
+    if getattr(model, "_response_cache", None) is not None:
+        return model
+    cache = cache or get_llm_cache()
+    model_name = f"{type(model).__name__}:{model.id}"
+    invoke, ainvoke = model.invoke, model.ainvoke
+    invoke_stream, ainvoke_stream = model.invoke_stream, model.ainvoke_stream
+
+    def key_of(messages, assistant_message=None, response_format=None, tools=None, tool_choice=None, **_):
+        return request_key(model, messages, response_format, tools, tool_choice)
+
+    def store(key: str, responses: List[ModelResponse], started: float):
+        if not responses or not all(_cacheable(r) for r in responses):
+            return
+        try:
+            payload = _dump(responses)
+        except (TypeError, ValueError):
+            return  # provider data that is not JSON
+        cache.put(key, model_name, payload, time.perf_counter() - started, _usage(responses))
+
+    @functools.wraps(invoke)
+    def cached_invoke(*args, **kwargs):
+        key = key_of(*args, **kwargs)
+        payload = cache.get(key, model_name)
+        if payload is not None:
+            return _load(payload, kwargs.get("response_format"))[0]
+        started = time.perf_counter()
+        response = invoke(*args, **kwargs)
+        store(key, [response], started)
+        return response
+
+    @functools.wraps(ainvoke)
+    async def cached_ainvoke(*args, **kwargs):
+        key = key_of(*args, **kwargs)
+        payload = cache.get(key, model_name)
+        if payload is not None:
+            return _load(payload, kwargs.get("response_format"))[0]
+        started = time.perf_counter()
+        response = await ainvoke(*args, **kwargs)
+        store(key, [response], started)
+        return response
+
+    @functools.wraps(invoke_stream)
+    def cached_invoke_stream(*args, **kwargs):
+        key = key_of(*args, **kwargs)
+        payload = cache.get(key, model_name)
+        if payload is not None:
+            yield from _load(payload, kwargs.get("response_format"))
+            return
+        started = time.perf_counter()
+        deltas = []
+        for delta in invoke_stream(*args, **kwargs):
+            deltas.append(delta)
+            yield delta
+        store(key, deltas, started)
+
+    @functools.wraps(ainvoke_stream)
+    async def cached_ainvoke_stream(*args, **kwargs):
+        key = key_of(*args, **kwargs)
+        payload = cache.get(key, model_name)
+        if payload is not None:
+            for delta in _load(payload, kwargs.get("response_format")):
+                yield delta
+            return
+        started = time.perf_counter()
+        deltas = []
+        async for delta in ainvoke_stream(*args, **kwargs):
+            deltas.append(delta)
+            yield delta
+        store(key, deltas, started)
+
+    model.invoke = cached_invoke
+    model.ainvoke = cached_ainvoke
+    model.invoke_stream = cached_invoke_stream
+    model.ainvoke_stream = cached_ainvoke_stream
+    model._response_cache = cache
+    return model
+
+
+def with_response_cache(model):
+    """The model with its calls cached when LLM_CACHE_ENABLED is set, else unchanged"""
+    return cache_model_responses(model) if LLM_CACHE_ENABLED else model
+
+
+# Global singleton instance
+_llm_cache: Optional[LLMResponseCache] = None
+
+
+def get_llm_cache() -> LLMResponseCache:
+    """Get or create the global LLM response cache"""
+    global _llm_cache
+    if _llm_cache is None:
+        _llm_cache = LLMResponseCache()
+    return _llm_cache
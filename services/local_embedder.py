@@ -0,0 +1,126 @@
+"""
+Local Embedder - sentence-transformers on CPU threads, no API round-trips
+
+Runs a sentence-transformers model in-process. Texts are encoded in batches
+of LOCAL_EMBEDDER_BATCH_SIZE with LOCAL_EMBEDDER_THREADS torch threads, and
+vectors can be cut to fewer dimensions (Matryoshka-style truncation followed
+by re-normalization) to shrink the table and speed up search.
+
+sentence-transformers comes with chonkie[st]; the model is downloaded on
+first use and loaded once per process.
+
+Usage:
+    from services.local_embedder import LocalEmbedder
+
+    embedder = LocalEmbedder(dimensions=256)
+    vector = embedder.get_embedding("hello")
+"""
+import asyncio
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from agno.knowledge.embedder.base import Embedder
+
+from config.settings import (
+    LOCAL_EMBEDDER_BATCH_SIZE,
+    LOCAL_EMBEDDER_MODEL,
+    LOCAL_EMBEDDER_THREADS,
+)
+
+# Output size of well-known models, so the vector store can be created without loading the model
+KNOWN_DIMENSIONS = {
+    "sentence-transformers/all-MiniLM-L6-v2": 384,
+    "sentence-transformers/all-mpnet-base-v2": 768,
+    "BAAI/bge-small-en-v1.5": 384,
+    "BAAI/bge-base-en-v1.5": 768,
+    "nomic-ai/nomic-embed-text-v1.5": 768,
+    "mixedbread-ai/mxbai-embed-large-v1": 1024,
+}
+
+
+def reduce_vectors(vectors: np.ndarray, dimensions: Optional[int], normalize: bool = True) -> np.ndarray:
+    """Keep the first `dimensions` components and re-normalize each row to unit length"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if dimensions and dimensions < vectors.shape[-1]:
+        vectors = vectors[..., :dimensions]
+    if normalize:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1, norms)
+    return vectors
+
+
+@dataclass
+class LocalEmbedder(Embedder):
+    """
+    CPU embedder backed by sentence-transformers.
+
+    dimensions: Output size. Smaller than the model's native size truncates
+        the vectors; None uses the native size.
+    """
+
+    id: str = LOCAL_EMBEDDER_MODEL
+    dimensions: Optional[int] = None
+    batch_size: int = LOCAL_EMBEDDER_BATCH_SIZE
+    num_threads: int = LOCAL_EMBEDDER_THREADS
+    device: str = "cpu"
+    normalize: bool = True
+
+    def __post_init__(self):
+        self.enable_batch = True
+        self._model: Any = None
+        self._lock = threading.Lock()
+        native = KNOWN_DIMENSIONS.get(self.id)
+        if native is None:
+            native = self._get_model().get_sentence_embedding_dimension()
+        self.native_dimensions = native
+        if not self.dimensions or self.dimensions > native:
+            self.dimensions = native
+
+    def _get_model(self):
+        if self._model is None:
+            try:
+                import torch
+                from sentence_transformers import SentenceTransformer
+            except ImportError:
+                raise ImportError(
+                    "EMBEDDER_BACKEND=local needs sentence-transformers, "
+                    "install it with `pip install 'chonkie[st]'`"
+                )
+            torch.set_num_threads(self.num_threads)
+            print(f"🧠 Loading local embedding model {self.id} ({self.device}, {self.num_threads} threads)")
+            self._model = SentenceTransformer(self.id, device=self.device)
+        return self._model
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Embed texts in batches; returns a (len(texts), dimensions) float32 matrix"""
+        if not texts:
+            return np.zeros((0, self.dimensions), dtype=np.float32)
+        # One encode at a time: torch already spreads each batch over num_threads
+        with self._lock:
+            model = self._get_model()
+            vectors = model.encode(
+                texts, batch_size=self.batch_size, convert_to_numpy=True, show_progress_bar=False
+            )
+        return reduce_vectors(vectors, self.dimensions, self.normalize)
+
+    def get_embedding(self, text: str) -> List[float]:
+        return self.encode([text])[0].tolist()
+
+    def get_embedding_and_usage(self, text: str) -> Tuple[List[float], Optional[Dict]]:
+        return self.get_embedding(text), None
+
+    async def async_get_embedding(self, text: str) -> List[float]:
+        return await asyncio.to_thread(self.get_embedding, text)
+
+    async def async_get_embedding_and_usage(self, text: str) -> Tuple[List[float], Optional[Dict]]:
+        return await asyncio.to_thread(self.get_embedding_and_usage, text)
+
+    def get_embeddings_batch_and_usage(self, texts: List[str]) -> Tuple[List[List[float]], List[Optional[Dict]]]:
+        return self.encode(texts).tolist(), [None] * len(texts)
+
+    async def async_get_embeddings_batch_and_usage(
+        self, texts: List[str]
+    ) -> Tuple[List[List[float]], List[Optional[Dict]]]:
+        return await asyncio.to_thread(self.get_embeddings_batch_and_usage, texts)
@@ -0,0 +1,358 @@
+"""
+Memory Consolidation - Periodic merging of near-duplicate user memories
+
+Memory extraction is asked to consolidate and deduplicate, but every turn only
+sees its own messages, so near-identical memories pile up in the agno
+memories table. A consolidation pass clusters each user's memories by
+embedding similarity (reusing the memory index), merges every cluster into
+one memory with a single cheap LLM call, and moves the originals into an
+archive table so a merge can always be traced back or undone.
+
+Each pass reports memory count and estimated token footprint before and
+after.
+
+Usage:
+    from services.memory_consolidation import get_memory_consolidator
+
+    consolidator = get_memory_consolidator(db)
+    report = consolidator.run(dry_run=True)  # clusters only, nothing merged
+    consolidator.start()
+"""
+import json
+import sqlite3
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from uuid import uuid4
+
+import numpy as np
+from apscheduler.schedulers.background import BackgroundScheduler
+from agno.db.schemas import UserMemory
+from agno.models.message import Message
+
+from config.model_factory import create_openai_model
+from config.settings import (
+    MEMORY_ARCHIVE_DB_FILE,
+    MEMORY_CONSOLIDATION_INTERVAL_SECONDS,
+    MEMORY_CONSOLIDATION_MODEL_ID,
+    MEMORY_CONSOLIDATION_THRESHOLD,
+)
+from services.embedding_pipeline import estimate_tokens
+from services.memory_index import MemoryIndex, memory_updated_at, get_memory_index
+from services.metrics import get_metrics_registry
+
+MERGE_INSTRUCTIONS = """You merge near-duplicate memories about one user into a single memory.
+Keep every distinct fact, preference and detail; drop repetition.
+If memories disagree, keep the most recent one (they are listed oldest first).
+Answer with the merged memory only: one or two sentences in third person, no preamble."""
+
+
+@dataclass
+class ConsolidationReport:
+    """Memory count and token footprint before and after one consolidation pass"""
+    started_at: str = field(default_factory=lambda: datetime.now().isoformat())
+    seconds: float = 0.0
+    dry_run: bool = False
+    users: int = 0
+    memories_before: int = 0
+    memories_after: int = 0
+    tokens_before: int = 0
+    tokens_after: int = 0
+    clusters: int = 0
+    llm_calls: int = 0
+    archived: int = 0
+    errors: List[str] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["seconds"] = round(self.seconds, 3)
+        return data
+
+
+class MemoryConsolidator:
+    """
+    Merges near-duplicate memories of every user.
+
+    Args:
+        db: agno database holding the memories table
+        model: Model that writes merged memories (default: MEMORY_CONSOLIDATION_MODEL_ID)
+        index: Memory index used for embeddings (default: the shared one)
+        threshold: Cosine similarity from which two memories count as near-duplicates
+        max_cluster_size: Maximum memories merged into one
+        archive_db_file: SQLite file that keeps the merged originals
+        interval_seconds: Time between scheduled passes
+    """
+
+    def __init__(
+        self,
+        db,
+        model=None,
+        index: Optional[MemoryIndex] = None,
+        threshold: float = MEMORY_CONSOLIDATION_THRESHOLD,
+        max_cluster_size: int = 8,
+        archive_db_file: str = MEMORY_ARCHIVE_DB_FILE,
+        interval_seconds: int = MEMORY_CONSOLIDATION_INTERVAL_SECONDS,
+    ):
+        self.db = db
+        self.model = model
+        self.index = index
+        self.threshold = threshold
+        self.max_cluster_size = max(2, max_cluster_size)
+        self.archive_db_file = archive_db_file
+        self.interval_seconds = interval_seconds
+
+        self.reports: List[ConsolidationReport] = []
+        self.max_reports = 20
+        self._run_lock = threading.Lock()
+        self._scheduler: Optional[BackgroundScheduler] = None
+
+        self._init_archive()
+
+    # ------------------------------------------------------------------
+    # Archive
+    # ------------------------------------------------------------------
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.archive_db_file)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _init_archive(self):
+        Path(self.archive_db_file).parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS archived_memories (
+                    memory_id TEXT PRIMARY KEY,
+                    user_id TEXT NOT NULL,
+                    merged_into TEXT NOT NULL,
+                    memory TEXT NOT NULL,
+                    archived_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_archived_merged_into ON archived_memories (merged_into)")
+
+    def _archive(self, user_id: str, merged_into: str, memories: List[UserMemory]):
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO archived_memories VALUES (?, ?, ?, ?, ?)",
+                [
+                    (memory.memory_id, user_id, merged_into, json.dumps(asdict(memory), ensure_ascii=False, default=str), now)
+                    for memory in memories
+                ],
+            )
+
+    def list_archived(self, user_id: str, limit: int = 100) -> List[Dict[str, Any]]:
+        """Archived originals of a user, newest first"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT * FROM archived_memories WHERE user_id = ? ORDER BY archived_at DESC LIMIT ?",
+                (user_id, limit),
+            ).fetchall()
+        return [{**dict(row), "memory": json.loads(row["memory"])} for row in rows]
+
+    # ------------------------------------------------------------------
+    # Clustering & merging
+    # ------------------------------------------------------------------
+
+    def _index(self) -> MemoryIndex:
+        return self.index if self.index is not None else get_memory_index()
+
+    def cluster(self, user_id: str, memories: List[UserMemory]) -> List[List[UserMemory]]:
+        """
+        Groups of near-duplicate memories (two or more each), oldest first.
+
+        Every cluster is built around one memory and only takes memories close
+        to it, so a chain of slightly different memories is never merged.
+        """
+        embedded, matrix = self._index().embed_memories(user_id, memories)
+        if len(embedded) < 2:
+            return []
+        similarity = matrix @ matrix.T
+        clustered = np.zeros(len(embedded), dtype=bool)
+        clusters = []
+        # Newest memories seed clusters, so the freshest wording anchors each merge
+        for seed in sorted(range(len(embedded)), key=lambda i: memory_updated_at(embedded[i]), reverse=True):
+            if clustered[seed]:
+                continue
+            candidates = np.flatnonzero((similarity[seed] >= self.threshold) & ~clustered)
+            candidates = sorted(candidates, key=lambda i: -similarity[seed, i])[:self.max_cluster_size]
+            if len(candidates) < 2:
+                continue
+            clustered[candidates] = True
+            clusters.append(sorted((embedded[i] for i in candidates), key=memory_updated_at))
+        return clusters
+
+    def _model(self):
+        if self.model is None:
+            self.model = create_openai_model(MEMORY_CONSOLIDATION_MODEL_ID)
+        return self.model
+
+    def merge_text(self, memories: List[UserMemory]) -> str:
+        """One LLM call: the merged text of a cluster"""
+        listing = "\n".join(f"- {memory.memory}" for memory in memories)
+        response = self._model().response(messages=[
+            Message(role="system", content=MERGE_INSTRUCTIONS),
+            Message(role="user", content=f"Memories:\n{listing}"),
+        ])
+        return (response.content or "").strip()
+
+    def _merge(self, user_id: str, cluster: List[UserMemory]) -> UserMemory:
+        text = self.merge_text(cluster)
+        if not text:
+            raise ValueError("the model returned an empty memory")
+        newest = cluster[-1]
+        topics = list(dict.fromkeys(topic for memory in cluster for topic in (memory.topics or [])))
+        merged = UserMemory(
+            memory=text,
+            memory_id=str(uuid4()),
+            topics=topics or None,
+            user_id=user_id,
+            agent_id=newest.agent_id,
+            team_id=newest.team_id,
+        )
+        # Archive before touching the table, so an interrupted merge loses nothing
+        self._archive(user_id, merged.memory_id, cluster)
+        self.db.upsert_user_memory(merged)
+        self.db.delete_user_memories([memory.memory_id for memory in cluster])
+        return merged
+
+    # ------------------------------------------------------------------
+    # Passes
+    # ------------------------------------------------------------------
+
+    def _user_ids(self) -> List[str]:
+        stats, _ = self.db.get_user_memory_stats()
+        return [row["user_id"] for row in stats if row.get("user_id")]
+
+    def consolidate_user(self, user_id: str, report: ConsolidationReport, dry_run: bool = False):
+        """Merge the near-duplicates of one user into report"""
+        memories = self.db.get_user_memories(user_id=user_id) or []
+        tokens = sum(estimate_tokens(memory.memory) for memory in memories)
+        report.users += 1
+        report.memories_before += len(memories)
+        report.tokens_before += tokens
+
+        count = len(memories)
+        for cluster in self.cluster(user_id, memories):
+            report.clusters += 1
+            if dry_run:
+                continue
+            try:
+                merged = self._merge(user_id, cluster)
+            except Exception as e:
+                report.errors.append(f"{user_id}: {str(e)}")
+                print(f"❌ Memory merge failed for {user_id} ({len(cluster)} memories): {str(e)}")
+                continue
+            finally:
+                report.llm_calls += 1
+            report.archived += len(cluster)
+            count += 1 - len(cluster)
+            tokens += estimate_tokens(merged.memory) - sum(estimate_tokens(memory.memory) for memory in cluster)
+        report.memories_after += count
+        report.tokens_after += tokens
+
+    def run(self, user_id: Optional[str] = None, dry_run: bool = False) -> ConsolidationReport:
+        """
+        Run one consolidation pass.
+
+        Args:
+            user_id: Only consolidate this user (default: every user with memories)
+            dry_run: Find clusters without calling the model or changing memories
+
+        Returns:
+            ConsolidationReport: Counts and token footprint before and after
+        """
+        report = ConsolidationReport(dry_run=dry_run)
+        started = time.perf_counter()
+        with self._run_lock:
+            try:
+                user_ids = [user_id] if user_id else self._user_ids()
+            except Exception as e:
+                user_ids = []
+                report.errors.append(str(e))
+                print(f"❌ Memory consolidation could not list users: {str(e)}")
+            for uid in user_ids:
+                try:
+                    self.consolidate_user(uid, report, dry_run)
+                except Exception as e:
+                    report.errors.append(f"{uid}: {str(e)}")
+                    print(f"❌ Memory consolidation failed for {uid}: {str(e)}")
+        report.seconds = time.perf_counter() - started
+
+        self._record(report)
+        return report
+
+    def _record(self, report: ConsolidationReport):
+        self.reports = (self.reports + [report])[-self.max_reports:]
+        if report.dry_run:
+            return
+        metrics = get_metrics_registry()
+        metrics.counter("memory_consolidation_runs_total", "Memory consolidation passes").inc(
+            outcome="error" if report.errors else "ok"
+        )
+        metrics.counter("memory_consolidation_merged_total", "Memories archived into merged memories").inc(
+            report.archived
+        )
+        metrics.counter("memory_consolidation_llm_calls_total", "LLM calls made to merge memories").inc(
+            report.llm_calls
+        )
+        metrics.gauge("memory_total", "Stored user memories after the last consolidation").set(report.memories_after)
+        metrics.gauge("memory_tokens_total", "Estimated tokens of stored user memories").set(report.tokens_after)
+        print(
+            f"🧠 Consolidated memories of {report.users} user(s): {report.memories_before} → {report.memories_after} memories, "
+            f"{report.tokens_before} → {report.tokens_after} tokens, {report.llm_calls} LLM call(s) ({report.seconds:.1f}s)"
+        )
+
+    # ------------------------------------------------------------------
+    # Scheduling & stats
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """Run consolidation passes in a background thread"""
+        if self._scheduler is not None:
+            return
+        self._scheduler = BackgroundScheduler(daemon=True)
+        self._scheduler.add_job(
+            self.run,
+            "interval",
+            seconds=self.interval_seconds,
+            id="memory-consolidation",
+            max_instances=1,
+            coalesce=True,
+        )
+        self._scheduler.start()
+        print(f"✅ Memory consolidation started (every {self.interval_seconds}s, similarity ≥ {self.threshold})")
+
+    def stop(self):
+        """Stop the background scheduler"""
+        if self._scheduler is not None:
+            self._scheduler.shutdown(wait=False)
+            self._scheduler = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get consolidation statistics"""
+        return {
+            "running": self._scheduler is not None,
+            "interval_seconds": self.interval_seconds,
+            "threshold": self.threshold,
+            "max_cluster_size": self.max_cluster_size,
+            "recent_runs": [report.to_dict() for report in self.reports[-5:]],
+        }
+
+
+# Global singleton instance
+_memory_consolidator: Optional[MemoryConsolidator] = None
+
+
+def get_memory_consolidator(db=None) -> MemoryConsolidator:
+    """Get or create the global memory consolidator"""
+    global _memory_consolidator
+    if _memory_consolidator is None:
+        if db is None:
+            raise ValueError("A database is required to create the memory consolidator")
+        _memory_consolidator = MemoryConsolidator(db)
+    return _memory_consolidator
@@ -0,0 +1,346 @@
+"""
+Memory Index - Embedding-ranked user memories for the agent's context
+
+agno puts every memory of a user into the system prompt. Once a user has
+hundreds of memories that inflates prompt tokens and latency on every run.
+RelevantMemoryManager instead returns the memories closest to the current
+task: memories are embedded once (with the knowledge base's embedder and its
+persistent cache) into a small NumPy matrix per user, ranked by cosine
+similarity to the run input, and capped at MEMORY_TOP_K memories and
+MEMORY_CONTEXT_MAX_TOKENS estimated tokens.
+
+The run input reaches the manager through a context variable set by the
+focus_memories_on_input pre-hook. agno reads memories while building the
+system prompt, synchronously on the event loop under arun, so there the hook
+is awaited and embeds the input (and any new memories) in a worker thread
+beforehand; the prompt build only ranks. Under agent.run the same hook embeds
+inline. Outside of a run (memory APIs, extraction) all memories are returned
+as before.
+
+Usage:
+    from services.memory_index import RelevantMemoryManager, focus_memories_on_input
+
+    agent = Agent(..., memory_manager=RelevantMemoryManager(db=db), pre_hooks=[focus_memories_on_input])
+"""
+import asyncio
+import hashlib
+import inspect
+import threading
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from agno.db.schemas import UserMemory
+from agno.memory import MemoryManager
+from agno.utils.log import log_debug, log_warning
+
+from config.settings import MEMORY_CONTEXT_MAX_TOKENS, MEMORY_TOP_K
+from services.embedding_pipeline import estimate_tokens
+from services.memory_queue import DeferredMemoryManager
+from services.metrics import get_metrics_registry
+
+_current_query: ContextVar[Optional[str]] = ContextVar("memory_query", default=None)
+# Embedding of the current run's input, computed by the pre-hook off the event loop
+_current_query_vector: ContextVar[Optional[np.ndarray]] = ContextVar("memory_query_vector", default=None)
+
+
+def get_memory_query() -> Optional[str]:
+    """Task text of the current run (None outside of a run)"""
+    return _current_query.get()
+
+
+def get_memory_query_vector() -> Optional[np.ndarray]:
+    """Embedding of the current run's task text, if the pre-hook computed it"""
+    return _current_query_vector.get()
+
+
+def set_memory_query(query: Optional[str], vector: Optional[np.ndarray] = None):
+    _current_query.set(query or None)
+    _current_query_vector.set(vector if query else None)
+
+
+def focus_memories_on_input(run_input=None, agent=None, user_id=None):
+    """
+    Agent pre-hook: rank this run's memories by relevance to its input
+
+    agno's sync hook path (agent.run) calls hooks without awaiting them, its
+    async path (arun) awaits hooks it sees as coroutine functions. This hook
+    is marked as one: without a running loop it embeds inline, on a loop it
+    returns a coroutine that embeds in a worker thread.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        query, manager = _run_query(run_input, agent)
+        set_memory_query(query, manager.prepare_query(user_id, query) if manager is not None else None)
+        return None
+    return _afocus_memories_on_input(run_input, agent, user_id)
+
+
+async def _afocus_memories_on_input(run_input, agent, user_id) -> None:
+    query, manager = _run_query(run_input, agent)
+    vector = await asyncio.to_thread(manager.prepare_query, user_id, query) if manager is not None else None
+    set_memory_query(query, vector)
+
+
+def _run_query(run_input, agent) -> Tuple[Optional[str], Optional["RelevantMemoryManager"]]:
+    """The run's task text, and the agent's manager if it ranks memories"""
+    query = run_input.input_content_string() if run_input is not None else None
+    manager = getattr(agent, "memory_manager", None)
+    return query, (manager if query and isinstance(manager, RelevantMemoryManager) else None)
+
+
+# Let agno's async hook path await the hook (inspect.markcoroutinefunction is Python 3.12+)
+if hasattr(inspect, "markcoroutinefunction"):
+    inspect.markcoroutinefunction(focus_memories_on_input)
+else:
+    focus_memories_on_input._is_coroutine = asyncio.coroutines._is_coroutine
+
+
+def _text_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8", errors="surrogatepass")).hexdigest()
+
+
+def memory_updated_at(memory: UserMemory) -> float:
+    value = memory.updated_at
+    if value is None:
+        return 0.0
+    return value.timestamp() if hasattr(value, "timestamp") else float(value)
+
+
+@dataclass
+class _UserMatrix:
+    """Normalized embeddings of one user's memories, one row per memory"""
+    hashes: Dict[str, str] = field(default_factory=dict)
+    rows: Dict[str, int] = field(default_factory=dict)
+    matrix: Optional[np.ndarray] = None
+
+
+class MemoryIndex:
+    """
+    Per-user embedding matrices of memories, refreshed incrementally.
+
+    Args:
+        embedder: Embedder for memories and queries (defaults to the knowledge base's)
+        top_k: Maximum memories returned per run
+        max_tokens: Estimated token budget of the returned memories
+    """
+
+    def __init__(self, embedder=None, top_k: int = MEMORY_TOP_K, max_tokens: int = MEMORY_CONTEXT_MAX_TOKENS):
+        self._embedder = embedder
+        self.top_k = top_k
+        self.max_tokens = max_tokens
+        self._users: Dict[str, _UserMatrix] = {}
+        self._lock = threading.Lock()
+
+        self.runs = 0
+        self.tokens_available = 0
+        self.tokens_injected = 0
+        self.embedded_memories = 0
+
+    @property
+    def embedder(self):
+        if self._embedder is None:
+            from services.knowledge_service import get_knowledge_service
+
+            self._embedder = get_knowledge_service().vector_db.embedder
+        return self._embedder
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        if getattr(self.embedder, "enable_batch", False):
+            embeddings, _ = self.embedder.get_embeddings_batch_and_usage(texts)
+            return embeddings
+        return [self.embedder.get_embedding(text) for text in texts]
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    def _sync(self, user_id: str, memories: List[UserMemory]) -> _UserMatrix:
+        """Embed new or changed memories and drop deleted ones"""
+        with self._lock:
+            current = self._users.get(user_id) or _UserMatrix()
+            wanted = {memory.memory_id: _text_hash(memory.memory) for memory in memories}
+            if wanted == current.hashes and current.matrix is not None:
+                return current
+
+            changed = [memory for memory in memories if current.hashes.get(memory.memory_id) != wanted[memory.memory_id]]
+            vectors = self._embed([memory.memory for memory in changed])
+            fresh = {memory.memory_id: vector for memory, vector in zip(changed, vectors) if vector}
+            self.embedded_memories += len(fresh)
+
+            rows, matrix_rows = {}, []
+            for memory in memories:
+                memory_id = memory.memory_id
+                if memory_id in fresh:
+                    vector = np.asarray(fresh[memory_id], dtype=np.float32)
+                elif memory_id in current.rows and current.hashes.get(memory_id) == wanted[memory_id]:
+                    vector = current.matrix[current.rows[memory_id]]
+                else:
+                    continue
+                rows[memory_id] = len(matrix_rows)
+                matrix_rows.append(vector)
+
+            updated = _UserMatrix(
+                hashes={memory_id: wanted[memory_id] for memory_id in rows},
+                rows=rows,
+                matrix=self._normalize(np.vstack(matrix_rows)) if matrix_rows else None,
+            )
+            self._users[user_id] = updated
+            return updated
+
+    def embed_memories(self, user_id: str, memories: List[UserMemory]) -> Tuple[List[UserMemory], np.ndarray]:
+        """The memories that have an embedding, and their normalized vectors row by row"""
+        user_matrix = self._sync(user_id, [memory for memory in memories if memory.memory_id])
+        embedded = [memory for memory in memories if memory.memory_id in user_matrix.rows]
+        if user_matrix.matrix is None or not embedded:
+            return [], np.zeros((0, 0), dtype=np.float32)
+        return embedded, user_matrix.matrix[[user_matrix.rows[memory.memory_id] for memory in embedded]]
+
+    def _cap(self, memories: List[UserMemory]) -> List[UserMemory]:
+        """Take memories in order until top_k or the token budget is reached"""
+        selected, tokens = [], 0
+        for memory in memories:
+            cost = estimate_tokens(memory.memory)
+            if len(selected) >= self.top_k or (selected and tokens + cost > self.max_tokens):
+                break
+            selected.append(memory)
+            tokens += cost
+        return selected
+
+    def _needs_ranking(self, memories: List[UserMemory]) -> bool:
+        total_tokens = sum(estimate_tokens(memory.memory) for memory in memories)
+        return len(memories) > self.top_k or total_tokens > self.max_tokens
+
+    def prepare(self, user_id: str, memories: List[UserMemory], query: str) -> Optional[np.ndarray]:
+        """
+        Do the embedding work of select() ahead of time (blocking).
+
+        Returns:
+            The query vector to pass to select(), None when no ranking is needed,
+            or an empty vector when embedding failed
+        """
+        if not self._needs_ranking(memories):
+            return None
+        try:
+            self._sync(user_id, [memory for memory in memories if memory.memory_id])
+            return np.asarray(self._embed([query])[0], dtype=np.float32)
+        except Exception as e:
+            log_warning(f"Embedding the memory query failed: {e}")
+            return np.zeros(0, dtype=np.float32)
+
+    def select(
+        self, user_id: str, memories: List[UserMemory], query: str, query_vector: Optional[np.ndarray] = None
+    ) -> List[UserMemory]:
+        """The memories most relevant to query, within the count and token caps"""
+        total_tokens = sum(estimate_tokens(memory.memory) for memory in memories)
+        if not self._needs_ranking(memories):
+            selected = memories
+        else:
+            try:
+                user_matrix = self._sync(user_id, [memory for memory in memories if memory.memory_id])
+                if query_vector is None:
+                    query_vector = np.asarray(self._embed([query])[0], dtype=np.float32)
+                if user_matrix.matrix is None or not query_vector.size:
+                    raise ValueError("no embeddings available")
+                scores = user_matrix.matrix @ self._normalize(query_vector)
+                by_id = {memory.memory_id: memory for memory in memories}
+                ranked = [
+                    by_id[memory_id]
+                    for memory_id, _ in sorted(user_matrix.rows.items(), key=lambda item: -scores[item[1]])
+                ]
+            except Exception as e:
+                # Without embeddings, fall back to the most recently updated memories
+                log_warning(f"Memory ranking failed, using the most recent memories: {e}")
+                ranked = sorted(memories, key=memory_updated_at, reverse=True)
+            selected = self._cap(ranked)
+
+        injected_tokens = sum(estimate_tokens(memory.memory) for memory in selected)
+        self._record(total_tokens, injected_tokens, len(memories), len(selected))
+        log_debug(f"Using {len(selected)} of {len(memories)} memories for {user_id} ({injected_tokens}/{total_tokens} tokens)")
+        return selected
+
+    def _record(self, total_tokens: int, injected_tokens: int, total: int, selected: int):
+        with self._lock:
+            self.runs += 1
+            self.tokens_available += total_tokens
+            self.tokens_injected += injected_tokens
+        metrics = get_metrics_registry()
+        metrics.counter("memory_context_tokens_saved_total", "Estimated memory tokens kept out of prompts").inc(
+            total_tokens - injected_tokens
+        )
+        metrics.histogram(
+            "memory_context_tokens", "Estimated tokens of memories injected per run",
+            (50, 100, 250, 500, 1000, 2000, 5000, 10000),
+        ).observe(injected_tokens)
+        metrics.histogram(
+            "memory_context_skipped", "Memories left out of the context per run",
+            (0, 1, 5, 10, 50, 100, 500),
+        ).observe(total - selected)
+
+    def invalidate(self, user_id: Optional[str] = None):
+        with self._lock:
+            if user_id is None:
+                self._users.clear()
+            else:
+                self._users.pop(user_id, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "top_k": self.top_k,
+                "max_tokens": self.max_tokens,
+                "users_indexed": len(self._users),
+                "memories_indexed": sum(len(user.rows) for user in self._users.values()),
+                "embedded_memories": self.embedded_memories,
+                "runs": self.runs,
+                "tokens_available": self.tokens_available,
+                "tokens_injected": self.tokens_injected,
+                "tokens_saved_per_run": round((self.tokens_available - self.tokens_injected) / self.runs, 1)
+                if self.runs else None,
+            }
+
+
+class RelevantMemoryManager(MemoryManager):
+    """MemoryManager that hands a run only the memories relevant to its input"""
+
+    def __init__(self, *args, index: Optional[MemoryIndex] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.index = index
+
+    def _index(self) -> MemoryIndex:
+        return self.index if self.index is not None else get_memory_index()
+
+    def prepare_query(self, user_id: Optional[str], query: str) -> Optional[np.ndarray]:
+        """Embed the query and any new memories of the user (blocking; called off the event loop)"""
+        memories = super().get_user_memories(user_id=user_id)
+        if not memories:
+            return None
+        return self._index().prepare(user_id or "default", memories, query)
+
+    def get_user_memories(self, user_id: Optional[str] = None) -> Optional[List[UserMemory]]:
+        memories = super().get_user_memories(user_id=user_id)
+        query = get_memory_query()
+        if not memories or not query:
+            return memories
+        return self._index().select(user_id or "default", memories, query, get_memory_query_vector())
+
+
+class DeferredRelevantMemoryManager(RelevantMemoryManager, DeferredMemoryManager):
+    """Relevant memories in the context, extraction queued (MEMORY_MODE=deferred)"""
+
+
+# Global singleton instance
+_memory_index: Optional[MemoryIndex] = None
+
+
+def get_memory_index() -> MemoryIndex:
+    """Get or create the global memory index"""
+    global _memory_index
+    if _memory_index is None:
+        _memory_index = MemoryIndex()
+    return _memory_index
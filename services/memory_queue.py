@@ -0,0 +1,311 @@
+"""
+Memory Queue - Deferred, batched user-memory extraction
+
+With MEMORY_MODE=deferred, agents no longer wait for a memory-extraction LLM
+call at the end of every turn. DeferredMemoryManager queues the turn's
+messages instead, and a background thread runs one extraction per user once
+MEMORY_BATCH_TURNS turns are queued or the user has been idle for
+MEMORY_IDLE_SECONDS. Several turns then cost a single MemoryManager call.
+
+The time each extraction takes is what a turn used to wait for, so the queue
+reports it as latency saved per turn, next to the LLM calls saved by batching.
+
+A failed extraction puts its turns back in front of the user's queue and is
+retried with exponential backoff (MEMORY_RETRY_BACKOFF_SECONDS, doubling)
+up to MEMORY_EXTRACTION_MAX_RETRIES times before the turns are dropped.
+
+Usage:
+    from services.memory_queue import DeferredMemoryManager, get_memory_queue
+
+    manager = DeferredMemoryManager(db=db, model=OpenAIChat(id="gpt-4o-mini"))
+    get_memory_queue().flush()  # extract everything queued now
+"""
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from agno.memory import MemoryManager
+from agno.models.message import Message
+from agno.utils.log import log_debug
+
+from config.settings import (
+    MEMORY_BATCH_TURNS,
+    MEMORY_EXTRACTION_MAX_RETRIES,
+    MEMORY_IDLE_SECONDS,
+    MEMORY_RETRY_BACKOFF_SECONDS,
+)
+from services.metrics import get_metrics_registry
+
+
+@dataclass
+class _PendingBatch:
+    """Turns of one user (and agent) waiting for extraction"""
+    manager: "DeferredMemoryManager"
+    user_id: str
+    agent_id: Optional[str]
+    team_id: Optional[str]
+    messages: List[Message] = field(default_factory=list)
+    turns: int = 0
+    first_queued: float = field(default_factory=time.monotonic)
+    last_queued: float = field(default_factory=time.monotonic)
+    # Failed extractions of these turns so far, and when the next may start
+    attempts: int = 0
+    retry_at: float = 0.0
+
+    def ready_at(self, batch_turns: int, idle_seconds: float) -> float:
+        """Monotonic time at which the batch becomes due"""
+        due = self.last_queued if self.turns >= batch_turns else self.last_queued + idle_seconds
+        return max(due, self.retry_at)
+
+
+class MemoryExtractionQueue:
+    """
+    Per-user queues of turns, extracted in batches by a background thread.
+
+    Args:
+        batch_turns: Queued turns that trigger an extraction
+        idle_seconds: Idle time after the last turn that triggers an extraction
+        max_retries: Retries of a failed extraction before its turns are dropped
+        retry_backoff_seconds: Delay before the first retry (doubles per retry)
+    """
+
+    def __init__(
+        self,
+        batch_turns: int = MEMORY_BATCH_TURNS,
+        idle_seconds: float = MEMORY_IDLE_SECONDS,
+        max_retries: int = MEMORY_EXTRACTION_MAX_RETRIES,
+        retry_backoff_seconds: float = MEMORY_RETRY_BACKOFF_SECONDS,
+    ):
+        self.batch_turns = max(1, batch_turns)
+        self.idle_seconds = idle_seconds
+        self.max_retries = max(0, max_retries)
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self._pending: Dict[Tuple[str, Optional[str], Optional[str]], _PendingBatch] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._extract_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+
+        self.turns_queued = 0
+        self.turns_extracted = 0
+        self.turns_failed = 0
+        self.retries = 0
+        self.batches = 0
+        self.extraction_seconds = 0.0
+        self.last_error: Optional[str] = None
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="memory-extraction", daemon=True)
+            self._thread.start()
+
+    def enqueue(
+        self,
+        manager: "DeferredMemoryManager",
+        messages: List[Message],
+        user_id: str,
+        agent_id: Optional[str] = None,
+        team_id: Optional[str] = None,
+    ):
+        """Queue one turn; returns immediately"""
+        key = (user_id, agent_id, team_id)
+        with self._lock:
+            batch = self._pending.get(key)
+            if batch is None:
+                batch = self._pending[key] = _PendingBatch(manager, user_id, agent_id, team_id)
+            # Agents may be copied per request; the latest copy extracts the batch
+            batch.manager = manager
+            batch.messages.extend(messages)
+            batch.turns += 1
+            batch.last_queued = time.monotonic()
+            self.turns_queued += 1
+            pending_turns = sum(b.turns for b in self._pending.values())
+        metrics = get_metrics_registry()
+        metrics.counter("memory_turns_queued_total", "Turns queued for deferred memory extraction").inc()
+        metrics.gauge("memory_pending_turns", "Turns waiting for memory extraction").set(pending_turns)
+        self._ensure_thread()
+        if batch.turns >= self.batch_turns:
+            self._wakeup.set()
+
+    def _take_ready(self, force: bool = False) -> List[_PendingBatch]:
+        now = time.monotonic()
+        with self._lock:
+            ready = [
+                key for key, batch in self._pending.items()
+                if force or batch.ready_at(self.batch_turns, self.idle_seconds) <= now
+            ]
+            return [self._pending.pop(key) for key in ready]
+
+    def _next_deadline(self) -> float:
+        """Seconds until the next batch becomes due (idle timer or retry backoff)"""
+        with self._lock:
+            if not self._pending:
+                return self.idle_seconds
+            earliest = min(batch.ready_at(self.batch_turns, self.idle_seconds) for batch in self._pending.values())
+        return max(0.05, earliest - time.monotonic())
+
+    def _requeue(self, batch: _PendingBatch):
+        """Put a failed batch back in front of the turns queued since, to retry after a backoff"""
+        batch.attempts += 1
+        batch.retry_at = time.monotonic() + self.retry_backoff_seconds * 2 ** (batch.attempts - 1)
+        key = (batch.user_id, batch.agent_id, batch.team_id)
+        with self._lock:
+            newer = self._pending.get(key)
+            if newer is not None:
+                batch.manager = newer.manager
+                batch.messages.extend(newer.messages)
+                batch.turns += newer.turns
+                batch.last_queued = newer.last_queued
+            self._pending[key] = batch
+        self.retries += 1
+
+    def _extract(self, batch: _PendingBatch):
+        metrics = get_metrics_registry()
+        started = time.perf_counter()
+        try:
+            batch.manager.extract_now(
+                messages=batch.messages, user_id=batch.user_id, agent_id=batch.agent_id, team_id=batch.team_id
+            )
+        except Exception as e:
+            self.last_error = str(e)
+            if batch.attempts < self.max_retries:
+                self._requeue(batch)
+                print(
+                    f"⚠️  Memory extraction failed for {batch.user_id} ({batch.turns} turns), "
+                    f"retry {batch.attempts}/{self.max_retries} queued: {str(e)}"
+                )
+                return
+            self.turns_failed += batch.turns
+            print(f"❌ Memory extraction failed for {batch.user_id} ({batch.turns} turns), dropping them: {str(e)}")
+            return
+        seconds = time.perf_counter() - started
+        self.batches += 1
+        self.turns_extracted += batch.turns
+        self.extraction_seconds += seconds
+        metrics.counter("memory_extraction_batches_total", "Deferred memory extraction calls").inc()
+        metrics.histogram(
+            "memory_extraction_seconds", "Time of one batched memory extraction",
+            (0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0),
+        ).observe(seconds)
+        log_debug(f"Extracted memories for {batch.user_id} from {batch.turns} turns in {seconds:.2f}s")
+
+    def _drain(self, force: bool = False):
+        with self._extract_lock:
+            for batch in self._take_ready(force):
+                self._extract(batch)
+        with self._lock:
+            pending_turns = sum(b.turns for b in self._pending.values())
+        get_metrics_registry().gauge("memory_pending_turns", "Turns waiting for memory extraction").set(pending_turns)
+
+    def _run(self):
+        while not self._stopping:
+            self._wakeup.wait(timeout=self._next_deadline())
+            self._wakeup.clear()
+            if self._stopping:
+                break
+            self._drain()
+
+    def flush(self):
+        """Extract everything queued now (blocks until done)"""
+        self._drain(force=True)
+
+    def close(self, timeout: Optional[float] = 60):
+        """Stop the background thread and extract what is still queued"""
+        self._stopping = True
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Queue state, LLM calls saved by batching and latency removed from each turn"""
+        with self._lock:
+            pending_turns = sum(b.turns for b in self._pending.values())
+            pending_users = len({b.user_id for b in self._pending.values()})
+        average = self.extraction_seconds / self.batches if self.batches else None
+        return {
+            "batch_turns": self.batch_turns,
+            "idle_seconds": self.idle_seconds,
+            "pending_turns": pending_turns,
+            "pending_users": pending_users,
+            "turns_queued": self.turns_queued,
+            "turns_extracted": self.turns_extracted,
+            "turns_failed": self.turns_failed,
+            "retries": self.retries,
+            "extraction_calls": self.batches,
+            "llm_calls_saved": max(0, self.turns_extracted - self.batches),
+            "avg_extraction_seconds": round(average, 3) if average is not None else None,
+            # Each turn used to wait for one extraction before the run finished
+            "latency_saved_per_turn_seconds": round(average, 3) if average is not None else None,
+            "last_error": self.last_error,
+        }
+
+
+class DeferredMemoryManager(MemoryManager):
+    """
+    MemoryManager whose end-of-turn extraction is queued instead of run inline.
+
+    Reading, searching and the agentic memory tools behave as in MemoryManager.
+    """
+
+    def __init__(self, *args, queue: Optional[MemoryExtractionQueue] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.queue = queue
+
+    def _queue(self) -> MemoryExtractionQueue:
+        return self.queue if self.queue is not None else get_memory_queue()
+
+    def create_user_memories(
+        self,
+        message: Optional[str] = None,
+        messages: Optional[List[Message]] = None,
+        agent_id: Optional[str] = None,
+        team_id: Optional[str] = None,
+        user_id: Optional[str] = None,
+    ) -> str:
+        if not messages and not message:
+            raise ValueError("You must provide either a message or a list of messages")
+        if message:
+            messages = [Message(role="user", content=message)]
+        self._queue().enqueue(self, list(messages), user_id or "default", agent_id, team_id)
+        return "Memory extraction queued"
+
+    async def acreate_user_memories(
+        self,
+        message: Optional[str] = None,
+        messages: Optional[List[Message]] = None,
+        agent_id: Optional[str] = None,
+        team_id: Optional[str] = None,
+        user_id: Optional[str] = None,
+    ) -> str:
+        return self.create_user_memories(
+            message=message, messages=messages, agent_id=agent_id, team_id=team_id, user_id=user_id
+        )
+
+    def extract_now(
+        self,
+        messages: List[Message],
+        user_id: str,
+        agent_id: Optional[str] = None,
+        team_id: Optional[str] = None,
+    ) -> str:
+        """Run the real (blocking) extraction over the given messages"""
+        return MemoryManager.create_user_memories(
+            self, messages=messages, agent_id=agent_id, team_id=team_id, user_id=user_id
+        )
+
+
+# Global singleton instance
+_memory_queue: Optional[MemoryExtractionQueue] = None
+
+
+def get_memory_queue() -> MemoryExtractionQueue:
+    """Get or create the global memory extraction queue"""
+    global _memory_queue
+    if _memory_queue is None:
+        _memory_queue = MemoryExtractionQueue()
+    return _memory_queue
@@ -0,0 +1,246 @@
+"""
+Metrics - In-process counters and histograms for Open Pulse
+
+A small, dependency-free metrics registry. Components record structured
+metrics here and the API exposes them as JSON (/api/metrics) and in the
+Prometheus text format (/metrics).
+
+Usage:
+    from services.metrics import get_metrics_registry
+
+    metrics = get_metrics_registry()
+    metrics.counter("reader_retries_total", "Retried requests").inc(reader="JinaWebReader")
+    with metrics.histogram("reader_fetch_seconds", "Fetch latency").time(reader="JinaWebReader"):
+        ...
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+
+# Default histogram buckets (seconds)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Dict[str, str]] = None) -> str:
+    pairs = list(key) + list((extra or {}).items())
+    if not pairs:
+        return ""
+    body = ",".join(f'{k}="{str(v)}"' for k, v in pairs)
+    return "{" + body + "}"
+
+
+class Counter:
+    """Monotonically increasing counter, one value per label set"""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, description: str = ""):
+        self.name = name
+        self.description = description
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        """Increase the counter for the given labels"""
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        """Current value for the given labels"""
+        return self._values.get(_label_key(labels), 0.0)
+
+    def total(self) -> float:
+        """Sum over all label sets"""
+        with self._lock:
+            return sum(self._values.values())
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [{"labels": dict(key), "value": value} for key, value in self._values.items()]
+
+    def render(self) -> List[str]:
+        lines = []
+        with self._lock:
+            for key, value in self._values.items():
+                lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+
+class Gauge(Counter):
+    """Value that can go up and down (e.g. current index coverage)"""
+
+    type_name = "gauge"
+
+    def set(self, value: float, **labels):
+        """Set the gauge for the given labels"""
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram:
+    """Distribution of observed values over fixed buckets"""
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, description: str = "", buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [bucket counts..., +Inf count], sum, count
+        self._series: Dict[LabelKey, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        """Record one observation"""
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+                self._series[key] = series
+            series["counts"][index] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall time of the wrapped block in seconds"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _quantile(self, counts: List[int], total: int, q: float) -> Optional[float]:
+        """Estimate a quantile as the upper bound of the bucket containing it"""
+        if total == 0:
+            return None
+        rank = q * total
+        cumulative = 0
+        for i, count in enumerate(counts):
+            cumulative += count
+            if cumulative >= rank:
+                return self.buckets[i] if i < len(self.buckets) else float("inf")
+        return float("inf")
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        result = []
+        with self._lock:
+            for key, series in self._series.items():
+                counts = series["counts"]
+                total = series["count"]
+                result.append({
+                    "labels": dict(key),
+                    "count": total,
+                    "sum": round(series["sum"], 6),
+                    "mean": round(series["sum"] / total, 6) if total else None,
+                    "p50": self._quantile(counts, total, 0.50),
+                    "p95": self._quantile(counts, total, 0.95),
+                    "p99": self._quantile(counts, total, 0.99),
+                    "buckets": {
+                        str(le): count for le, count in zip(list(self.buckets) + ["+Inf"], counts)
+                    },
+                })
+        return result
+
+    def render(self) -> List[str]:
+        lines = []
+        with self._lock:
+            for key, series in self._series.items():
+                cumulative = 0
+                for le, count in zip(list(self.buckets) + ["+Inf"], series["counts"]):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_format_labels(key, {'le': str(le)})} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {series['sum']}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {series['count']}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Registry of named metrics
+
+    Metrics are created on first use and shared afterwards, so any module can
+    ask for a metric by name without coordinating registration order.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, description: str, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = cls(name, description, **kwargs)
+                self._metrics[name] = metric
+            elif not isinstance(metric, cls) or type(metric) is not cls:
+                raise ValueError(f"Metric {name} already registered as {metric.type_name}")
+            return metric
+
+    def counter(self, name: str, description: str = "") -> Counter:
+        """Get or create a counter"""
+        return self._get_or_create(Counter, name, description)
+
+    def gauge(self, name: str, description: str = "") -> Gauge:
+        """Get or create a gauge"""
+        return self._get_or_create(Gauge, name, description)
+
+    def histogram(self, name: str, description: str = "", buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        """Get or create a histogram"""
+        return self._get_or_create(Histogram, name, description, buckets=buckets)
+
+    def snapshot(self, prefix: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Get all metrics as a JSON-serializable dictionary
+
+        Args:
+            prefix: Only include metrics whose name starts with this prefix
+        """
+        with self._lock:
+            metrics = dict(self._metrics)
+        return {
+            name: {
+                "type": metric.type_name,
+                "description": metric.description,
+                "series": metric.snapshot(),
+            }
+            for name, metric in sorted(metrics.items())
+            if prefix is None or name.startswith(prefix)
+        }
+
+    def render_prometheus(self) -> str:
+        """Render all metrics in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = dict(self._metrics)
+        lines = []
+        for name, metric in sorted(metrics.items()):
+            if metric.description:
+                lines.append(f"# HELP {name} {metric.description}")
+            lines.append(f"# TYPE {name} {metric.type_name}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Global singleton instance
+_metrics_registry: Optional[MetricsRegistry] = None
+
+
+def get_metrics_registry() -> MetricsRegistry:
+    """Get or create the global metrics registry"""
+    global _metrics_registry
+    if _metrics_registry is None:
+        _metrics_registry = MetricsRegistry()
+    return _metrics_registry
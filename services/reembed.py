@@ -0,0 +1,130 @@
+"""
+Re-embed - Copy the knowledge table into a new table with another embedder
+
+Switching the embedder backend, the vector size or the stored precision
+changes the vector column, so existing rows have to be embedded again. This
+command reads the current table in batches, embeds the stored chunk text with
+the new embedder and writes the rows (same ids, payload and namespace) into a
+new table. The source table is left untouched; an interrupted run can be
+resumed, since rows already in the target are skipped.
+
+Usage:
+    python -m services.reembed --backend local --dimensions 256 --target-table agno_docs_local
+
+Then set LANCEDB_TABLE_NAME (and EMBEDDER_BACKEND / EMBEDDING_DIMENSIONS /
+VECTOR_PRECISION) to match and restart the server.
+"""
+import argparse
+import json
+import time
+from collections import defaultdict
+from typing import Any, Dict, List
+
+import lancedb
+from agno.knowledge.document.base import Document
+
+from config.settings import (
+    EMBEDDER_BACKEND,
+    EMBEDDING_DIMENSIONS,
+    LANCEDB_TABLE_NAME,
+    LANCEDB_URI,
+    VECTOR_PRECISION,
+)
+from services.lance_store import PulseLanceDb
+
+
+def _documents_from_batch(batch, id_column: str) -> Dict[str, List]:
+    """Group a record batch into {content_hash: [(row_id, Document), ...]}"""
+    grouped: Dict[str, List] = defaultdict(list)
+    for row_id, payload in zip(batch.column(id_column).to_pylist(), batch.column("payload").to_pylist()):
+        data = json.loads(payload)
+        document = Document(
+            name=data.get("name"),
+            meta_data=data.get("meta_data") or {},
+            content=data["content"],
+            content_id=data.get("content_id"),
+        )
+        grouped[data.get("content_hash") or ""].append((row_id, document))
+    return grouped
+
+
+def reembed_table(source_table, target: PulseLanceDb, batch_rows: int = 1000) -> Dict[str, Any]:
+    """
+    Embed every row of source_table with target's embedder and write it to target.
+
+    Args:
+        source_table: Open LanceDB table to copy from
+        target: Store for the new table (created if missing)
+        batch_rows: Rows read, embedded and written per step
+
+    Returns:
+        dict: Rows read, skipped (already in target), written and elapsed time
+    """
+    target.create()
+    started = time.perf_counter()
+    stats = {"rows": 0, "skipped": 0, "written": 0, "failed": 0}
+    id_column = target._id
+    total = source_table.count_rows()
+
+    scanner = source_table.to_lance().to_batches(columns=[id_column, "payload"], batch_size=batch_rows)
+    for batch in scanner:
+        stats["rows"] += batch.num_rows
+        for content_hash, items in _documents_from_batch(batch, id_column).items():
+            existing = target._existing_ids([row_id for row_id, _ in items])
+            pending = [(row_id, doc) for row_id, doc in items if row_id not in existing]
+            stats["skipped"] += len(items) - len(pending)
+            if not pending:
+                continue
+            ids = [row_id for row_id, _ in pending]
+            documents = [doc for _, doc in pending]
+            report = target.pipeline.embed_documents_sync(documents)
+            rows = target._build_rows(content_hash, documents, ids)
+            if rows:
+                target._write_rows(rows)
+            stats["written"] += len(rows)
+            stats["failed"] += report.failed
+        print(f"🔁 Re-embedded {stats['rows']}/{total} rows ({stats['written']} written, {stats['skipped']} skipped)")
+
+    target._bump_version()
+    if stats["written"] and target.index_manager is not None:
+        target.index_manager.check()
+    stats["seconds"] = round(time.perf_counter() - started, 2)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-embed the knowledge table into a new table")
+    parser.add_argument("--backend", default=EMBEDDER_BACKEND, choices=["openai", "local"])
+    parser.add_argument("--dimensions", type=int, default=EMBEDDING_DIMENSIONS)
+    parser.add_argument("--precision", default=VECTOR_PRECISION, choices=["float32", "float16", "int8"])
+    parser.add_argument("--uri", default=LANCEDB_URI)
+    parser.add_argument("--source-table", default=LANCEDB_TABLE_NAME)
+    parser.add_argument("--target-table", required=True)
+    parser.add_argument("--batch-rows", type=int, default=1000)
+    args = parser.parse_args()
+
+    if args.target_table == args.source_table:
+        parser.error("--target-table must differ from --source-table")
+
+    from services.knowledge_service import create_embedder
+
+    source_table = lancedb.connect(args.uri).open_table(args.source_table)
+    target = PulseLanceDb(
+        table_name=args.target_table,
+        uri=args.uri,
+        embedder=create_embedder(args.backend, args.dimensions),
+        vector_precision=args.precision,
+    )
+    stats = reembed_table(source_table, target, batch_rows=args.batch_rows)
+    if target.write_queue is not None:
+        target.write_queue.close()
+
+    print(f"✅ Re-embedded {args.source_table} → {args.target_table}: {stats}")
+    print(
+        f"   Set LANCEDB_TABLE_NAME={args.target_table} EMBEDDER_BACKEND={args.backend} "
+        f"EMBEDDING_DIMENSIONS={args.dimensions or ''} VECTOR_PRECISION={args.precision} and restart"
+    )
+
+
+if __name__ == "__main__":
+    main()
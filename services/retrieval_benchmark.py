@@ -0,0 +1,315 @@
+"""
+Retrieval Benchmark - Ingest and search numbers for the knowledge table
+
+Generates a deterministic synthetic corpus, embeds it with a local hashing
+embedder (no API calls) and loads it into a PulseLanceDb table. It then
+measures:
+- ingest throughput (chunks/s through the same insert path as uploads)
+- query latency p50/p99 and recall@k for vector, keyword and hybrid search
+- the same again after the ANN index is built, plus how many of the exact
+  vector results the ANN index still returns
+
+Keyword and hybrid search need the full-text index, so it is built in both
+rounds; "without indexes" means no ANN vector index (exact vector scan).
+
+Each query is made of words sampled from one corpus chunk, which is the
+relevant result for recall@k. Results are written as JSON for trend tracking.
+
+Usage:
+    python -m services.retrieval_benchmark --sizes 10000 100000
+    python -m services.retrieval_benchmark --sizes 1000000 --queries 500 --output bench.json
+"""
+import argparse
+import json
+import math
+import random
+import shutil
+import statistics
+import time
+import zlib
+from dataclasses import dataclass
+from datetime import datetime
+from itertools import accumulate
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import lancedb
+import numpy as np
+from agno.knowledge.document.base import Document
+from agno.knowledge.embedder.base import Embedder
+from agno.vectordb.search import SearchType
+
+from config.settings import PROJECT_ROOT, VECTOR_INDEX_TYPE
+from services.index_manager import LanceIndexManager
+from services.lance_store import PulseLanceDb
+
+BENCHMARK_DIR = PROJECT_ROOT / "tmp" / "benchmark"
+
+_SYLLABLES = [c + v for c in "bdfgklmnprstvz" for v in "aeiou"]
+
+
+@dataclass
+class SyntheticEmbedder(Embedder):
+    """
+    Bag-of-words hashing embedder: each word maps to a fixed random vector and
+    a text embeds to the normalized sum, so texts sharing words are close.
+    """
+
+    dimensions: int = 64
+    seed: int = 42
+    buckets: int = 8192
+
+    def __post_init__(self):
+        self.enable_batch = True
+        self.batch_size = 256
+        rng = np.random.default_rng(self.seed)
+        self._word_vectors = rng.standard_normal((self.buckets, self.dimensions)).astype(np.float32)
+
+    def _embed(self, text: str) -> List[float]:
+        rows = [zlib.crc32(word.encode()) % self.buckets for word in text.lower().split()]
+        vector = self._word_vectors[rows].sum(axis=0) if rows else np.zeros(self.dimensions, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        return (vector / norm if norm else vector).tolist()
+
+    def get_embedding(self, text: str) -> List[float]:
+        return self._embed(text)
+
+    def get_embedding_and_usage(self, text: str):
+        return self._embed(text), None
+
+    async def async_get_embedding(self, text: str) -> List[float]:
+        return self._embed(text)
+
+    async def async_get_embedding_and_usage(self, text: str):
+        return self._embed(text), None
+
+    def get_embeddings_batch_and_usage(self, texts: List[str]):
+        return [self._embed(text) for text in texts], [None] * len(texts)
+
+    async def async_get_embeddings_batch_and_usage(self, texts: List[str]):
+        return self.get_embeddings_batch_and_usage(texts)
+
+
+class SyntheticCorpus:
+    """
+    Deterministic corpus: chunk i is always the same text for a given seed.
+
+    Every chunk mixes words of one topic with words drawn from a Zipf-like
+    distribution over the whole vocabulary, like real text.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        seed: int = 42,
+        vocabulary_size: int = 20000,
+        topics: int = 200,
+        topic_words: int = 40,
+        words_per_chunk: int = 48,
+    ):
+        self.size = size
+        self.seed = seed
+        self.words_per_chunk = words_per_chunk
+
+        rng = random.Random(seed)
+        vocabulary = set()
+        while len(vocabulary) < vocabulary_size:
+            vocabulary.add("".join(rng.choices(_SYLLABLES, k=rng.randint(2, 4))))
+        self.vocabulary = sorted(vocabulary)
+        rng.shuffle(self.vocabulary)
+        self.topics = [rng.sample(self.vocabulary, topic_words) for _ in range(topics)]
+        self._cum_weights = list(accumulate(1 / (rank + 1) for rank in range(vocabulary_size)))
+
+    def _words(self, i: int) -> List[str]:
+        rng = random.Random(f"{self.seed}:{i}")
+        topic = self.topics[i % len(self.topics)]
+        topic_count = self.words_per_chunk // 4
+        words = rng.choices(topic, k=topic_count)
+        words += rng.choices(self.vocabulary, cum_weights=self._cum_weights, k=self.words_per_chunk - topic_count)
+        rng.shuffle(words)
+        return words
+
+    def document(self, i: int) -> Document:
+        return Document(name=f"chunk-{i}", content=" ".join(self._words(i)), meta_data={"chunk": i})
+
+    def documents(self, start: int, stop: int) -> List[Document]:
+        return [self.document(i) for i in range(start, min(stop, self.size))]
+
+    def queries(self, count: int, words: int = 8) -> List[Tuple[str, str]]:
+        """(query, name of the relevant chunk) pairs"""
+        rng = random.Random(f"{self.seed}:queries")
+        pairs = []
+        for i in rng.sample(range(self.size), min(count, self.size)):
+            chunk_words = list(dict.fromkeys(self._words(i)))
+            pairs.append((" ".join(rng.sample(chunk_words, min(words, len(chunk_words)))), f"chunk-{i}"))
+        return pairs
+
+
+def _percentile(values: List[float], percentile: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, math.ceil(percentile / 100 * len(ordered)) - 1)
+    return round(ordered[index], 3)
+
+
+def ingest(vector_db: PulseLanceDb, corpus: SyntheticCorpus, batch_size: int = 1000) -> Dict[str, Any]:
+    """Insert the corpus in batches (one content hash per batch), as uploads do"""
+    started = time.perf_counter()
+    embedding_seconds = 0.0
+    for start in range(0, corpus.size, batch_size):
+        vector_db.insert(f"synthetic-{corpus.seed}-{start}", corpus.documents(start, start + batch_size))
+        embedding_seconds += vector_db.last_ingest["embedding"]["seconds"]
+        done = min(start + batch_size, corpus.size)
+        if done % max(batch_size, corpus.size // 10) < batch_size or done == corpus.size:
+            print(f"📥 Ingested {done}/{corpus.size} chunks")
+    seconds = time.perf_counter() - started
+    return {
+        "chunks": corpus.size,
+        "seconds": round(seconds, 3),
+        "chunks_per_second": round(corpus.size / seconds, 2) if seconds else None,
+        "embedding_seconds": round(embedding_seconds, 3),
+    }
+
+
+def measure_queries(
+    vector_db: PulseLanceDb, search_type: SearchType, queries: List[Tuple[str, str]], k: int = 10
+) -> Tuple[Dict[str, Any], List[List[str]]]:
+    """Latency percentiles and recall@k for one search type; also returns the ranked names"""
+    vector_db.search_type = search_type
+    vector_db.search(queries[0][0], limit=k)  # warm-up (opens the table, loads indexes)
+
+    timings, hits, ranked = [], 0, []
+    for query, relevant in queries:
+        started = time.perf_counter()
+        results = vector_db.search(query, limit=k)
+        timings.append((time.perf_counter() - started) * 1000)
+        names = [doc.name for doc in results]
+        hits += relevant in names
+        ranked.append(names)
+
+    return {
+        "queries": len(queries),
+        "p50_ms": _percentile(timings, 50),
+        "p99_ms": _percentile(timings, 99),
+        "mean_ms": round(statistics.fmean(timings), 3),
+        f"recall_at_{k}": round(hits / len(queries), 4),
+    }, ranked
+
+
+def _overlap(exact: List[List[str]], approximate: List[List[str]]) -> float:
+    """Share of the exact top-k that the approximate search also returned"""
+    found = sum(len(set(a) & set(b)) for a, b in zip(exact, approximate))
+    total = sum(len(a) for a in exact)
+    return round(found / total, 4) if total else 0.0
+
+
+def run_benchmark(
+    size: int,
+    uri: str,
+    queries: int = 200,
+    k: int = 10,
+    batch_size: int = 1000,
+    dimensions: int = 64,
+    seed: int = 42,
+    index_type: str = VECTOR_INDEX_TYPE,
+) -> Dict[str, Any]:
+    """
+    Benchmark one corpus size.
+
+    Returns:
+        dict: Ingest throughput, per-mode query stats without and with the ANN index, and index build times
+    """
+    print(f"\n📊 Retrieval benchmark: {size} chunks, {dimensions} dimensions")
+    corpus = SyntheticCorpus(size, seed=seed)
+    vector_db = PulseLanceDb(
+        table_name=f"benchmark_{size}",
+        uri=uri,
+        embedder=SyntheticEmbedder(dimensions=dimensions, seed=seed),
+        search_type=SearchType.hybrid,
+        search_cache=None,
+        index_manager=None,
+        write_queue=None,
+    )
+    if vector_db.exists():
+        vector_db.drop()
+    vector_db.create()
+
+    result: Dict[str, Any] = {"size": size, "dimensions": dimensions, "k": k, "seed": seed, "index_type": index_type}
+    result["ingest"] = ingest(vector_db, corpus, batch_size)
+
+    # Round 1: full-text and namespace indexes only, vector search scans every row
+    manager = LanceIndexManager(vector_db, index_type=index_type, min_rows=size + 1)
+    vector_db.index_manager = manager
+    manager.check()
+    query_set = corpus.queries(queries)
+    result["without_vector_index"] = {}
+    exact: Dict[SearchType, List[List[str]]] = {}
+    for search_type in SearchType:
+        stats, exact[search_type] = measure_queries(vector_db, search_type, query_set, k)
+        result["without_vector_index"][search_type.value] = stats
+        print(f"   {search_type.value:<8} flat     p50 {stats['p50_ms']} ms  p99 {stats['p99_ms']} ms  recall@{k} {stats[f'recall_at_{k}']}")
+
+    # Round 2: with the ANN index
+    manager.min_rows = 0
+    manager.check()
+    result["with_vector_index"] = {}
+    for search_type in SearchType:
+        stats, ranked = measure_queries(vector_db, search_type, query_set, k)
+        stats["overlap_with_exact"] = _overlap(exact[search_type], ranked)
+        result["with_vector_index"][search_type.value] = stats
+        print(f"   {search_type.value:<8} indexed  p50 {stats['p50_ms']} ms  p99 {stats['p99_ms']} ms  recall@{k} {stats[f'recall_at_{k}']}")
+
+    result["index_builds"] = manager.history
+    result["indexes"] = manager.get_coverage()["indexes"]
+    return result
+
+
+def remove_benchmark_data(uri: str, sizes: List[int]):
+    """
+    Drop the benchmark_<size> tables a run created. The directory itself is only
+    removed when it is inside BENCHMARK_DIR and nothing else is left in it, so
+    pointing --uri at a real knowledge base never deletes its tables.
+    """
+    connection = lancedb.connect(uri)
+    existing = set(connection.table_names())
+    for size in sizes:
+        if f"benchmark_{size}" in existing:
+            connection.drop_table(f"benchmark_{size}")
+
+    path = Path(uri).resolve()
+    if path.is_relative_to(BENCHMARK_DIR.resolve()) and path.is_dir() and not any(path.iterdir()):
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark knowledge retrieval on a synthetic corpus")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--dimensions", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--index-type", default=VECTOR_INDEX_TYPE, help="LanceDB vector index type (IVF_PQ, IVF_HNSW_SQ, ...)")
+    parser.add_argument("--uri", default=str(BENCHMARK_DIR / "lancedb"))
+    parser.add_argument("--output", default=None, help="JSON file (default: tmp/benchmark/retrieval-<timestamp>.json)")
+    parser.add_argument("--keep-data", action="store_true", help="Keep the benchmark_<size> tables after the run")
+    args = parser.parse_args()
+
+    started_at = datetime.now()
+    runs = [
+        run_benchmark(size, args.uri, args.queries, args.k, args.batch_size, args.dimensions, args.seed, args.index_type)
+        for size in args.sizes
+    ]
+    report = {"started_at": started_at.isoformat(), "finished_at": datetime.now().isoformat(), "runs": runs}
+
+    output = Path(args.output or BENCHMARK_DIR / f"retrieval-{started_at:%Y%m%d-%H%M%S}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    if not args.keep_data:
+        remove_benchmark_data(args.uri, args.sizes)
+    print(f"\n✅ Benchmark results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
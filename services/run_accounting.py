@@ -0,0 +1,581 @@
+"""
+Run Accounting - Per-run tokens, latency and cost in an indexed table
+
+Runs stored in agno_sessions carry their metrics inside a JSON blob, so spend
+and latency cannot be queried by user, agent or day. RunAccountingStore keeps
+one normalized row per agent run and per workflow step (model, input/output
+tokens, wall time, estimated cost) in a small SQLite file with indexes for
+those groupings.
+
+Agent runs are recorded by the account_runs pre-hook, which wraps the run's
+session so the finished run is recorded when agno stores it (streaming runs
+included, which skip post-hooks). Workflow steps are recorded by
+account_workflow_steps. Agent-backed steps keep their tokens for the per-step
+view, but only the agent's own row counts towards spend, so nothing is counted
+twice.
+
+Both hand their rows to a background writer thread (like the memory and
+session summary queues), so accounting adds no SQLite I/O to the run itself,
+which under arun happens on the event loop. flush() writes what is queued.
+
+Cost is estimated from MODEL_PRICES (USD per million input/output tokens),
+extended or overridden by the JSON file at ACCOUNTING_PRICES_FILE.
+
+Usage:
+    from services.run_accounting import account_runs, account_workflow_steps, get_run_accounting
+
+    agent = Agent(..., pre_hooks=[account_runs])
+    workflow = account_workflow_steps(Workflow(...))
+    get_run_accounting().summary(group_by="user")
+"""
+import functools
+import inspect
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from agno.utils.log import log_debug, log_warning
+
+from config.settings import ACCOUNTING_DB_FILE, ACCOUNTING_ENABLED, ACCOUNTING_PRICES_FILE
+from services.metrics import get_metrics_registry
+
+# USD per million (input, output) tokens; longest matching prefix wins
+MODEL_PRICES: Dict[str, Tuple[float, float]] = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4.1-nano": (0.10, 0.40),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-5-nano": (0.05, 0.40),
+    "gpt-5-mini": (0.25, 2.00),
+    "gpt-5": (1.25, 10.00),
+    "o4-mini": (1.10, 4.40),
+    "gemini-2.5-flash-image": (0.30, 30.00),
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.5-pro": (1.25, 10.00),
+    "claude-sonnet-4": (3.00, 15.00),
+    "claude-3-5-haiku": (0.80, 4.00),
+}
+
+GROUP_COLUMNS = {
+    "user": "user_id",
+    "agent": "agent",
+    "day": "day",
+    "step": "step",
+    "model": "model",
+    "workflow": "workflow",
+}
+
+
+def load_prices(prices_file: Optional[str] = ACCOUNTING_PRICES_FILE) -> Dict[str, Tuple[float, float]]:
+    """Built-in prices, updated from the optional JSON file ({"model": [input, output], ...})"""
+    prices = dict(MODEL_PRICES)
+    if prices_file and os.path.exists(prices_file):
+        try:
+            with open(prices_file, "r", encoding="utf-8") as f:
+                prices.update({model: tuple(value) for model, value in json.load(f).items()})
+        except Exception as e:
+            log_warning(f"Could not read model prices from {prices_file}: {e}")
+    return prices
+
+
+def estimate_cost(
+    model: Optional[str], input_tokens: int, output_tokens: int, prices: Optional[Dict[str, Tuple[float, float]]] = None
+) -> Optional[float]:
+    """Estimated USD cost of a call, None when the model has no known price"""
+    if not model:
+        return None
+    prices = prices if prices is not None else MODEL_PRICES
+    # OpenRouter ids carry the provider ("openai/gpt-4o-mini")
+    name = model.split("/")[-1].lower()
+    matches = [prefix for prefix in prices if name.startswith(prefix)]
+    if not matches:
+        return None
+    input_price, output_price = prices[max(matches, key=len)]
+    return (input_tokens * input_price + output_tokens * output_price) / 1_000_000
+
+
+class RunAccountingStore:
+    """
+    Indexed table of agent runs and workflow steps.
+
+    Args:
+        db_file: SQLite file of the accounting table
+        prices_file: Optional JSON file with model prices
+    """
+
+    def __init__(self, db_file: str = ACCOUNTING_DB_FILE, prices_file: Optional[str] = ACCOUNTING_PRICES_FILE):
+        self.db_file = db_file
+        self.prices = load_prices(prices_file)
+        self._lock = threading.Lock()
+        self._step_lock = threading.Lock()
+        self.rows_written = 0
+        self.write_errors = 0
+
+        # Background writer for rows recorded during runs
+        self._pending: List[Tuple[Callable, tuple, dict]] = []
+        self._pending_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+
+        self._init_db()
+
+    # ------------------------------------------------------------------
+    # Storage
+    # ------------------------------------------------------------------
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_file)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _init_db(self):
+        Path(self.db_file).parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS run_accounting (
+                    record_id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    recorded_at REAL NOT NULL,
+                    day TEXT NOT NULL,
+                    user_id TEXT,
+                    agent TEXT,
+                    workflow TEXT,
+                    step TEXT,
+                    session_id TEXT,
+                    run_id TEXT,
+                    model TEXT,
+                    provider TEXT,
+                    status TEXT,
+                    input_tokens INTEGER NOT NULL DEFAULT 0,
+                    output_tokens INTEGER NOT NULL DEFAULT 0,
+                    total_tokens INTEGER NOT NULL DEFAULT 0,
+                    cache_read_tokens INTEGER NOT NULL DEFAULT 0,
+                    seconds REAL,
+                    cost_usd REAL,
+                    billable INTEGER NOT NULL DEFAULT 1
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_run_accounting_user_day ON run_accounting (user_id, day)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_run_accounting_agent_day ON run_accounting (agent, day)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_run_accounting_step_day ON run_accounting (step, day)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_run_accounting_day ON run_accounting (day)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_run_accounting_run ON run_accounting (run_id, step)")
+
+    def record(
+        self,
+        record_id: str,
+        kind: str,
+        user_id: Optional[str] = None,
+        agent: Optional[str] = None,
+        workflow: Optional[str] = None,
+        step: Optional[str] = None,
+        session_id: Optional[str] = None,
+        run_id: Optional[str] = None,
+        model: Optional[str] = None,
+        provider: Optional[str] = None,
+        status: Optional[str] = None,
+        input_tokens: int = 0,
+        output_tokens: int = 0,
+        total_tokens: int = 0,
+        cache_read_tokens: int = 0,
+        seconds: Optional[float] = None,
+        billable: bool = True,
+        recorded_at: Optional[float] = None,
+    ) -> Optional[float]:
+        """Store (or replace) one accounting row; returns its estimated cost"""
+        recorded_at = recorded_at if recorded_at is not None else time.time()
+        total_tokens = total_tokens or input_tokens + output_tokens
+        cost = estimate_cost(model, input_tokens, output_tokens, self.prices)
+        try:
+            with self._lock, self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO run_accounting VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        record_id, kind, recorded_at, datetime.fromtimestamp(recorded_at).strftime("%Y-%m-%d"),
+                        user_id, agent, workflow, step, session_id, run_id, model, provider, status,
+                        input_tokens, output_tokens, total_tokens, cache_read_tokens, seconds, cost, int(billable),
+                    ),
+                )
+            self.rows_written += 1
+        except Exception as e:
+            self.write_errors += 1
+            log_warning(f"Could not record accounting for {record_id}: {e}")
+            return cost
+
+        if billable:
+            labels = {"agent": agent or step or "unknown"}
+            metrics = get_metrics_registry()
+            metrics.counter("llm_input_tokens_total", "Model input tokens by agent").inc(input_tokens, **labels)
+            metrics.counter("llm_output_tokens_total", "Model output tokens by agent").inc(output_tokens, **labels)
+            if cost:
+                metrics.counter("llm_cost_usd_total", "Estimated model cost (USD) by agent").inc(cost, **labels)
+        log_debug(f"Accounted {kind} {record_id}: {input_tokens}+{output_tokens} tokens, {seconds}s, ${cost}")
+        return cost
+
+    def record_agent_run(self, run_output, agent_name: Optional[str] = None, user_id: Optional[str] = None) -> Optional[float]:
+        """Record a finished agno RunOutput"""
+        metrics = run_output.metrics
+        status = getattr(run_output.status, "value", run_output.status)
+        return self.record(
+            record_id=f"agent:{run_output.run_id}",
+            kind="agent",
+            user_id=user_id or run_output.user_id,
+            agent=agent_name or run_output.agent_name,
+            session_id=run_output.session_id,
+            run_id=run_output.run_id,
+            model=run_output.model,
+            provider=run_output.model_provider,
+            status=status,
+            input_tokens=metrics.input_tokens if metrics else 0,
+            output_tokens=metrics.output_tokens if metrics else 0,
+            total_tokens=metrics.total_tokens if metrics else 0,
+            cache_read_tokens=metrics.cache_read_tokens if metrics else 0,
+            seconds=metrics.duration if metrics else None,
+        )
+
+    def record_step(
+        self,
+        step,
+        step_output,
+        seconds: float,
+        user_id: Optional[str] = None,
+        session_id: Optional[str] = None,
+        workflow_run_response=None,
+    ) -> Optional[float]:
+        """Record one executed workflow step"""
+        metrics = getattr(step_output, "metrics", None)
+        # Agent-backed steps are already counted through the agent's own run
+        agent_backed = getattr(step, "agent", None) is not None or getattr(step, "team", None) is not None
+        additional = (metrics.additional_metrics or {}) if metrics else {}
+        workflow_run_id = getattr(workflow_run_response, "run_id", None)
+        success = getattr(step_output, "success", True)
+        # A step can run several times in one workflow run (Loop, retries):
+        # each execution gets its own row
+        with self._step_lock:
+            execution = self._step_executions(workflow_run_id, step.name)
+            return self.record(
+                record_id=f"step:{workflow_run_id or time.time_ns()}:{step.name}:{execution}",
+                kind="step",
+                user_id=user_id,
+                agent=getattr(getattr(step, "agent", None), "name", None),
+                workflow=getattr(workflow_run_response, "workflow_name", None),
+                step=step.name,
+                session_id=session_id,
+                run_id=workflow_run_id,
+                model=additional.get("model"),
+                status="completed" if success else "error",
+                input_tokens=metrics.input_tokens if metrics else 0,
+                output_tokens=metrics.output_tokens if metrics else 0,
+                total_tokens=metrics.total_tokens if metrics else 0,
+                seconds=seconds,
+                billable=not agent_backed,
+            )
+
+    def _step_executions(self, workflow_run_id: Optional[str], step_name: str) -> int:
+        """How often the step was already recorded for this workflow run"""
+        if workflow_run_id is None:
+            return 0
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT COUNT(*) FROM run_accounting WHERE kind = 'step' AND run_id = ? AND step = ?",
+                (workflow_run_id, step_name),
+            ).fetchone()
+        return row[0]
+
+    # ------------------------------------------------------------------
+    # Background writes
+    # ------------------------------------------------------------------
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="run-accounting", daemon=True)
+            self._thread.start()
+
+    def enqueue(self, method: Callable, *args, **kwargs):
+        """Call a record method on the writer thread; returns immediately"""
+        with self._pending_lock:
+            self._pending.append((method, args, kwargs))
+        self._ensure_thread()
+        self._wakeup.set()
+
+    def _drain(self):
+        # One writer at a time keeps rows in order (step execution numbers depend on it)
+        with self._write_lock:
+            while True:
+                with self._pending_lock:
+                    pending, self._pending = self._pending, []
+                if not pending:
+                    return
+                for method, args, kwargs in pending:
+                    try:
+                        method(*args, **kwargs)
+                    except Exception as e:
+                        self.write_errors += 1
+                        log_warning(f"Could not record accounting: {e}")
+
+    def _run(self):
+        while not self._stopping:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            if self._stopping:
+                break
+            self._drain()
+
+    def flush(self):
+        """Write every queued row now (blocks until done)"""
+        self._drain()
+
+    def close(self, timeout: Optional[float] = 10):
+        """Stop the writer thread and write what is still queued"""
+        self._stopping = True
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _filters(
+        since: Optional[str], until: Optional[str], user_id: Optional[str], agent: Optional[str]
+    ) -> Tuple[List[str], List[Any]]:
+        clauses, params = [], []
+        if since:
+            clauses.append("day >= ?")
+            params.append(since)
+        if until:
+            clauses.append("day <= ?")
+            params.append(until)
+        if user_id:
+            clauses.append("user_id = ?")
+            params.append(user_id)
+        if agent:
+            clauses.append("agent = ?")
+            params.append(agent)
+        return clauses, params
+
+    def summary(
+        self,
+        group_by: str = "day",
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        user_id: Optional[str] = None,
+        agent: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Tokens, latency and cost grouped by user, agent, day, step, model or workflow.
+
+        Steps are reported from the step rows; every other grouping sums the
+        billable rows, so agent work inside a workflow is counted once.
+        """
+        column = GROUP_COLUMNS.get(group_by)
+        if column is None:
+            raise ValueError(f"group_by must be one of {', '.join(GROUP_COLUMNS)}")
+        clauses, params = self._filters(since, until, user_id, agent)
+        clauses.append("kind = 'step'" if group_by == "step" else "billable = 1")
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"""
+                SELECT {column} AS key,
+                       COUNT(*) AS runs,
+                       SUM(input_tokens) AS input_tokens,
+                       SUM(output_tokens) AS output_tokens,
+                       SUM(total_tokens) AS total_tokens,
+                       SUM(seconds) AS seconds,
+                       AVG(seconds) AS avg_seconds,
+                       MAX(seconds) AS max_seconds,
+                       SUM(cost_usd) AS cost_usd,
+                       SUM(cost_usd IS NULL AND total_tokens > 0) AS unpriced_runs
+                FROM run_accounting
+                WHERE {" AND ".join(clauses)}
+                GROUP BY {column}
+                ORDER BY {"key DESC" if group_by == "day" else "cost_usd DESC, total_tokens DESC"}
+                """,
+                params,
+            ).fetchall()
+        return [
+            {
+                group_by: row["key"],
+                "runs": row["runs"],
+                "input_tokens": row["input_tokens"] or 0,
+                "output_tokens": row["output_tokens"] or 0,
+                "total_tokens": row["total_tokens"] or 0,
+                "seconds": round(row["seconds"] or 0.0, 3),
+                "avg_seconds": round(row["avg_seconds"], 3) if row["avg_seconds"] is not None else None,
+                "max_seconds": round(row["max_seconds"], 3) if row["max_seconds"] is not None else None,
+                "cost_usd": round(row["cost_usd"], 6) if row["cost_usd"] is not None else None,
+                "unpriced_runs": row["unpriced_runs"] or 0,
+            }
+            for row in rows
+        ]
+
+    def recent(self, limit: int = 50, user_id: Optional[str] = None, agent: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Latest accounting rows, newest first"""
+        clauses, params = self._filters(None, None, user_id, agent)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT * FROM run_accounting {where} ORDER BY recorded_at DESC LIMIT ?", params + [limit]
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT COUNT(*) AS rows_stored, SUM(CASE WHEN billable = 1 THEN cost_usd END) AS cost_usd FROM run_accounting"
+            ).fetchone()
+        return {
+            "db_file": self.db_file,
+            "rows_stored": row["rows_stored"],
+            "rows_written": self.rows_written,
+            "rows_pending": len(self._pending),
+            "write_errors": self.write_errors,
+            "total_cost_usd": round(row["cost_usd"], 6) if row["cost_usd"] is not None else None,
+            "priced_models": len(self.prices),
+        }
+
+
+def account_session_runs(session, agent_name: Optional[str] = None, user_id: Optional[str] = None,
+                         store: Optional[RunAccountingStore] = None):
+    """
+    Record every run the session stores once it has finished.
+
+    The session's upsert_run is wrapped in place; wrapping is idempotent.
+    """
+    if getattr(session, "_run_accounting", False):
+        return session
+    original = session.upsert_run
+
+    @functools.wraps(original)
+    def accounted(run, *args, **kwargs):
+        result = original(run, *args, **kwargs)
+        status = getattr(getattr(run, "status", None), "value", None)
+        if status in ("COMPLETED", "ERROR", "CANCELLED"):
+            accounting = store if store is not None else get_run_accounting()
+            accounting.enqueue(accounting.record_agent_run, run, agent_name=agent_name, user_id=user_id)
+        return result
+
+    session.upsert_run = accounted
+    session._run_accounting = True
+    return session
+
+
+def account_runs(agent=None, session=None, user_id=None) -> None:
+    """Agent pre-hook: record this run's tokens, latency and cost when it is stored"""
+    if session is None or not ACCOUNTING_ENABLED:
+        return
+    account_session_runs(session, getattr(agent, "name", None), user_id)
+
+
+def _iter_steps(steps):
+    """Steps of a workflow, including the ones nested in Parallel, Loop, Condition and Router"""
+    for step in steps or []:
+        if callable(step) and not hasattr(step, "execute"):
+            continue
+        nested = getattr(step, "steps", None) or getattr(step, "choices", None)
+        if nested:
+            yield from _iter_steps(nested)
+        elif hasattr(step, "execute"):
+            yield step
+
+
+def account_step(step, store: Optional[RunAccountingStore] = None):
+    """
+    Record each execution of a workflow Step (wall time, tokens of its output).
+
+    The step's execute methods are wrapped in place; wrapping is idempotent.
+    """
+    if getattr(step, "_run_accounting", False):
+        return step
+
+    def accounting() -> RunAccountingStore:
+        return store if store is not None else get_run_accounting()
+
+    def context(method, args, kwargs) -> Dict[str, Any]:
+        bound = inspect.signature(method).bind_partial(*args, **kwargs).arguments
+        return {key: bound.get(key) for key in ("user_id", "session_id", "workflow_run_response")}
+
+    def record(step_output, started, call_context):
+        store = accounting()
+        store.enqueue(store.record_step, step, step_output, time.perf_counter() - started, **call_context)
+
+    original_execute = step.execute
+    original_aexecute = step.aexecute
+    original_execute_stream = step.execute_stream
+    original_aexecute_stream = step.aexecute_stream
+
+    @functools.wraps(original_execute)
+    def execute(*args, **kwargs):
+        started = time.perf_counter()
+        output = original_execute(*args, **kwargs)
+        record(output, started, context(original_execute, args, kwargs))
+        return output
+
+    @functools.wraps(original_aexecute)
+    async def aexecute(*args, **kwargs):
+        started = time.perf_counter()
+        output = await original_aexecute(*args, **kwargs)
+        record(output, started, context(original_aexecute, args, kwargs))
+        return output
+
+    def is_output(event) -> bool:
+        return type(event).__name__ == "StepOutput"
+
+    @functools.wraps(original_execute_stream)
+    def execute_stream(*args, **kwargs):
+        started, output = time.perf_counter(), None
+        for event in original_execute_stream(*args, **kwargs):
+            if is_output(event):
+                output = event
+            yield event
+        record(output, started, context(original_execute_stream, args, kwargs))
+
+    @functools.wraps(original_aexecute_stream)
+    async def aexecute_stream(*args, **kwargs):
+        started, output = time.perf_counter(), None
+        async for event in original_aexecute_stream(*args, **kwargs):
+            if is_output(event):
+                output = event
+            yield event
+        record(output, started, context(original_aexecute_stream, args, kwargs))
+
+    step.execute = execute
+    step.aexecute = aexecute
+    step.execute_stream = execute_stream
+    step.aexecute_stream = aexecute_stream
+    step._run_accounting = True
+    return step
+
+
+def account_workflow_steps(workflow, store: Optional[RunAccountingStore] = None):
+    """Record every step of the workflow (a no-op when ACCOUNTING_ENABLED is off)"""
+    if not ACCOUNTING_ENABLED:
+        return workflow
+    for step in _iter_steps(workflow.steps):
+        account_step(step, store)
+    return workflow
+
+
+# Global singleton instance
+_run_accounting: Optional[RunAccountingStore] = None
+
+
+def get_run_accounting() -> RunAccountingStore:
+    """Get or create the global run accounting store"""
+    global _run_accounting
+    if _run_accounting is None:
+        _run_accounting = RunAccountingStore()
+    return _run_accounting
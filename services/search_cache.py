@@ -0,0 +1,129 @@
+"""
+Search Cache - In-memory LRU + TTL cache of knowledge search results
+
+Entries are keyed by (query, filters, search_type, limit, namespace) together
+with the version of the table they were read from. The vector store bumps its
+version on every write, which drops all cached results, so a search never
+returns results from before the last ingest. The TTL bounds staleness from writes
+made by other processes.
+
+Usage:
+    from services.search_cache import SearchResultCache
+
+    cache = SearchResultCache(max_entries=1024, ttl_seconds=600)
+    results = cache.get(key)
+    if results is None:
+        results = search(...)
+        cache.put(key, results)
+"""
+import copy
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from agno.knowledge.document.base import Document
+
+from config.settings import SEARCH_CACHE_MAX_ENTRIES, SEARCH_CACHE_TTL_SECONDS
+from services.metrics import get_metrics_registry
+
+
+def search_key(
+    query: str,
+    filters: Optional[Dict[str, Any]],
+    search_type: Any,
+    limit: int,
+    version: int,
+    namespace: Optional[str] = None,
+) -> Tuple[Hashable, ...]:
+    """Cache key of one search (filters are normalized so key order does not matter; version comes last)"""
+    filters_key = json.dumps(filters, sort_keys=True, default=str) if filters else ""
+    search_type = getattr(search_type, "value", search_type)
+    return (query.strip(), filters_key, str(search_type), limit, namespace, version)
+
+
+class SearchResultCache:
+    """
+    Thread-safe LRU cache with a per-entry TTL.
+
+    Cached documents are copied on the way in and out, so callers can modify
+    the returned documents without affecting later hits.
+
+    Args:
+        max_entries: Maximum cached searches before the least recently used is dropped
+        ttl_seconds: Age after which an entry is ignored
+        name: Label used for metrics
+    """
+
+    def __init__(
+        self,
+        max_entries: int = SEARCH_CACHE_MAX_ENTRIES,
+        ttl_seconds: float = SEARCH_CACHE_TTL_SECONDS,
+        name: str = "knowledge",
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.name = name
+
+        self._entries: "OrderedDict[Hashable, Tuple[float, List[Document]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _record(self, result: str):
+        get_metrics_registry().counter(
+            "knowledge_search_cache_lookups_total", "Knowledge search cache lookups"
+        ).inc(cache=self.name, result=result)
+
+    def get(self, key: Hashable) -> Optional[List[Document]]:
+        """Return a copy of the cached results, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] > self.ttl_seconds:
+                del self._entries[key]
+                self.expired += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        self._record("miss" if entry is None else "hit")
+        return copy.deepcopy(entry[1]) if entry is not None else None
+
+    def put(self, key: Hashable, documents: List[Document]):
+        """Store results, dropping the least recently used entry when full"""
+        if self.max_entries <= 0:
+            return
+        stored = copy.deepcopy(documents)
+        with self._lock:
+            self._entries[key] = (time.monotonic(), stored)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self):
+        """Drop every entry (called when the underlying table changes)"""
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "expired": self.expired,
+            "invalidations": self.invalidations,
+        }
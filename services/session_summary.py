@@ -0,0 +1,309 @@
+"""
+Session Summary - Incremental session summaries updated in the background
+
+agno's SessionSummaryManager re-summarizes the whole conversation at the end
+of every run, and the run waits for that LLM call. The prompt grows with the
+session, so long conversations get slower turn by turn.
+
+IncrementalSessionSummaryManager queues the session instead. A background
+thread folds only the runs added since the last summary into the previous
+summary (previous summary + new exchanges in, updated summary out), so the
+summary prompt stays the same size however long the session gets. Updates are
+skipped until at least SESSION_SUMMARY_MIN_NEW_RUNS runs or
+SESSION_SUMMARY_MIN_NEW_TOKENS estimated tokens are new; the last folded run
+is kept in the session's session_data, so restarts resume where they stopped.
+
+Usage:
+    from services.session_summary import IncrementalSessionSummaryManager, get_session_summary_queue
+
+    agent = Agent(..., db=db, session_summary_manager=IncrementalSessionSummaryManager(db=db))
+    get_session_summary_queue().flush()  # fold everything queued now
+"""
+import threading
+import time
+from dataclasses import dataclass
+from textwrap import dedent
+from typing import Any, Dict, List, Optional, Tuple
+
+from agno.db.base import SessionType
+from agno.models.message import Message
+from agno.session import TeamSession
+from agno.session.summary import SessionSummary, SessionSummaryManager
+from agno.utils.log import log_debug
+
+from config.settings import SESSION_SUMMARY_MIN_NEW_RUNS, SESSION_SUMMARY_MIN_NEW_TOKENS
+from services.embedding_pipeline import estimate_tokens
+from services.metrics import get_metrics_registry
+
+# Key in session_data holding the id of the last run folded into the summary
+SUMMARIZED_RUN_KEY = "summarized_run_id"
+
+INCREMENTAL_SUMMARY_PROMPT = dedent("""\
+    You maintain the running summary of a conversation between a user and an assistant.
+    Update the previous summary with the new part of the conversation and extract:
+    - Summary (str): The updated summary of the whole session, focusing on important information that would be helpful for future interactions.
+    - Topics (Optional[List[str]]): The topics discussed in the whole session.
+    Keep everything from the previous summary that is still relevant, drop what the new messages make obsolete,
+    and keep the summary concise and to the point. Only include relevant information.
+    """)
+
+
+def conversation_messages(runs: List[Any]) -> List[Message]:
+    """User message and final assistant response of each run (as in AgentSession.get_messages_for_session)"""
+    messages = []
+    for run in runs:
+        run_messages = [message for message in (run.messages or []) if not getattr(message, "from_history", False)]
+        user = next((message for message in run_messages if message.role == "user"), None)
+        assistant = next((message for message in reversed(run_messages) if message.role in ("assistant", "model")), None)
+        if user is not None and assistant is not None:
+            messages.extend([user, assistant])
+    return messages
+
+
+def unsummarized_runs(session) -> List[Any]:
+    """Runs of the session added after the last run folded into its summary"""
+    runs = list(session.runs or [])
+    last_run_id = (session.session_data or {}).get(SUMMARIZED_RUN_KEY)
+    if session.summary is None or last_run_id is None:
+        return runs
+    for position, run in enumerate(runs):
+        if run.run_id == last_run_id:
+            return runs[position + 1:]
+    # The folded run is gone (history trimmed), summarize what is left
+    return runs
+
+
+@dataclass
+class _PendingSession:
+    """Latest state of one session waiting for a summary update"""
+    manager: "IncrementalSessionSummaryManager"
+    session: Any
+
+
+class SessionSummaryQueue:
+    """
+    Sessions waiting for a summary update, folded by a background thread.
+
+    Args:
+        min_new_runs: New runs that make an update worthwhile
+        min_new_tokens: Estimated new tokens that make an update worthwhile
+    """
+
+    def __init__(self, min_new_runs: int = SESSION_SUMMARY_MIN_NEW_RUNS, min_new_tokens: int = SESSION_SUMMARY_MIN_NEW_TOKENS):
+        self.min_new_runs = max(1, min_new_runs)
+        self.min_new_tokens = min_new_tokens
+        self._pending: Dict[str, _PendingSession] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._update_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+
+        self.runs_queued = 0
+        self.updates = 0
+        self.skipped = 0
+        self.failed = 0
+        self.runs_folded = 0
+        self.prompt_tokens = 0
+        self.update_seconds = 0.0
+        self.last_error: Optional[str] = None
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="session-summary", daemon=True)
+            self._thread.start()
+
+    def enqueue(self, manager: "IncrementalSessionSummaryManager", session):
+        """Queue the session after a run; returns immediately"""
+        with self._lock:
+            # Several runs of one session before the thread gets to it fold in one update
+            self._pending[session.session_id] = _PendingSession(manager, session)
+            self.runs_queued += 1
+        get_metrics_registry().counter("session_summary_runs_queued_total", "Runs queued for a session summary update").inc()
+        self._ensure_thread()
+        self._wakeup.set()
+
+    def _should_update(self, new_runs: List[Any], conversation: List[Message]) -> bool:
+        if not conversation:
+            return False
+        new_tokens = sum(estimate_tokens(str(message.content or "")) for message in conversation)
+        return len(new_runs) >= self.min_new_runs or new_tokens >= self.min_new_tokens
+
+    def _update(self, pending: _PendingSession):
+        session = pending.session
+        new_runs = unsummarized_runs(session)
+        conversation = conversation_messages(new_runs)
+        if not self._should_update(new_runs, conversation):
+            self.skipped += 1
+            get_metrics_registry().counter("session_summary_skipped_total", "Summary updates skipped as too small").inc()
+            return
+
+        metrics = get_metrics_registry()
+        started = time.perf_counter()
+        try:
+            summary, prompt_tokens = pending.manager.fold(session.summary, conversation)
+            if summary is None:
+                raise ValueError("the model returned no usable summary")
+            pending.manager.save_summary(session, summary, new_runs[-1].run_id)
+        except Exception as e:
+            self.failed += 1
+            self.last_error = str(e)
+            print(f"❌ Session summary update failed for {session.session_id}: {str(e)}")
+            return
+        seconds = time.perf_counter() - started
+        self.updates += 1
+        self.runs_folded += len(new_runs)
+        self.prompt_tokens += prompt_tokens
+        self.update_seconds += seconds
+        metrics.counter("session_summary_updates_total", "Incremental session summary updates").inc()
+        metrics.histogram(
+            "session_summary_prompt_tokens", "Estimated prompt tokens of one summary update",
+            (250, 500, 1000, 2000, 4000, 8000, 16000),
+        ).observe(prompt_tokens)
+        metrics.histogram(
+            "session_summary_seconds", "Time of one background summary update",
+            (0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+        ).observe(seconds)
+        log_debug(f"Folded {len(new_runs)} runs into the summary of {session.session_id} in {seconds:.2f}s")
+
+    def _take_all(self) -> List[_PendingSession]:
+        with self._lock:
+            pending = list(self._pending.values())
+            self._pending.clear()
+            return pending
+
+    def _drain(self):
+        with self._update_lock:
+            for pending in self._take_all():
+                self._update(pending)
+
+    def _run(self):
+        while not self._stopping:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            if self._stopping:
+                break
+            self._drain()
+
+    def flush(self):
+        """Update every queued session now (blocks until done)"""
+        self._drain()
+
+    def close(self, timeout: Optional[float] = 60):
+        """Stop the background thread and update what is still queued"""
+        self._stopping = True
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Queue state, updates skipped and the (flat) prompt size of each update"""
+        with self._lock:
+            pending_sessions = len(self._pending)
+        average = self.update_seconds / self.updates if self.updates else None
+        return {
+            "min_new_runs": self.min_new_runs,
+            "min_new_tokens": self.min_new_tokens,
+            "pending_sessions": pending_sessions,
+            "runs_queued": self.runs_queued,
+            "updates": self.updates,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "runs_folded": self.runs_folded,
+            "avg_prompt_tokens": round(self.prompt_tokens / self.updates, 1) if self.updates else None,
+            "avg_update_seconds": round(average, 3) if average is not None else None,
+            # Each run used to wait for a full re-summarization before it finished
+            "latency_removed_per_run_seconds": round(average, 3) if average is not None else None,
+            "last_error": self.last_error,
+        }
+
+
+@dataclass
+class IncrementalSessionSummaryManager(SessionSummaryManager):
+    """
+    SessionSummaryManager that folds new runs into the previous summary in the background.
+
+    The run never waits for the summary; the agent's context picks up the
+    updated summary from the next run on.
+    """
+
+    # Database the updated summaries are written to (the agent's db)
+    db: Optional[Any] = None
+
+    # Queue running the updates (defaults to the global queue)
+    queue: Optional[SessionSummaryQueue] = None
+
+    def _queue(self) -> SessionSummaryQueue:
+        return self.queue if self.queue is not None else get_session_summary_queue()
+
+    def create_session_summary(self, session) -> Optional[SessionSummary]:
+        if self.model is None or session is None:
+            return None
+        self._queue().enqueue(self, session)
+        # The run keeps the current summary, the updated one is saved when ready
+        return session.summary
+
+    async def acreate_session_summary(self, session) -> Optional[SessionSummary]:
+        return self.create_session_summary(session)
+
+    def get_update_messages(self, previous: Optional[SessionSummary], conversation: List[Message]) -> List[Message]:
+        """Prompt with the previous summary and only the new part of the conversation"""
+        response_format = self.get_response_format(self.model)
+        if previous is None:
+            return self._summary_messages(self.get_system_message(conversation, response_format))
+
+        system_message = self.get_system_message(conversation, response_format)
+        previous_text = f"<previous_summary>\n{previous.summary}\n</previous_summary>\n"
+        if previous.topics:
+            previous_text += f"<previous_topics>{', '.join(previous.topics)}</previous_topics>\n"
+        prompt = self.session_summary_prompt or INCREMENTAL_SUMMARY_PROMPT
+        # get_system_message starts with its own prompt; swap it for the incremental one
+        default_prompt_end = system_message.content.index("<conversation>")
+        system_message.content = prompt + previous_text + system_message.content[default_prompt_end:]
+        return self._summary_messages(system_message)
+
+    @staticmethod
+    def _summary_messages(system_message: Message) -> List[Message]:
+        return [system_message, Message(role="user", content="Provide the summary of the conversation.")]
+
+    def fold(self, previous: Optional[SessionSummary], conversation: List[Message]) -> Tuple[Optional[SessionSummary], int]:
+        """Updated summary from the previous one and the new messages, and the estimated prompt tokens"""
+        messages = self.get_update_messages(previous, conversation)
+        prompt_tokens = sum(estimate_tokens(str(message.content or "")) for message in messages)
+        response = self.model.response(messages=messages, response_format=self.get_response_format(self.model))
+        return self._process_summary_response(response, self.model), prompt_tokens
+
+    def save_summary(self, session, summary: SessionSummary, last_run_id: str):
+        """Set the summary on the live session and persist it"""
+        session.summary = summary
+        if session.session_data is None:
+            session.session_data = {}
+        # In place: the run may still be writing other keys of the same dict
+        session.session_data[SUMMARIZED_RUN_KEY] = last_run_id
+        self.summaries_updated = True
+        if self.db is None:
+            return
+        session_type = SessionType.TEAM if isinstance(session, TeamSession) else SessionType.AGENT
+        # Write onto the stored session so runs saved meanwhile are not overwritten
+        stored = self.db.get_session(session_id=session.session_id, session_type=session_type)
+        if stored is None:
+            # The run has not been saved yet; it saves the live session, summary included
+            return
+        stored.summary = summary
+        stored.session_data = {**(stored.session_data or {}), SUMMARIZED_RUN_KEY: last_run_id}
+        self.db.upsert_session(stored)
+
+
+# Global singleton instance
+_session_summary_queue: Optional[SessionSummaryQueue] = None
+
+
+def get_session_summary_queue() -> SessionSummaryQueue:
+    """Get or create the global session summary queue"""
+    global _session_summary_queue
+    if _session_summary_queue is None:
+        _session_summary_queue = SessionSummaryQueue()
+    return _session_summary_queue
@@ -0,0 +1,194 @@
+"""
+Write Queue - Single writer for a LanceDB table
+
+Every append creates a new Lance fragment and table version, so many small
+concurrent uploads leave the table fragmented. All writes are handed to one
+writer thread instead; it waits briefly for more submissions and appends
+them together in one add(). Maintenance jobs run on the same thread, so they
+never race with appends.
+
+Usage:
+    from services.write_queue import LanceWriteQueue
+
+    queue = LanceWriteQueue(add_rows=table.add)
+    queue.write(rows)                    # blocks until written
+    await asyncio.wrap_future(queue.submit(rows))
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from config.settings import LANCE_WRITE_BATCH_ROWS, LANCE_WRITE_LINGER_MS
+from services.metrics import get_metrics_registry
+
+
+class _Job:
+    """A function to run alone on the writer thread"""
+
+    def __init__(self, fn: Callable[[], Any]):
+        self.fn = fn
+        self.future: Future = Future()
+
+
+class _Write:
+    def __init__(self, rows: List[Dict[str, Any]]):
+        self.rows = rows
+        self.future: Future = Future()
+
+
+_STOP = object()
+
+
+class LanceWriteQueue:
+    """
+    Coalescing single-writer queue.
+
+    Args:
+        add_rows: Function that appends a list of rows to the table
+        max_batch_rows: Stop coalescing once this many rows are pending
+        linger_ms: How long to wait for more submissions after the first one
+    """
+
+    def __init__(
+        self,
+        add_rows: Callable[[List[Dict[str, Any]]], None],
+        max_batch_rows: int = LANCE_WRITE_BATCH_ROWS,
+        linger_ms: int = LANCE_WRITE_LINGER_MS,
+        name: str = "lance",
+    ):
+        self.add_rows = add_rows
+        self.max_batch_rows = max_batch_rows
+        self.linger_seconds = linger_ms / 1000
+        self.name = name
+
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+        self.submissions = 0
+        self.writes = 0
+        self.rows_written = 0
+        self.jobs = 0
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=f"{self.name}-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, rows: List[Dict[str, Any]]) -> Future:
+        """Queue rows for writing; the future resolves once they are in the table"""
+        item = _Write(rows)
+        if not rows:
+            item.future.set_result(None)
+            return item.future
+        self._ensure_thread()
+        self._queue.put(item)
+        return item.future
+
+    def write(self, rows: List[Dict[str, Any]]):
+        """Queue rows and wait until they are written (re-raises write errors)"""
+        self.submit(rows).result()
+
+    def run_exclusive(self, fn: Callable[[], Any]) -> Future:
+        """Run fn on the writer thread, between writes"""
+        job = _Job(fn)
+        self._ensure_thread()
+        self._queue.put(job)
+        return job.future
+
+    # ------------------------------------------------------------------
+    # Writer thread
+    # ------------------------------------------------------------------
+
+    def _collect(self, first: _Write) -> Tuple[List[_Write], Any]:
+        """Gather more writes until the batch is full or the linger time is over"""
+        batch = [first]
+        pending_rows = len(first.rows)
+        deadline = time.monotonic() + self.linger_seconds
+        while pending_rows < self.max_batch_rows:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if not isinstance(item, _Write):
+                # Jobs and stop requests run after the current batch
+                return batch, item
+            batch.append(item)
+            pending_rows += len(item.rows)
+        return batch, None
+
+    def _flush(self, batch: List[_Write]):
+        rows = [row for item in batch for row in item.rows]
+        started = time.perf_counter()
+        try:
+            self.add_rows(rows)
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0].future.set_exception(e)
+                return
+            # Retry one by one so a bad submission does not fail the others
+            for item in batch:
+                self._flush([item])
+            return
+
+        self.writes += 1
+        self.rows_written += len(rows)
+        metrics = get_metrics_registry()
+        metrics.counter("lance_writes_total", "Appends to LanceDB tables").inc(table=self.name)
+        metrics.histogram(
+            "lance_write_rows", "Rows per LanceDB append", (1, 10, 50, 100, 500, 1000, 5000, 20000)
+        ).observe(len(rows), table=self.name)
+        metrics.histogram(
+            "lance_write_seconds", "Time per LanceDB append", (0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+        ).observe(time.perf_counter() - started, table=self.name)
+        for item in batch:
+            item.future.set_result(None)
+
+    def _run_job(self, job: _Job):
+        self.jobs += 1
+        try:
+            job.future.set_result(job.fn())
+        except Exception as e:
+            job.future.set_exception(e)
+
+    def _run(self):
+        carry = None
+        while True:
+            item = carry if carry is not None else self._queue.get()
+            carry = None
+            if item is _STOP:
+                return
+            if isinstance(item, _Job):
+                self._run_job(item)
+                continue
+            batch, carry = self._collect(item)
+            self.submissions += len(batch)
+            self._flush(batch)
+
+    def close(self, timeout: Optional[float] = 30):
+        """Write everything queued so far, then stop the writer thread"""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get queue statistics"""
+        return {
+            "running": self._thread is not None and self._thread.is_alive(),
+            "pending": self._queue.qsize(),
+            "submissions": self.submissions,
+            "writes": self.writes,
+            "rows_written": self.rows_written,
+            "submissions_per_write": round(self.submissions / self.writes, 2) if self.writes else None,
+            "jobs": self.jobs,
+        }
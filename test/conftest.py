@@ -0,0 +1,16 @@
+"""
+Shared pytest fixtures
+"""
+import pytest
+
+from readers import chunking
+from readers.chunking import ChunkCache
+
+
+@pytest.fixture(autouse=True)
+def isolated_chunk_cache(tmp_path, monkeypatch):
+    """Give every test its own chunk cache instead of the one under the project's tmp/"""
+    cache = ChunkCache(str(tmp_path / "chunk_cache.db"))
+    monkeypatch.setattr(chunking, "get_chunk_cache", lambda: cache)
+    yield cache
+    cache.close()
@@ -0,0 +1,161 @@
+"""
+Test script for the streaming chat-history importer
+Parses small exports with a tiny read buffer and records extraction calls, so no API key is needed
+"""
+import json
+import threading
+
+from services.chat_history_import import (
+    ChatHistoryImporter,
+    ChatMessage,
+    iter_json_records,
+    iter_messages,
+    iter_windows,
+    parse_timestamp,
+)
+
+BASE = 1_700_000_000
+
+
+def sample_records(count=40):
+    return [
+        {"sender": f"user{i % 3}", "content": f"message {i} about hiking 🏔️", "timestamp": BASE + i * 60,
+         "conversation": "friends" if i % 2 else "family"}
+        for i in range(count)
+    ]
+
+
+class RecordingImporter(ChatHistoryImporter):
+    """Records windows instead of extracting memories with a model"""
+
+    def __init__(self, **kwargs):
+        super().__init__(manager=None, **kwargs)
+        self.windows = []
+        self.active = 0
+        self.max_active = 0
+        self._count_lock = threading.Lock()
+
+    def extract_window(self, window, user_id):
+        with self._count_lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        self.windows.append((user_id, window.conversation, len(window.messages)))
+        with self._count_lock:
+            self.active -= 1
+
+
+def test_json_array_is_streamed(tmp_path):
+    path = tmp_path / "export.json"
+    path.write_text(json.dumps(sample_records()), encoding="utf-8")
+    read = []
+    # A 64-byte buffer forces objects (and multi-byte characters) to span reads
+    records = list(iter_json_records(str(path), read.append, chunk_bytes=64))
+    assert records == sample_records()
+    assert sum(read) == path.stat().st_size
+
+
+def test_wrapped_object_and_json_lines(tmp_path):
+    wrapped = tmp_path / "chat.json"
+    wrapped.write_text(json.dumps({"name": "Trip", "messages": sample_records(5)}), encoding="utf-8")
+    assert len(list(iter_json_records(str(wrapped), chunk_bytes=32))) == 5
+
+    lines = tmp_path / "chat.jsonl"
+    lines.write_text("\n".join(json.dumps(record) for record in sample_records(5)), encoding="utf-8")
+    messages = list(iter_messages(str(lines)))
+    assert [message.content for message in messages] == [record["content"] for record in sample_records(5)]
+
+
+def test_messages_key_after_a_large_header_is_found(tmp_path):
+    wrapped = tmp_path / "chat.json"
+    header = {"participants": [{"name": f"member {i}", "bio": "likes hiking " * 20} for i in range(50)]}
+    wrapped.write_text(json.dumps({**header, "messages": sample_records(5)}), encoding="utf-8")
+    # The messages key lies far beyond the first few chunks
+    assert wrapped.stat().st_size > 100 * 32
+    assert list(iter_json_records(str(wrapped), chunk_bytes=32)) == sample_records(5)
+
+
+def test_object_without_messages_fails_the_job(tmp_path):
+    path = tmp_path / "chat.json"
+    path.write_text(json.dumps({"name": "Trip", "notes": "x" * 5000}), encoding="utf-8")
+    importer = RecordingImporter(workers=1, gap_seconds=3600, max_tokens=150)
+    job = importer.run(importer.create_job(str(path), "alice"))
+
+    assert job.status == "failed"
+    assert "No messages array" in job.error
+    assert importer.windows == []
+
+
+def test_txt_export(tmp_path):
+    path = tmp_path / "wechat.txt"
+    path.write_text(
+        "2024-01-05 10:23:11 Alice: going hiking on Sunday\n"
+        "2024/1/5 10:25 Bob\n"
+        "count me in\n"
+        "bringing snacks\n"
+        "[2024-01-05 10:30] Alice：great\n",
+        encoding="utf-8",
+    )
+    messages = list(iter_messages(str(path)))
+    assert [(m.sender, m.content) for m in messages] == [
+        ("Alice", "going hiking on Sunday"),
+        ("Bob", "count me in\nbringing snacks"),
+        ("Alice", "great"),
+    ]
+    assert messages[1].timestamp == parse_timestamp("2024-01-05 10:25")
+    assert all(m.conversation == "wechat" for m in messages)
+
+
+def test_windows_split_on_gap_and_budget():
+    def messages():
+        for i in range(10):
+            yield ChatMessage("a", "word " * 40, "chat", BASE + i * 60)
+        # A long silence starts a new window
+        yield ChatMessage("a", "back again", "chat", BASE + 100_000)
+
+    windows = list(iter_windows(messages(), gap_seconds=3600, max_tokens=200))
+    assert sum(len(window.messages) for window in windows) == 11
+    assert all(window.tokens <= 200 for window in windows)
+    assert windows[-1].messages[0].content == "back again"
+    assert len(windows[-1].messages) == 1
+
+
+def test_import_job_reports_progress(tmp_path):
+    path = tmp_path / "export.json"
+    path.write_text(json.dumps(sample_records(200)), encoding="utf-8")
+    importer = RecordingImporter(workers=3, gap_seconds=3600, max_tokens=150)
+    job = importer.run(importer.create_job(str(path), "alice"))
+
+    assert job.status == "done"
+    assert job.messages == 200
+    assert job.windows == job.windows_done == len(importer.windows) > 2
+    assert job.bytes_read == job.bytes_total == path.stat().st_size
+    assert {conversation for _, conversation, _ in importer.windows} == {"friends", "family"}
+    assert sum(count for _, _, count in importer.windows) == 200
+    assert importer.max_active <= 3
+    assert job.to_dict()["progress"] == 1.0
+    assert path.exists()
+
+
+def test_uploaded_exports_are_deleted_when_the_job_ends(tmp_path):
+    path = tmp_path / "upload.jsonl"
+    path.write_text("\n".join(json.dumps(record) for record in sample_records(10)), encoding="utf-8")
+    importer = RecordingImporter(workers=1, gap_seconds=3600, max_tokens=150)
+    job = importer.run(importer.create_job(str(path), "alice", delete_file=True))
+
+    assert job.status == "done" and job.messages == 10
+    assert "delete_file" not in job.to_dict()
+    assert not path.exists()
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+
+    for test in (test_json_array_is_streamed, test_wrapped_object_and_json_lines,
+                 test_messages_key_after_a_large_header_is_found, test_object_without_messages_fails_the_job,
+                 test_txt_export,
+                 test_import_job_reports_progress, test_uploaded_exports_are_deleted_when_the_job_ends):
+        with tempfile.TemporaryDirectory() as directory:
+            test(Path(directory))
+    test_windows_split_on_gap_and_budget()
+    print("✅ All chat history import tests passed")
@@ -0,0 +1,98 @@
+"""
+Test script for parallel chunking and the chunk cache
+Uses CPU-only chunking strategies and a temporary cache file
+"""
+from agno.knowledge.chunking.document import DocumentChunking
+from agno.knowledge.chunking.fixed import FixedSizeChunking
+from agno.knowledge.document.base import Document
+from agno.knowledge.reader.base import Reader
+
+import readers.chunking as chunking
+from readers.chunking import ChunkCache, chunk_documents, strategy_fingerprint
+from readers.instrumentation import instrument_reader
+from readers.local_readers import shutdown_parse_pool
+
+
+class CountingChunking(FixedSizeChunking):
+    """FixedSizeChunking that counts its calls (in this process)"""
+
+    calls = 0
+
+    def chunk(self, document):
+        CountingChunking.calls += 1
+        return super().chunk(document)
+
+
+class TextReader(Reader):
+    def read(self, obj, name=None, password=None):
+        return [Document(name=name, content=obj)]
+
+
+def use_cache(tmp_path, monkeypatch) -> ChunkCache:
+    cache = ChunkCache(str(tmp_path / "chunk_cache.db"), max_entries=100)
+    monkeypatch.setattr(chunking, "get_chunk_cache", lambda: cache)
+    return cache
+
+
+def make_docs(count, size=3000):
+    return [
+        Document(name=f"doc{i}", id=f"doc{i}", meta_data={"page": i}, content=f"document {i} " + "x" * size)
+        for i in range(count)
+    ]
+
+
+def test_fingerprint_covers_strategy_and_parameters():
+    assert strategy_fingerprint(FixedSizeChunking(chunk_size=500)) == strategy_fingerprint(FixedSizeChunking(chunk_size=500))
+    assert strategy_fingerprint(FixedSizeChunking(chunk_size=500)) != strategy_fingerprint(FixedSizeChunking(chunk_size=600))
+    assert strategy_fingerprint(FixedSizeChunking(chunk_size=500)) != strategy_fingerprint(DocumentChunking(chunk_size=500))
+
+
+def test_second_pass_is_served_from_cache(tmp_path, monkeypatch):
+    cache = use_cache(tmp_path, monkeypatch)
+    CountingChunking.calls = 0
+    reader = TextReader(chunking_strategy=CountingChunking(chunk_size=1000))
+
+    first = chunk_documents(reader, make_docs(4))
+    assert CountingChunking.calls == 4
+    second = chunk_documents(reader, make_docs(4))
+    assert CountingChunking.calls == 4
+    assert [(c.id, c.name, c.meta_data, c.content) for c in first] == [(c.id, c.name, c.meta_data, c.content) for c in second]
+    assert cache.get_stats()["hits"] == 4
+
+    # Switching strategies only recomputes under the new key; one new document is the only miss afterwards
+    reader.chunking_strategy = CountingChunking(chunk_size=2000)
+    chunk_documents(reader, make_docs(4))
+    assert CountingChunking.calls == 8
+    chunk_documents(reader, make_docs(5))
+    assert CountingChunking.calls == 9
+
+
+def test_large_inputs_are_chunked_in_process_pool(tmp_path, monkeypatch):
+    use_cache(tmp_path, monkeypatch)
+    monkeypatch.setattr(chunking, "READER_INLINE_MAX_BYTES", 0)
+    reader = TextReader(chunking_strategy=FixedSizeChunking(chunk_size=1000))
+    docs = make_docs(3)
+    try:
+        chunks = chunk_documents(reader, docs)
+    finally:
+        shutdown_parse_pool()
+
+    expected = [chunk for doc in make_docs(3) for chunk in FixedSizeChunking(chunk_size=1000).chunk(doc)]
+    assert [c.content for c in chunks] == [c.content for c in expected]
+    assert [c.id for c in chunks] == [c.id for c in expected]
+
+
+def test_instrumented_reader_uses_cache(tmp_path, monkeypatch):
+    cache = use_cache(tmp_path, monkeypatch)
+    reader = instrument_reader(TextReader(chunking_strategy=DocumentChunking(chunk_size=50)))
+    document = Document(name="note", content="First paragraph here.\n\nSecond paragraph there.\n\nThird one.")
+
+    first = reader.chunk_document(document)
+    second = reader.chunk_document(document)
+    assert [c.content for c in first] == [c.content for c in second]
+    assert cache.get_stats()["hits"] == 1
+
+    # Documents that need no splitting come back as themselves
+    small = Document(name="small", content="tiny")
+    assert reader.chunk_document(small)[0] is small
+    assert reader.chunk_document(small)[0] is small
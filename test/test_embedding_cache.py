@@ -0,0 +1,98 @@
+"""
+Test script for the persistent embedding cache
+Uses a counting fake embedder, so no OPENAI_API_KEY is needed
+"""
+import asyncio
+from dataclasses import dataclass
+from agno.knowledge.embedder.base import Embedder
+from services.embedding_cache import CachedEmbedder
+
+
+@dataclass
+class CountingEmbedder(Embedder):
+    """Deterministic 4-dimensional embedder that counts API calls"""
+
+    id: str = "fake-embedding"
+    dimensions: int = 4
+    calls: int = 0
+
+    def get_embedding_and_usage(self, text):
+        self.calls += 1
+        return [float(len(text)), 1.0, 2.0, 3.0], {"total_tokens": len(text)}
+
+    async def async_get_embedding_and_usage(self, text):
+        return self.get_embedding_and_usage(text)
+
+    async def async_get_embeddings_batch_and_usage(self, texts):
+        results = [self.get_embedding_and_usage(text) for text in texts]
+        return [emb for emb, _ in results], [usage for _, usage in results]
+
+
+def test_repeated_texts_are_served_from_disk(tmp_path):
+    inner = CountingEmbedder()
+    embedder = CachedEmbedder(embedder=inner, cache_dir=str(tmp_path), max_entries=10)
+
+    first, usage = embedder.get_embedding_and_usage("hello")
+    second, cached_usage = embedder.get_embedding_and_usage("hello")
+
+    assert first == second == [5.0, 1.0, 2.0, 3.0]
+    assert usage == {"total_tokens": 5} and cached_usage is None
+    assert inner.calls == 1
+    assert embedder.get_stats()["hit_rate"] == 0.5
+
+    # A new process (new wrapper) reads the same files
+    reopened = CachedEmbedder(embedder=CountingEmbedder(), cache_dir=str(tmp_path), max_entries=10)
+    assert reopened.get_embedding("hello") == first
+    assert reopened.embedder.calls == 0
+
+
+def test_batch_only_embeds_uncached_unique_texts(tmp_path):
+    inner = CountingEmbedder()
+    embedder = CachedEmbedder(embedder=inner, cache_dir=str(tmp_path), max_entries=10)
+    embedder.get_embedding("a")
+
+    embeddings, usages = asyncio.run(embedder.async_get_embeddings_batch_and_usage(["a", "bb", "bb", "ccc"]))
+
+    assert [emb[0] for emb in embeddings] == [1.0, 2.0, 2.0, 3.0]
+    assert usages[0] is None
+    assert inner.calls == 3  # "a" once before, then "bb" and "ccc"
+
+
+def test_least_recently_used_rows_are_evicted(tmp_path):
+    inner = CountingEmbedder()
+    embedder = CachedEmbedder(embedder=inner, cache_dir=str(tmp_path), max_entries=2)
+
+    embedder.get_embedding("one")
+    embedder.get_embedding("two")
+    embedder.get_embedding("one")      # "two" is now least recently used
+    embedder.get_embedding("three")    # evicts "two"
+
+    calls = inner.calls
+    embedder.get_embedding("one")
+    assert inner.calls == calls
+    embedder.get_embedding("two")
+    assert inner.calls == calls + 1
+    assert embedder.get_stats()["entries"] == 2
+
+
+def test_lowering_capacity_keeps_recent_rows(tmp_path):
+    texts = ["a", "bb", "ccc", "dddd", "eeeee", "ffffff"]
+    inner = CountingEmbedder()
+    embedder = CachedEmbedder(embedder=inner, cache_dir=str(tmp_path), max_entries=6)
+    for text in texts:
+        embedder.get_embedding(text)
+    embedder.get_embedding("a")        # slot 0 stays recent, slots 0, 4, 5 survive
+    embedder.store.close()
+
+    smaller = CachedEmbedder(embedder=inner, cache_dir=str(tmp_path), max_entries=3)
+    calls = inner.calls
+    for text in ("a", "eeeee", "ffffff"):
+        assert smaller.get_embedding(text) == [float(len(text)), 1.0, 2.0, 3.0]
+    assert inner.calls == calls
+    assert smaller.get_stats()["entries"] == 3
+    assert (tmp_path / "fake-embedding_4" / "vectors.f32").stat().st_size == 3 * 4 * 4
+
+    # Full at the new capacity: new rows evict instead of writing past the end
+    smaller.get_embedding("bb")
+    assert inner.calls == calls + 1
+    assert smaller.get_stats()["entries"] == 3
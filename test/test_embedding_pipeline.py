@@ -0,0 +1,93 @@
+"""
+Test script for batched ingestion embedding
+Uses a fake batch embedder and a temporary LanceDB, so no OPENAI_API_KEY is needed
+"""
+import asyncio
+import hashlib
+from dataclasses import dataclass
+
+from agno.knowledge.document.base import Document
+from agno.knowledge.embedder.base import Embedder
+from services.embedding_pipeline import EmbeddingPipeline, estimate_tokens
+from services.lance_store import PulseLanceDb
+
+
+@dataclass
+class BatchEmbedder(Embedder):
+    """Deterministic 8-dimensional embedder that records batch sizes and concurrency"""
+
+    dimensions: int = 8
+    batch_size: int = 100
+
+    def __post_init__(self):
+        self.batches = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def get_embedding(self, text):
+        digest = hashlib.md5(text.encode()).digest()
+        return [b / 255 for b in digest[:self.dimensions]]
+
+    def get_embedding_and_usage(self, text):
+        return self.get_embedding(text), None
+
+    async def async_get_embedding(self, text):
+        return self.get_embedding(text)
+
+    async def async_get_embedding_and_usage(self, text):
+        return self.get_embedding(text), None
+
+    def get_embeddings_batch_and_usage(self, texts):
+        self.batches.append(len(texts))
+        return [self.get_embedding(text) for text in texts], [None] * len(texts)
+
+    async def async_get_embeddings_batch_and_usage(self, texts):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        return self.get_embeddings_batch_and_usage(texts)
+
+
+def make_docs(count, size=40):
+    return [Document(name="doc", content=f"chunk {i} " + "x" * size) for i in range(count)]
+
+
+def test_batches_respect_token_and_item_limits():
+    pipeline = EmbeddingPipeline(BatchEmbedder(), max_batch_tokens=50, max_batch_items=4)
+    docs = make_docs(20)
+
+    batches = pipeline.make_batches(docs)
+
+    assert sum(len(batch) for batch in batches) == 20
+    for batch in batches:
+        assert len(batch) <= 4
+        assert sum(estimate_tokens(doc.content) for doc in batch) <= 50
+
+
+def test_concurrency_is_bounded():
+    embedder = BatchEmbedder()
+    pipeline = EmbeddingPipeline(embedder, max_batch_items=2, max_concurrency=3)
+    docs = make_docs(20)
+
+    report = asyncio.run(pipeline.embed_documents(docs))
+
+    assert report.chunks == 20 and report.batches == 10 and report.failed == 0
+    assert embedder.max_in_flight == 3
+    assert all(doc.embedding for doc in docs)
+
+
+def test_insert_skips_stored_chunks(tmp_path):
+    embedder = BatchEmbedder()
+    vector_db = PulseLanceDb(table_name="pipeline_test", uri=str(tmp_path / "lancedb"), embedder=embedder)
+    vector_db.create()
+
+    vector_db.insert("hash-1", make_docs(5))
+    assert vector_db.get_count() == 5
+    assert embedder.batches == [5]
+
+    # Re-inserting overlapping content only embeds and writes the new chunks
+    vector_db.insert("hash-1", make_docs(8))
+    assert vector_db.get_count() == 8
+    assert embedder.batches == [5, 3]
+    assert vector_db.last_ingest["skipped_existing"] == 5
@@ -0,0 +1,146 @@
+"""
+Test script for token-budgeted conversation history
+Uses a whitespace tokenizer built in memory (one token per word), so nothing is downloaded
+"""
+from agno.models.message import Message
+from agno.run.agent import RunOutput
+from agno.run.base import RunStatus
+from agno.session import AgentSession
+from tokenizers import Tokenizer, models, pre_tokenizers
+
+from services.history_budget import HistoryBudget, TokenCounter, budget_session_history
+
+
+class CountingTokenizer:
+    """Whitespace tokenizer that counts how often it is called"""
+
+    def __init__(self):
+        self.tokenizer = Tokenizer(models.WordLevel(vocab={"[UNK]": 0}, unk_token="[UNK]"))
+        self.tokenizer.pre_tokenizer = pre_tokenizers.Whitespace()
+        self.calls = 0
+
+    def encode(self, text, add_special_tokens=True):
+        self.calls += 1
+        return self.tokenizer.encode(text, add_special_tokens=add_special_tokens)
+
+
+def words(prefix, count):
+    return " ".join(f"{prefix}{i}" for i in range(count))
+
+
+def make_session(turns=10, words_per_message=20):
+    session = AgentSession(session_id="s1", runs=[])
+    for turn in range(turns):
+        session.runs.append(RunOutput(
+            run_id=f"run-{turn}",
+            status=RunStatus.completed,
+            messages=[
+                Message(role="system", content="You are the newsletter agent"),
+                Message(role="user", content=words(f"q{turn}_", words_per_message)),
+                Message(role="assistant", content=words(f"a{turn}_", words_per_message)),
+            ],
+        ))
+    return session
+
+
+def make_budget(max_tokens=100, max_message_tokens=0):
+    tokenizer = CountingTokenizer()
+    budget = HistoryBudget(max_tokens, max_message_tokens, TokenCounter(name="whitespace", tokenizer=tokenizer))
+    return budget, tokenizer
+
+
+def test_newest_runs_fill_the_budget():
+    budget, _ = make_budget(max_tokens=100)
+    session = make_session(turns=10, words_per_message=20)
+
+    messages = budget.select(session, "Newsletter Agent", last_n=10, skip_role="system")
+
+    # 40 tokens per run: the two newest runs fit into 100 tokens
+    assert [m.content.split()[0] for m in messages] == ["q8_0", "a8_0", "q9_0", "a9_0"]
+    stats = budget.get_stats()["agents"]["Newsletter Agent"]
+    assert stats["history_tokens_used"] == 80
+    assert stats["history_tokens_available"] == 400
+    assert stats["history_runs_used"] == 2
+    print("✅ History is filled with the newest runs up to the budget")
+
+
+def test_long_message_is_truncated_not_the_whole_history():
+    budget, _ = make_budget(max_tokens=200, max_message_tokens=30)
+    session = make_session(turns=3, words_per_message=10)
+    article = words("w", 1000)
+    session.runs[1].messages[1].content = article
+
+    messages = budget.select(session, last_n=10, skip_role="system")
+
+    # The pasted article counts as 30 tokens, so all three runs still fit
+    assert len(messages) == 6
+    shortened = messages[2]
+    assert shortened.content.startswith(words("w", 30))
+    assert "970 more tokens left out of the history" in shortened.content
+    assert session.runs[1].messages[1].content == article
+    assert budget.get_stats()["agents"]["agent"]["messages_truncated"] == 1
+    print("✅ An over-long message is cut down in the history copy only")
+
+
+def test_agno_filters_still_apply():
+    budget, _ = make_budget(max_tokens=10_000)
+    session = make_session(turns=5, words_per_message=5)
+    session.runs[4].status = RunStatus.error
+    session.runs[3].messages[1].from_history = True
+
+    messages = budget.select(session, last_n=3, skip_role=None)
+
+    # Last 3 runs without the failed one, one system message, history-tagged messages skipped
+    assert [m.role for m in messages] == ["system", "user", "assistant", "user", "assistant", "assistant"]
+    assert messages[1].content.startswith("q1_")
+    assert messages[5].content.startswith("a3_")
+    print("✅ last_n, run status, roles and history tags are honoured")
+
+
+def test_run_token_counts_are_cached():
+    budget, tokenizer = make_budget(max_tokens=10_000)
+    session = make_session(turns=5)
+
+    budget.select(session, last_n=10)
+    calls = tokenizer.calls
+    budget.select(session, last_n=10)
+
+    assert tokenizer.calls == calls
+    assert budget.get_stats()["cache_hits"] >= 5
+    print("✅ Token counts of stored runs are computed once")
+
+
+def test_session_is_wrapped_once():
+    budget, _ = make_budget(max_tokens=100)
+    session = make_session(turns=10, words_per_message=20)
+
+    budget_session_history(session, "Social Agent", budget=budget)
+    wrapped = session.get_messages_from_last_n_runs
+    budget_session_history(session, "Social Agent", budget=budget)
+    assert session.get_messages_from_last_n_runs is wrapped
+
+    messages = session.get_messages_from_last_n_runs(last_n=10, skip_role="system")
+    assert len(messages) == 4
+    assert budget.get_stats()["agents"]["Social Agent"]["runs"] == 1
+    print("✅ The pre-hook makes the session select history by tokens")
+
+
+def test_estimates_until_the_tokenizer_is_loaded():
+    counter = TokenCounter(name="not-loaded")
+    counter._loading = True  # pretend the download is still running
+
+    assert not counter.exact
+    assert counter.count("x" * 400) == 101
+    assert counter.truncate("x" * 400, 10) == "x" * 40
+    print("✅ Token estimates are used while the tokenizer loads")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing token-budgeted history...")
+    test_newest_runs_fill_the_budget()
+    test_long_message_is_truncated_not_the_whole_history()
+    test_agno_filters_still_apply()
+    test_run_token_counts_are_cached()
+    test_session_is_wrapped_once()
+    test_estimates_until_the_tokenizer_is_loaded()
+    print("\n✅ All history budget tests passed!")
@@ -0,0 +1,131 @@
+"""
+Test script for the shared HTTP client pool and the model factory
+Only builds clients (no requests are sent), so no API key is needed
+"""
+import asyncio
+import os
+import threading
+
+import httpx
+
+from config.model_factory import PooledOpenAIChat, PooledOpenRouter, create_chat_model
+from services.http_pool import HTTPClientPool, get_http_pool
+
+
+def test_models_share_provider_clients():
+    first = PooledOpenAIChat(id="gpt-4o-mini", api_key="sk-one")
+    second = PooledOpenAIChat(id="gpt-4o", api_key="sk-one")
+    other_key = PooledOpenAIChat(id="gpt-4o", api_key="sk-two")
+
+    client = first.get_client()
+    assert second.get_client() is client
+    assert other_key.get_client() is not client
+    # Every provider client sits on the one shared httpx pool
+    assert client._client is get_http_pool().sync_client
+    assert other_key.get_client()._client is get_http_pool().sync_client
+    print("✅ Models with the same client params share one client and one pool")
+
+
+def test_openrouter_uses_its_own_client_on_the_same_pool():
+    router = PooledOpenRouter(id="openai/gpt-4o-mini", api_key="or-key")
+    openai = PooledOpenAIChat(id="gpt-4o-mini", api_key="or-key")
+
+    assert router.get_client() is not openai.get_client()
+    assert str(router.get_client().base_url).startswith("https://openrouter.ai")
+    assert router.get_client()._client is openai.get_client()._client
+    print("✅ OpenRouter gets its own client on the shared pool")
+
+
+def test_async_clients_are_per_event_loop():
+    pool = HTTPClientPool(max_connections=10, max_keepalive=5, http2=False)
+
+    async def clients():
+        first = pool.async_openai_client({"api_key": "sk-one"})
+        second = pool.async_openai_client({"api_key": "sk-one"})
+        assert first is second
+        assert isinstance(first._client, httpx.AsyncClient)
+        return first
+
+    one = asyncio.run(clients())
+    two = asyncio.run(clients())
+    # Connections cannot be shared between event loops
+    assert one is not two
+    assert pool.clients_reused == 2
+    # Each client is closed while asyncio.run shuts its loop down
+    assert one._client.is_closed and two._client.is_closed
+    print("✅ Async clients are shared within an event loop only")
+
+
+def test_explicit_http_client_is_respected():
+    own_client = httpx.Client()
+    model = PooledOpenAIChat(id="gpt-4o-mini", api_key="sk-one", http_client=own_client)
+
+    assert model.get_client()._client is own_client
+    own_client.close()
+    print("✅ A model given its own http_client keeps it")
+
+
+def test_factory_picks_the_provider():
+    saved = os.environ.pop("OPENAI_API_KEY", None)
+    try:
+        assert isinstance(create_chat_model("openai/gpt-4o-mini"), PooledOpenRouter)
+        os.environ["OPENAI_API_KEY"] = "sk-test"
+        model = create_chat_model("gpt-4o-mini")
+        assert isinstance(model, PooledOpenAIChat) and model.id == "gpt-4o-mini"
+    finally:
+        os.environ.pop("OPENAI_API_KEY", None)
+        if saved is not None:
+            os.environ["OPENAI_API_KEY"] = saved
+    print("✅ The factory builds pooled OpenAI or OpenRouter models")
+
+
+def test_close_drops_clients():
+    pool = HTTPClientPool(http2=False)
+    client = pool.openai_client({"api_key": "sk-one"})
+    http_client = pool.sync_client
+
+    pool.close()
+    assert http_client.is_closed
+    assert pool.openai_client({"api_key": "sk-one"}) is not client
+    assert pool.get_stats()["provider_clients"] == {"openai": 1}
+    print("✅ Closing the pool closes its connections and forgets clients")
+
+
+def test_aclose_closes_every_loops_client():
+    pool = HTTPClientPool(http2=False)
+    other_loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=other_loop.run_forever, daemon=True)
+    thread.start()
+
+    async def client():
+        return pool.async_client()
+
+    try:
+        other_client = asyncio.run_coroutine_threadsafe(client(), other_loop).result(5)
+
+        async def close_from_here():
+            own_client = pool.async_client()
+            await pool.aclose()
+            return own_client
+
+        own_client = asyncio.run(close_from_here())
+        assert own_client.is_closed
+        assert other_client.is_closed
+        assert pool.get_stats()["async_clients"] == 0
+    finally:
+        other_loop.call_soon_threadsafe(other_loop.stop)
+        thread.join(5)
+        other_loop.close()
+    print("✅ aclose closes the async clients of every event loop")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing the shared HTTP client pool...")
+    test_models_share_provider_clients()
+    test_openrouter_uses_its_own_client_on_the_same_pool()
+    test_async_clients_are_per_event_loop()
+    test_explicit_http_client_is_respected()
+    test_factory_picks_the_provider()
+    test_close_drops_clients()
+    test_aclose_closes_every_loops_client()
+    print("\n✅ All HTTP pool tests passed!")
@@ -0,0 +1,79 @@
+"""
+Test script for the LanceDB index manager
+Uses a fake embedder and a temporary LanceDB, so no OPENAI_API_KEY is needed
+"""
+import hashlib
+from dataclasses import dataclass
+
+from agno.knowledge.document.base import Document
+from agno.knowledge.embedder.base import Embedder
+from agno.vectordb.lancedb import SearchType
+from services.index_manager import LanceIndexManager
+from services.lance_store import PulseLanceDb
+
+
+@dataclass
+class HashEmbedder(Embedder):
+    """Deterministic 16-dimensional embedder"""
+
+    dimensions: int = 16
+
+    def get_embedding(self, text):
+        digest = hashlib.sha256(text.encode()).digest()
+        return [b / 255 for b in digest[:self.dimensions]]
+
+    def get_embedding_and_usage(self, text):
+        return self.get_embedding(text), None
+
+    async def async_get_embedding(self, text):
+        return self.get_embedding(text)
+
+    async def async_get_embedding_and_usage(self, text):
+        return self.get_embedding(text), None
+
+
+def make_docs(start, count):
+    return [Document(name="doc", content=f"topic {i} about open pulse") for i in range(start, start + count)]
+
+
+def test_indexes_follow_thresholds(tmp_path):
+    vector_db = PulseLanceDb(
+        table_name="index_test",
+        uri=str(tmp_path / "lancedb"),
+        embedder=HashEmbedder(),
+        search_type=SearchType.hybrid,
+        index_manager=None,
+    )
+    manager = LanceIndexManager(vector_db, min_rows=300, update_min_new_rows=50, retrain_growth=10)
+    vector_db.index_manager = manager
+    vector_db.create()
+
+    # Below the ANN threshold only the full-text and namespace indexes are built
+    vector_db.insert("hash-1", make_docs(0, 100))
+    manager.wait()
+    coverage = manager.get_coverage()
+    assert set(coverage["indexes"]) == {"fts", "namespace"}
+    assert vector_db.fts_index_exists
+
+    # Crossing the threshold builds the ANN index and records latency before/after
+    vector_db.insert("hash-2", make_docs(100, 250))
+    manager.wait()
+    coverage = manager.get_coverage()
+    assert coverage["indexes"]["vector"]["coverage"] == 1.0
+    record = manager.history[-1]
+    assert "build_vector" in record["actions"]
+    assert record["probe_latency_ms_before"] is not None and record["probe_latency_ms_after"] is not None
+
+    # New rows are folded into the existing indexes without retraining
+    vector_db.insert("hash-3", make_docs(350, 60))
+    manager.wait()
+    assert manager.history[-1]["actions"] == ["update"]
+    assert manager.get_coverage()["indexes"]["fts"]["unindexed_rows"] == 0
+    assert len(vector_db.search("open pulse topic 5", limit=3)) == 3
+
+    # A new process picks up the existing indexes
+    reopened = PulseLanceDb(
+        table_name="index_test", uri=str(tmp_path / "lancedb"), embedder=HashEmbedder(), search_type=SearchType.hybrid
+    )
+    assert reopened.fts_index_exists
+    assert reopened.index_manager.trained_rows == 410
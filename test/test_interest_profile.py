@@ -0,0 +1,200 @@
+"""
+Test script for cached interest profiles
+Uses an in-memory store and a scripted profile builder, so no API key is needed
+"""
+import threading
+
+from agno.db.schemas import UserMemory
+
+import services.interest_profile as interest_profile
+from services.interest_profile import InterestProfileStore, watch_memory_writes, with_interest_profile
+
+
+class FakeMemoryDb:
+    """Just the memory methods of an agno database"""
+
+    def __init__(self):
+        self.memories = {}
+
+    def get_user_memories(self, user_id=None):
+        return [memory for memory in self.memories.values() if memory.user_id == user_id]
+
+    def get_user_memory(self, memory_id):
+        return self.memories.get(memory_id)
+
+    def upsert_user_memory(self, memory):
+        self.memories[memory.memory_id] = memory
+        return memory
+
+    def delete_user_memory(self, memory_id):
+        self.memories.pop(memory_id, None)
+
+    def delete_user_memories(self, memory_ids):
+        for memory_id in memory_ids:
+            self.memories.pop(memory_id, None)
+
+    def clear_memories(self):
+        self.memories.clear()
+
+
+class ScriptedProfileStore(InterestProfileStore):
+    """Builds profiles from memory topics, counting the model calls it replaces"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.model_calls = 0
+
+    def build_with_model(self, memories):
+        self.model_calls += 1
+        schema = self.build_from_topics(memories)
+        schema.formats = ["short summaries"]
+        return schema
+
+
+def make_store(tmp_path, db=None):
+    db = db or FakeMemoryDb()
+    store = ScriptedProfileStore(db, db_file=str(tmp_path / "profiles.db"))
+    watch_memory_writes(db, store)
+    return db, store
+
+
+def add(db, memory_id, user_id, text, topics):
+    db.upsert_user_memory(UserMemory(memory=text, memory_id=memory_id, user_id=user_id, topics=topics))
+
+
+def test_profile_is_cached_until_memories_change(tmp_path):
+    db, store = make_store(tmp_path)
+    add(db, "a1", "alice", "follows AI research", ["ai"])
+    add(db, "a2", "alice", "likes AI agents", ["ai", "agents"])
+    add(db, "b1", "bob", "cycles every weekend", ["cycling"])
+
+    profile = store.get("alice")
+    assert list(profile.topics)[0] == "ai"
+    assert profile.formats == ["short summaries"]
+    assert profile.source == "model"
+    for _ in range(100):
+        assert store.get("alice") is profile
+    assert store.model_calls == 1
+    assert store.get_stats()["hits"] == 100
+
+    # Bob's write leaves Alice's profile alone
+    add(db, "b2", "bob", "watches cycling races", ["cycling"])
+    assert store.get("alice") is profile
+    assert store.model_calls == 1
+
+    add(db, "a3", "alice", "started learning rust", ["rust"])
+    assert "rust" in store.get("alice").topics
+    assert store.model_calls == 2
+
+    db.delete_user_memory("a3")
+    assert "rust" not in store.get("alice").topics
+    assert store.model_calls == 3
+
+
+def test_unchanged_rewrite_does_not_rebuild(tmp_path):
+    db, store = make_store(tmp_path)
+    add(db, "a1", "alice", "follows AI research", ["ai"])
+    store.get("alice")
+    add(db, "a1", "alice", "follows AI research", ["ai"])
+    store.get("alice")
+    assert store.model_calls == 1
+
+
+def test_profiles_survive_restart(tmp_path):
+    db, store = make_store(tmp_path)
+    add(db, "a1", "alice", "follows AI research", ["ai"])
+    built = store.get("alice")
+
+    _, restarted = make_store(tmp_path, db)
+    assert restarted.get("alice").topics == built.topics
+    assert restarted.model_calls == 0
+
+    # A write made while no store was watching is caught by the fingerprint
+    db.memories["a2"] = UserMemory(memory="likes jazz", memory_id="a2", user_id="alice", topics=["jazz"])
+    _, restarted = make_store(tmp_path, db)
+    assert "jazz" in restarted.get("alice").topics
+    assert restarted.model_calls == 1
+
+
+def test_model_failure_falls_back_to_topics(tmp_path):
+    class FailingStore(InterestProfileStore):
+        def build_with_model(self, memories):
+            raise RuntimeError("no API key")
+
+    db = FakeMemoryDb()
+    add(db, "a1", "alice", "follows AI research", ["AI"])
+    store = FailingStore(db, db_file=str(tmp_path / "profiles.db"))
+    profile = store.get("alice")
+    assert profile.source == "topics"
+    assert profile.topics == {"ai": 1.0}
+    assert "ai (1.0)" in profile.to_prompt()
+
+
+def test_empty_user(tmp_path):
+    _, store = make_store(tmp_path)
+    profile = store.get("nobody")
+    assert profile.source == "empty"
+    assert store.model_calls == 0
+
+
+def test_instructions_never_wait_for_a_rebuild(tmp_path, monkeypatch):
+    class BlockedStore(ScriptedProfileStore):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.release = threading.Event()
+            self.release.set()
+
+        def build_with_model(self, memories):
+            assert self.release.wait(5)
+            return super().build_with_model(memories)
+
+    db = FakeMemoryDb()
+    store = BlockedStore(db, db_file=str(tmp_path / "profiles.db"))
+    watch_memory_writes(db, store)
+    monkeypatch.setattr(interest_profile, "_interest_profiles", store)
+    monkeypatch.setattr(interest_profile, "INTEREST_PROFILE_ENABLED", True)
+    instructions = with_interest_profile("Write the digest.")
+    interest_profile.load_interest_profile("alice")
+
+    add(db, "a1", "alice", "follows AI research", ["ai"])
+    store.get("alice")
+
+    # While the rebuild is blocked the run gets the previous profile
+    store.release.clear()
+    add(db, "a2", "alice", "started learning rust", ["rust"])
+    prompt = instructions()
+    assert "ai (1.0)" in prompt and "rust" not in prompt
+    assert store.model_calls == 1
+    assert instructions() == prompt
+
+    store.release.set()
+    store._rebuilds["alice"].join(5)
+    assert "rust" in instructions()
+    assert store.model_calls == 2
+
+
+def test_write_during_rebuild_keeps_profile_stale(tmp_path):
+    db, store = make_store(tmp_path)
+    add(db, "a1", "alice", "follows AI research", ["ai"])
+    original = store.build_with_model
+
+    def build_and_write(memories):
+        if store.model_calls == 0:
+            add(db, "a2", "alice", "likes jazz", ["jazz"])
+        return original(memories)
+
+    store.build_with_model = build_and_write
+    assert "jazz" not in store.get("alice").topics
+    assert "jazz" in store.get("alice").topics
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+
+    for test in (test_profile_is_cached_until_memories_change, test_unchanged_rewrite_does_not_rebuild,
+                 test_profiles_survive_restart, test_model_failure_falls_back_to_topics, test_empty_user,
+                 test_write_during_rebuild_keeps_profile_stale):
+        with tempfile.TemporaryDirectory() as directory:
+            test(Path(directory))
+    print("✅ All interest profile tests passed")
@@ -0,0 +1,159 @@
+"""
+Test script for JinaWebReader streaming mode
+Uses a fake HTTP response, so no JINA_API_KEY or network access is needed
+"""
+import pytest
+import requests
+from readers import JinaWebReader
+from readers.jina_reader import split_markdown_sections
+
+
+PAGE = """Title: Example
+
+# Introduction
+Some intro text.
+
+## Details
+```python
+# not a heading
+print("hi")
+```
+More details.
+
+## Conclusion
+Bye.
+"""
+
+
+class FakeResponse:
+    """Minimal stand-in for a streamed requests.Response"""
+
+    def __init__(self, body: bytes, chunk_size: int = 7):
+        self.body = body
+        self.status_code = 200
+        self.encoding = "utf-8"
+        self.url = "https://r.jina.ai/https://example.com"
+        self.chunk_size = chunk_size
+        self.closed = False
+
+    def iter_content(self, chunk_size=None):
+        for i in range(0, len(self.body), self.chunk_size):
+            yield self.body[i:i + self.chunk_size]
+
+    def close(self):
+        self.closed = True
+
+
+def test_split_markdown_sections():
+    """Headings start sections, headings inside code fences do not"""
+    sections = list(split_markdown_sections(PAGE.splitlines(keepends=True)))
+    titles = [title for title, _ in sections]
+
+    assert titles == [None, "Introduction", "Details", "Conclusion"]
+    assert "# not a heading" in sections[2][1]
+    assert "".join(content for _, content in sections) == PAGE
+
+
+def test_streaming_read(monkeypatch):
+    """Streaming mode yields one document per section"""
+    fake = FakeResponse(PAGE.encode("utf-8"))
+    monkeypatch.setattr(requests, "get", lambda *args, **kwargs: fake)
+
+    reader = JinaWebReader(api_key="test", stream=True)
+    docs = reader.read("https://example.com")
+
+    assert [doc.meta_data.get("section_title") for doc in docs] == [
+        None, "Introduction", "Details", "Conclusion"
+    ]
+    assert all(doc.meta_data["streamed"] for doc in docs)
+    assert fake.closed
+
+
+def test_streaming_byte_cap(monkeypatch):
+    """Reading stops at max_bytes and the last section is marked truncated"""
+    body = ("# Big\n" + "x" * 100 + "\n# Never read\nlater\n").encode("utf-8")
+    monkeypatch.setattr(requests, "get", lambda *args, **kwargs: FakeResponse(body))
+
+    reader = JinaWebReader(api_key="test", stream=True, max_bytes=50)
+    docs = reader.read("https://example.com")
+
+    assert len(docs) == 1
+    assert docs[0].meta_data["truncated"] is True
+    assert len(docs[0].content.encode("utf-8")) == 50
+
+
+def test_multibyte_characters_split_across_chunks(monkeypatch):
+    """UTF-8 sequences split between network chunks are decoded correctly"""
+    body = "# 标题\n中文内容\n".encode("utf-8")
+    monkeypatch.setattr(requests, "get", lambda *args, **kwargs: FakeResponse(body, chunk_size=2))
+
+    reader = JinaWebReader(api_key="test", stream=True)
+    docs = reader.read("https://example.com")
+
+    assert docs[0].content == "# 标题\n中文内容\n"
+    assert docs[0].meta_data["section_title"] == "标题"
+
+
+class FakeVectorDb:
+    """Records the batches inserted for each content hash"""
+
+    def __init__(self):
+        self.calls = []
+
+    def exists(self):
+        return True
+
+    def upsert_available(self):
+        return True
+
+    def content_hash_exists(self, content_hash):
+        return False
+
+    async def async_upsert(self, content_hash, documents, filters=None):
+        self.calls.append(("upsert", [doc.content for doc in documents]))
+
+    async def async_insert(self, content_hash, documents, filters=None):
+        self.calls.append(("insert", [doc.content for doc in documents]))
+
+
+def test_knowledge_inserts_sections_as_they_stream(monkeypatch):
+    """RegistryKnowledge inserts streamed sections in batches and closes the response"""
+    from agno.knowledge.content import Content, ContentStatus
+    from readers import registry
+    from readers.registry import RegistryKnowledge
+
+    fake = FakeResponse(PAGE.encode("utf-8"))
+    monkeypatch.setattr(requests, "get", lambda *args, **kwargs: fake)
+    monkeypatch.setattr(registry, "STREAM_BATCH_SECTIONS", 3)
+
+    reader = JinaWebReader(api_key="test", stream=True, chunk=False)
+    monkeypatch.setattr(reader, "read", lambda *args, **kwargs: pytest.fail("read() loads the whole page"))
+    vector_db = FakeVectorDb()
+    knowledge = RegistryKnowledge(name="stream", vector_db=vector_db)
+    knowledge.add_content(url="https://example.com", reader=reader, skip_if_exists=True)
+
+    # First batch replaces stored content for the URL, later batches are added
+    assert [kind for kind, _ in vector_db.calls] == ["upsert", "insert"]
+    assert [len(contents) for _, contents in vector_db.calls] == [3, 1]
+    assert vector_db.calls[1][1][0].startswith("## Conclusion")
+    assert fake.closed
+
+
+def test_error_responses_are_closed(monkeypatch):
+    """Rate-limited and failed responses release their connection"""
+    responses = []
+
+    def fake_get(*args, **kwargs):
+        response = FakeResponse(b"slow down")
+        response.status_code = 429 if not responses else 500
+        response.text = "slow down"
+        responses.append(response)
+        return response
+
+    monkeypatch.setattr(requests, "get", fake_get)
+    monkeypatch.setattr("time.sleep", lambda seconds: None)
+
+    reader = JinaWebReader(api_key="test", stream=True, max_retries=3)
+    assert reader.read("https://example.com") == []
+    assert len(responses) == 2
+    assert all(response.closed for response in responses)
@@ -0,0 +1,87 @@
+"""
+Test script for per-user knowledge namespaces
+Uses a fake embedder and a temporary LanceDB, so no OPENAI_API_KEY is needed
+"""
+import hashlib
+from dataclasses import dataclass
+
+from agno.knowledge.document.base import Document
+from agno.knowledge.embedder.base import Embedder
+from agno.vectordb.lancedb import LanceDb, SearchType
+from services.knowledge_namespace import get_knowledge_namespace, knowledge_namespace, scope_knowledge_to_user
+from services.lance_store import PulseLanceDb
+
+
+@dataclass
+class HashEmbedder(Embedder):
+    """Deterministic 8-dimensional embedder"""
+
+    dimensions: int = 8
+
+    def get_embedding(self, text):
+        digest = hashlib.md5(text.encode()).digest()
+        return [b / 255 for b in digest[:self.dimensions]]
+
+    def get_embedding_and_usage(self, text):
+        return self.get_embedding(text), None
+
+    async def async_get_embedding(self, text):
+        return self.get_embedding(text)
+
+    async def async_get_embedding_and_usage(self, text):
+        return self.get_embedding(text), None
+
+
+def owners(documents):
+    return sorted({(doc.meta_data or {}).get("user_id", "shared") for doc in documents})
+
+
+def make_store(tmp_path, **kwargs):
+    return PulseLanceDb(
+        table_name="namespace_test",
+        uri=str(tmp_path / "lancedb"),
+        embedder=HashEmbedder(),
+        index_manager=None,
+        write_queue=None,
+        **kwargs,
+    )
+
+
+def test_searches_only_see_own_and_shared_rows(tmp_path):
+    for search_type in (SearchType.vector, SearchType.hybrid):
+        vector_db = make_store(tmp_path / search_type.value, search_type=search_type)
+        vector_db.create()
+        vector_db.insert("shared", [Document(name="guide", content="open pulse guide")])
+        # The same text can be stored by two users
+        vector_db.insert("alice", [Document(name="note", content="open pulse note")], filters={"user_id": "alice"})
+        vector_db.insert("bob", [Document(name="note", content="open pulse note")], filters={"user_id": "bob"})
+        assert vector_db.get_count() == 3
+
+        with knowledge_namespace("alice"):
+            assert owners(vector_db.search("open pulse", limit=10)) == ["alice", "shared"]
+        assert owners(vector_db.search("open pulse", limit=10, filters={"user_id": "bob"})) == ["bob", "shared"]
+        assert owners(vector_db.search("open pulse", limit=10)) == ["shared"]
+
+
+def test_agent_pre_hook_sets_namespace():
+    scope_knowledge_to_user(user_id="carol@example.com")
+    assert get_knowledge_namespace() == "carol@example.com"
+    scope_knowledge_to_user(user_id=None)
+    assert get_knowledge_namespace() is None
+
+
+def test_existing_table_is_migrated(tmp_path):
+    legacy = LanceDb(
+        table_name="namespace_test", uri=str(tmp_path / "lancedb"), embedder=HashEmbedder(), search_type=SearchType.vector
+    )
+    legacy.create()
+    legacy.insert("shared", [Document(name="guide", content="open pulse guide")])
+    legacy.insert("alice", [Document(name="note", content="alice note")], filters={"user_id": "alice"})
+
+    vector_db = make_store(tmp_path, search_type=SearchType.vector)
+
+    assert "namespace" in vector_db.table.schema.names
+    with knowledge_namespace("alice"):
+        assert owners(vector_db.search("note", limit=10)) == ["alice", "shared"]
+    with knowledge_namespace("bob"):
+        assert owners(vector_db.search("note", limit=10)) == ["shared"]
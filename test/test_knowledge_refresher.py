@@ -0,0 +1,157 @@
+"""
+Test script for the incremental knowledge refresher
+Uses a fake reader, a fake embedder and a temporary LanceDB, so no API keys are needed
+"""
+import hashlib
+import time
+from dataclasses import dataclass
+
+from agno.knowledge import Knowledge
+from agno.knowledge.document.base import Document
+from agno.knowledge.embedder.base import Embedder
+from agno.knowledge.reader.base import Reader
+from services.knowledge_refresher import KnowledgeRefresher
+from services.lance_store import PulseLanceDb, chunk_row_id
+
+
+URL = "https://example.com/page"
+
+
+@dataclass
+class CountingEmbedder(Embedder):
+    """Deterministic 16-dimensional embedder that counts embedded texts"""
+
+    dimensions: int = 16
+    calls: int = 0
+
+    def get_embedding(self, text):
+        self.calls += 1
+        digest = hashlib.sha256(text.encode()).digest()
+        return [b / 255 for b in digest[:self.dimensions]]
+
+    def get_embedding_and_usage(self, text):
+        return self.get_embedding(text), None
+
+    async def async_get_embedding(self, text):
+        return self.get_embedding(text)
+
+    async def async_get_embedding_and_usage(self, text):
+        return self.get_embedding(text), None
+
+
+class FakePageReader(Reader):
+    """Returns one document per paragraph of the current page text"""
+
+    def __init__(self, pages):
+        super().__init__(chunk=False)
+        self.pages = pages
+        self.reads = 0
+
+    def read(self, url, name=None):
+        self.reads += 1
+        return [Document(name=name or url, content=part) for part in self.pages[url].split("\n\n")]
+
+
+def make_refresher(tmp_path, pages):
+    embedder = CountingEmbedder()
+    vector_db = PulseLanceDb(
+        table_name="refresh_test", uri=str(tmp_path / "lancedb"), embedder=embedder, index_manager=None
+    )
+    vector_db.create()
+    knowledge = Knowledge(name="refresh", vector_db=vector_db)
+    knowledge.readers = {"JinaWebReader": FakePageReader(pages)}
+    refresher = KnowledgeRefresher(knowledge, db_file=str(tmp_path / "refresh.db"), default_interval_seconds=3600)
+    return refresher, vector_db, embedder
+
+
+def stored_contents(vector_db):
+    return sorted(doc.content for doc in vector_db.search("paragraph", limit=50))
+
+
+def test_add_source_picks_up_stored_chunks(tmp_path):
+    """Chunks already stored for the URL count as known, other URLs' chunks do not"""
+    refresher, vector_db, _ = make_refresher(tmp_path, {URL: "first paragraph"})
+    vector_db.insert(refresher._content_hash(URL), [Document(name=URL, content="first paragraph")])
+    vector_db.insert(refresher._content_hash("https://other.com"), [Document(name="other", content="other paragraph")])
+
+    refresher.add_source(URL)
+
+    assert refresher._stored_chunk_ids(URL) == [chunk_row_id("first paragraph")]
+    report = refresher.run_cycle(force=True)
+    assert (report.chunks_reembedded, report.chunks_unchanged, report.chunks_removed) == (0, 1, 0)
+    print("✅ Known chunks are read from LanceDB for the URL only")
+
+
+def test_only_changed_chunks_are_embedded(tmp_path):
+    """A changed page re-embeds new chunks and deletes the ones that disappeared"""
+    pages = {URL: "intro paragraph\n\nbody paragraph\n\nold paragraph"}
+    refresher, vector_db, embedder = make_refresher(tmp_path, pages)
+    refresher.add_source(URL)
+
+    first = refresher.run_cycle(force=True)
+    assert first.chunks_reembedded == 3
+    assert stored_contents(vector_db) == ["body paragraph", "intro paragraph", "old paragraph"]
+
+    pages[URL] = "intro paragraph\n\nbody paragraph\n\nnew paragraph"
+    calls_before = embedder.calls
+    second = refresher.run_cycle(force=True)
+
+    assert (second.chunks_reembedded, second.chunks_unchanged, second.chunks_removed) == (1, 2, 1)
+    assert embedder.calls - calls_before == 1
+    assert stored_contents(vector_db) == ["body paragraph", "intro paragraph", "new paragraph"]
+    print("✅ Only new chunks are embedded and removed chunks are deleted")
+
+
+def test_sources_refresh_on_their_schedule(tmp_path):
+    """Sources are only refreshed when due, and are rescheduled afterwards"""
+    refresher, _, _ = make_refresher(tmp_path, {URL: "scheduled paragraph"})
+    reader = refresher.knowledge.readers["JinaWebReader"]
+    refresher.add_source(URL, interval_seconds=60)
+
+    assert refresher.run_cycle().sources_checked == 0
+    assert reader.reads == 0
+
+    refresher.run_cycle(force=True)
+    source = refresher.list_sources()[0]
+    assert reader.reads == 1
+    assert source["next_due_at"] - source["last_refreshed_at"] == 60
+    assert source["next_due_at"] > time.time()
+
+    refresher.remove_source(URL)
+    assert refresher.list_sources() == []
+    print("✅ Sources are refreshed on their own schedule")
+
+
+def stored_rows(vector_db):
+    rows = vector_db.table.search().select(["id", "namespace"]).limit(None).to_arrow()
+    return sorted(zip(rows.column("id").to_pylist(), rows.column("namespace").to_pylist()))
+
+
+def test_user_source_stays_in_its_namespace(tmp_path):
+    """A user's URL is refreshed into that user's namespace, under the same row ids"""
+    pages = {URL: "private paragraph\n\nold paragraph"}
+    refresher, vector_db, embedder = make_refresher(tmp_path, pages)
+    owner = {"user_id": "alice"}
+    vector_db.insert(
+        refresher._content_hash(URL),
+        [Document(name=URL, content=part) for part in pages[URL].split("\n\n")],
+        filters=owner,
+    )
+    before = stored_rows(vector_db)
+    assert before == sorted((chunk_row_id(text, "alice"), "alice") for text in ("private paragraph", "old paragraph"))
+
+    refresher.add_source(URL, metadata=owner)
+    calls_before = embedder.calls
+    unchanged = refresher.run_cycle(force=True)
+    assert (unchanged.chunks_reembedded, unchanged.chunks_unchanged, unchanged.chunks_removed) == (0, 2, 0)
+    assert embedder.calls == calls_before
+    assert stored_rows(vector_db) == before
+
+    pages[URL] = "private paragraph\n\nnew paragraph"
+    changed = refresher.run_cycle(force=True)
+    assert (changed.chunks_reembedded, changed.chunks_unchanged, changed.chunks_removed) == (1, 1, 1)
+    assert stored_rows(vector_db) == sorted(
+        (chunk_row_id(text, "alice"), "alice") for text in ("private paragraph", "new paragraph")
+    )
+    assert refresher.list_sources()[0]["namespace"] == "alice"
+    print("✅ A user's source keeps its namespace and row ids")
@@ -0,0 +1,125 @@
+"""
+Test script for the deterministic LLM response cache
+Uses a counting fake model, so no API key is needed
+"""
+import asyncio
+
+from agno.models.message import Message
+from agno.models.metrics import Metrics
+from agno.models.response import ModelResponse
+
+from services.llm_cache import LLMResponseCache, cache_model_responses, request_key
+
+
+class FakeModel:
+    """Answers with a counter and reports token usage"""
+
+    def __init__(self, temperature=0.0):
+        self.id = "fake-1"
+        self.temperature = temperature
+        self.calls = 0
+
+    def get_request_params(self, response_format=None, tools=None, tool_choice=None):
+        return {"temperature": self.temperature}
+
+    def _format_message(self, message):
+        return {"role": message.role, "content": message.content}
+
+    def _answer(self):
+        self.calls += 1
+        return ModelResponse(role="assistant", content=f"answer {self.calls}",
+                             response_usage=Metrics(input_tokens=100, output_tokens=20))
+
+    def invoke(self, messages, assistant_message=None, **kwargs):
+        return self._answer()
+
+    async def ainvoke(self, messages, assistant_message=None, **kwargs):
+        return self._answer()
+
+    def invoke_stream(self, messages, assistant_message=None, **kwargs):
+        self.calls += 1
+        yield ModelResponse(role="assistant", content="part one, ")
+        yield ModelResponse(content="part two", response_usage=Metrics(input_tokens=50, output_tokens=5))
+
+    async def ainvoke_stream(self, messages, assistant_message=None, **kwargs):
+        for delta in self.invoke_stream(messages, assistant_message, **kwargs):
+            yield delta
+
+
+def messages(question="What's new in AI?", now="2026-01-05 08:00:01.123"):
+    return [
+        Message(role="system", content=f"You write newsletters. The current time is {now}."),
+        Message(role="user", content=question),
+    ]
+
+
+def test_repeated_calls_are_served_from_cache(tmp_path):
+    cache = LLMResponseCache(str(tmp_path / "llm.db"))
+    model = cache_model_responses(FakeModel(), cache)
+
+    first = model.invoke(messages=messages(), assistant_message=Message(role="assistant"))
+    # Same call a few seconds later: only the timestamp in the system prompt differs
+    second = model.invoke(messages=messages(now="2026-01-05 08:00:09.456"), assistant_message=Message(role="assistant"))
+    assert model.calls == 1
+    assert second.content == first.content == "answer 1"
+    assert second.response_usage is None
+
+    model.invoke(messages=messages("Anything about robotics?"), assistant_message=Message(role="assistant"))
+    assert model.calls == 2
+
+    stats = cache.get_stats()
+    assert stats["hits"] == 1 and stats["misses"] == 2
+    assert stats["input_tokens_saved"] == 100 and stats["output_tokens_saved"] == 20
+    assert stats["seconds_saved"] >= 0
+
+
+def test_key_covers_temperature_and_day():
+    cold, warm = FakeModel(0.0), FakeModel(0.7)
+    base = request_key(cold, messages(), now=1_767_600_000)
+    assert request_key(cold, messages(), now=1_767_600_000 + 60) == base
+    assert request_key(warm, messages(), now=1_767_600_000) != base
+    assert request_key(cold, messages(), now=1_767_600_000 + 86_400) != base
+    assert request_key(cold, messages(), tools=[{"type": "function", "function": {"name": "search"}}],
+                       now=1_767_600_000) != base
+
+
+def test_streams_are_replayed(tmp_path):
+    model = cache_model_responses(FakeModel(), LLMResponseCache(str(tmp_path / "llm.db")))
+    first = [delta.content for delta in model.invoke_stream(messages=messages())]
+    second = [delta.content for delta in model.invoke_stream(messages=messages())]
+    assert first == second == ["part one, ", "part two"]
+    assert model.calls == 1
+
+    async def collect():
+        return [delta.content async for delta in model.ainvoke_stream(messages=messages())]
+
+    assert asyncio.run(collect()) == first
+    assert model.calls == 1
+
+
+def test_size_limit_evicts_least_recently_used(tmp_path):
+    cache = LLMResponseCache(str(tmp_path / "llm.db"), max_bytes=600)
+    model = cache_model_responses(FakeModel(), cache)
+    for i in range(10):
+        model.invoke(messages=messages(f"question {i}"))
+    stats = cache.get_stats()
+    assert 0 < stats["entries"] < 10
+    assert stats["bytes"] <= 600
+    assert stats["evictions"] == 10 - stats["entries"]
+
+    # The newest answer is still cached
+    calls = model.calls
+    model.invoke(messages=messages("question 9"))
+    assert model.calls == calls
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+
+    for test in (test_repeated_calls_are_served_from_cache, test_streams_are_replayed,
+                 test_size_limit_evicts_least_recently_used):
+        with tempfile.TemporaryDirectory() as directory:
+            test(Path(directory))
+    test_key_covers_temperature_and_day()
+    print("✅ All LLM cache tests passed")
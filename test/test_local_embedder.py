@@ -0,0 +1,91 @@
+"""
+Test script for the local embedder helpers, reduced-precision vectors and re-embedding
+Uses fake embedders and a temporary LanceDB, so neither sentence-transformers nor OPENAI_API_KEY is needed
+"""
+import hashlib
+from dataclasses import dataclass
+
+import lancedb
+import numpy as np
+import pyarrow as pa
+from agno.knowledge.document.base import Document
+from agno.knowledge.embedder.base import Embedder
+from agno.vectordb.lancedb import SearchType
+from services.lance_store import PulseLanceDb
+from services.local_embedder import reduce_vectors
+from services.reembed import reembed_table
+
+
+@dataclass
+class HashEmbedder(Embedder):
+    """Deterministic embedder with a configurable size"""
+
+    dimensions: int = 16
+
+    def get_embedding(self, text):
+        digest = hashlib.sha256(text.encode()).digest()
+        return [b / 255 for b in digest[:self.dimensions]]
+
+    def get_embedding_and_usage(self, text):
+        return self.get_embedding(text), None
+
+    async def async_get_embedding(self, text):
+        return self.get_embedding(text)
+
+    async def async_get_embedding_and_usage(self, text):
+        return self.get_embedding(text), None
+
+
+def make_store(tmp_path, table_name, dimensions=16, **kwargs):
+    return PulseLanceDb(
+        table_name=table_name,
+        uri=str(tmp_path / "lancedb"),
+        embedder=HashEmbedder(dimensions=dimensions),
+        search_type=SearchType.vector,
+        index_manager=None,
+        write_queue=None,
+        **kwargs,
+    )
+
+
+def test_reduce_vectors_truncates_and_normalizes():
+    vectors = np.array([[3.0, 4.0, 12.0], [0.0, 0.0, 0.0]])
+    reduced = reduce_vectors(vectors, 2)
+    assert reduced.shape == (2, 2)
+    assert np.allclose(reduced[0], [0.6, 0.8])
+    assert np.allclose(reduced[1], [0.0, 0.0])
+    # Asking for more dimensions than the model has keeps them all
+    assert reduce_vectors(vectors, 10, normalize=False).shape == (2, 3)
+
+
+def test_float16_table_is_searchable(tmp_path):
+    vector_db = make_store(tmp_path, "half_test", vector_precision="float16")
+    vector_db.create()
+    vector_db.insert("hash-1", [Document(name="doc", content=f"topic {i}") for i in range(20)])
+
+    vector_type = vector_db.table.schema.field("vector").type
+    assert pa.types.is_float16(vector_type.value_type)
+    results = vector_db.search("topic 7", limit=3)
+    assert results[0].content == "topic 7"
+
+
+def test_reembed_copies_rows_into_new_table(tmp_path):
+    source = make_store(tmp_path, "source_docs")
+    source.create()
+    source.insert("hash-1", [Document(name="guide", content=f"guide part {i}") for i in range(30)])
+    source.insert("hash-2", [Document(name="note", content="private note")], filters={"user_id": "alice"})
+
+    target = make_store(tmp_path, "target_docs", dimensions=8, vector_precision="float16")
+    source_table = lancedb.connect(str(tmp_path / "lancedb")).open_table("source_docs")
+    stats = reembed_table(source_table, target, batch_rows=7)
+    assert stats["rows"] == 31 and stats["written"] == 31
+
+    assert target.get_count() == 31
+    assert target.table.schema.field("vector").type.list_size == 8
+    assert target.content_hash_exists("hash-2")
+    assert target.search("guide part 3", limit=1)[0].content == "guide part 3"
+    assert [doc.content for doc in target.search("private note", limit=5, filters={"user_id": "alice"})][0] == "private note"
+
+    # A second run resumes: everything is already there
+    again = reembed_table(source_table, target, batch_rows=7)
+    assert again["written"] == 0 and again["skipped"] == 31
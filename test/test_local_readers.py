@@ -0,0 +1,158 @@
+"""
+Test script for the offline PDF/HTML/Markdown readers
+Builds small files in memory, no network access needed
+"""
+import asyncio
+import io
+import os
+import threading
+from pypdf import PdfWriter, PageObject
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+from readers.local_readers import (
+    LocalHTMLReader,
+    LocalMarkdownReader,
+    LocalPDFReader,
+    shutdown_parse_pool,
+)
+from readers.registry import ReaderRegistry
+
+
+def make_pdf(page_count: int) -> bytes:
+    """Build a PDF with one line of text per page"""
+    writer = PdfWriter()
+    font = DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    })
+    for i in range(page_count):
+        page = PageObject.create_blank_page(width=300, height=300)
+        stream = DecodedStreamObject()
+        stream.set_data(f"BT /F1 12 Tf 20 150 Td (Page number {i + 1}) Tj ET".encode())
+        page[NameObject("/Contents")] = writer._add_object(stream)
+        page[NameObject("/Resources")] = DictionaryObject({
+            NameObject("/Font"): DictionaryObject({NameObject("/F1"): font}),
+        })
+        writer.add_page(page)
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def test_pdf_pages_parsed_in_process_pool():
+    """Page ranges are extracted by worker processes and come back in order"""
+    reader = LocalPDFReader(inline_max_bytes=0, pages_per_task=3, chunk=False)
+    try:
+        docs = reader.read(io.BytesIO(make_pdf(7)), name="report")
+    finally:
+        shutdown_parse_pool()
+
+    assert [doc.meta_data["page"] for doc in docs] == list(range(1, 8))
+    assert "Page number 5" in docs[4].content
+    assert docs[0].id == "report_1"
+
+
+def test_html_reader_strips_noise_and_keeps_headings():
+    html = b"""<html><head><title>Weekly</title><script>track()</script></head>
+    <body><nav>Menu</nav><h1>Top story</h1><p>Body text.</p><ul><li>One</li></ul></body></html>"""
+    docs = LocalHTMLReader(chunk=False).read(io.BytesIO(html), name="page")
+
+    assert docs[0].meta_data["title"] == "Weekly"
+    assert "# Top story" in docs[0].content
+    assert "- One" in docs[0].content
+    assert "track()" not in docs[0].content and "Menu" not in docs[0].content
+
+
+def test_markdown_reader_strips_front_matter():
+    text = b"---\ntags: [ai]\n---\n# Notes\n\nSome text.\n"
+    docs = LocalMarkdownReader(chunk=False).read(io.BytesIO(text), name="notes")
+
+    assert docs[0].meta_data["title"] == "Notes"
+    assert docs[0].content.startswith("# Notes")
+
+
+def test_registry_dispatches_by_extension_and_mime_type():
+    registry = ReaderRegistry()
+
+    assert isinstance(registry.get_reader_for_extension("text/html"), LocalHTMLReader)
+    assert isinstance(registry.get_reader_for_extension(".PDF"), LocalPDFReader)
+    assert isinstance(registry.get_reader_for_extension("text/markdown"), LocalMarkdownReader)
+
+
+class RecordingPDFReader(LocalPDFReader):
+    """Records what the page tasks receive"""
+
+    def _run_many(self, fn, arg_list, offload=True):
+        self.sources = getattr(self, "sources", []) + [args[0] for args in arg_list]
+        return super()._run_many(fn, arg_list, offload=offload)
+
+
+def test_pdf_uploads_reach_workers_as_a_spooled_file():
+    """Workers get one temporary file path, not a copy of the PDF per task"""
+    reader = RecordingPDFReader(inline_max_bytes=0, pages_per_task=2, chunk=False)
+    try:
+        docs = reader.read(io.BytesIO(make_pdf(5)), name="upload")
+    finally:
+        shutdown_parse_pool()
+
+    assert len(docs) == 5
+    assert len(reader.sources) == 4  # page count + three page ranges
+    assert all(isinstance(source, str) for source in reader.sources)
+    assert len(set(reader.sources)) == 1
+    assert not os.path.exists(reader.sources[0])
+
+
+class ThreadRecordingReader(LocalMarkdownReader):
+    """Records the thread each read runs on"""
+
+    def read(self, file, name=None, **kwargs):
+        self.thread = threading.get_ident()
+        return super().read(file, name, **kwargs)
+
+
+class FakeVectorDb:
+    def __init__(self):
+        self.documents = []
+
+    def exists(self):
+        return True
+
+    def upsert_available(self):
+        return True
+
+    def content_hash_exists(self, content_hash):
+        return False
+
+    async def async_upsert(self, content_hash, documents, filters=None):
+        self.documents.extend(documents)
+
+    async def async_insert(self, content_hash, documents, filters=None):
+        self.documents.extend(documents)
+
+
+def test_uploads_are_read_off_the_event_loop():
+    """RegistryKnowledge reads file uploads in a worker thread"""
+    from agno.knowledge.content import Content, FileData
+    from readers.registry import RegistryKnowledge
+
+    reader = ThreadRecordingReader(chunk=False)
+    vector_db = FakeVectorDb()
+    knowledge = RegistryKnowledge(name="uploads", vector_db=vector_db)
+    content = Content(
+        name="notes",
+        file_data=FileData(content=b"# Notes\n\nSome text.\n", type="text/markdown"),
+        metadata={"user_id": "alice"},
+        reader=reader,
+    )
+    content.content_hash = knowledge._build_content_hash(content)
+    content.id = "content-1"
+
+    async def upload():
+        await knowledge._load_from_content(content, upsert=True, skip_if_exists=False)
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(upload())
+
+    assert reader.thread != loop_thread
+    assert [doc.meta_data["user_id"] for doc in vector_db.documents] == ["alice"]
+    assert vector_db.documents[0].content_id == "content-1"
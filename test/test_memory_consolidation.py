@@ -0,0 +1,119 @@
+"""
+Test script for near-duplicate memory consolidation
+Uses an in-memory store, a keyword embedder and a scripted merge, so no API key is needed
+"""
+from agno.db.schemas import UserMemory
+
+from services.memory_consolidation import MemoryConsolidator
+from services.memory_index import MemoryIndex
+
+TOPICS = ["python", "cooking", "travel", "music", "running"]
+
+
+class KeywordEmbedder:
+    """One dimension per topic word"""
+
+    def get_embedding(self, text):
+        words = text.lower().split()
+        return [float(words.count(topic)) for topic in TOPICS]
+
+
+class FakeMemoryDb:
+    """Just the memory methods of an agno database"""
+
+    def __init__(self, memories):
+        self.memories = {memory.memory_id: memory for memory in memories}
+
+    def get_user_memory_stats(self):
+        users = sorted({memory.user_id for memory in self.memories.values()})
+        return [{"user_id": user_id} for user_id in users], len(users)
+
+    def get_user_memories(self, user_id=None):
+        return [memory for memory in self.memories.values() if memory.user_id == user_id]
+
+    def upsert_user_memory(self, memory):
+        self.memories[memory.memory_id] = memory
+        return memory
+
+    def delete_user_memories(self, memory_ids):
+        for memory_id in memory_ids:
+            self.memories.pop(memory_id, None)
+
+
+class ScriptedConsolidator(MemoryConsolidator):
+    """Merges by keeping the newest text instead of calling a model"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.merge_calls = 0
+
+    def merge_text(self, memories):
+        self.merge_calls += 1
+        return memories[-1].memory + " (merged)"
+
+
+def make_db():
+    memories = [
+        UserMemory(memory="likes python", memory_id="a1", user_id="alice", updated_at=1, topics=["tech"]),
+        UserMemory(memory="enjoys python python", memory_id="a2", user_id="alice", updated_at=2, topics=["coding"]),
+        UserMemory(memory="writes python daily", memory_id="a3", user_id="alice", updated_at=3),
+        UserMemory(memory="loves cooking", memory_id="a4", user_id="alice", updated_at=4),
+        UserMemory(memory="plans travel", memory_id="a5", user_id="alice", updated_at=5),
+        UserMemory(memory="music fan", memory_id="b1", user_id="bob", updated_at=1),
+        UserMemory(memory="likes music a lot", memory_id="b2", user_id="bob", updated_at=2),
+        UserMemory(memory="goes running", memory_id="b3", user_id="bob", updated_at=3),
+    ]
+    return FakeMemoryDb(memories)
+
+
+def make_consolidator(db, tmp_path):
+    return ScriptedConsolidator(
+        db,
+        index=MemoryIndex(embedder=KeywordEmbedder()),
+        threshold=0.9,
+        archive_db_file=str(tmp_path / "archive.db"),
+    )
+
+
+def test_near_duplicates_are_merged_and_archived(tmp_path):
+    db = make_db()
+    consolidator = make_consolidator(db, tmp_path)
+    report = consolidator.run()
+
+    assert report.users == 2
+    assert report.memories_before == 8
+    assert report.memories_after == 5
+    assert report.clusters == 2
+    assert report.llm_calls == consolidator.merge_calls == 2
+    assert report.archived == 5
+    assert report.tokens_after < report.tokens_before
+    assert not report.errors
+
+    alice = sorted(memory.memory for memory in db.get_user_memories("alice"))
+    assert alice == ["loves cooking", "plans travel", "writes python daily (merged)"]
+    merged = next(memory for memory in db.get_user_memories("alice") if "merged" in memory.memory)
+    assert merged.topics == ["tech", "coding"]
+
+    archived = consolidator.list_archived("alice")
+    assert sorted(row["memory_id"] for row in archived) == ["a1", "a2", "a3"]
+    assert all(row["merged_into"] == merged.memory_id for row in archived)
+
+
+def test_dry_run_changes_nothing(tmp_path):
+    db = make_db()
+    consolidator = make_consolidator(db, tmp_path)
+    report = consolidator.run(user_id="alice", dry_run=True)
+
+    assert report.clusters == 1
+    assert report.llm_calls == 0
+    assert report.memories_after == report.memories_before == 5
+    assert len(db.memories) == 8
+
+
+def test_second_pass_finds_nothing(tmp_path):
+    db = make_db()
+    consolidator = make_consolidator(db, tmp_path)
+    consolidator.run()
+    report = consolidator.run()
+    assert report.clusters == 0
+    assert report.memories_before == report.memories_after == 5
@@ -0,0 +1,176 @@
+"""
+Test script for embedding-ranked memory retrieval
+Uses a keyword embedder and an in-memory manager, so no API key is needed
+"""
+import asyncio
+import threading
+import warnings
+from types import SimpleNamespace
+
+from agno.agent import Agent
+from agno.db.schemas import UserMemory
+from agno.memory import MemoryManager
+from agno.run.agent import RunInput, RunOutput
+from agno.session import AgentSession
+
+from services.memory_index import MemoryIndex, RelevantMemoryManager, focus_memories_on_input, set_memory_query
+
+TOPICS = ["python", "cooking", "travel", "music"]
+
+
+class KeywordEmbedder:
+    """One dimension per topic word; counts embedded texts"""
+
+    def __init__(self):
+        self.embedded = 0
+        self.threads = set()
+
+    def get_embedding(self, text):
+        self.embedded += 1
+        self.threads.add(threading.get_ident())
+        words = text.lower().split()
+        return [float(words.count(topic)) for topic in TOPICS] + [0.1]
+
+
+def make_memories(count):
+    return [
+        UserMemory(memory=f"memory {i} about {TOPICS[i % len(TOPICS)]}", memory_id=f"m{i}", updated_at=i)
+        for i in range(count)
+    ]
+
+
+def test_small_sets_are_returned_unchanged():
+    index = MemoryIndex(embedder=KeywordEmbedder(), top_k=10, max_tokens=1000)
+    memories = make_memories(5)
+    assert index.select("alice", memories, "python") == memories
+    # Nothing needed ranking, so nothing was embedded
+    assert index.embedder.embedded == 0
+
+
+def test_most_relevant_memories_within_caps():
+    index = MemoryIndex(embedder=KeywordEmbedder(), top_k=5, max_tokens=1000)
+    selected = index.select("alice", make_memories(40), "tips for cooking dinner")
+    assert len(selected) == 5
+    assert all("cooking" in memory.memory for memory in selected)
+
+    stats = index.get_stats()
+    assert stats["memories_indexed"] == 40
+    assert stats["tokens_injected"] < stats["tokens_available"]
+
+
+def test_token_budget_caps_selection():
+    index = MemoryIndex(embedder=KeywordEmbedder(), top_k=50, max_tokens=20)
+    selected = index.select("alice", make_memories(40), "travel")
+    assert 0 < len(selected) < 40
+    assert all("travel" in memory.memory for memory in selected)
+
+
+def test_only_changed_memories_are_reembedded():
+    embedder = KeywordEmbedder()
+    index = MemoryIndex(embedder=embedder, top_k=3, max_tokens=1000)
+    memories = make_memories(20)
+    index.select("alice", memories, "music")
+    assert embedder.embedded == 20 + 1  # memories + query
+
+    memories[0] = UserMemory(memory="memory 0 about music now", memory_id="m0")
+    memories.append(UserMemory(memory="new memory about music", memory_id="m20"))
+    selected = index.select("alice", memories, "music")
+    assert embedder.embedded == 21 + 2 + 1
+    assert all("music" in memory.memory for memory in selected)
+
+
+def test_manager_filters_only_during_a_run():
+    memories = make_memories(30)
+    index = MemoryIndex(embedder=KeywordEmbedder(), top_k=4, max_tokens=1000)
+    manager = RelevantMemoryManager(index=index)
+    original = MemoryManager.get_user_memories
+    MemoryManager.get_user_memories = lambda self, user_id=None: list(memories)
+    try:
+        set_memory_query(None)
+        assert len(manager.get_user_memories("alice")) == 30
+
+        set_memory_query("python questions")
+        selected = manager.get_user_memories("alice")
+        assert len(selected) == 4
+        assert all("python" in memory.memory for memory in selected)
+    finally:
+        MemoryManager.get_user_memories = original
+        set_memory_query(None)
+
+
+def test_pre_hook_embeds_off_the_event_loop():
+    """The pre-hook does the embedding in a thread; building the prompt only ranks"""
+    memories = make_memories(30)
+    embedder = KeywordEmbedder()
+    manager = RelevantMemoryManager(index=MemoryIndex(embedder=embedder, top_k=4, max_tokens=1000))
+    agent = SimpleNamespace(memory_manager=manager)
+    run_input = SimpleNamespace(input_content_string=lambda: "travel plans")
+    original = MemoryManager.get_user_memories
+    MemoryManager.get_user_memories = lambda self, user_id=None: list(memories)
+
+    async def run():
+        await focus_memories_on_input(run_input=run_input, agent=agent, user_id="alice")
+        embedded = embedder.embedded
+        # What agno does while building the system prompt, on the loop
+        selected = manager.get_user_memories("alice")
+        assert embedder.embedded == embedded
+        return threading.get_ident(), selected
+
+    try:
+        loop_thread, selected = asyncio.run(run())
+    finally:
+        MemoryManager.get_user_memories = original
+        set_memory_query(None)
+
+    assert embedder.embedded == 30 + 1
+    assert loop_thread not in embedder.threads
+    assert len(selected) == 4 and all("travel" in memory.memory for memory in selected)
+
+
+def test_pre_hook_runs_through_both_agno_hook_paths():
+    """agent.run calls the hook without awaiting it, arun awaits it; both rank the memories"""
+    memories = make_memories(30)
+    embedder = KeywordEmbedder()
+    manager = RelevantMemoryManager(index=MemoryIndex(embedder=embedder, top_k=4, max_tokens=1000))
+    agent = Agent(name="Digest Agent", memory_manager=manager)
+    original = MemoryManager.get_user_memories
+    MemoryManager.get_user_memories = lambda self, user_id=None: list(memories)
+
+    def hook_args(text):
+        return dict(
+            hooks=[focus_memories_on_input],
+            run_response=RunOutput(run_id="r1", session_id="s1"),
+            run_input=RunInput(input_content=text),
+            session=AgentSession(session_id="s1"),
+            user_id="alice",
+        )
+
+    async def run_async_hooks():
+        async for _ in agent._aexecute_pre_hooks(**hook_args("travel plans")):
+            pass
+        return manager.get_user_memories("alice")
+
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            for _ in agent._execute_pre_hooks(**hook_args("music playlists")):
+                pass
+            selected = manager.get_user_memories("alice")
+            assert len(selected) == 4 and all("music" in memory.memory for memory in selected)
+
+            selected = asyncio.run(run_async_hooks())
+            assert len(selected) == 4 and all("travel" in memory.memory for memory in selected)
+    finally:
+        MemoryManager.get_user_memories = original
+        set_memory_query(None)
+
+
+if __name__ == "__main__":
+    test_small_sets_are_returned_unchanged()
+    test_most_relevant_memories_within_caps()
+    test_token_budget_caps_selection()
+    test_only_changed_memories_are_reembedded()
+    test_manager_filters_only_during_a_run()
+    test_pre_hook_embeds_off_the_event_loop()
+    test_pre_hook_runs_through_both_agno_hook_paths()
+    print("✅ All memory index tests passed")
@@ -0,0 +1,103 @@
+"""
+Test script for deferred, batched memory extraction
+Replaces the LLM extraction with a recorder, so no API key is needed
+"""
+import time
+
+from services.memory_queue import DeferredMemoryManager, MemoryExtractionQueue
+
+
+class RecordingMemoryManager(DeferredMemoryManager):
+    """Records extraction calls instead of calling a model"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.calls = []
+
+    def extract_now(self, messages, user_id, agent_id=None, team_id=None):
+        time.sleep(0.01)
+        self.calls.append((user_id, [message.content for message in messages]))
+        return "ok"
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_turns_are_batched_per_user():
+    queue = MemoryExtractionQueue(batch_turns=3, idle_seconds=60)
+    manager = RecordingMemoryManager(queue=queue)
+
+    started = time.perf_counter()
+    for i in range(3):
+        assert manager.create_user_memories(message=f"alice turn {i}", user_id="alice") == "Memory extraction queued"
+    manager.create_user_memories(message="bob turn 0", user_id="bob")
+    # Queuing never waits for the model
+    assert time.perf_counter() - started < 0.5
+
+    assert wait_for(lambda: len(manager.calls) == 1)
+    assert manager.calls[0] == ("alice", ["alice turn 0", "alice turn 1", "alice turn 2"])
+    assert queue.get_stats()["pending_turns"] == 1
+
+    queue.close()
+    assert manager.calls[1] == ("bob", ["bob turn 0"])
+    stats = queue.get_stats()
+    assert stats["extraction_calls"] == 2 and stats["turns_extracted"] == 4
+    assert stats["llm_calls_saved"] == 2
+    assert stats["latency_saved_per_turn_seconds"] > 0
+
+
+def test_idle_users_are_extracted():
+    queue = MemoryExtractionQueue(batch_turns=10, idle_seconds=0.2)
+    manager = RecordingMemoryManager(queue=queue)
+    manager.create_user_memories(message="I like Rust", user_id="carol")
+    manager.create_user_memories(message="and databases", user_id="carol")
+
+    assert wait_for(lambda: len(manager.calls) == 1)
+    assert manager.calls[0] == ("carol", ["I like Rust", "and databases"])
+    queue.close()
+
+
+class FlakyMemoryManager(RecordingMemoryManager):
+    """Fails the first `failures` extractions"""
+
+    def __init__(self, failures, **kwargs):
+        super().__init__(**kwargs)
+        self.failures = failures
+
+    def extract_now(self, messages, user_id, agent_id=None, team_id=None):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("rate limited")
+        return super().extract_now(messages, user_id, agent_id, team_id)
+
+
+def test_failed_extractions_are_retried():
+    queue = MemoryExtractionQueue(batch_turns=2, idle_seconds=60, max_retries=2, retry_backoff_seconds=0.3)
+    manager = FlakyMemoryManager(failures=1, queue=queue)
+    manager.create_user_memories(message="I like Go", user_id="dave")
+    manager.create_user_memories(message="and Postgres", user_id="dave")
+
+    assert wait_for(lambda: queue.get_stats()["retries"] == 1)
+    # A turn queued during the backoff joins the retried batch, after the failed turns
+    manager.create_user_memories(message="also Kafka", user_id="dave")
+    assert wait_for(lambda: len(manager.calls) == 1)
+    assert manager.calls[0] == ("dave", ["I like Go", "and Postgres", "also Kafka"])
+    stats = queue.get_stats()
+    assert stats["turns_failed"] == 0 and stats["turns_extracted"] == 3
+    queue.close()
+
+
+def test_turns_are_dropped_after_the_last_retry():
+    queue = MemoryExtractionQueue(batch_turns=1, idle_seconds=60, max_retries=1, retry_backoff_seconds=0.05)
+    manager = FlakyMemoryManager(failures=2, queue=queue)
+    manager.create_user_memories(message="lost turn", user_id="erin")
+
+    assert wait_for(lambda: queue.get_stats()["turns_failed"] == 1)
+    stats = queue.get_stats()
+    assert stats["retries"] == 1 and stats["pending_turns"] == 0
+    assert stats["last_error"] == "rate limited"
+    queue.close()
@@ -0,0 +1,73 @@
+"""
+Test script for reader instrumentation and the metrics registry
+Uses a fake HTTP response, so no JINA_API_KEY or network access is needed
+"""
+import asyncio
+import requests
+from agno.knowledge.document.base import Document
+from readers import JinaWebReader
+from readers.instrumentation import instrument_reader
+from services.metrics import MetricsRegistry, get_metrics_registry
+
+
+class FakeResponse:
+    """Minimal stand-in for a requests.Response"""
+
+    def __init__(self, status_code: int, text: str = ""):
+        self.status_code = status_code
+        self.text = text
+        self.content = text.encode("utf-8")
+
+    def close(self):
+        pass
+
+
+def test_histogram_snapshot_and_prometheus():
+    """Histograms keep per-label buckets and render cumulative counts"""
+    registry = MetricsRegistry()
+    latency = registry.histogram("fetch_seconds", "Fetch latency", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 5.0):
+        latency.observe(value, reader="test")
+
+    series = registry.snapshot()["fetch_seconds"]["series"][0]
+    assert series["count"] == 4
+    assert series["buckets"] == {"0.1": 1, "1.0": 2, "+Inf": 1}
+    assert series["p50"] == 1.0
+
+    text = registry.render_prometheus()
+    assert '# TYPE fetch_seconds histogram' in text
+    assert 'fetch_seconds_bucket{reader="test",le="1.0"} 3' in text
+    assert 'fetch_seconds_count{reader="test"} 4' in text
+
+
+def test_jina_retry_and_status_metrics(monkeypatch):
+    """A 429 followed by a 200 records one retry and both status codes"""
+    responses = iter([FakeResponse(429), FakeResponse(200, "# Page\nbody")])
+    monkeypatch.setattr(requests, "get", lambda *args, **kwargs: next(responses))
+    monkeypatch.setattr("readers.jina_reader.time.sleep", lambda seconds: None)
+
+    metrics = get_metrics_registry()
+    retries = metrics.counter("reader_retries_total")
+    status = metrics.counter("reader_http_responses_total")
+    before_retries = retries.value(reader="JinaWebReader", reason="rate_limit")
+    before_429 = status.value(reader="JinaWebReader", status=429)
+
+    reader = instrument_reader(JinaWebReader(api_key="test"), reader_key="metrics-test")
+    docs = asyncio.run(reader.async_read("https://example.com"))
+
+    assert len(docs) == 1
+    assert retries.value(reader="JinaWebReader", reason="rate_limit") == before_retries + 1
+    assert status.value(reader="JinaWebReader", status=429) == before_429 + 1
+    # async_read delegates to read, but the call is only counted once
+    assert metrics.counter("reader_reads_total").value(reader="metrics-test", outcome="ok") == 1
+
+
+def test_chunks_per_document():
+    """chunk_document reports how many chunks each document produced"""
+    reader = instrument_reader(JinaWebReader(api_key="test", chunk_size=10), reader_key="chunk-test")
+    reader.chunk_document(Document(name="doc", content="word " * 20))
+
+    series = get_metrics_registry().snapshot()["reader_chunks_per_document"]["series"]
+    chunk_series = [s for s in series if s["labels"] == {"reader": "chunk-test"}]
+    assert chunk_series and chunk_series[0]["count"] == 1
+    assert chunk_series[0]["sum"] > 1
@@ -0,0 +1,95 @@
+"""
+Test script for the lazy reader registry
+No API keys or network access needed
+"""
+import pytest
+from agno.knowledge import Knowledge
+from agno.knowledge.reader.base import Reader
+from agno.knowledge.reader.reader_factory import ReaderFactory
+from readers.registry import ReaderRegistry, ReaderSpec, evict_cached_reader
+
+
+class CountingReader(Reader):
+    """Reader that counts how often it is constructed"""
+
+    instances = 0
+
+    def __init__(self, greeting: str = "hi", **kwargs):
+        super().__init__(**kwargs)
+        CountingReader.instances += 1
+        self.greeting = greeting
+
+    def read(self, obj, name=None):
+        return []
+
+
+@pytest.fixture(autouse=True)
+def unregister_test_readers():
+    """Undo the ReaderFactory registrations made by the test registries"""
+    yield
+    for key in ("CountingReader", "NeedsKeyReader"):
+        if hasattr(ReaderFactory, f"_get_{key}_reader"):
+            delattr(ReaderFactory, f"_get_{key}_reader")
+        evict_cached_reader(key)
+
+
+def _registry():
+    return ReaderRegistry(specs=[
+        ReaderSpec(
+            key="CountingReader",
+            target=f"{__name__}:CountingReader",
+            name="Counting Reader",
+            options=lambda: {"greeting": "hello"},
+        ),
+        ReaderSpec(
+            key="NeedsKeyReader",
+            target=f"{__name__}:CountingReader",
+            name="Needs Key Reader",
+            required_env=("OPEN_PULSE_TEST_MISSING_KEY",),
+        ),
+    ])
+
+
+def test_readers_are_built_on_first_use():
+    """Attaching readers does not construct them; first attribute access does"""
+    CountingReader.instances = 0
+    registry = _registry()
+    first, second = Knowledge(name="a"), Knowledge(name="b")
+
+    status = registry.attach(first)
+    registry.attach(second)
+
+    assert status == {
+        "CountingReader": "registered",
+        "NeedsKeyReader": "skipped: OPEN_PULSE_TEST_MISSING_KEY not found",
+    }
+    assert "NeedsKeyReader" not in first.readers
+    assert CountingReader.instances == 0
+    assert registry.get_stats()["readers"]["CountingReader"]["loaded"] is False
+
+    reader = first.readers["CountingReader"]
+    assert isinstance(reader, Reader)
+    assert reader.greeting == "hello"
+    assert second.readers["CountingReader"].name == "Counting Reader"
+
+    # One shared instance across Knowledge objects and ReaderFactory
+    assert CountingReader.instances == 1
+    assert ReaderFactory.create_reader("CountingReader") is registry.get_reader("CountingReader")
+    assert registry.get_stats()["readers"]["CountingReader"]["loaded"] is True
+
+
+def test_factory_with_overrides_builds_new_instance():
+    """ReaderFactory calls with kwargs get a fresh reader with those options"""
+    registry = _registry()
+    registry.register_factories()
+    factory = registry._make_factory("CountingReader")
+
+    custom = factory(ReaderFactory, greeting="hey")
+    assert custom.greeting == "hey"
+    assert custom is not registry.get_reader("CountingReader")
+
+
+def test_registration_is_undone_between_tests():
+    """The fixture leaves no test reader behind on the global ReaderFactory"""
+    assert not hasattr(ReaderFactory, "_get_CountingReader_reader")
+    assert "CountingReader" not in ReaderFactory._reader_cache
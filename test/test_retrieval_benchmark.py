@@ -0,0 +1,45 @@
+"""
+Test script for the retrieval benchmark
+Runs a tiny synthetic corpus through a temporary LanceDB, so no OPENAI_API_KEY is needed
+"""
+import lancedb
+
+from services.retrieval_benchmark import SyntheticCorpus, SyntheticEmbedder, remove_benchmark_data, run_benchmark
+
+
+def test_corpus_is_deterministic():
+    first, second = SyntheticCorpus(50, seed=7), SyntheticCorpus(50, seed=7)
+    assert first.document(13).content == second.document(13).content
+    assert first.queries(5) == second.queries(5)
+    assert SyntheticCorpus(50, seed=8).document(13).content != first.document(13).content
+
+
+def test_embedder_ranks_shared_words_closer():
+    embedder = SyntheticEmbedder(dimensions=32)
+    base, near, far = (embedder.get_embedding(text) for text in ("alpha beta gamma", "alpha beta delta", "omega psi chi"))
+    dot = lambda a, b: sum(x * y for x, y in zip(a, b))
+    assert dot(base, near) > dot(base, far)
+
+
+def test_benchmark_reports_every_mode(tmp_path):
+    result = run_benchmark(600, str(tmp_path / "lancedb"), queries=20, k=5, batch_size=250, dimensions=16)
+
+    assert result["ingest"]["chunks"] == 600
+    for round_name in ("without_vector_index", "with_vector_index"):
+        assert set(result[round_name]) == {"vector", "keyword", "hybrid"}
+        for stats in result[round_name].values():
+            assert stats["queries"] == 20
+            assert stats["p50_ms"] <= stats["p99_ms"]
+    assert result["without_vector_index"]["keyword"]["recall_at_5"] > 0.5
+    assert result["indexes"]["vector"]["coverage"] == 1.0
+
+
+def test_cleanup_only_drops_benchmark_tables(tmp_path):
+    uri = str(tmp_path / "lancedb")
+    connection = lancedb.connect(uri)
+    connection.create_table("open_pulse_knowledge", data=[{"id": "1", "vector": [0.0, 1.0]}])
+    connection.create_table("benchmark_600", data=[{"id": "1", "vector": [0.0, 1.0]}])
+
+    remove_benchmark_data(uri, [600])
+    assert connection.table_names() == ["open_pulse_knowledge"]
+    assert (tmp_path / "lancedb").exists()
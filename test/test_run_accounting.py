@@ -0,0 +1,188 @@
+"""
+Test script for per-run token, latency and cost accounting
+Uses stored runs and function steps only, so no API key is needed
+"""
+import threading
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+from agno.agent import Agent
+from agno.models.metrics import Metrics
+from agno.run.agent import RunOutput
+from agno.run.base import RunStatus
+from agno.session import AgentSession
+from agno.workflow import Step, Workflow
+from agno.workflow.types import StepInput, StepOutput
+
+from services.run_accounting import (
+    RunAccountingStore,
+    account_session_runs,
+    account_step,
+    account_workflow_steps,
+    estimate_cost,
+)
+
+
+def make_store(tmp_path):
+    return RunAccountingStore(db_file=str(tmp_path / "accounting.db"), prices_file=None)
+
+
+def make_run(run_id, status=RunStatus.completed, model="gpt-4o-mini", input_tokens=1000, output_tokens=500):
+    return RunOutput(
+        run_id=run_id,
+        session_id="s1",
+        agent_name="Newsletter Agent",
+        model=model,
+        model_provider="OpenAI",
+        status=status,
+        metrics=Metrics(input_tokens=input_tokens, output_tokens=output_tokens, total_tokens=input_tokens + output_tokens, duration=1.5),
+    )
+
+
+def image_step(step_input: StepInput) -> StepOutput:
+    return StepOutput(
+        content="cover",
+        metrics=Metrics(input_tokens=20, output_tokens=1290, additional_metrics={"model": "gemini-2.5-flash-image"}),
+    )
+
+
+def test_cost_uses_the_longest_matching_price():
+    assert estimate_cost("gpt-4o-mini", 1_000_000, 0) == 0.15
+    assert estimate_cost("gpt-4o-2024-08-06", 0, 1_000_000) == 10.0
+    assert estimate_cost("openai/gpt-4o-mini", 1_000_000, 1_000_000) == 0.75
+    assert estimate_cost("some-local-model", 100, 100) is None
+    print("✅ Costs are estimated from the model price table")
+
+
+def test_finished_runs_are_recorded_once(tmp_path):
+    store = make_store(tmp_path)
+    session = AgentSession(session_id="s1", runs=[])
+    account_session_runs(session, "Newsletter Agent", "alice", store=store)
+    account_session_runs(session, "Newsletter Agent", "alice", store=store)
+
+    run = make_run("r1", status=RunStatus.running)
+    session.upsert_run(run)
+    store.flush()
+    assert store.get_stats()["rows_stored"] == 0
+
+    run.status = RunStatus.completed
+    session.upsert_run(run)
+    session.upsert_run(run)
+
+    store.flush()
+    rows = store.recent()
+    assert len(rows) == 1 and len(session.runs) == 1
+    row = rows[0]
+    assert (row["user_id"], row["agent"], row["model"], row["status"]) == ("alice", "Newsletter Agent", "gpt-4o-mini", "COMPLETED")
+    assert (row["input_tokens"], row["output_tokens"], row["seconds"]) == (1000, 500, 1.5)
+    assert abs(row["cost_usd"] - (1000 * 0.15 + 500 * 0.60) / 1e6) < 1e-12
+    print("✅ A stored run is recorded once, when it has finished")
+
+
+def test_summary_by_user_agent_and_day(tmp_path):
+    store = make_store(tmp_path)
+    yesterday = datetime(2025, 1, 1, 12).timestamp()
+    today = datetime(2025, 1, 2, 12).timestamp()
+    store.record("agent:1", "agent", user_id="alice", agent="Digest Agent", model="gpt-4o", input_tokens=1000, output_tokens=1000, seconds=4.0, recorded_at=yesterday)
+    store.record("agent:2", "agent", user_id="alice", agent="Newsletter Agent", model="gpt-4o-mini", input_tokens=100, output_tokens=100, seconds=1.0, recorded_at=today)
+    store.record("agent:3", "agent", user_id="bob", agent="Newsletter Agent", model="gpt-4o-mini", input_tokens=300, output_tokens=100, seconds=2.0, recorded_at=today)
+
+    by_user = {row["user"]: row for row in store.summary("user")}
+    assert by_user["alice"]["runs"] == 2 and by_user["alice"]["total_tokens"] == 2200
+    assert by_user["bob"]["avg_seconds"] == 2.0
+
+    by_agent = store.summary("agent")
+    assert by_agent[0]["agent"] == "Digest Agent"  # most expensive first
+    assert {row["agent"]: row["runs"] for row in by_agent} == {"Digest Agent": 1, "Newsletter Agent": 2}
+
+    by_day = store.summary("day")
+    assert [row["day"] for row in by_day] == ["2025-01-02", "2025-01-01"]
+    assert store.summary("day", since="2025-01-02", user_id="alice")[0]["runs"] == 1
+    print("✅ Spend and latency are reported by user, agent and day")
+
+
+def test_workflow_steps_are_recorded_without_double_counting(tmp_path):
+    store = make_store(tmp_path)
+    digest_agent = Agent(name="Digest Agent")
+    generate = Step(name="Generate Newsletter", agent=digest_agent)
+    cover = account_step(Step(name="Generate Cover Image", executor=image_step), store=store)
+    assert account_step(cover, store=store) is cover
+
+    output = cover.execute(StepInput(input="AI news"), session_id="w1", user_id="alice")
+    assert output.content == "cover"
+    events = list(cover.execute_stream(StepInput(input="AI news"), user_id="alice"))
+    assert any(isinstance(event, StepOutput) for event in events)
+
+    # The agent-backed step's tokens are already in the agent's own row
+    store.record_agent_run(make_run("r1"), user_id="alice")
+    store.record_step(generate, StepOutput(content="x", metrics=Metrics(input_tokens=1000, output_tokens=500)), 2.0, user_id="alice")
+
+    store.flush()
+    by_step = {row["step"]: row for row in store.summary("step")}
+    assert by_step["Generate Cover Image"]["runs"] == 2
+    assert by_step["Generate Cover Image"]["output_tokens"] == 2580
+    assert by_step["Generate Newsletter"]["input_tokens"] == 1000
+
+    alice = store.summary("user")[0]
+    assert alice["input_tokens"] == 1000 + 2 * 20
+    assert abs(alice["cost_usd"] - ((1000 * 0.15 + 500 * 0.60) + 2 * (20 * 0.30 + 1290 * 30.0)) / 1e6) < 1e-9
+    print("✅ Steps are recorded and agent steps are not counted twice")
+
+
+def test_workflow_steps_are_wrapped(tmp_path):
+    store = make_store(tmp_path)
+    workflow = Workflow(name="Test Workflow", steps=[Step(name="Generate Cover Image", executor=image_step)])
+    account_workflow_steps(workflow, store=store)
+    assert getattr(workflow.steps[0], "_run_accounting", False)
+    print("✅ Every step of a workflow is accounted")
+
+
+def test_repeated_step_in_one_workflow_run_keeps_every_execution(tmp_path):
+    store = make_store(tmp_path)
+    cover = account_step(Step(name="Generate Cover Image", executor=image_step), store=store)
+    run = SimpleNamespace(run_id="wf-1", workflow_name="Newsletter Workflow")
+
+    # A Loop executes the same step several times within one workflow run
+    for _ in range(3):
+        cover.execute(StepInput(input="AI news"), user_id="alice", workflow_run_response=run)
+
+    store.flush()
+    by_step = {row["step"]: row for row in store.summary("step")}
+    assert by_step["Generate Cover Image"]["runs"] == 3
+    assert by_step["Generate Cover Image"]["output_tokens"] == 3 * 1290
+    print("✅ Every execution of a repeated step gets its own row")
+
+
+def test_stored_runs_are_written_off_the_calling_thread(tmp_path):
+    store = make_store(tmp_path)
+    writers = []
+    original = store.record
+    store.record = lambda *args, **kwargs: writers.append(threading.get_ident()) or original(*args, **kwargs)
+    session = AgentSession(session_id="s1", runs=[])
+    account_session_runs(session, "Newsletter Agent", "alice", store=store)
+
+    session.upsert_run(make_run("r1"))
+    deadline = time.monotonic() + 5
+    while not writers and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert writers and threading.get_ident() not in writers
+    store.close()
+    assert store.get_stats()["rows_stored"] == 1
+    print("✅ Finished runs are written by the background writer")
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+
+    print("🧪 Testing run accounting...")
+    test_cost_uses_the_longest_matching_price()
+    for test in (test_finished_runs_are_recorded_once, test_summary_by_user_agent_and_day,
+                 test_workflow_steps_are_recorded_without_double_counting, test_workflow_steps_are_wrapped,
+                 test_repeated_step_in_one_workflow_run_keeps_every_execution,
+                 test_stored_runs_are_written_off_the_calling_thread):
+        with tempfile.TemporaryDirectory() as directory:
+            test(Path(directory))
+    print("\n✅ All run accounting tests passed!")
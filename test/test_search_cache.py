@@ -0,0 +1,77 @@
+"""
+Test script for the knowledge search result cache
+Uses a fake embedder and a temporary LanceDB, so no OPENAI_API_KEY is needed
+"""
+import hashlib
+import time
+from dataclasses import dataclass
+
+from agno.knowledge.document.base import Document
+from agno.knowledge.embedder.base import Embedder
+from services.lance_store import PulseLanceDb
+from services.search_cache import SearchResultCache, search_key
+
+
+@dataclass
+class HashEmbedder(Embedder):
+    """Deterministic 8-dimensional embedder that counts query embeddings"""
+
+    dimensions: int = 8
+    calls: int = 0
+
+    def get_embedding(self, text):
+        self.calls += 1
+        digest = hashlib.md5(text.encode()).digest()
+        return [b / 255 for b in digest[:self.dimensions]]
+
+    def get_embedding_and_usage(self, text):
+        return self.get_embedding(text), None
+
+    async def async_get_embedding(self, text):
+        return self.get_embedding(text)
+
+    async def async_get_embedding_and_usage(self, text):
+        return self.get_embedding(text), None
+
+
+def test_lru_and_ttl():
+    cache = SearchResultCache(max_entries=2, ttl_seconds=0.05)
+    cache.put("a", [Document(content="a")])
+    cache.put("b", [Document(content="b")])
+    cache.get("a")
+    cache.put("c", [Document(content="c")])
+
+    assert cache.get("b") is None  # least recently used was dropped
+    assert cache.get("a")[0].content == "a"
+
+    time.sleep(0.06)
+    assert cache.get("a") is None
+    assert cache.get_stats()["expired"] >= 1
+
+
+def test_key_ignores_filter_order():
+    first = search_key("ai news", {"a": 1, "b": 2}, "hybrid", 5, 0)
+    second = search_key("ai news ", {"b": 2, "a": 1}, "hybrid", 5, 0)
+    assert first == second
+    assert first != search_key("ai news", {"a": 1, "b": 2}, "hybrid", 5, 1)
+
+
+def test_search_is_cached_until_ingest(tmp_path):
+    embedder = HashEmbedder()
+    vector_db = PulseLanceDb(table_name="search_cache_test", uri=str(tmp_path / "lancedb"), embedder=embedder)
+    vector_db.create()
+    vector_db.insert("hash-1", [Document(name="doc", content=f"chunk {i}") for i in range(3)])
+
+    calls = embedder.calls
+    first = vector_db.search("chunk", limit=2)
+    first[0].content = "modified by caller"
+    second = vector_db.search("chunk", limit=2)
+
+    assert embedder.calls == calls + 1  # second search never reached the table
+    assert second[0].content != "modified by caller"
+    assert vector_db.search_cache.get_stats()["hits"] == 1
+
+    # Ingest bumps the table version and new chunks become visible
+    vector_db.insert("hash-2", [Document(name="doc", content="chunk fresh")])
+    assert len(vector_db.search("chunk", limit=10)) == 4
+    assert vector_db.get_stats()["version"] == 2
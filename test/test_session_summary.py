@@ -0,0 +1,183 @@
+"""
+Test script for incremental, background session summaries
+Replaces the summary model with a recorder, so no API key is needed
+"""
+import re
+import time
+from types import SimpleNamespace
+
+from agno.models.message import Message
+from agno.run.agent import RunOutput
+from agno.session import AgentSession
+from agno.session.summary import SessionSummaryResponse
+
+from services.session_summary import (
+    SUMMARIZED_RUN_KEY,
+    IncrementalSessionSummaryManager,
+    SessionSummaryQueue,
+    unsummarized_runs,
+)
+
+
+class RecordingModel:
+    """Summarizes by listing the user messages it was shown"""
+
+    supports_native_structured_outputs = True
+    supports_json_schema_outputs = False
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.prompts = []
+
+    def response(self, messages, response_format=None):
+        time.sleep(self.delay)
+        prompt = messages[0].content
+        self.prompts.append(prompt)
+        previous = prompt.split("<previous_summary>\n")[1].split("\n</previous_summary>")[0] if "<previous_summary>" in prompt else ""
+        new = re.findall(r"User: (.*)", prompt)
+        summary = "; ".join(part for part in [previous] + new if part)
+        return SimpleNamespace(parsed=SessionSummaryResponse(summary=summary, topics=["test"]), content=None)
+
+
+class FakeSessionDb:
+    """Stores sessions by id like the agent's db"""
+
+    def __init__(self):
+        self.sessions = {}
+
+    def get_session(self, session_id, session_type, user_id=None, deserialize=True):
+        return self.sessions.get(session_id)
+
+    def upsert_session(self, session, deserialize=True):
+        self.sessions[session.session_id] = session
+        return session
+
+
+def add_run(session, text):
+    run = RunOutput(
+        run_id=f"run-{len(session.runs or [])}",
+        session_id=session.session_id,
+        messages=[
+            Message(role="system", content="You are a helpful assistant"),
+            Message(role="user", content=text),
+            Message(role="assistant", content=f"answer to {text}"),
+        ],
+    )
+    session.runs = (session.runs or []) + [run]
+    return run
+
+
+def make_manager(min_new_runs=2, min_new_tokens=10_000, delay=0.0):
+    queue = SessionSummaryQueue(min_new_runs=min_new_runs, min_new_tokens=min_new_tokens)
+    model = RecordingModel(delay=delay)
+    db = FakeSessionDb()
+    return IncrementalSessionSummaryManager(model=model, db=db, queue=queue), queue, model, db
+
+
+def test_run_does_not_wait_for_the_summary():
+    manager, queue, model, _ = make_manager(min_new_runs=1, delay=0.5)
+    session = AgentSession(session_id="s1")
+    add_run(session, "first question")
+
+    started = time.perf_counter()
+    assert manager.create_session_summary(session) is None
+    assert time.perf_counter() - started < 0.2
+
+    queue.flush()
+    assert session.summary.summary == "first question"
+    assert session.session_data[SUMMARIZED_RUN_KEY] == "run-0"
+    print("✅ The run returns before the summary model is called")
+
+
+def test_small_changes_are_skipped():
+    manager, queue, model, _ = make_manager(min_new_runs=2)
+    session = AgentSession(session_id="s1")
+
+    add_run(session, "q0")
+    manager.create_session_summary(session)
+    queue.flush()
+    assert model.prompts == [] and queue.skipped == 1
+
+    add_run(session, "q1")
+    manager.create_session_summary(session)
+    queue.flush()
+    assert len(model.prompts) == 1
+    assert session.summary.summary == "q0; q1"
+    print("✅ Updates wait for enough new runs")
+
+
+def test_only_new_runs_are_folded():
+    manager, queue, model, _ = make_manager(min_new_runs=2)
+    session = AgentSession(session_id="s1")
+
+    for turn in range(10):
+        add_run(session, f"q{turn}")
+        manager.create_session_summary(session)
+        queue.flush()
+
+    assert session.summary.summary == "; ".join(f"q{turn}" for turn in range(10))
+    assert len(model.prompts) == 5
+    # Each update sees the previous summary and the two new runs only
+    for prompt in model.prompts:
+        assert len(re.findall(r"User: ", prompt)) == 2
+    assert "<previous_summary>" not in model.prompts[0]
+    assert "q0; q1" in model.prompts[1]
+    assert unsummarized_runs(session) == []
+    print("✅ Updates fold only the runs added since the last summary")
+
+
+def test_summary_is_persisted_on_the_stored_session():
+    manager, queue, _, db = make_manager(min_new_runs=1)
+    session = AgentSession(session_id="s1")
+    add_run(session, "hello")
+    stored = AgentSession(session_id="s1", runs=list(session.runs), session_data={"session_state": {"k": 1}})
+    db.upsert_session(stored)
+
+    manager.create_session_summary(session)
+    queue.flush()
+
+    assert db.sessions["s1"].summary.summary == "hello"
+    assert db.sessions["s1"].session_data == {"session_state": {"k": 1}, SUMMARIZED_RUN_KEY: "run-0"}
+    print("✅ The updated summary is written to the stored session")
+
+
+def test_queued_runs_of_one_session_fold_once():
+    manager, queue, model, _ = make_manager(min_new_runs=1)
+    session = AgentSession(session_id="s1")
+    queue._ensure_thread = lambda: None  # keep everything queued until flush
+
+    for turn in range(3):
+        add_run(session, f"q{turn}")
+        manager.create_session_summary(session)
+    assert queue.get_stats()["pending_sessions"] == 1
+
+    queue.flush()
+    assert len(model.prompts) == 1
+    assert session.summary.summary == "q0; q1; q2"
+    print("✅ Several queued runs of a session cost one update")
+
+
+def test_background_thread_updates_the_summary():
+    manager, queue, _, _ = make_manager(min_new_runs=1)
+    session = AgentSession(session_id="s1")
+    add_run(session, "background")
+    manager.create_session_summary(session)
+
+    deadline = time.monotonic() + 5
+    while session.summary is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    queue.close()
+    assert session.summary.summary == "background"
+    assert queue.get_stats()["updates"] == 1
+    print("✅ The background thread updates the summary")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing incremental session summaries...")
+    test_run_does_not_wait_for_the_summary()
+    test_small_changes_are_skipped()
+    test_only_new_runs_are_folded()
+    test_summary_is_persisted_on_the_stored_session()
+    test_queued_runs_of_one_session_fold_once()
+    test_background_thread_updates_the_summary()
+    print("\n✅ All session summary tests passed!")
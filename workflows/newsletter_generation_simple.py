@@ -4,15 +4,33 @@ from textwrap import dedent
 from pathlib import Path
 import uuid
 import asyncio
-from google import genai
 from agno.media import Image
+from agno.models.metrics import Metrics
 from agno.workflow import Workflow, Step, Parallel
 from agno.workflow.types import StepInput, StepOutput
 from agno.db.sqlite import SqliteDb
 from agents import create_digest_agent, create_research_agent
+from config.model_factory import create_gemini_client
+from services.run_accounting import account_workflow_steps
 from config.settings import DATABASE_FILE, GOOGLE_API_KEY, IMAGES_DIR, AGENTOS_HOST, AGENTOS_PORT
 from workflows.notification_manager import get_notification_manager
 
+COVER_IMAGE_MODEL = "gemini-2.5-flash-image"
+
+
+def _image_metrics(response) -> Metrics:
+    """Token usage of the image call, for run accounting"""
+    usage = getattr(response, "usage_metadata", None)
+    input_tokens = (getattr(usage, "prompt_token_count", None) or 0) if usage else 0
+    output_tokens = (getattr(usage, "candidates_token_count", None) or 0) if usage else 0
+    return Metrics(
+        input_tokens=input_tokens,
+        output_tokens=output_tokens,
+        total_tokens=input_tokens + output_tokens,
+        additional_metrics={"model": COVER_IMAGE_MODEL},
+    )
+
+
 def generate_cover_image(step_input: StepInput) -> StepOutput:
     """Generate a cover image for the newsletter using Google Gemini and save to filesystem"""
     newsletter_content = step_input.previous_step_content or step_input.input
@@ -30,11 +48,12 @@ def generate_cover_image(step_input: StepInput) -> StepOutput:
         )
         print(f"📝 Image prompt: {prompt}")
 
-        client = genai.Client(api_key=GOOGLE_API_KEY)
+        client = create_gemini_client(GOOGLE_API_KEY)
         response = client.models.generate_content(
-            model="gemini-2.5-flash-image",
+            model=COVER_IMAGE_MODEL,
             contents=[prompt],
         )
+        metrics = _image_metrics(response)
 
         # Extract image bytes
         image_bytes = None
@@ -46,7 +65,7 @@ def generate_cover_image(step_input: StepInput) -> StepOutput:
 
         if image_bytes is None:
             print("⚠️ No image generated, continuing without cover")
-            return StepOutput(content=newsletter_content, success=True)
+            return StepOutput(content=newsletter_content, metrics=metrics, success=True)
 
         # Save image to filesystem
         image_id = str(uuid.uuid4())
@@ -66,7 +85,7 @@ def generate_cover_image(step_input: StepInput) -> StepOutput:
         cover_image = Image(url=image_url, id=image_id)
         print(f"🔗 Image URL: {image_url}")
 
-        return StepOutput(content=newsletter_content, images=[cover_image], success=True)
+        return StepOutput(content=newsletter_content, images=[cover_image], metrics=metrics, success=True)
 
     except Exception as e:
         print(f"❌ Error generating cover image: {e}")
@@ -172,4 +191,5 @@ def create_simple_newsletter_workflow(db: SqliteDb = None) -> Workflow:
         store_events=True,
     )
 
-    return workflow
\ No newline at end of file
+    # Record wall time, tokens and cost of each step
+    return account_workflow_steps(workflow)
\ No newline at end of file